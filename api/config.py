@@ -18,6 +18,9 @@ class Config:
     # Dossier pour les modèles entraînés
     MODEL_PATH = os.environ.get('MODEL_PATH') or 'model/trained_models'
     
+    # Feature store des données d'entraînement (features précalculées par mois)
+    FEATURE_STORE_PATH = os.environ.get('FEATURE_STORE_PATH') or 'data/feature_store'
+    
     # Configuration pour Firebase
     FIREBASE_API_KEY = os.environ.get('FIREBASE_API_KEY')
     FIREBASE_AUTH_DOMAIN = os.environ.get('FIREBASE_AUTH_DOMAIN')
@@ -31,6 +34,12 @@ class Config:
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER')
     
+    # Cache des prédictions: durée de vie (s), nombre d'entrées par worker et
+    # backend partagé optionnel entre workers (ex. redis://localhost:6379/0)
+    PREDICTION_CACHE_TTL = int(os.environ.get('PREDICTION_CACHE_TTL') or 300)
+    PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE') or 1024)
+    PREDICTION_CACHE_URL = os.environ.get('PREDICTION_CACHE_URL')
+    
     # Rate limiting
     RATELIMIT_DEFAULT = "100/hour"
     RATELIMIT_STORAGE_URL = "memory://"
@@ -11,6 +11,7 @@ from services.user_service import UserService
 from services.prediction_service import PredictionService
 from services.simulation_service import SimulationService
 from services.notification_service import NotificationService
+from services.model_registry import model_registry
 
 admin_bp = Blueprint('admin', __name__)
 user_service = UserService()
@@ -401,6 +402,10 @@ def activate_model(model_id):
         
         db.session.commit()
         
+        # Rechargement immédiat dans ce processus (les autres workers le font à leur
+        # prochaine vérification des versions actives)
+        model_registry.refresh(force=True)
+        
         return jsonify({
             "success": True,
             "message": f"Model {model_id} activated successfully"
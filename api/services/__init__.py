@@ -13,6 +13,7 @@ from services.prediction_service import PredictionService
 from services.simulation_service import SimulationService
 from services.notification_service import NotificationService
 from services.subscription_service import SubscriptionService
+from services.model_registry import ModelRegistry, model_registry
 
 # Liste des services importés pour référence
 __all__ = [
@@ -22,5 +23,7 @@ __all__ = [
     'PredictionService',
     'SimulationService',
     'NotificationService',
-    'SubscriptionService'
+    'SubscriptionService',
+    'ModelRegistry',
+    'model_registry'
 ]
\ No newline at end of file
@@ -0,0 +1,163 @@
+# api/services/model_registry.py
+import logging
+import os
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import text
+
+from extensions import db
+from model.dual_prediction_model import DualPredictionModel
+from model.model_bundle import LATEST_MODEL_FILES, bundle_path
+from data_preparation.enhanced_data_prep import EnhancedDataPreparation
+
+# Intervalle (secondes) entre deux vérifications des modèles actifs dans model_versions
+RELOAD_CHECK_INTERVAL = 30
+
+# Fichiers chargés quand aucune version n'est active: copies du dernier modèle
+# entraîné, réécrites à chaque entraînement (voir DualPredictionModel._save_bundle)
+DEFAULT_MODEL_FILES = LATEST_MODEL_FILES
+
+
+class ModelRegistry:
+    """
+    Modèles actifs partagés par tous les services d'un processus.
+
+    Chaque fichier de model_versions (is_active = TRUE) n'est chargé qu'une fois
+    par processus, avec un seul EnhancedDataPreparation (et donc un seul moteur
+    SQLAlchemy). Les services reçoivent une référence au DualPredictionModel
+    courant, à utiliser en lecture seule (prédictions); quand les versions
+    actives changent, un nouveau DualPredictionModel est construit à côté puis
+    remplace l'ancien en une affectation, sans interrompre les prédictions en cours.
+    """
+
+    def __init__(self, check_interval=RELOAD_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._model = None
+        self._data_prep = None
+        self._active = {}       # catégorie -> (id de version, chemin du fichier, date de modification)
+        self._loaded = {}       # (chemin du fichier, date de modification) -> (estimateur, bundle)
+        self._checked_at = 0.0
+
+    @property
+    def model(self):
+        """DualPredictionModel courant (rechargé si les versions actives ont changé)."""
+        if self._model is None or time.monotonic() - self._checked_at > self.check_interval:
+            self.refresh()
+        return self._model
+
+    @property
+    def data_prep(self):
+        """EnhancedDataPreparation partagé, avec les encodeurs des modèles actifs."""
+        if self._data_prep is None:
+            self.refresh()
+        return self._data_prep
+
+    def active_version(self, model_category):
+        """
+        Identifiant de la version active. À défaut, chemin du fichier par défaut et
+        date de modification: une copie latest réécrite change d'identifiant.
+        """
+        if self._model is None or time.monotonic() - self._checked_at > self.check_interval:
+            self.refresh()
+        version, file_path, modified_at = self._active.get(model_category, (None, None, None))
+        if version is not None:
+            return version
+        return f"{file_path}@{modified_at}" if modified_at is not None else file_path
+
+    @staticmethod
+    def _modified_at(file_path):
+        """Date de modification du bundle (ou du fichier): un fichier réécrit est rechargé."""
+        for path in (bundle_path(file_path), file_path):
+            if os.path.exists(path):
+                return os.path.getmtime(path)
+        return None
+
+    def _active_versions(self):
+        """Chemins des modèles actifs par catégorie (fichiers par défaut à défaut)."""
+        model_path = current_app.config.get('MODEL_PATH', 'model/trained_models')
+        active = {category: (None, os.path.join(model_path, file_name))
+                  for category, file_name in DEFAULT_MODEL_FILES.items()}
+        try:
+            rows = db.session.execute(text("""
+                SELECT id, model_category, file_path
+                FROM model_versions
+                WHERE is_active = TRUE
+                ORDER BY created_at
+            """)).fetchall()
+            for row in rows:
+                if row.model_category in active and row.file_path:
+                    active[row.model_category] = (row.id, row.file_path)
+        except Exception as e:
+            db.session.rollback()
+            self.logger.error(f"Error reading active model versions: {str(e)}")
+        return {category: (version, file_path, self._modified_at(file_path))
+                for category, (version, file_path) in active.items()}
+
+    def refresh(self, force=False):
+        """
+        Vérifie les versions actives et recharge les modèles qui ont changé.
+
+        Un seul thread recharge; les autres continuent avec le modèle courant
+        (ils n'attendent que pour le tout premier chargement).
+
+        Returns:
+            DualPredictionModel courant
+        """
+        if not self._lock.acquire(blocking=self._model is None or force):
+            return self._model
+        try:
+            active = self._active_versions()
+            if self._model is not None and not force and active == self._active:
+                return self._model
+
+            if self._data_prep is None:
+                self._data_prep = EnhancedDataPreparation()
+            model = self._build_model(active)
+            model.install_encoders(self._data_prep)
+
+            # Remplacement atomique: les requêtes en cours gardent l'ancienne référence
+            self._model, self._active = model, active
+            versions = {category: version for category, (version, _, _) in active.items()}
+            self.logger.info(f"Active models loaded: {versions}")
+            return self._model
+        finally:
+            self._checked_at = time.monotonic()
+            self._lock.release()
+
+    def _build_model(self, active):
+        """Nouveau DualPredictionModel avec les fichiers actifs (déjà chargés: réutilisés)."""
+        model = DualPredictionModel(base_path=current_app.config.get('MODEL_PATH', 'model/trained_models'))
+        loaded = {}
+        for category, (_, file_path, modified_at) in active.items():
+            if (file_path, modified_at) in self._loaded:
+                estimator, bundle = self._loaded[(file_path, modified_at)]
+            else:
+                load = model.load_standard_model if category == 'standard' else model.load_simulation_model
+                if not load(file_path):
+                    continue
+                estimator = model.standard_model if category == 'standard' else model.simulation_model
+                bundle = model.bundles.get(category)
+
+            if category == 'standard':
+                model.standard_model = estimator
+            else:
+                model.simulation_model = estimator
+            if bundle is not None:
+                model.bundles[category] = bundle
+            loaded[(file_path, modified_at)] = (estimator, bundle)
+
+        # Ne garder en mémoire que les fichiers actifs
+        self._loaded = loaded
+        if model.standard_model is None:
+            model.initialize_standard_model()
+        if model.simulation_model is None:
+            model.initialize_top7_simulation_model()
+        return model
+
+
+# Registre du processus (un par worker)
+model_registry = ModelRegistry()
@@ -0,0 +1,122 @@
+# api/services/prediction_cache.py
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+# Valeurs par défaut (surchargées par PREDICTION_CACHE_TTL / PREDICTION_CACHE_SIZE)
+DEFAULT_TTL = 300
+DEFAULT_MAX_SIZE = 1024
+
+_cache = None
+
+
+def odds_fingerprint(latest_odds):
+    """Empreinte des cotes actuelles d'une course ({id_cheval: cote})."""
+    snapshot = sorted((str(horse), None if odds is None else float(odds)) for horse, odds in latest_odds.items())
+    return hashlib.sha1(json.dumps(snapshot).encode()).hexdigest()[:16]
+
+
+def make_key(course_id, prediction_type, model_version, latest_odds):
+    """
+    Clé de cache: course, type de prédiction, version du modèle actif et empreinte
+    des cotes. Un changement de cote ou de modèle donne une nouvelle clé, les
+    anciennes entrées expirent (TTL) ou sont évincées (LRU).
+    """
+    return f"prediction:{course_id}:{prediction_type}:{model_version}:{odds_fingerprint(latest_odds)}"
+
+
+class PredictionCache:
+    """
+    Cache des réponses de prédiction: LRU en mémoire avec TTL, et backend partagé
+    optionnel (Redis) pour que les workers profitent des calculs des autres.
+
+    Les réponses sont stockées sérialisées en JSON: chaque lecture renvoie une
+    copie que l'appelant peut modifier (ajustements temps réel) sans altérer le cache.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, ttl=DEFAULT_TTL, backend_url=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.logger = logging.getLogger(__name__)
+        self._entries = OrderedDict()   # clé -> (expiration, réponse JSON)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self._shared = None
+        if backend_url:
+            try:
+                import redis
+                self._shared = redis.Redis.from_url(backend_url)
+            except ImportError:
+                self.logger.warning("redis is not installed, prediction cache is local to the worker")
+
+    def get(self, key):
+        """Réponse en cache pour key, ou None."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return json.loads(entry[1])
+                del self._entries[key]
+
+        payload = None
+        if self._shared is not None:
+            try:
+                payload = self._shared.get(key)
+            except Exception as e:
+                self.logger.error(f"Error reading shared prediction cache: {str(e)}")
+
+        if payload is None:
+            self.misses += 1
+            return None
+
+        payload = payload.decode() if isinstance(payload, bytes) else payload
+        self._store(key, payload)
+        self.hits += 1
+        return json.loads(payload)
+
+    def set(self, key, value):
+        """Met en cache une réponse (sérialisable en JSON)."""
+        payload = json.dumps(value, default=str)
+        self._store(key, payload)
+        if self._shared is not None:
+            try:
+                self._shared.setex(key, self.ttl, payload)
+            except Exception as e:
+                self.logger.error(f"Error writing shared prediction cache: {str(e)}")
+
+    def _store(self, key, payload):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                'shared': self._shared is not None}
+
+
+def get_prediction_cache():
+    """Cache du processus, configuré par PREDICTION_CACHE_TTL / _SIZE / _URL."""
+    global _cache
+    if _cache is None:
+        from flask import current_app
+        config = current_app.config
+        _cache = PredictionCache(
+            max_size=config.get('PREDICTION_CACHE_SIZE', DEFAULT_MAX_SIZE),
+            ttl=config.get('PREDICTION_CACHE_TTL', DEFAULT_TTL),
+            backend_url=config.get('PREDICTION_CACHE_URL')
+        )
+    return _cache
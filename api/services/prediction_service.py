@@ -7,47 +7,25 @@ from flask import current_app
 from extensions import db
 from sqlalchemy import func, and_, text
 
-# Importation du modèle de prédiction existant
-from model.dual_prediction_model import DualPredictionModel
-from data_preparation.enhanced_data_prep import EnhancedDataPreparation
+# Modèles et préparation des données partagés par le processus
+from services.model_registry import model_registry
+from services.prediction_cache import get_prediction_cache, make_key
 
 class PredictionService:
     """Service pour gérer les prédictions de courses"""
     
     def __init__(self):
         self.logger = logging.getLogger(__name__)
-        
-        # Initialiser les classes du projet existant
-        self.data_prep = EnhancedDataPreparation()
-        self.model = DualPredictionModel(base_path=current_app.config.get('MODEL_PATH', 'model/trained_models'))
-        
-        # Charger les modèles préentraînés
-        self._load_models()
     
-    def _load_models(self):
-        """Charge les modèles préentraînés nécessaires"""
-        try:
-            # Charger le modèle standard
-            standard_model_path = f"{current_app.config.get('MODEL_PATH')}/enhanced_xgboost_latest.pkl"
-            self.model.load_standard_model(standard_model_path)
-            
-            # Charger le modèle de simulation (Top 7)
-            simulation_model_path = f"{current_app.config.get('MODEL_PATH')}/simulation_top7_xgboost_ranking_latest.pkl"
-            self.model.load_simulation_model(simulation_model_path)
-            
-            self.logger.info("Prediction models loaded successfully")
-            return True
-        except Exception as e:
-            self.logger.error(f"Failed to load prediction models: {str(e)}")
-            # Tenter de charger d'autres versions si disponibles
-            try:
-                self.model.initialize_standard_model()
-                self.model.initialize_simulation_model()
-                self.logger.info("Initialized new prediction models")
-                return True
-            except Exception as e2:
-                self.logger.error(f"Failed to initialize models: {str(e2)}")
-                return False
+    @property
+    def model(self):
+        """Modèles actifs partagés du processus (lecture seule, voir model_registry)"""
+        return model_registry.model
+    
+    @property
+    def data_prep(self):
+        """Préparation des données partagée du processus"""
+        return model_registry.data_prep
 
     def get_upcoming_races(self, days_ahead=1):
         """Récupère les courses à venir dans les prochains jours"""
@@ -94,64 +72,250 @@ class PredictionService:
             return []
 
     def predict_course(self, course_id, prediction_type='standard'):
-        """Effectue une prédiction pour une course donnée"""
+        """
+        Effectue une prédiction pour une course donnée.
+        
+        Les réponses sont mises en cache par course, type de prédiction, version du
+        modèle actif et cotes actuelles (voir prediction_cache): une nouvelle cote
+        ou un nouveau modèle actif donne lieu à un nouveau calcul.
+        """
         try:
-            # Vérifier que la course existe et n'est pas déjà terminée
+            # Vérifier que la course existe et n'est pas déjà terminée, et lire les
+            # cotes actuelles de ses participants (une seule requête)
             query = text("""
-                SELECT c.id, c.date_heure, c.lieu, h.libelleLong AS hippodrome_nom, 
-                       c.type_course, c.distance, c.terrain, c.num_course, c.libelle,
-                       c.position IS NOT NULL AS is_finished
+                SELECT c.position IS NOT NULL AS is_finished, p.id_cheval, p.cote_actuelle
                 FROM courses c
-                LEFT JOIN pmu_hippodromes h ON c.lieu = h.libelleLong
+                LEFT JOIN participations p ON c.id = p.id_course
                 WHERE c.id = :course_id
             """)
             
-            result = db.session.execute(query, {"course_id": course_id}).fetchone()
+            rows = db.session.execute(query, {"course_id": course_id}).fetchall()
             
-            if not result:
+            if not rows:
                 raise ValueError(f"Course with ID {course_id} not found")
             
-            if result.is_finished:
+            if rows[0].is_finished:
                 raise ValueError("Cannot predict a race that has already finished")
             
-            # Utiliser votre système existant pour la prédiction
-            # Préparer les données pour la prédiction
-            prediction_data = self.data_prep.get_participant_data(course_id=course_id)
+            # Réponse déjà calculée pour ces cotes et ce modèle
+            if prediction_type not in ('standard', 'top3', 'top7'):
+                raise ValueError(f"Unsupported prediction type: {prediction_type}")
+            latest_odds = {str(row.id_cheval): row.cote_actuelle for row in rows if row.id_cheval is not None}
+            model_version = model_registry.active_version('simulation' if prediction_type == 'top7' else 'standard')
+            cache = get_prediction_cache()
+            cache_key = make_key(course_id, prediction_type, model_version, latest_odds)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+            
+            # Prédiction précalculée (generate_predictions) encore à jour
+            stored = self.get_stored_prediction(course_id, prediction_type, model_version)
+            if stored is not None:
+                cache.set(cache_key, stored)
+                return stored
             
-            if prediction_data is None or prediction_data.empty:
-                raise ValueError(f"No participants found for course {course_id}")
+            # Utiliser votre système existant pour la prédiction
+            predictions_dict = self.compute_predictions(course_id, [prediction_type])[prediction_type]
             
-            # Créer des features avancées
-            enhanced_data = self.data_prep.create_advanced_features(prediction_data)
+            # Sauvegarder la prédiction dans la base de données
+            self._save_prediction_to_db(course_id, prediction_type, predictions_dict,
+                                        model_version_id=model_version if isinstance(model_version, int) else None)
             
-            # Encoder pour le modèle
-            prepared_data = self.data_prep.encode_features_for_model(enhanced_data, is_training=False)
+            # Retourner le résultat
+            response = {
+                'timestamp': datetime.now().isoformat(),
+                'data': predictions_dict
+            }
+            cache.set(cache_key, response)
+            return response
             
+        except Exception as e:
+            self.logger.error(f"Error predicting course {course_id}: {str(e)}")
+            raise
+
+    def compute_predictions(self, course_id, prediction_types):
+        """
+        Calcule les prédictions d'une course pour plusieurs types à la fois: les
+        données et features ne sont préparées qu'une fois.
+        
+        Returns:
+            dict {type de prédiction: liste des chevaux}
+        """
+        # Un seul jeu de modèles pour toutes les prédictions de la course
+        model = self.model
+        
+        enhanced_data, prepared_data = self._prepare_prediction_data([course_id], prediction_types)
+        if enhanced_data is None:
+            raise ValueError(f"No participants found for course {course_id}")
+        
+        results = {}
+        for prediction_type in prediction_types:
             # Faire la prédiction selon le type demandé
             if prediction_type == 'standard' or prediction_type == 'top3':
                 # Prédiction standard (top 3)
-                predictions = self.model.predict_standard(prepared_data)
+                predictions = model.predict_standard(prepared_data)
             elif prediction_type == 'top7':
                 # Prédiction Top 7
-                predictions = self.model.predict_top7(prepared_data)
+                predictions = model.predict_top7(enhanced_data)
             else:
                 raise ValueError(f"Unsupported prediction type: {prediction_type}")
             
+            if predictions is None:
+                raise ValueError(f"{prediction_type} prediction failed for course {course_id}")
+            
             # Convertir le DataFrame en dictionnaire
-            predictions_dict = predictions.to_dict(orient='records')
+            results[prediction_type] = predictions.to_dict(orient='records')
+        
+        return results
+
+    def _prepare_prediction_data(self, course_ids, prediction_types):
+        """
+        Charge les participants des courses et calcule leurs features en une passe.
+        
+        Returns:
+            tuple (features avancées, features encodées pour le modèle standard ou None),
+            (None, None) si aucune course n'a de participants
+        """
+        # Préparer les données pour la prédiction (même chargement que predict_race)
+        prediction_data = self.data_prep.get_upcoming_data(course_ids=list(course_ids))
+        
+        if prediction_data is None or prediction_data.empty:
+            return None, None
+        
+        # Créer des features avancées
+        enhanced_data = self.data_prep.create_enhanced_features(prediction_data, fill_missing=False)
+        
+        # Encoder pour le modèle standard (le Top 7 utilise les features brutes)
+        prepared_data = None
+        if any(prediction_type in ('standard', 'top3') for prediction_type in prediction_types):
+            prepared_data = self.data_prep.encode_features_for_model(enhanced_data, is_training=False)
+        
+        return enhanced_data, prepared_data
+
+    def compute_predictions_batch(self, course_ids, prediction_types):
+        """
+        Calcule les prédictions de plusieurs courses en une passe: un chargement,
+        un calcul de features et un appel au modèle par type pour toutes les courses.
+        
+        Returns:
+            dict {course: {type de prédiction: liste des chevaux}} (courses sans participants absentes)
+        """
+        model = self.model
+        
+        enhanced_data, prepared_data = self._prepare_prediction_data(course_ids, prediction_types)
+        if enhanced_data is None:
+            return {}
+        
+        results = {}
+        for prediction_type in prediction_types:
+            if prediction_type == 'standard' or prediction_type == 'top3':
+                predictions_by_course = model.predict_standard_batch(prepared_data)
+            elif prediction_type == 'top7':
+                predictions_by_course = model.predict_top7_batch(enhanced_data)
+            else:
+                raise ValueError(f"Unsupported prediction type: {prediction_type}")
             
-            # Sauvegarder la prédiction dans la base de données
-            self._save_prediction_to_db(course_id, prediction_type, predictions_dict)
+            if predictions_by_course is None:
+                raise ValueError(f"{prediction_type} batch prediction failed")
             
-            # Retourner le résultat
+            for course, predictions in predictions_by_course.items():
+                results.setdefault(course, {})[prediction_type] = predictions.to_dict(orient='records')
+        
+        return results
+
+    def precompute_courses(self, course_ids, prediction_types=('standard', 'top7'), force=False):
+        """
+        Calcule et enregistre les prédictions des courses qui ne sont pas à jour
+        (nouvelles cotes ou nouveau modèle actif depuis le dernier calcul), avec
+        une seule passe de préparation et de prédiction pour toutes ces courses.
+        
+        Returns:
+            dict {course: types de prédiction recalculés} ([] si la course était à jour);
+            les courses sans participants sont absentes
+        """
+        versions = {
+            prediction_type: model_registry.active_version('simulation' if prediction_type == 'top7' else 'standard')
+            for prediction_type in prediction_types
+        }
+        refreshed = {}
+        stale = {}
+        for course_id in course_ids:
+            stale_types = [
+                prediction_type for prediction_type in prediction_types
+                if force or self.get_stored_prediction(course_id, prediction_type, versions[prediction_type]) is None
+            ]
+            if stale_types:
+                stale[course_id] = stale_types
+            else:
+                refreshed[course_id] = []
+        if not stale:
+            return refreshed
+        
+        stale_types = [t for t in prediction_types if any(t in types for types in stale.values())]
+        predictions = self.compute_predictions_batch(list(stale), stale_types)
+        
+        # Enregistrer la part de chaque course
+        for course_id, types in stale.items():
+            if course_id not in predictions:
+                continue
+            for prediction_type in types:
+                model_version = versions[prediction_type]
+                self._save_prediction_to_db(course_id, prediction_type, predictions[course_id][prediction_type],
+                                            model_version_id=model_version if isinstance(model_version, int) else None)
+            refreshed[course_id] = types
+        return refreshed
+
+    def get_stored_prediction(self, course_id, prediction_type, model_version=None):
+        """
+        Dernière prédiction enregistrée pour la course si elle est à jour: faite avec
+        la version active du modèle et après la dernière mise à jour des cotes.
+        Les demandes top3 sont servies par la prédiction standard précalculée.
+        
+        Returns:
+            dict (timestamp, data) ou None
+        """
+        try:
+            model_category = 'simulation' if prediction_type == 'top7' else 'standard'
+            if model_version is None:
+                model_version = model_registry.active_version(model_category)
+            if not isinstance(model_version, int):
+                return None
+            
+            query = text("""
+                SELECT p.prediction_data, p.created_at
+                FROM predictions p
+                WHERE p.course_id = :course_id
+                AND p.prediction_type = :prediction_type
+                AND p.model_version_id = :model_id
+                AND p.created_at >= COALESCE((
+                    SELECT MAX(ch.horodatage)
+                    FROM cote_historique ch
+                    JOIN participations pa ON ch.id_participation = pa.id
+                    WHERE pa.id_course = :course_id
+                ), p.created_at)
+                ORDER BY p.created_at DESC
+                LIMIT 1
+            """)
+            
+            result = db.session.execute(query, {
+                "course_id": course_id,
+                "prediction_type": 'standard' if prediction_type == 'top3' else prediction_type,
+                "model_id": model_version
+            }).fetchone()
+            
+            if not result:
+                return None
+            
+            data = result.prediction_data
             return {
-                'timestamp': datetime.now().isoformat(),
-                'data': predictions_dict
+                'timestamp': result.created_at.isoformat(),
+                'data': json.loads(data) if isinstance(data, str) else data
             }
             
         except Exception as e:
-            self.logger.error(f"Error predicting course {course_id}: {str(e)}")
-            raise
+            db.session.rollback()
+            self.logger.error(f"Error reading stored prediction for course {course_id}: {str(e)}")
+            return None
 
     def predict_course_realtime(self, course_id, latest_odds=None):
         """Effectue une prédiction en temps réel avec les dernières cotes"""
@@ -432,22 +596,24 @@ class PredictionService:
             self.logger.error(f"Error generating betting suggestions: {str(e)}")
             return {"message": "Impossible de générer des suggestions de paris"}
 
-    def _save_prediction_to_db(self, course_id, prediction_type, prediction_data):
+    def _save_prediction_to_db(self, course_id, prediction_type, prediction_data, model_version_id=None):
         """Sauvegarde la prédiction dans la base de données"""
         try:
-            # Sélectionner le modèle actif pour ce type de prédiction
-            query = text("""
-                SELECT id
-                FROM model_versions
-                WHERE model_category = :model_category
-                AND is_active = 1
-                LIMIT 1
-            """)
-            
-            model_category = 'standard' if prediction_type in ['standard', 'top3'] else 'simulation'
-            model_result = db.session.execute(query, {"model_category": model_category}).fetchone()
-            
-            model_id = model_result.id if model_result else None
+            model_id = model_version_id
+            if model_id is None:
+                # Sélectionner le modèle actif pour ce type de prédiction
+                query = text("""
+                    SELECT id
+                    FROM model_versions
+                    WHERE model_category = :model_category
+                    AND is_active = 1
+                    LIMIT 1
+                """)
+                
+                model_category = 'standard' if prediction_type in ['standard', 'top3'] else 'simulation'
+                model_result = db.session.execute(query, {"model_category": model_category}).fetchone()
+                
+                model_id = model_result.id if model_result else None
             
             # Préparer l'insertion
             query = text("""
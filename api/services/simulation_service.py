@@ -7,42 +7,24 @@ from flask import current_app
 from extensions import db
 from sqlalchemy import func, and_, text
 
-# Importation du modèle de prédiction existant
-from model.dual_prediction_model import DualPredictionModel
-from data_preparation.enhanced_data_prep import EnhancedDataPreparation
+# Modèles et préparation des données partagés par le processus
+from services.model_registry import model_registry
 
 class SimulationService:
     """Service pour gérer les simulations de courses"""
     
     def __init__(self):
         self.logger = logging.getLogger(__name__)
-        
-        # Initialiser les classes du projet existant
-        self.data_prep = EnhancedDataPreparation()
-        self.model = DualPredictionModel(base_path=current_app.config.get('MODEL_PATH', 'model/trained_models'))
-        
-        # Charger les modèles préentraînés
-        self._load_models()
     
-    def _load_models(self):
-        """Charge les modèles préentraînés nécessaires"""
-        try:
-            # Charger le modèle de simulation
-            simulation_model_path = f"{current_app.config.get('MODEL_PATH')}/simulation_top7_xgboost_ranking_latest.pkl"
-            self.model.load_simulation_model(simulation_model_path)
-            
-            self.logger.info("Simulation model loaded successfully")
-            return True
-        except Exception as e:
-            self.logger.error(f"Failed to load simulation model: {str(e)}")
-            # Tenter de l'initialiser
-            try:
-                self.model.initialize_simulation_model()
-                self.logger.info("Initialized new simulation model")
-                return True
-            except Exception as e2:
-                self.logger.error(f"Failed to initialize simulation model: {str(e2)}")
-                return False
+    @property
+    def model(self):
+        """Modèles actifs partagés du processus (lecture seule, voir model_registry)"""
+        return model_registry.model
+    
+    @property
+    def data_prep(self):
+        """Préparation des données partagée du processus"""
+        return model_registry.data_prep
 
     def simulate_course(self, course_id, selected_horses=None, simulation_params=None, 
                        horse_modifications=None, weather_conditions=None, track_conditions=None,
@@ -21,6 +21,7 @@ class TaskManager:
             'scraping': self.run_scraping,
             'prediction_generation': self.run_prediction_generation,
             'model_training': self.run_model_training,
+            'model_incremental_update': self.run_model_incremental_update,
             'model_evaluation': self.run_model_evaluation,
             'notification_sending': self.run_notification_sending,
             'data_cleanup': self.run_data_cleanup
@@ -221,6 +222,24 @@ class TaskManager:
         
         return result
     
+    def run_model_incremental_update(self, extra_rounds=None, holdout_days=1):
+        """
+        Met à jour les modèles actifs avec les courses terminées depuis leur entraînement.
+        
+        Args:
+            extra_rounds (int): Nombre d'arbres ajoutés à chaque modèle
+            holdout_days (int): Nombre de journées réservées à la validation
+            
+        Returns:
+            dict: Résultat de la mise à jour
+        """
+        from tasks.training_scheduler import update_models_incrementally
+        
+        # Mettre à jour les modèles
+        result = update_models_incrementally(extra_rounds=extra_rounds, holdout_days=holdout_days)
+        
+        return result
+    
     def run_model_evaluation(self, days_back=None):
         """
         Évalue les performances des modèles de prédiction.
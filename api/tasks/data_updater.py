@@ -14,6 +14,7 @@ import time
 from extensions import db
 from models.course import Course, Participation, Cheval, Jockey, CoteHistorique
 from data_traitement.traitement import save_race_data, save_participants_data
+from data_preparation.entity_aggregates import EntityAggregates, arrival_positions
 
 logger = logging.getLogger(__name__)
 
@@ -195,13 +196,14 @@ def scrape_date(date_obj):
         errors.append(error_msg)
         return courses_scraped, participants_scraped, errors
 
-def update_odds(course_id=None, all_upcoming=False):
+def update_odds(course_id=None, all_upcoming=False, refresh_predictions=True):
     """
     Met à jour les cotes des courses.
     
     Args:
         course_id (int): ID de la course spécifique à mettre à jour
         all_upcoming (bool): Mettre à jour toutes les courses à venir
+        refresh_predictions (bool): Recalculer les prédictions des courses dont les cotes ont changé
         
     Returns:
         dict: Résultats de la mise à jour
@@ -213,9 +215,13 @@ def update_odds(course_id=None, all_upcoming=False):
         'status': 'success',
         'courses_updated': 0,
         'odds_updated': 0,
+        'predictions_refreshed': 0,
         'errors': []
     }
     
+    # Courses dont au moins une cote a changé
+    changed_courses = []
+    
     try:
         # Déterminer les courses à mettre à jour
         if course_id:
@@ -325,6 +331,8 @@ def update_odds(course_id=None, all_upcoming=False):
                         })
                         
                         results['odds_updated'] += 1
+                        if course_id not in changed_courses:
+                            changed_courses.append(course_id)
                 
                 db.session.commit()
                 results['courses_updated'] += 1
@@ -339,6 +347,12 @@ def update_odds(course_id=None, all_upcoming=False):
                 results['errors'].append(error_msg)
                 continue
         
+        # Recalculer les prédictions précalculées des courses aux nouvelles cotes
+        if refresh_predictions and changed_courses:
+            prediction_results = generate_predictions(course_ids=changed_courses)
+            results['predictions_refreshed'] = prediction_results['predictions_generated']
+            results['errors'].extend(prediction_results['errors'])
+        
         # Mettre à jour le statut final
         if len(results['errors']) > 0:
             results['status'] = 'partial_success'
@@ -385,6 +399,10 @@ def update_results(course_id=None, all_past=False, days_back=1):
     }
     
     try:
+        # Agrégats par père / entraîneur / propriétaire mis à jour avec les arrivées
+        entity_aggregates = EntityAggregates(db.engine)
+        entity_aggregates.ensure_tables()
+        
         # Déterminer les courses à mettre à jour
         if course_id:
             # Mettre à jour une course spécifique
@@ -463,7 +481,11 @@ def update_results(course_id=None, all_past=False, days_back=1):
                 
                 # Mettre à jour les positions des participants
                 if ordre_arrivee and len(ordre_arrivee) > 0:
-                    for position, horse_num in enumerate(ordre_arrivee, start=1):
+                    # Contributions de la course aux agrégats avant écriture
+                    before = entity_aggregates.snapshot(db.session, course_ids=[course_id])
+                    
+                    # Numéros normalisés en entiers, ex aequo à la même position
+                    for horse_num, position in arrival_positions(ordre_arrivee).items():
                         # Trouver le participant avec ce numéro
                         participant_query = text("""
                             UPDATE participations
@@ -476,6 +498,10 @@ def update_results(course_id=None, all_past=False, days_back=1):
                             "course_id": course_id,
                             "horse_num": horse_num
                         })
+                    
+                    # Agrégats mis à jour par deltas dans la même transaction
+                    after = entity_aggregates.snapshot(db.session, course_ids=[course_id])
+                    entity_aggregates.record_change(db.session, before, after)
                 
                 # Enregistrer les rapports
                 if results_data.get('rapports'):
@@ -550,6 +576,88 @@ def update_results(course_id=None, all_past=False, days_back=1):
         results['duration_seconds'] = (datetime.fromisoformat(results['end_time']) - 
                                       datetime.fromisoformat(results['start_time'])).total_seconds()
         return results
+def generate_predictions(days_ahead=1, course_ids=None, force=False):
+    """
+    Précalcule les prédictions standard et Top 7 des courses à venir et les
+    enregistre dans predictions avec la version du modèle actif, pour que l'API
+    serve le résultat enregistré au lieu de calculer à la première demande.
+    
+    Seules les prédictions qui ne sont plus à jour (cotes modifiées ou nouveau
+    modèle actif depuis le dernier calcul) sont recalculées.
+    
+    Args:
+        days_ahead (int): Nombre de jours à l'avance
+        course_ids (list): Courses à traiter (toutes les courses à venir sinon)
+        force (bool): Recalculer même les prédictions à jour
+        
+    Returns:
+        dict: Résultats du précalcul
+    """
+    from services.prediction_service import PredictionService
+    
+    logger.info(f"Starting prediction precomputation: days_ahead={days_ahead}, course_ids={course_ids}")
+    
+    results = {
+        'start_time': datetime.now().isoformat(),
+        'status': 'success',
+        'courses_processed': 0,
+        'courses_up_to_date': 0,
+        'predictions_generated': 0,
+        'errors': []
+    }
+    
+    try:
+        prediction_service = PredictionService()
+        
+        if course_ids is None:
+            course_ids = [race['id'] for race in prediction_service.get_upcoming_races(days_ahead)]
+        
+        # Une seule passe de préparation et de prédiction pour les courses à recalculer
+        try:
+            refreshed = prediction_service.precompute_courses(course_ids, force=force)
+        except Exception as e:
+            refreshed = None
+            error_msg = f"Error precomputing predictions for courses {course_ids}: {str(e)}"
+            logger.error(error_msg)
+            results['errors'].append(error_msg)
+        
+        for course_id in (course_ids if refreshed is not None else []):
+            if course_id not in refreshed:
+                error_msg = f"Error precomputing predictions for course {course_id}: no participants found"
+                logger.error(error_msg)
+                results['errors'].append(error_msg)
+                continue
+            results['courses_processed'] += 1
+            if refreshed[course_id]:
+                results['predictions_generated'] += len(refreshed[course_id])
+            else:
+                results['courses_up_to_date'] += 1
+        
+        # Mettre à jour le statut final
+        if len(results['errors']) > 0:
+            results['status'] = 'partial_success'
+        
+        results['end_time'] = datetime.now().isoformat()
+        results['duration_seconds'] = (datetime.fromisoformat(results['end_time']) - 
+                                      datetime.fromisoformat(results['start_time'])).total_seconds()
+        
+        logger.info(f"Prediction precomputation completed: {results['predictions_generated']} predictions generated, "
+                    f"{results['courses_up_to_date']} courses already up to date")
+        return results
+        
+    except Exception as e:
+        error_msg = f"Error in prediction precomputation task: {str(e)}"
+        logger.error(error_msg)
+        logger.error(traceback.format_exc())
+        
+        results['status'] = 'error'
+        results['errors'].append(error_msg)
+        results['end_time'] = datetime.now().isoformat()
+        results['duration_seconds'] = (datetime.fromisoformat(results['end_time']) - 
+                                      datetime.fromisoformat(results['start_time'])).total_seconds()
+        
+        return results
+
 def run_all_tasks():
     """
     Exécute toutes les tâches de mise à jour des données dans l'ordre recommandé.
@@ -563,6 +671,7 @@ def run_all_tasks():
         'start_time': datetime.now().isoformat(),
         'scraping_results': None,
         'odds_update_results': None,
+        'prediction_results': None,
         'results_update_results': None,
         'status': 'success'
     }
@@ -592,7 +701,15 @@ def run_all_tasks():
             logger.error("Odds update task failed, continuing with other tasks")
             results['status'] = 'partial_success'
         
-        # 3. Mise à jour des résultats pour les courses récentes
+        # 3. Précalcul des prédictions des courses à venir (seules les prédictions périmées)
+        prediction_results = generate_predictions(days_ahead=config.get('prediction', {}).get('days_ahead', 1))
+        results['prediction_results'] = prediction_results
+        
+        if prediction_results['status'] == 'error':
+            logger.error("Prediction precomputation task failed, continuing with other tasks")
+            results['status'] = 'partial_success'
+        
+        # 4. Mise à jour des résultats pour les courses récentes
         days_back = config.get('evaluation', {}).get('days_back', 1)
         results_update_results = update_results(all_past=True, days_back=days_back)
         results['results_update_results'] = results_update_results
@@ -660,6 +777,22 @@ def schedule_tasks():
                 replace_existing=True
             )
             logger.info(f"Scheduled daily scraping task at {time_str}")
+            
+            # Précalculer les prédictions du jour une fois le scraping terminé
+            prediction_config = config.get('prediction', {})
+            delay = prediction_config.get('precompute_delay_minutes', 15)
+            precompute_minutes = (hour * 60 + minute + delay) % (24 * 60)
+            
+            scheduler.add_job(
+                generate_predictions,
+                'cron',
+                hour=precompute_minutes // 60,
+                minute=precompute_minutes % 60,
+                kwargs={'days_ahead': prediction_config.get('days_ahead', 1)},
+                id='daily_prediction_precompute',
+                replace_existing=True
+            )
+            logger.info(f"Scheduled daily prediction precomputation {delay} minutes after scraping")
         
         # Planifier la mise à jour des cotes
         prediction_config = config.get('prediction', {})
@@ -694,6 +827,25 @@ def schedule_tasks():
                 replace_existing=True
             )
             logger.info(f"Scheduled daily results update task at {time_str}")
+            
+            # Mise à jour incrémentale des modèles une fois les résultats enregistrés
+            training_config = config.get('training', {})
+            if training_config.get('incremental_update', True):
+                from tasks.training_scheduler import update_models_incrementally
+                
+                delay = training_config.get('incremental_delay_minutes', 30)
+                incremental_minutes = (hour * 60 + minute + delay) % (24 * 60)
+                
+                scheduler.add_job(
+                    update_models_incrementally,
+                    'cron',
+                    hour=incremental_minutes // 60,
+                    minute=incremental_minutes % 60,
+                    kwargs={'holdout_days': training_config.get('incremental_holdout_days', 1)},
+                    id='daily_incremental_model_update',
+                    replace_existing=True
+                )
+                logger.info(f"Scheduled daily incremental model update {delay} minutes after results update")
         
         # Planifier l'exécution de toutes les tâches (hebdomadaire)
         if evaluation_config.get('schedule', {}).get('frequency') == 'weekly':
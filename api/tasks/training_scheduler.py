@@ -13,10 +13,20 @@ from flask import current_app
 
 from extensions import db
 from model.dual_prediction_model import DualPredictionModel
+from model.model_bundle import ModelBundle, bundle_path
 from data_preparation.enhanced_data_prep import EnhancedDataPreparation
+from data_preparation.feature_store import FeatureStore, DEFAULT_STORE_PATH
 
 logger = logging.getLogger(__name__)
 
+def load_training_features(data_prep, start_date=None, end_date=None):
+    """
+    Données d'entraînement avec features avancées, lues dans le feature store
+    (FEATURE_STORE_PATH) après recalcul des seules courses nouvelles ou modifiées.
+    """
+    store = FeatureStore(data_prep, store_path=current_app.config.get('FEATURE_STORE_PATH', DEFAULT_STORE_PATH))
+    return store.load(start_date=start_date, end_date=end_date)
+
 def train_models(days_back=300, model_type='xgboost'):
     """
     Entraîne les modèles de prédiction.
@@ -52,20 +62,17 @@ def train_models(days_back=300, model_type='xgboost'):
         logger.info(f"Loading training data from {cutoff_date}")
         
         try:
-            # Charger les données des courses passées
-            training_data = data_prep.load_historical_data(cutoff_date)
+            # Charger les données des courses passées avec leurs features avancées
+            enhanced_data = load_training_features(data_prep, start_date=cutoff_date.strftime('%Y-%m-%d'))
             
-            if training_data is None or training_data.empty:
+            if enhanced_data is None or enhanced_data.empty:
                 error_msg = "No historical data available for training"
                 logger.error(error_msg)
                 results['errors'].append(error_msg)
                 results['status'] = 'error'
                 return results
             
-            logger.info(f"Loaded {len(training_data)} samples for training")
-            
-            # Créer des features avancées
-            enhanced_data = data_prep.create_advanced_features(training_data)
+            logger.info(f"Loaded {len(enhanced_data)} samples for training")
             
             # Séparer les données d'entraînement et de test
             test_cutoff = datetime.now() - timedelta(days=test_days)
@@ -261,7 +268,192 @@ def train_models(days_back=300, model_type='xgboost'):
         
         return results
 
-def register_model_in_db(model_type, model_category, hyperparameters, metrics, file_path, sample_count, feature_count=0):
+def update_models_incrementally(extra_rounds=None, holdout_days=1, max_regression=0.0, activate=True):
+    """
+    Met à jour les modèles actifs sans réentraînement complet: des arbres sont
+    ajoutés à partir des courses terminées depuis la date d'entraînement de chaque
+    modèle (continuation XGBoost), les dernières journées servant de validation.
+    Un modèle qui ne régresse pas est enregistré comme nouvelle version.
+    
+    Args:
+        extra_rounds (int): Nombre d'arbres ajoutés (INCREMENTAL_ROUNDS par défaut)
+        holdout_days (int): Nombre de journées de courses réservées à la validation
+        max_regression (float): Dégradation tolérée de la métrique de validation
+        activate (bool): Activer la nouvelle version à la place du modèle mis à jour
+        
+    Returns:
+        dict: Résultats de la mise à jour
+    """
+    import joblib
+    from model.dual_prediction_model import INCREMENTAL_ROUNDS
+
+    extra_rounds = extra_rounds or INCREMENTAL_ROUNDS
+    logger.info(f"Starting incremental model update: extra_rounds={extra_rounds}, holdout_days={holdout_days}")
+    
+    results = {
+        'start_time': datetime.now().isoformat(),
+        'status': 'success',
+        'models_updated': [],
+        'models_rejected': [],
+        'errors': []
+    }
+    
+    try:
+        models_query = text("""
+            SELECT id, model_type, model_category, file_path, training_date
+            FROM model_versions
+            WHERE is_active = TRUE
+        """)
+        active_models = db.session.execute(models_query).fetchall()
+        
+        if not active_models:
+            logger.info("No active models to update")
+            results['end_time'] = datetime.now().isoformat()
+            results['duration_seconds'] = 0
+            return results
+        
+        # Charger une seule fois les courses terminées depuis le plus ancien entraînement
+        data_prep = EnhancedDataPreparation()
+        model = DualPredictionModel(base_path=current_app.config.get('MODEL_PATH', 'model/trained_models'))
+        since = min(row.training_date for row in active_models)
+        enhanced_data = load_training_features(data_prep, start_date=since.strftime('%Y-%m-%d %H:%M:%S'))
+        
+        if enhanced_data is None or enhanced_data.empty:
+            logger.info(f"No completed races since {since}")
+            results['end_time'] = datetime.now().isoformat()
+            results['duration_seconds'] = (datetime.fromisoformat(results['end_time']) - 
+                                          datetime.fromisoformat(results['start_time'])).total_seconds()
+            return results
+        
+        new_data = model.create_target_variables(enhanced_data)
+        new_data['date_heure'] = pd.to_datetime(new_data['date_heure'])
+        holdout_start = new_data['date_heure'].max().normalize() - timedelta(days=holdout_days - 1)
+        holdout_data = new_data[new_data['date_heure'] >= holdout_start]
+        
+        for model_row in active_models:
+            try:
+                update_data = new_data[(new_data['date_heure'] > model_row.training_date) &
+                                       (new_data['date_heure'] < holdout_start)]
+                if update_data.empty:
+                    logger.info(f"No new races to learn for model {model_row.id}")
+                    continue
+                
+                estimator = joblib.load(model_row.file_path)
+                updated, report = model.continue_training(
+                    estimator, update_data, holdout_data,
+                    extra_rounds=extra_rounds, max_regression=max_regression
+                )
+                report['parent_id'] = model_row.id
+                
+                if updated is None:
+                    logger.info(f"Incremental update of model {model_row.id} rejected: {report['metric']} regressed")
+                    results['models_rejected'].append(report)
+                    continue
+                
+                # Enregistrer la nouvelle version à côté du modèle d'origine
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                base_name = os.path.splitext(os.path.basename(model_row.file_path))[0].split('_incremental_')[0]
+                file_path = os.path.join(os.path.dirname(model_row.file_path),
+                                         f"{base_name}_incremental_{timestamp}.pkl")
+                joblib.dump(updated, file_path)
+                with open(file_path.replace('.pkl', '_info.json'), 'w') as f:
+                    json.dump(report, f, indent=4, default=str)
+                
+                # Bundle d'inférence: même schéma de features que le modèle parent
+                parent_bundle = bundle_path(model_row.file_path)
+                if os.path.exists(parent_bundle):
+                    ModelBundle.load(parent_bundle).with_model(
+                        updated, parent_id=model_row.id, model_path=file_path
+                    ).save(bundle_path(file_path))
+                
+                params = updated.get_params()
+                model_id = register_model_in_db(
+                    model_type=model_row.model_type,
+                    model_category=model_row.model_category,
+                    hyperparameters={
+                        'parent_id': model_row.id,
+                        'base_rounds': report['base_rounds'],
+                        'extra_rounds': report['extra_rounds'],
+                        'max_depth': params.get('max_depth'),
+                        'learning_rate': params.get('learning_rate'),
+                        'objective': params.get('objective')
+                    },
+                    metrics=report['after'],
+                    file_path=file_path,
+                    sample_count=report['training_size'],
+                    feature_count=report['feature_count'],
+                    validation_method='incremental_holdout',
+                    # Date des dernières courses apprises: la journée de validation
+                    # sera apprise par la prochaine mise à jour
+                    training_date=update_data['date_heure'].max().to_pydatetime()
+                )
+                
+                if activate and model_id is not None:
+                    db.session.execute(text("""
+                        UPDATE model_versions
+                        SET is_active = CASE WHEN id = :new_id THEN TRUE ELSE FALSE END,
+                            updated_at = :updated_at
+                        WHERE id IN (:old_id, :new_id)
+                    """), {"old_id": model_row.id, "new_id": model_id, "updated_at": datetime.now()})
+                    db.session.commit()
+                
+                results['models_updated'].append({
+                    'id': model_id,
+                    'type': model_row.model_type,
+                    'category': model_row.model_category,
+                    'file_path': file_path,
+                    **report
+                })
+                logger.info(f"Model {model_row.id} updated incrementally as model {model_id}")
+                
+            except Exception as e:
+                db.session.rollback()
+                error_msg = f"Error updating model {model_row.id}: {str(e)}"
+                logger.error(error_msg)
+                logger.error(traceback.format_exc())
+                results['errors'].append(error_msg)
+        
+        if activate and results['models_updated']:
+            try:
+                update_model_paths_in_config([
+                    {'id': m['id'], 'type': m['type'], 'category': m['category'], 'file_path': m['file_path']}
+                    for m in results['models_updated']
+                ])
+            except Exception as e:
+                error_msg = f"Error updating model paths in config: {str(e)}"
+                logger.error(error_msg)
+                results['errors'].append(error_msg)
+        
+        # Mettre à jour le statut final
+        if len(results['errors']) > 0 and not results['models_updated']:
+            results['status'] = 'error'
+        elif len(results['errors']) > 0:
+            results['status'] = 'partial_success'
+        
+        results['end_time'] = datetime.now().isoformat()
+        results['duration_seconds'] = (datetime.fromisoformat(results['end_time']) - 
+                                      datetime.fromisoformat(results['start_time'])).total_seconds()
+        
+        logger.info(f"Incremental update completed: {len(results['models_updated'])} models updated, "
+                    f"{len(results['models_rejected'])} rejected")
+        return results
+        
+    except Exception as e:
+        db.session.rollback()
+        error_msg = f"Error in incremental model update task: {str(e)}"
+        logger.error(error_msg)
+        logger.error(traceback.format_exc())
+        
+        results['status'] = 'error'
+        results['errors'].append(error_msg)
+        results['end_time'] = datetime.now().isoformat()
+        results['duration_seconds'] = (datetime.fromisoformat(results['end_time']) - 
+                                      datetime.fromisoformat(results['start_time'])).total_seconds()
+        
+        return results
+
+def register_model_in_db(model_type, model_category, hyperparameters, metrics, file_path, sample_count, feature_count=0,
+                         validation_method='train_test_split', training_date=None):
     """
     Enregistre un nouveau modèle dans la base de données.
     
@@ -273,6 +465,8 @@ def register_model_in_db(model_type, model_category, hyperparameters, metrics, f
         file_path (str): Chemin du fichier du modèle
         sample_count (int): Nombre d'échantillons utilisés pour l'entraînement
         feature_count (int): Nombre de features utilisées
+        validation_method (str): Méthode de validation du modèle
+        training_date (datetime): Date des dernières données apprises (maintenant par défaut)
         
     Returns:
         int: ID du modèle enregistré
@@ -303,7 +497,7 @@ def register_model_in_db(model_type, model_category, hyperparameters, metrics, f
             "model_type": model_type,
             "model_category": model_category,
             "hyperparameters": json.dumps(hyperparameters),
-            "training_date": datetime.now(),
+            "training_date": training_date or datetime.now(),
             "accuracy": accuracy,
             "precision_score": precision,
             "recall_score": recall,
@@ -312,7 +506,7 @@ def register_model_in_db(model_type, model_category, hyperparameters, metrics, f
             "file_path": file_path,
             "feature_count": feature_count,
             "sample_count": sample_count,
-            "validation_method": "train_test_split",
+            "validation_method": validation_method,
             "is_active": False,  # Par défaut, le modèle n'est pas actif
             "created_at": datetime.now()
         })
@@ -0,0 +1,76 @@
+# test_incremental_update.py
+import os
+from collections import namedtuple
+from unittest.mock import MagicMock, patch
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from xgboost import XGBClassifier
+
+from tasks.training_scheduler import update_models_incrementally
+
+ModelRow = namedtuple('ModelRow', 'id model_type model_category file_path training_date')
+FEATURES = ['forme', 'cote_actuelle']
+
+
+def _completed_races(n_races, start_date):
+    """Courses terminées synthétiques de 8 partants, une journée pour 4 courses"""
+    rng = np.random.default_rng(0)
+    rows = []
+    for race in range(n_races):
+        forme = rng.normal(size=8)
+        positions = np.argsort(np.argsort(-forme)) + 1
+        for horse in range(8):
+            rows.append({
+                'id_course': race + 1,
+                'date_heure': start_date + pd.Timedelta(days=race // 4, hours=14),
+                'forme': forme[horse],
+                'cote_actuelle': float(rng.uniform(2, 30)),
+                'position': int(positions[horse])
+            })
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture
+def active_model(tmp_path):
+    """Classifieur actif entraîné avant les courses synthétiques"""
+    train = _completed_races(40, pd.Timestamp('2026-01-01'))
+    estimator = XGBClassifier(n_estimators=20, max_depth=3)
+    estimator.fit(train[FEATURES], (train['position'] <= 3).astype(int))
+    file_path = str(tmp_path / 'enhanced_xgboost_20260101_000000.pkl')
+    joblib.dump(estimator, file_path)
+    return ModelRow(1, 'xgboost', 'standard', file_path, pd.Timestamp('2026-01-01').to_pydatetime())
+
+
+def test_incremental_update_saves_new_version(app, active_model):
+    """La mise à jour incrémentale sauvegarde le modèle continué et l'enregistre comme nouvelle version"""
+    new_races = _completed_races(24, pd.Timestamp('2026-02-01'))
+    fake_db = MagicMock()
+    fake_db.session.execute.return_value.fetchall.return_value = [active_model]
+
+    with app.app_context(), \
+            patch('tasks.training_scheduler.db', fake_db), \
+            patch('tasks.training_scheduler.EnhancedDataPreparation'), \
+            patch('tasks.training_scheduler.load_training_features', return_value=new_races), \
+            patch('tasks.training_scheduler.register_model_in_db', return_value=2) as register, \
+            patch('tasks.training_scheduler.update_model_paths_in_config') as update_config:
+        result = update_models_incrementally(extra_rounds=10, holdout_days=1, max_regression=1.0)
+
+    assert result['status'] == 'success'
+    assert result['errors'] == []
+    assert len(result['models_updated']) == 1
+
+    updated = result['models_updated'][0]
+    assert updated['id'] == 2
+    assert updated['total_rounds'] == 30
+    assert os.path.exists(updated['file_path'])
+    assert os.path.exists(updated['file_path'].replace('.pkl', '_info.json'))
+    assert joblib.load(updated['file_path']).get_booster().num_boosted_rounds() == 30
+
+    assert register.call_args.kwargs['validation_method'] == 'incremental_holdout'
+    assert register.call_args.kwargs['hyperparameters']['parent_id'] == active_model.id
+    # Date de coupure: dernière journée apprise, la journée de validation restant à apprendre
+    assert register.call_args.kwargs['training_date'] == pd.Timestamp('2026-02-05 14:00')
+    update_config.assert_called_once()
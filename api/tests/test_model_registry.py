@@ -0,0 +1,81 @@
+# test_model_registry.py
+import pytest
+from unittest.mock import patch, MagicMock
+
+from services.model_registry import ModelRegistry
+from services.prediction_service import PredictionService
+from services.simulation_service import SimulationService
+
+
+def _fake_load(category):
+    """Chargement simulé: un objet distinct par fichier chargé"""
+    def load(model, model_file=None):
+        setattr(model, f'{category}_model', MagicMock(name=model_file))
+        return True
+    return load
+
+
+@pytest.fixture
+def registry(app):
+    with app.app_context(), \
+            patch('services.model_registry.EnhancedDataPreparation'), \
+            patch('model.dual_prediction_model.DualPredictionModel.load_standard_model',
+                  autospec=True, side_effect=_fake_load('standard')) as load_standard, \
+            patch('model.dual_prediction_model.DualPredictionModel.load_simulation_model',
+                  autospec=True, side_effect=_fake_load('simulation')) as load_simulation:
+        registry = ModelRegistry(check_interval=3600)
+        registry.load_standard = load_standard
+        registry.load_simulation = load_simulation
+        yield registry
+
+
+def test_models_loaded_once_and_shared(registry):
+    """Les services partagent les modèles chargés une seule fois"""
+    active = {'standard': (1, 'standard_v1.pkl', None), 'simulation': (2, 'simulation_v1.pkl', None)}
+    with patch.object(ModelRegistry, '_active_versions', return_value=active), \
+            patch('services.prediction_service.model_registry', registry), \
+            patch('services.simulation_service.model_registry', registry):
+        prediction_model = PredictionService().model
+        simulation_model = SimulationService().model
+        registry.refresh()
+
+        assert prediction_model is simulation_model
+        assert registry.model is prediction_model
+        assert registry.load_standard.call_count == 1
+        assert registry.load_simulation.call_count == 1
+
+
+def test_hot_swap_on_activation(registry):
+    """Un changement de version active remplace le modèle sans recharger les autres"""
+    active = {'standard': (1, 'standard_v1.pkl', None), 'simulation': (2, 'simulation_v1.pkl', None)}
+    with patch.object(ModelRegistry, '_active_versions', return_value=active):
+        old_model = registry.model
+
+    active = {'standard': (3, 'standard_v2.pkl', None), 'simulation': (2, 'simulation_v1.pkl', None)}
+    with patch.object(ModelRegistry, '_active_versions', return_value=active):
+        new_model = registry.refresh(force=True)
+
+    assert new_model is not old_model
+    assert registry.model is new_model
+    assert new_model.standard_model is not old_model.standard_model
+    assert new_model.simulation_model is old_model.simulation_model
+    assert registry.load_standard.call_count == 2
+    assert registry.load_simulation.call_count == 1
+
+
+def test_latest_file_reloaded_when_rewritten(registry):
+    """Sans version active, une copie latest réécrite par un entraînement est rechargée"""
+    active = {'standard': (None, 'enhanced_latest.pkl', 100.0), 'simulation': (None, 'simulation_top7_latest.pkl', 100.0)}
+    with patch.object(ModelRegistry, '_active_versions', return_value=active):
+        old_model = registry.refresh(force=True)
+        assert registry.active_version('standard') == 'enhanced_latest.pkl@100.0'
+
+    active = {'standard': (None, 'enhanced_latest.pkl', 200.0), 'simulation': (None, 'simulation_top7_latest.pkl', 100.0)}
+    with patch.object(ModelRegistry, '_active_versions', return_value=active):
+        new_model = registry.refresh(force=True)
+        # Nouvelle version: les réponses en cache de l'ancien modèle ne sont plus servies
+        assert registry.active_version('standard') == 'enhanced_latest.pkl@200.0'
+
+    assert new_model.standard_model is not old_model.standard_model
+    assert new_model.simulation_model is old_model.simulation_model
+    assert registry.load_standard.call_count == 2
@@ -0,0 +1,57 @@
+# test_prediction_cache.py
+import pytest
+from unittest.mock import patch
+
+from services.prediction_cache import PredictionCache, make_key
+
+ODDS = {'1': 3.5, '2': 8.0, '3': None}
+RESPONSE = {'timestamp': '2025-04-08T10:00:00', 'data': [{'id_cheval': 1, 'predicted_rank': 1}]}
+
+
+def test_key_changes_with_odds_and_model():
+    """Une nouvelle cote ou un nouveau modèle actif invalide la réponse"""
+    key = make_key(42, 'top7', 3, ODDS)
+
+    assert key == make_key(42, 'top7', 3, dict(reversed(list(ODDS.items()))))
+    assert key != make_key(42, 'top7', 3, {**ODDS, '2': 7.5})
+    assert key != make_key(42, 'top7', 4, ODDS)
+    assert key != make_key(42, 'top3', 3, ODDS)
+
+
+def test_hit_returns_independent_copy():
+    """Les réponses lues peuvent être modifiées sans altérer le cache"""
+    cache = PredictionCache(max_size=10, ttl=60)
+    key = make_key(42, 'top7', 3, ODDS)
+    assert cache.get(key) is None
+
+    cache.set(key, RESPONSE)
+    cached = cache.get(key)
+    cached['data'][0]['predicted_rank'] = 5
+
+    assert cache.get(key) == RESPONSE
+    assert cache.stats()['hits'] == 2
+    assert cache.stats()['misses'] == 1
+
+
+def test_ttl_expiry():
+    """Les entrées expirent après leur durée de vie"""
+    cache = PredictionCache(max_size=10, ttl=60)
+    with patch('services.prediction_cache.time.monotonic', return_value=1000.0):
+        cache.set('key', RESPONSE)
+    with patch('services.prediction_cache.time.monotonic', return_value=1059.0):
+        assert cache.get('key') == RESPONSE
+    with patch('services.prediction_cache.time.monotonic', return_value=1061.0):
+        assert cache.get('key') is None
+
+
+def test_lru_eviction():
+    """L'entrée la moins récemment utilisée est évincée"""
+    cache = PredictionCache(max_size=2, ttl=60)
+    cache.set('a', RESPONSE)
+    cache.set('b', RESPONSE)
+    cache.get('a')
+    cache.set('c', RESPONSE)
+
+    assert cache.get('a') is not None
+    assert cache.get('b') is None
+    assert cache.get('c') is not None
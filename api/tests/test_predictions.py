@@ -3,7 +3,13 @@
 import json
 import pytest
 from flask import url_for
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+
+from data_preparation.enhanced_data_prep import EnhancedDataPreparation
+from model.dual_prediction_model import DualPredictionModel
+from services.prediction_service import PredictionService
 
 def test_upcoming_races(client, auth_headers):
     """Test de la récupération des courses à venir"""
@@ -107,4 +113,66 @@ def test_prediction_history(client, auth_headers):
     assert response.status_code == 200
     data = json.loads(response.data)
     assert data['success'] is True
-    assert 'data' in data
\ No newline at end of file
+    assert 'data' in data
+
+def test_compute_predictions_prepares_course_once():
+    """Test du calcul des prédictions standard et Top 7 d'une course avec une préparation des données simulée"""
+    participants = pd.DataFrame({'id_course': [42, 42], 'id_cheval': [1, 2]})
+    enhanced = participants.assign(forme=[0.5, -0.5])
+    encoded = enhanced.assign(forme_encoded=[1, 0])
+
+    # spec: une méthode absente de EnhancedDataPreparation lève AttributeError
+    data_prep = MagicMock(spec=EnhancedDataPreparation)
+    data_prep.get_upcoming_data.return_value = participants
+    data_prep.create_enhanced_features.return_value = enhanced
+    data_prep.encode_features_for_model.return_value = encoded
+    model = MagicMock(spec=DualPredictionModel)
+    model.predict_standard.return_value = pd.DataFrame({'id_cheval': [1, 2], 'predicted_rank': [1, 2]})
+    model.predict_top7.return_value = pd.DataFrame({'id_cheval': [2, 1], 'predicted_rank': [1, 2]})
+
+    with patch('services.prediction_service.model_registry', MagicMock(model=model, data_prep=data_prep)):
+        results = PredictionService().compute_predictions(42, ['standard', 'top7'])
+
+    data_prep.get_upcoming_data.assert_called_once_with(course_ids=[42])
+    data_prep.create_enhanced_features.assert_called_once_with(participants, fill_missing=False)
+    data_prep.encode_features_for_model.assert_called_once_with(enhanced, is_training=False)
+    model.predict_standard.assert_called_once_with(encoded)
+    model.predict_top7.assert_called_once_with(enhanced)
+    assert results['standard'] == [{'id_cheval': 1, 'predicted_rank': 1}, {'id_cheval': 2, 'predicted_rank': 2}]
+    assert results['top7'][0] == {'id_cheval': 2, 'predicted_rank': 1}
+
+
+def test_precompute_courses_in_one_batch():
+    """Test du précalcul: une seule préparation et un appel au modèle par type pour les courses à recalculer"""
+    participants = pd.DataFrame({'id_course': [41, 41, 42, 42], 'id_cheval': [1, 2, 3, 4]})
+    data_prep = MagicMock(spec=EnhancedDataPreparation)
+    data_prep.get_upcoming_data.return_value = participants
+    data_prep.create_enhanced_features.return_value = participants
+    data_prep.encode_features_for_model.return_value = participants
+    model = MagicMock(spec=DualPredictionModel)
+    model.predict_standard_batch.return_value = {
+        course: pd.DataFrame({'id_cheval': group['id_cheval'], 'predicted_rank': [1, 2]})
+        for course, group in participants.groupby('id_course')
+    }
+    model.predict_top7_batch.return_value = {
+        course: pd.DataFrame({'id_cheval': group['id_cheval'][::-1], 'predicted_rank': [1, 2]})
+        for course, group in participants.groupby('id_course')
+    }
+    registry = MagicMock(model=model, data_prep=data_prep)
+    registry.active_version.return_value = 7
+
+    # La course 40 a déjà des prédictions à jour
+    stored = lambda course_id, prediction_type, model_version: {'data': []} if course_id == 40 else None
+    with patch('services.prediction_service.model_registry', registry), \
+            patch.object(PredictionService, 'get_stored_prediction', side_effect=stored), \
+            patch.object(PredictionService, '_save_prediction_to_db') as save:
+        refreshed = PredictionService().precompute_courses([40, 41, 42])
+
+    assert refreshed == {40: [], 41: ['standard', 'top7'], 42: ['standard', 'top7']}
+    data_prep.get_upcoming_data.assert_called_once_with(course_ids=[41, 42])
+    data_prep.create_enhanced_features.assert_called_once()
+    model.predict_standard_batch.assert_called_once_with(participants)
+    model.predict_top7_batch.assert_called_once_with(participants)
+    assert save.call_count == 4
+    save.assert_any_call(42, 'top7', [{'id_cheval': 4, 'predicted_rank': 1}, {'id_cheval': 3, 'predicted_rank': 2}],
+                         model_version_id=7)
@@ -10,8 +10,11 @@ from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # Import des nouveaux modules
 from data_preparation.enhanced_data_prep import EnhancedDataPreparation
+from data_preparation.feature_store import FeatureStore
 from model.dual_prediction_model import DualPredictionModel
+from model.model_bundle import LATEST_MODEL_FILES
 from database.database import save_prediction
+from batch_processing.race_executor import RacePredictionExecutor, DEFAULT_RACE_TIMEOUT
 
 import json
 import os
@@ -41,11 +44,19 @@ if os.path.exists(config_path):
 class BatchProcessor:
     """Classe pour le traitement par lots des prédictions de courses, avec support pour les deux modèles."""
     
-    def __init__(self, data_prep=None, model=None, db_path='pmu_ia', model_path='model/trained_models'):
-        """Initialise le processeur par lots avec les nouvelles classes."""
+    def __init__(self, data_prep=None, model=None, db_path='pmu_ia', model_path='model/trained_models',
+                 executor_mode='thread', max_workers=None, race_timeout=DEFAULT_RACE_TIMEOUT):
+        """
+        Initialise le processeur par lots avec les nouvelles classes.
+        executor_mode, max_workers et race_timeout configurent les prédictions
+        course par course (voir RacePredictionExecutor).
+        """
         self.logger = logging.getLogger(__name__)
         self.db_path = db_path
         self.model_path = model_path
+        self.executor_mode = executor_mode
+        self.max_workers = max_workers
+        self.race_timeout = race_timeout
         
         
         # Initialiser une connexion à la base de données
@@ -70,8 +81,8 @@ class BatchProcessor:
             self.model = DualPredictionModel(base_path=model_path)
             
             # Essayer de charger les modèles
-            standard_model_path = os.path.join(model_path, 'standard_latest.pkl')
-            simulation_model_path = os.path.join(model_path, 'simulation_latest.pkl')
+            standard_model_path = os.path.join(model_path, LATEST_MODEL_FILES['standard'])
+            simulation_model_path = os.path.join(model_path, LATEST_MODEL_FILES['simulation'])
             
             if os.path.exists(standard_model_path):
                 self.model.load_standard_model(standard_model_path)
@@ -82,6 +93,9 @@ class BatchProcessor:
                 self.model.load_simulation_model(simulation_model_path)
             else:
                 self.logger.warning(f"Modèle de simulation non trouvé à {simulation_model_path}")
+            
+            # Encodeurs de l'entraînement embarqués dans les bundles
+            self.model.install_encoders(self.data_prep)
     
     def train_dual_models(self, days_back=None, test_days=14, 
                         standard_model_type='xgboost', simulation_model_type='xgboost_ranking'):
@@ -111,20 +125,18 @@ class BatchProcessor:
         else:
             self.logger.info(f"Récupération de toutes les données jusqu'au {end_date_str}")
         
-        # Récupérer les données d'entraînement
-        training_data = self.data_prep.get_training_data(
+        # Récupérer les données d'entraînement avec leurs features avancées
+        # (feature store: seules les courses nouvelles ou modifiées sont recalculées)
+        enhanced_data = FeatureStore(self.data_prep).load(
             start_date=start_date_str,
             end_date=end_date_str
         )
         
-        if training_data.empty:
+        if enhanced_data.empty:
             self.logger.error("Aucune donnée d'entraînement trouvée")
             return None
         
-        self.logger.info(f"Données récupérées: {len(training_data)} échantillons")
-        
-        # Créer des features avancées
-        enhanced_data = self.data_prep.create_advanced_features(training_data)
+        self.logger.info(f"Données récupérées: {len(enhanced_data)} échantillons")
         
         # Encoder pour le modèle
         prepared_data = self.data_prep.encode_features_for_model(enhanced_data, is_training=True)
@@ -139,13 +151,14 @@ class BatchProcessor:
         # Créer les variables cibles
         final_data = self.model.create_target_variables(prepared_data)
         
-        # Entraîner le modèle standard avec un test_size fixe
-        self.logger.info(f"Entraînement du modèle standard ({standard_model_type}) avec test_size={test_size}")
-        standard_accuracy, standard_path = self.model.train_standard_model(final_data, test_size=test_size)
-        
-        # Entraîner le modèle de simulation avec le même test_size fixe
-        self.logger.info(f"Entraînement du modèle de simulation ({simulation_model_type}) avec test_size={test_size}")
-        simulation_metrics, simulation_path = self.model.train_simulation_model(final_data, test_size=test_size)
+        # Entraîner les deux modèles en parallèle à partir d'une seule matrice de features
+        self.logger.info(f"Entraînement concurrent des modèles standard ({standard_model_type}) "
+                         f"et de simulation ({simulation_model_type}) avec test_size={test_size}")
+        results = self.model.train_concurrently(final_data, test_size=test_size)
+        if results is None:
+            return None
+        standard_accuracy, standard_path = results['standard_accuracy'], results['standard_path']
+        simulation_metrics, simulation_path = results['simulation_metrics'], results['simulation_path']
         
         self.logger.info("Entraînement des modèles terminé")
         
@@ -159,7 +172,13 @@ class BatchProcessor:
     
         
     def predict_upcoming_races_standard(self, days_ahead=1, output_dir='predictions'):
-        """Prédit les résultats pour toutes les courses à venir avec le modèle standard."""
+        """
+        Prédit les résultats pour toutes les courses à venir avec le modèle standard.
+        
+        Les participants de toutes les courses sont chargés ensemble, les features
+        calculées en une passe et le modèle appelé une seule fois; les scores sont
+        ensuite découpés par course.
+        """
         if self.model.standard_model is None:
             self.logger.error("Modèle standard non chargé. Impossible de faire des prédictions.")
             return None
@@ -173,42 +192,50 @@ class BatchProcessor:
         now = datetime.now()
         end_date = now + timedelta(days=days_ahead)
         
-        # Récupérer les courses à venir
-        upcoming_races = self.data_prep.get_course_data(
+        # Récupérer les participants de toutes les courses à venir
+        upcoming_data = self.data_prep.get_upcoming_data(
             start_date=now.strftime("%Y-%m-%d"),
             end_date=end_date.strftime("%Y-%m-%d")
         )
         
-        if upcoming_races.empty:
+        if upcoming_data.empty:
             self.logger.info(f"Aucune course trouvée pour les {days_ahead} prochains jours")
             return []
         
+        # Une ligne par course pour les informations de la course
+        upcoming_races = upcoming_data.drop_duplicates('id_course').reset_index(drop=True)
         self.logger.info(f"Traitement de {len(upcoming_races)} courses à venir")
         
+        try:
+            # Créer les features de toutes les courses en une passe (valeurs manquantes:
+            # médianes d'entraînement du bundle, et non médianes de la journée)
+            enhanced_data = self.data_prep.create_enhanced_features(upcoming_data, fill_missing=False)
+            
+            # Encoder pour le modèle
+            prepared_data = self.data_prep.encode_features_for_model(enhanced_data, is_training=False)
+            
+            # Un seul appel au modèle standard pour toutes les courses
+            predictions_by_course = self.model.predict_standard_batch(prepared_data) or {}
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la prédiction par lot: {str(e)}")
+            predictions_by_course = {}
+        
+        # Courses non prédites par le lot: prédiction course par course en parallèle
+        remaining = [race_id for race_id in upcoming_races['id_course'] if race_id not in predictions_by_course]
+        if remaining:
+            self.logger.warning(f"{len(remaining)} courses prédites course par course")
+            predictions_by_course.update(self.predict_races(remaining, 'standard')['predictions'])
+        
         # Stocker les résultats
         all_predictions = []
         
         # Traiter chaque course
         for idx, race in upcoming_races.iterrows():
-            race_id = race['id']
+            race_id = race['id_course']
             self.logger.info(f"Traitement de la course {race_id} ({idx+1}/{len(upcoming_races)})")
             
             try:
-                # Préparer les données pour la prédiction
-                prediction_data = self.data_prep.get_participant_data(course_id=race_id)
-                
-                if prediction_data is None or prediction_data.empty:
-                    self.logger.warning(f"Pas de données disponibles pour la course {race_id}")
-                    continue
-                
-                # Créer des features avancées
-                enhanced_data = self.data_prep.create_advanced_features(prediction_data)
-                
-                # Encoder pour le modèle
-                prepared_data = self.data_prep.encode_features_for_model(enhanced_data, is_training=False)
-                
-                # Faire la prédiction avec le modèle standard
-                results = self.model.predict_standard(prepared_data)
+                results = predictions_by_course.get(race_id)
                 
                 if results is None:
                     self.logger.warning(f"Échec de la prédiction pour la course {race_id}")
@@ -255,6 +282,18 @@ class BatchProcessor:
         self.logger.info(f"Traitement terminé. {len(all_predictions)} prédictions générées.")
         return all_predictions
     
+    def predict_races(self, course_ids, prediction_type='standard'):
+        """
+        Prédit des courses une par une avec le pool configuré (executor_mode,
+        max_workers, race_timeout).
+        
+        Returns:
+            dict avec predictions ({course: DataFrame}), failed, timed_out et duration_seconds
+        """
+        executor = RacePredictionExecutor(self.model, self.data_prep, mode=self.executor_mode,
+                                          max_workers=self.max_workers, race_timeout=self.race_timeout)
+        return executor.run(course_ids, prediction_type)
+    
     def simulate_race(self, course_id, selected_horses, simulation_params=None):
         """Simule une course avec des paramètres personnalisés."""
         if self.model.simulation_model is None:
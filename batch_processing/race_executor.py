@@ -0,0 +1,199 @@
+# batch_processing/race_executor.py
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from model.model_bundle import collect_encoders
+
+# Modes d'exécution des prédictions course par course
+EXECUTOR_MODES = ('sequential', 'thread', 'process')
+
+# Délai maximal (secondes) accordé à la prédiction d'une course, compté à partir
+# de son démarrage dans un worker
+DEFAULT_RACE_TIMEOUT = 120
+# Intervalle (secondes) de vérification du démarrage des courses soumises
+START_CHECK_INTERVAL = 0.05
+
+# Modèle et préparation des données, chargés une seule fois par processus de travail
+_WORKER = {}
+
+
+def _init_worker(model, encoders, engine_url):
+    """Initialise un processus de travail: une connexion, un modèle, un seul thread XGBoost."""
+    from sqlalchemy import create_engine
+    from data_preparation.enhanced_data_prep import EnhancedDataPreparation
+
+    # Un thread par processus: les cœurs sont répartis entre les processus
+    for estimator in (model.standard_model, model.simulation_model):
+        if estimator is not None and 'n_jobs' in estimator.get_params():
+            estimator.set_params(n_jobs=1)
+
+    data_prep = EnhancedDataPreparation(engine=create_engine(engine_url) if engine_url else None)
+    for name, encoder in encoders.items():
+        setattr(data_prep, name, encoder)
+
+    _WORKER.clear()
+    _WORKER.update({'model': model, 'data_prep': data_prep})
+
+
+def predict_race(course_id, prediction_type, model=None, data_prep=None):
+    """
+    Prédiction complète d'une course: chargement des participants, features et
+    appel au modèle (standard ou top7). Sans model / data_prep, utilise ceux du
+    processus de travail.
+
+    Returns:
+        DataFrame des prédictions, ou None
+    """
+    model = model if model is not None else _WORKER['model']
+    data_prep = data_prep if data_prep is not None else _WORKER['data_prep']
+
+    participants = data_prep.get_upcoming_data(course_ids=[course_id])
+    if participants.empty:
+        return None
+
+    enhanced_data = data_prep.create_enhanced_features(participants, fill_missing=False)
+    if prediction_type == 'top7':
+        return model.predict_top7(enhanced_data)
+    if prediction_type == 'standard':
+        prepared_data = data_prep.encode_features_for_model(enhanced_data, is_training=False)
+        return model.predict_standard(prepared_data)
+    raise ValueError(f"Type de prédiction inconnu: {prediction_type}")
+
+
+class RacePredictionExecutor:
+    """
+    Prédictions course par course en parallèle, quand la prédiction d'une journée
+    en un seul lot n'est pas possible (échec du lot, types de modèles mélangés).
+
+    - 'thread': pool de threads partageant le modèle et la connexion (le temps
+      est surtout passé dans les requêtes de chargement des features)
+    - 'process': pool de processus (spawn), le modèle et les encodeurs sont
+      transmis une fois à chaque processus; utilise tous les cœurs
+    - 'sequential': une course après l'autre (mode de référence)
+
+    Au plus max_workers courses sont en cours à la fois. Une course qui dépasse
+    race_timeout après son démarrage est abandonnée (son résultat est ignoré, le
+    calcul n'est pas interrompu) et comptée en échec; son worker n'est réutilisé
+    qu'une fois ce calcul terminé, pour que les courses suivantes ne l'attendent
+    pas sans démarrer.
+    """
+
+    def __init__(self, model, data_prep, mode='thread', max_workers=None, race_timeout=DEFAULT_RACE_TIMEOUT):
+        if mode not in EXECUTOR_MODES:
+            raise ValueError(f"Mode d'exécution inconnu: {mode}")
+        self.model = model
+        self.data_prep = data_prep
+        self.mode = mode
+        self.max_workers = max_workers
+        self.race_timeout = race_timeout
+        self.logger = logging.getLogger(__name__)
+
+    def _pool_size(self, n_tasks):
+        cpu_count = os.cpu_count() or 1
+        return max(min(n_tasks, self.max_workers or cpu_count), 1)
+
+    def _create_executor(self, workers):
+        if self.mode == 'thread':
+            return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='race')
+
+        engine_url = self.data_prep.engine.url.render_as_string(hide_password=False)
+        # spawn: pas de fork d'un processus dont les pools OpenMP sont déjà actifs
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=_init_worker,
+                                   initargs=(self.model, collect_encoders(self.data_prep), engine_url))
+
+    def _submit(self, executor, course_id, prediction_type):
+        if self.mode == 'thread':
+            return executor.submit(predict_race, course_id, prediction_type, self.model, self.data_prep)
+        return executor.submit(predict_race, course_id, prediction_type)
+
+    def run(self, course_ids, prediction_type='top7'):
+        """
+        Prédit chaque course de course_ids.
+
+        Returns:
+            dict avec predictions ({course: DataFrame}), failed ({course: erreur}),
+            timed_out (liste des courses abandonnées) et duration_seconds
+        """
+        start_time = time.time()
+        results = {'predictions': {}, 'failed': {}, 'timed_out': []}
+        course_ids = list(course_ids)
+        workers = self._pool_size(len(course_ids))
+        self.logger.info(f"Prédiction {prediction_type} de {len(course_ids)} courses "
+                         f"(mode {self.mode}, {workers} workers)")
+
+        def record(course_id, predictions=None, error=None):
+            if error is None and predictions is None:
+                error = "Aucune prédiction"
+            if error is not None:
+                self.logger.error(f"Erreur lors de la prédiction de la course {course_id}: {error}")
+                results['failed'][course_id] = error
+            else:
+                results['predictions'][course_id] = predictions
+
+        if self.mode == 'sequential' or (workers == 1 and self.mode == 'thread'):
+            for course_id in course_ids:
+                try:
+                    record(course_id, predict_race(course_id, prediction_type, self.model, self.data_prep))
+                except Exception as e:
+                    record(course_id, error=str(e))
+        else:
+            executor = self._create_executor(workers)
+            queue = list(reversed(course_ids))
+            pending = {}      # future -> (course, échéance, None tant que la course n'a pas démarré)
+            abandoned = set()  # courses hors délai dont le calcul occupe encore un worker
+            try:
+                while queue or pending:
+                    # Concurrence bornée: une course soumise par worker libre, les workers
+                    # des courses abandonnées ne sont pas réutilisés avant leur fin
+                    abandoned = {future for future in abandoned if not future.done()}
+                    while queue and len(pending) + len(abandoned) < workers:
+                        course_id = queue.pop()
+                        pending[self._submit(executor, course_id, prediction_type)] = (course_id, None)
+
+                    if not pending:
+                        # Tous les workers sont occupés par des courses abandonnées
+                        done, _ = wait(abandoned, timeout=self.race_timeout, return_when=FIRST_COMPLETED)
+                        if not done:
+                            while queue:
+                                record(queue.pop(), error="Aucun worker disponible (courses hors délai en cours)")
+                        continue
+
+                    # L'échéance d'une course part de son démarrage dans un worker
+                    now = time.monotonic()
+                    for future, (course_id, deadline) in pending.items():
+                        if deadline is None and (future.running() or future.done()):
+                            pending[future] = (course_id, now + self.race_timeout)
+                    deadlines = [deadline for _, deadline in pending.values() if deadline is not None]
+                    timeout = max(min(deadlines) - now, 0) if deadlines else None
+                    if len(deadlines) < len(pending):
+                        timeout = START_CHECK_INTERVAL if timeout is None else min(timeout, START_CHECK_INTERVAL)
+                    done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+                    for future in done:
+                        course_id, _ = pending.pop(future)
+                        try:
+                            record(course_id, future.result())
+                        except Exception as e:
+                            record(course_id, error=str(e))
+
+                    now = time.monotonic()
+                    for future, (course_id, deadline) in list(pending.items()):
+                        if deadline is not None and deadline <= now and not future.done():
+                            if not future.cancel():
+                                abandoned.add(future)
+                            del pending[future]
+                            results['timed_out'].append(course_id)
+                            record(course_id, error=f"Délai de {self.race_timeout}s dépassé")
+            finally:
+                # Ne pas attendre les courses abandonnées
+                executor.shutdown(wait=not results['timed_out'], cancel_futures=True)
+
+        results['duration_seconds'] = time.time() - start_time
+        self.logger.info(f"Prédictions terminées: {len(results['predictions'])} courses, "
+                         f"{len(results['failed'])} échecs ({len(results['timed_out'])} hors délai) "
+                         f"en {results['duration_seconds']:.1f}s")
+        return results
@@ -0,0 +1,2 @@
+# benchmarks/__init__.py
+"""Génération de données PMU synthétiques et mesure des étapes du pipeline."""
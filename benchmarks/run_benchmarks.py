@@ -0,0 +1,271 @@
+# benchmarks/run_benchmarks.py
+"""
+Mesure des étapes du pipeline sur une base synthétique.
+
+Pour chaque étape (chargement des données d'entraînement, features avancées,
+features participants, entraînement, prédiction Top 7) sont relevés la durée,
+le nombre d'aller-retours SQL et le pic mémoire Python (tracemalloc).
+Les résultats sont écrits en JSON (un fichier par exécution, suffixé par le
+commit git) pour être comparés d'un commit à l'autre.
+
+Usage:
+    python -m benchmarks.run_benchmarks --days 30 --reunions-per-day 4
+    python -m benchmarks.run_benchmarks --compare benchmarks/results/a.json benchmarks/results/b.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import create_engine, event, inspect
+
+from benchmarks.synthetic_data import generate_synthetic_database
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_URL = 'sqlite:///benchmarks/pmu_synthetic.db'
+RESULTS_DIR = 'benchmarks/results'
+
+
+class StageRecorder:
+    """
+    Chronomètre les étapes et compte les requêtes SQL émises sur le moteur
+    (écouteur before_cursor_execute).
+    """
+
+    def __init__(self, engine, track_memory=True):
+        self.engine = engine
+        self.track_memory = track_memory
+        self.query_count = 0
+        self.stages = {}
+        event.listen(engine, 'before_cursor_execute', self._count_query)
+
+    def _count_query(self, *args, **kwargs):
+        self.query_count += 1
+
+    def close(self):
+        event.remove(self.engine, 'before_cursor_execute', self._count_query)
+
+    def measure(self, name, func, *args, **kwargs):
+        """Exécute func et enregistre durée, requêtes SQL et pic mémoire sous le nom name."""
+        queries_before = self.query_count
+        if self.track_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        error = None
+        result = None
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            error = str(e)
+            logger.error(f"Erreur pendant l'étape {name}: {error}")
+        elapsed = time.perf_counter() - start
+
+        stage = {'seconds': round(elapsed, 4), 'sql_queries': self.query_count - queries_before}
+        if self.track_memory:
+            stage['peak_memory_mb'] = round(tracemalloc.get_traced_memory()[1] / 1024 ** 2, 2)
+            tracemalloc.stop()
+        if isinstance(result, pd.DataFrame):
+            stage['rows'] = len(result)
+        if error:
+            stage['error'] = error
+
+        self.stages[name] = stage
+        logger.info(f"{name}: {stage}")
+        return result
+
+
+def _git_revision():
+    """Commit courant (court) et présence de modifications non commitées."""
+    try:
+        sha = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                             text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                    capture_output=True, text=True).stdout.strip())
+        return sha, dirty
+    except Exception:
+        return 'unknown', False
+
+
+def _prepare_database(engine, args):
+    """Génère la base synthétique si elle est absente (ou si --regenerate)."""
+    if not args.regenerate and inspect(engine).has_table('participations'):
+        with engine.connect() as connection:
+            if connection.exec_driver_sql("SELECT COUNT(*) FROM participations").scalar():
+                logger.info("Base synthétique existante réutilisée")
+                return None
+    return generate_synthetic_database(
+        engine, days=args.days, reunions_per_day=args.reunions_per_day,
+        races_per_reunion=args.races_per_reunion, runners_per_race=args.runners,
+        seed=args.seed, drop_existing=True
+    )
+
+
+def run_benchmarks(engine, args):
+    """
+    Exécute toutes les étapes mesurées sur la base de engine.
+
+    Returns:
+        dict des résultats (jeu de données, environnement, mesures par étape)
+    """
+    from data_preparation.data_preparation import DataPreparation
+    from data_preparation.enhanced_data_prep import EnhancedDataPreparation
+    from model.dual_prediction_model import DualPredictionModel
+
+    recorder = StageRecorder(engine, track_memory=not args.no_memory)
+    try:
+        generated = recorder.measure('generate_synthetic_data', _prepare_database, engine, args)
+
+        data_prep = EnhancedDataPreparation(engine=engine)
+        training_data = recorder.measure('get_training_data', data_prep.get_training_data)
+        if training_data is None or training_data.empty:
+            raise RuntimeError("Aucune donnée d'entraînement dans la base synthétique")
+
+        # Features avancées: chemin groupé à date, groupé sur agrégats, ancien chemin par ligne
+        features = recorder.measure('create_enhanced_features', data_prep.create_enhanced_features,
+                                    training_data.copy())
+        recorder.measure('create_enhanced_features_aggregates', data_prep.create_enhanced_features,
+                         training_data.copy(), point_in_time=False)
+        if args.include_legacy:
+            sample = training_data.head(args.legacy_rows).copy()
+            recorder.measure('create_enhanced_features_legacy', data_prep.create_enhanced_features,
+                             sample, method='legacy')
+
+        # Features participants (DataPreparation, requêtes par ligne) sur un échantillon
+        base_prep = DataPreparation(engine=engine)
+        courses = pd.read_sql_query("SELECT * FROM courses", engine)
+        participants = training_data[['id', 'id_course', 'id_cheval', 'id_jockey', 'position']].head(
+            args.participant_rows).copy()
+        recorder.measure('create_participant_features', base_prep.create_participant_features,
+                         participants, courses)
+
+        # Entraînement Top 7 sur les jours antérieurs, prédiction sur le dernier jour
+        features['date_heure'] = pd.to_datetime(features['date_heure'])
+        last_day = features['date_heure'].dt.normalize().max()
+        train_df = features[features['date_heure'] < last_day].copy()
+        predict_df = features[features['date_heure'] >= last_day].copy()
+
+        model = DualPredictionModel(base_path=tempfile.mkdtemp(prefix='umpp_bench_'))
+        model.initialize_top7_simulation_model()
+        model.simulation_model.set_params(n_estimators=args.n_estimators)
+        recorder.measure('train_top7_simulation_model', model.train_top7_simulation_model, train_df)
+
+        def predict_all_races():
+            results = [model.predict_top7(race) for _, race in predict_df.groupby('id_course')]
+            return pd.concat([r for r in results if r is not None], ignore_index=True) if results else None
+
+        recorder.measure('predict_top7', predict_all_races)
+        if 'predict_top7' in recorder.stages:
+            races = predict_df['id_course'].nunique()
+            recorder.stages['predict_top7']['races'] = races
+            recorder.stages['predict_top7']['seconds_per_race'] = round(
+                recorder.stages['predict_top7']['seconds'] / max(races, 1), 5)
+    finally:
+        recorder.close()
+
+    sha, dirty = _git_revision()
+    with engine.connect() as connection:
+        table_counts = {
+            table: connection.exec_driver_sql(f"SELECT COUNT(*) FROM {table}").scalar()
+            for table in ['courses', 'participations', 'pmu_participants', 'chevaux', 'jockeys']
+        }
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': sha,
+        'git_dirty': dirty,
+        'environment': {'python': platform.python_version(), 'pandas': pd.__version__,
+                        'platform': platform.platform(), 'database': engine.dialect.name},
+        'dataset': {'days': args.days, 'reunions_per_day': args.reunions_per_day,
+                    'races_per_reunion': args.races_per_reunion, 'runners_per_race': args.runners,
+                    'seed': args.seed, 'regenerated': generated is not None, 'tables': table_counts},
+        'stages': recorder.stages,
+    }
+
+
+def compare_results(baseline_path, candidate_path):
+    """
+    Compare deux fichiers de résultats étape par étape.
+
+    Returns:
+        DataFrame (une ligne par étape) avec durées, requêtes SQL et ratio de durée
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(candidate_path) as f:
+        candidate = json.load(f)
+
+    rows = []
+    for name in dict.fromkeys(list(baseline['stages']) + list(candidate['stages'])):
+        base = baseline['stages'].get(name, {})
+        cand = candidate['stages'].get(name, {})
+        rows.append({
+            'stage': name,
+            'seconds_before': base.get('seconds'),
+            'seconds_after': cand.get('seconds'),
+            'speedup': round(base['seconds'] / cand['seconds'], 2) if base.get('seconds') and cand.get('seconds') else None,
+            'queries_before': base.get('sql_queries'),
+            'queries_after': cand.get('sql_queries'),
+            'peak_mb_before': base.get('peak_memory_mb'),
+            'peak_mb_after': cand.get('peak_memory_mb'),
+        })
+    return pd.DataFrame(rows).set_index('stage')
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Benchmark des étapes du pipeline sur données synthétiques')
+    parser.add_argument('--db-url', default=DEFAULT_DB_URL, help='URL SQLAlchemy de la base synthétique')
+    parser.add_argument('--days', type=int, default=30, help='Nombre de jours de courses')
+    parser.add_argument('--reunions-per-day', type=int, default=4, help='Réunions par jour')
+    parser.add_argument('--races-per-reunion', type=int, default=8, help='Courses par réunion')
+    parser.add_argument('--runners', type=int, default=14, help='Partants par course')
+    parser.add_argument('--seed', type=int, default=42, help='Graine aléatoire')
+    parser.add_argument('--regenerate', action='store_true', help='Régénérer la base même si elle existe')
+    parser.add_argument('--include-legacy', action='store_true',
+                        help='Mesurer aussi le calcul des features ligne par ligne (lent)')
+    parser.add_argument('--legacy-rows', type=int, default=200, help='Lignes de l\'échantillon legacy')
+    parser.add_argument('--participant-rows', type=int, default=200,
+                        help='Lignes de l\'échantillon create_participant_features')
+    parser.add_argument('--n-estimators', type=int, default=200, help='Arbres du modèle Top 7 mesuré')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='Désactiver tracemalloc (durées sans surcoût de traçage)')
+    parser.add_argument('--output', help='Fichier JSON de sortie (par défaut dans benchmarks/results)')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CANDIDATE'),
+                        help='Comparer deux fichiers de résultats au lieu d\'exécuter le benchmark')
+    args = parser.parse_args()
+
+    if args.compare:
+        print(compare_results(*args.compare).to_string())
+        return
+
+    if args.db_url.startswith('sqlite:///'):
+        os.makedirs(os.path.dirname(os.path.abspath(args.db_url[len('sqlite:///'):])), exist_ok=True)
+    engine = create_engine(args.db_url)
+    results = run_benchmarks(engine, args)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"bench_{stamp}_{results['git_commit']}.json")
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    summary = pd.DataFrame(results['stages']).T
+    print(summary.drop(columns=['error'], errors='ignore').to_string())
+    for name, stage in results['stages'].items():
+        if 'error' in stage:
+            print(f"Étape {name} en erreur: {stage['error']}")
+    print(f"Résultats écrits dans {output}")
+
+
+if __name__ == '__main__':
+    main()
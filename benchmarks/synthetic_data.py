@@ -0,0 +1,358 @@
+# benchmarks/synthetic_data.py
+"""
+Générateur de données PMU synthétiques.
+
+Remplit le schéma SQLAlchemy de database/setup_database.py (réunions, courses,
+participants, chevaux, jockeys, commentaires) avec des volumes réalistes:
+N réunions par jour x courses par réunion x partants par course sur M jours.
+Les résultats sont tirés d'une aptitude latente par cheval, de sorte que cotes,
+musiques et arrivées restent cohérentes entre elles et qu'un modèle entraîné
+dessus apprenne quelque chose.
+
+Usage:
+    python -m benchmarks.synthetic_data --db-url sqlite:///benchmarks/pmu_synthetic.db --days 30
+"""
+import argparse
+import logging
+from collections import deque
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine
+
+from database.setup_database import Base
+from data_preparation.entity_aggregates import AGG_METADATA, EntityAggregates
+
+logger = logging.getLogger(__name__)
+
+HIPPODROMES = [
+    ('VIN', 'VINCENNES', 'PARIS-VINCENNES'),
+    ('LON', 'LONGCHAMP', 'PARISLONGCHAMP'),
+    ('CHA', 'CHANTILLY', 'CHANTILLY'),
+    ('DEA', 'DEAUVILLE', 'DEAUVILLE'),
+    ('AUT', 'AUTEUIL', 'PARIS-AUTEUIL'),
+    ('ENG', 'ENGHIEN', 'ENGHIEN-SOISY'),
+    ('CAG', 'CAGNES', 'CAGNES-SUR-MER'),
+    ('CAE', 'CAEN', 'CAEN'),
+    ('VIC', 'VICHY', 'VICHY'),
+    ('LYP', 'LYON PARILLY', 'LYON-PARILLY'),
+    ('SCL', 'SAINT CLOUD', 'SAINT-CLOUD'),
+    ('MAR', 'MARSEILLE', 'MARSEILLE-BORELY'),
+    ('PAU', 'PAU', 'PAU'),
+    ('LAV', 'LAVAL', 'LAVAL'),
+]
+
+# Spécialité, discipline, lettre de musique, distances possibles
+SPECIALITES = [
+    ('TROT_ATTELE', 'ATTELE', 'a', [2100, 2150, 2700, 2850]),
+    ('TROT_MONTE', 'MONTE', 'm', [2150, 2700]),
+    ('PLAT', 'PLAT', 'p', [1200, 1600, 2000, 2400]),
+    ('OBSTACLE', 'HAIE', 'h', [3500, 3900, 4300]),
+]
+SPECIALITE_WEIGHTS = [0.45, 0.1, 0.35, 0.1]
+
+NEBULOSITES = ['Soleil', 'Peu Nuageux', 'Variable avec Averses', 'Couvert', 'Très Nuageux', 'Pluies']
+TERRAINS = ['Bon', 'Bon souple', 'Souple', 'Collant', 'Lourd', 'Sec']
+DIRECTIONS_VENT = ['N', 'NE', 'E', 'SE', 'S', 'SO', 'O', 'NO']
+SEXES = ['MALES', 'FEMELLES', 'HONGRES']
+INCIDENTS = ['DISQUALIFIE_POUR_ALLURE_IRREGULIERE', 'ARRETE', 'TOMBE', 'REFUSE_DE_PARTIR', 'GENE']
+COMMENTAIRES = [
+    "Le gagnant s'est imposé avec facilité, très bon finish.",
+    "Course rapide, le favori a déçu après un départ difficile.",
+    "Bien placé dans le parcours, il a résisté jusqu'au poteau.",
+    "Gêné dans le dernier tournant, il termine avec de bons moyens.",
+    "Mauvais départ, il n'a jamais pu revenir sur la tête.",
+]
+
+# Taille des lots d'INSERT exécutés en une instruction executemany
+INSERT_BATCH_SIZE = 5000
+
+# Nombre maximal de performances conservées dans la musique
+MUSIQUE_LENGTH = 8
+
+
+def _batched_insert(connection, table, rows):
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        connection.execute(table.insert(), rows[start:start + INSERT_BATCH_SIZE])
+
+
+def _musique_token(position, letter):
+    """Performance au format musique: position + discipline, code lettre sinon."""
+    if position is None:
+        return f'D{letter}'
+    return f'{position if position < 10 else 0}{letter}'
+
+
+class SyntheticPmuGenerator:
+    """
+    Générateur de jeux de données PMU reproductibles (graine fixe).
+
+    Les entités (chevaux, jockeys, entraîneurs, propriétaires, pères) sont tirées
+    une fois; chaque course tire ensuite ses partants dans le pool de chevaux et
+    classe les partants par aptitude bruitée.
+    """
+
+    def __init__(self, days=30, reunions_per_day=4, races_per_reunion=8, runners_per_race=14,
+                 start_date=None, seed=42, horse_pool=None, results_ratio=1.0):
+        """
+        Args:
+            days: nombre de jours de courses
+            reunions_per_day: réunions par jour (au plus le nombre d'hippodromes)
+            races_per_reunion: courses par réunion
+            runners_per_race: partants par course
+            start_date: premier jour (par défaut days jours avant aujourd'hui)
+            seed: graine du générateur aléatoire
+            horse_pool: nombre de chevaux distincts (par défaut ~ une course par semaine et par cheval)
+            results_ratio: part des jours (les plus anciens) dont l'arrivée est connue
+        """
+        self.days = days
+        self.reunions_per_day = min(reunions_per_day, len(HIPPODROMES))
+        self.races_per_reunion = races_per_reunion
+        self.runners_per_race = runners_per_race
+        self.start_date = start_date or (datetime.now() - timedelta(days=days)).replace(
+            hour=0, minute=0, second=0, microsecond=0)
+        self.rng = np.random.default_rng(seed)
+        runners_per_day = self.reunions_per_day * races_per_reunion * runners_per_race
+        self.horse_pool = max(horse_pool or runners_per_day * 7, runners_per_race)
+        self.results_days = int(round(days * results_ratio))
+        self.logger = logging.getLogger(__name__)
+
+    # ------------------------------------------------------------------
+    # Entités
+    # ------------------------------------------------------------------
+
+    def _make_entities(self):
+        rng = self.rng
+        n_horses = self.horse_pool
+        n_jockeys = max(50, self.reunions_per_day * self.runners_per_race * 3)
+        n_trainers = max(20, n_horses // 8)
+        n_owners = max(20, n_horses // 4)
+        n_sires = max(10, n_horses // 25)
+
+        self.ability = rng.normal(0.0, 1.0, n_horses)
+        self.horse_trainer = rng.integers(0, n_trainers, n_horses)
+        self.horse_owner = rng.integers(0, n_owners, n_horses)
+        self.horse_sire = rng.integers(0, n_sires, n_horses)
+        self.horse_jockey = rng.integers(0, n_jockeys, n_horses)
+        self.horse_sexe = rng.integers(0, len(SEXES), n_horses)
+        self.horse_age = rng.integers(2, 11, n_horses)
+        self.jockey_skill = rng.normal(0.0, 0.3, n_jockeys)
+
+        # Historique antérieur à la période générée, pour des musiques non vides
+        self.history = []
+        for ability in self.ability:
+            n_prior = int(rng.integers(0, MUSIQUE_LENGTH))
+            prior = np.clip(np.round(7 - 2.5 * ability + rng.normal(0, 3, n_prior)), 1, 16).astype(int)
+            self.history.append(deque((int(p), 'a') for p in prior))
+
+        chevaux = [
+            {'id': i + 1, 'nom': f'CHEVAL {i + 1:06d}', 'age': int(self.horse_age[i]),
+             'sexe': SEXES[self.horse_sexe[i]], 'proprietaire': f'PROPRIETAIRE {self.horse_owner[i]:05d}',
+             'nomPere': f'ETALON {self.horse_sire[i]:04d}', 'nomMere': f'JUMENT {i + 1:06d}'}
+            for i in range(n_horses)
+        ]
+        jockeys = [{'id': j + 1, 'nom': f'JOCKEY {j + 1:04d}', 'pays': 'FRA'} for j in range(n_jockeys)]
+        return chevaux, jockeys
+
+    # ------------------------------------------------------------------
+    # Courses
+    # ------------------------------------------------------------------
+
+    def generate(self):
+        """
+        Génère toutes les lignes, par table.
+
+        Returns:
+            dict nom de table -> liste de dict prêtes pour un INSERT groupé
+        """
+        rng = self.rng
+        chevaux, jockeys = self._make_entities()
+        rows = {
+            'pmu_pays': [{'code': 'FRA', 'libelle': 'FRANCE'}],
+            'pmu_hippodromes': [{'code': c, 'libelleCourt': court, 'libelleLong': long}
+                                for c, court, long in HIPPODROMES],
+            'chevaux': chevaux, 'jockeys': jockeys,
+            'pmu_reunions': [], 'pmu_courses': [], 'courses': [], 'participations': [],
+            'pmu_participants': [], 'commentaires_course': [],
+        }
+
+        course_id = 0
+        participation_id = 0
+        reunion_id = 0
+        for day in range(self.days):
+            date = self.start_date + timedelta(days=day)
+            with_results = day < self.results_days
+            hippodromes = rng.choice(len(HIPPODROMES), self.reunions_per_day, replace=False)
+
+            for num_reunion, hippo_idx in enumerate(hippodromes, start=1):
+                reunion_id += 1
+                code, _, libelle_long = HIPPODROMES[hippo_idx]
+                rows['pmu_reunions'].append({
+                    'id': reunion_id, 'dateReunion': date, 'numOfficiel': num_reunion,
+                    'hippodrome_code': code, 'pays_code': 'FRA', 'statut': 'FIN_DES_COURSES' if with_results else 'PROGRAMMEE',
+                    'nebulositeLibelleCourt': NEBULOSITES[rng.integers(len(NEBULOSITES))],
+                    'temperature': int(rng.integers(0, 30)), 'forceVent': int(rng.integers(0, 60)),
+                    'directionVent': DIRECTIONS_VENT[rng.integers(len(DIRECTIONS_VENT))],
+                })
+                terrain = TERRAINS[rng.integers(len(TERRAINS))]
+
+                for num_ordre in range(1, self.races_per_reunion + 1):
+                    course_id += 1
+                    specialite, discipline, letter, distances = SPECIALITES[
+                        rng.choice(len(SPECIALITES), p=SPECIALITE_WEIGHTS)]
+                    distance = int(distances[rng.integers(len(distances))])
+                    depart = date + timedelta(hours=12 + num_reunion, minutes=30 * num_ordre)
+                    prize = int(rng.choice([12000, 18000, 25000, 40000, 60000, 90000]))
+
+                    horses = rng.choice(self.horse_pool, self.runners_per_race, replace=False)
+                    jockeys_idx = self.horse_jockey[horses]
+                    strength = self.ability[horses] + self.jockey_skill[jockeys_idx]
+                    performance = strength + rng.normal(0.0, 1.0, len(horses))
+
+                    # Cotes: probabilités implicites d'après la force connue avant la course
+                    proba = np.exp(1.2 * strength)
+                    proba /= proba.sum()
+                    cote = np.clip(np.round(0.85 / proba, 1), 1.1, 150.0)
+                    cote_initiale = np.clip(np.round(cote * np.exp(rng.normal(0, 0.15, len(horses))), 1), 1.1, 150.0)
+
+                    # Arrivée: classement par performance, quelques non-arrivées
+                    incident_mask = rng.random(len(horses)) < 0.04
+                    order = np.argsort(-performance, kind='stable')
+                    order = np.concatenate([order[~incident_mask[order]], order[incident_mask[order]]])
+                    positions = np.empty(len(horses), dtype=int)
+                    positions[order] = np.arange(1, len(horses) + 1)
+                    num_pmu = np.arange(1, len(horses) + 1)
+                    arrivee = [[int(num_pmu[i])] for i in order if not incident_mask[i]]
+
+                    rows['pmu_courses'].append({
+                        'id': course_id, 'numReunion': num_reunion, 'numOrdre': num_ordre,
+                        'libelle': f'PRIX {course_id:06d}', 'heureDepart': depart, 'distance': distance,
+                        'distanceUnit': 'METRE', 'nombreDeclaresPartants': len(horses),
+                        'discipline': discipline, 'specialite': specialite, 'hippodrome_code': code,
+                        'ordreArrivee': arrivee if with_results else None,
+                        'statut': 'FIN_COURSE' if with_results else 'PROGRAMMEE',
+                        'reunion_id': reunion_id, 'montantPrix': prize,
+                    })
+                    rows['courses'].append({
+                        'id': course_id, 'date_heure': depart, 'lieu': libelle_long,
+                        'type_course': specialite, 'distance': distance, 'terrain': terrain,
+                        'num_course': num_ordre, 'libelle': f'PRIX {course_id:06d}', 'corde': 'GAUCHE',
+                        'ordreArrivee': arrivee if with_results else None, 'pmu_course_id': course_id,
+                    })
+                    if with_results:
+                        rows['commentaires_course'].append({
+                            'id': course_id, 'id_course': course_id, 'source': 'SYNTHETIQUE',
+                            'texte': COMMENTAIRES[rng.integers(len(COMMENTAIRES))],
+                        })
+
+                    for i, horse in enumerate(horses):
+                        participation_id += 1
+                        finished = with_results and not incident_mask[i]
+                        position = int(positions[i]) if finished else None
+                        incident = (INCIDENTS[rng.integers(len(INCIDENTS))]
+                                    if with_results and incident_mask[i] else None)
+                        poids = float(rng.integers(52, 62)) if specialite in ('PLAT', 'OBSTACLE') else None
+                        history = self.history[horse]
+                        musique = ''.join(_musique_token(p, l) for p, l in history)
+
+                        rows['participations'].append({
+                            'id': participation_id, 'id_course': course_id, 'id_cheval': int(horse) + 1,
+                            'id_jockey': int(jockeys_idx[i]) + 1, 'position': position, 'poids': poids,
+                            'est_forfait': False, 'cote_initiale': float(cote_initiale[i]),
+                            'cote_actuelle': float(cote[i]), 'statut': 'PARTANT', 'numPmu': int(num_pmu[i]),
+                        })
+                        temps = int(distance / (15.5 + 0.3 * performance[i]) * 1000) if finished else None
+                        rows['pmu_participants'].append({
+                            'id': participation_id, 'id_course': course_id, 'numPmu': int(num_pmu[i]),
+                            'nom': chevaux[horse]['nom'], 'age': chevaux[horse]['age'],
+                            'sexe': chevaux[horse]['sexe'], 'statut': 'PARTANT',
+                            'driver': jockeys[jockeys_idx[i]]['nom'],
+                            'entraineur': f'ENTRAINEUR {self.horse_trainer[horse]:05d}',
+                            'proprietaire': chevaux[horse]['proprietaire'], 'musique': musique,
+                            'incident': incident, 'ordreArrivee': position, 'tempsObtenu': temps,
+                            'reductionKilometrique': int(temps * 1000 / distance) if temps else None,
+                            'dernierRapportDirect': {'typeRapport': 'DIRECT', 'rapport': float(cote[i])},
+                            'dernierRapportReference': {'typeRapport': 'REFERENCE', 'rapport': float(cote_initiale[i])},
+                            'handicapPoids': poids, 'nomPere': chevaux[horse]['nomPere'],
+                            'nomMere': chevaux[horse]['nomMere'],
+                            'cheval_id': int(horse) + 1, 'jockey_id': int(jockeys_idx[i]) + 1,
+                        })
+
+                        if with_results:
+                            history.appendleft((position, letter))
+                            while len(history) > MUSIQUE_LENGTH:
+                                history.pop()
+
+        return rows
+
+    def write(self, engine, drop_existing=False):
+        """
+        Crée le schéma et insère les données générées.
+
+        Returns:
+            dict nom de table -> nombre de lignes insérées
+        """
+        if drop_existing:
+            AGG_METADATA.drop_all(engine)
+            Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+
+        rows = self.generate()
+        counts = {}
+        # Ordre des clés étrangères
+        order = ['pmu_pays', 'pmu_hippodromes', 'chevaux', 'jockeys', 'pmu_reunions', 'pmu_courses',
+                 'courses', 'participations', 'pmu_participants', 'commentaires_course']
+        with engine.begin() as connection:
+            for name in order:
+                _batched_insert(connection, Base.metadata.tables[name], rows[name])
+                counts[name] = len(rows[name])
+                self.logger.info(f"{name}: {counts[name]} lignes insérées")
+        return counts
+
+
+def generate_synthetic_database(engine, days=30, reunions_per_day=4, races_per_reunion=8,
+                                runners_per_race=14, seed=42, drop_existing=False,
+                                with_aggregates=True, with_indexes=True, **kwargs):
+    """
+    Remplit la base de engine avec un jeu de données synthétique.
+
+    Args:
+        with_aggregates: reconstruire les tables d'agrégats par père/entraîneur/propriétaire
+        with_indexes: créer les index secondaires des chemins chauds
+        **kwargs: options supplémentaires de SyntheticPmuGenerator (start_date, horse_pool...)
+
+    Returns:
+        dict nom de table -> nombre de lignes insérées
+    """
+    generator = SyntheticPmuGenerator(days=days, reunions_per_day=reunions_per_day,
+                                      races_per_reunion=races_per_reunion,
+                                      runners_per_race=runners_per_race, seed=seed, **kwargs)
+    counts = generator.write(engine, drop_existing=drop_existing)
+
+    if with_indexes:
+        from database.index_migration import create_indexes
+        create_indexes(engine)
+    if with_aggregates:
+        EntityAggregates(engine).rebuild()
+
+    return counts
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Génération de données PMU synthétiques')
+    parser.add_argument('--db-url', default='sqlite:///benchmarks/pmu_synthetic.db', help='URL SQLAlchemy de la base cible')
+    parser.add_argument('--days', type=int, default=30, help='Nombre de jours de courses')
+    parser.add_argument('--reunions-per-day', type=int, default=4, help='Réunions par jour')
+    parser.add_argument('--races-per-reunion', type=int, default=8, help='Courses par réunion')
+    parser.add_argument('--runners', type=int, default=14, help='Partants par course')
+    parser.add_argument('--seed', type=int, default=42, help='Graine aléatoire')
+    parser.add_argument('--drop', action='store_true', help='Supprimer les tables existantes avant génération')
+    args = parser.parse_args()
+
+    counts = generate_synthetic_database(
+        create_engine(args.db_url), days=args.days, reunions_per_day=args.reunions_per_day,
+        races_per_reunion=args.races_per_reunion, runners_per_race=args.runners,
+        seed=args.seed, drop_existing=args.drop
+    )
+    print(counts)
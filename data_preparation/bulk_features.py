@@ -0,0 +1,279 @@
+# data_preparation/bulk_features.py
+import logging
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text, bindparam
+
+# Nombre maximal d'identifiants par clause IN
+BULK_CHUNK_SIZE = 1000
+
+# Mots-clés utilisés pour l'analyse de sentiment des commentaires
+POSITIVE_KEYWORDS = ['bien', 'facilité', 'puissance', 'vite', 'énergie', 'fort', 'dominant']
+NEGATIVE_KEYWORDS = ['fatigue', 'difficulté', 'lent', 'effort', 'peine', 'déception']
+
+
+class BulkFeatureBuilder:
+    """
+    Calcule les familles de features historiques de create_enhanced_features
+    à partir de quelques requêtes groupées sur l'ensemble du lot.
+
+    Au lieu d'une requête par ligne, chaque famille charge les données de tous
+    les chevaux / courses du DataFrame en une fois (clauses IN découpées par
+    paquets), puis les rattache aux lignes avec des merge/groupby pandas.
+    Les colonnes produites sont identiques à celles du chemin ligne par ligne.
+
+    Les statistiques par père, entraîneur, propriétaire, couple jockey-cheval et
+    distance sont calculées par RollingStatsAggregator.
+    """
+
+    def __init__(self, engine, chunk_size=BULK_CHUNK_SIZE):
+        self.engine = engine
+        self.chunk_size = chunk_size
+        self.logger = logging.getLogger(__name__)
+        self.query_count = 0
+
+    # ------------------------------------------------------------------
+    # Accès base de données
+    # ------------------------------------------------------------------
+
+    def _read_in(self, query, values, key='ids'):
+        """
+        Exécute une requête contenant une clause IN :<key> par paquets
+        de chunk_size valeurs et concatène les résultats.
+        """
+        values = [v for v in pd.unique(pd.Series(values).dropna())]
+        if not values:
+            return pd.DataFrame()
+
+        # Convertir les types numpy en types Python pour le driver SQL
+        values = [v.item() if isinstance(v, np.generic) else v for v in values]
+
+        statement = text(query).bindparams(bindparam(key, expanding=True))
+        frames = []
+        for start in range(0, len(values), self.chunk_size):
+            chunk = values[start:start + self.chunk_size]
+            frames.append(pd.read_sql_query(statement, self.engine, params={key: chunk}))
+            self.query_count += 1
+
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def load_horse_history(self, cheval_ids):
+        """
+        Charge en une passe l'historique des participations de tous les chevaux
+        du lot, avec le type, la distance et la météo de chaque course.
+        """
+        query = """
+        SELECT
+            p.id_cheval,
+            p.id_jockey,
+            p.id_course AS hist_course,
+            p.position,
+            c.id AS hist_course_ref,
+            c.type_course AS hist_type_course,
+            c.distance AS hist_distance,
+            r.nebulositeLibelleCourt AS hist_meteo
+        FROM participations p
+        LEFT JOIN courses c ON p.id_course = c.id
+        LEFT JOIN pmu_courses pc ON c.pmu_course_id = pc.id
+        LEFT JOIN pmu_reunions r ON pc.reunion_id = r.id
+        WHERE p.id_cheval IN :ids
+        """
+        history = self._read_in(query, cheval_ids)
+        if not history.empty:
+            history['position'] = pd.to_numeric(history['position'], errors='coerce')
+        return history
+
+    # ------------------------------------------------------------------
+    # Utilitaires pandas
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _rows(df, columns):
+        """Extrait les lignes exploitables avec leur étiquette d'index dans '_row'."""
+        rows = df[columns].dropna().copy()
+        rows['_row'] = rows.index
+        return rows
+
+    @staticmethod
+    def _position_stats(merged, group='_row'):
+        """Agrège taux de victoire/place, position moyenne et nombre de courses."""
+        position = merged['position']
+        stats = merged.assign(
+            _win=(position == 1).astype(float),
+            _place=(position <= 3).astype(float)
+        ).groupby(group).agg(
+            count=('_win', 'size'),
+            win_rate=('_win', 'mean'),
+            place_rate=('_place', 'mean'),
+            avg_position=('position', 'mean')
+        )
+        stats['win_rate'] *= 100
+        stats['place_rate'] *= 100
+        return stats
+
+    @staticmethod
+    def _assign(df, stats, mapping):
+        """Copie les colonnes agrégées dans df pour les lignes concernées uniquement."""
+        if stats.empty:
+            return
+        for source, target in mapping.items():
+            df.loc[stats.index, target] = stats[source].values
+
+    # ------------------------------------------------------------------
+    # Familles de features
+    # ------------------------------------------------------------------
+
+    def add_incident_history(self, df):
+        """Nombre d'incidents passés de chaque cheval."""
+        query = """
+        SELECT cheval_id AS id_cheval, COUNT(*) AS incident_count
+        FROM pmu_participants
+        WHERE cheval_id IN :ids AND incident IS NOT NULL AND incident != ''
+        GROUP BY cheval_id
+        """
+        counts = self._read_in(query, df['id_cheval'])
+        if counts.empty:
+            df['past_incidents_count'] = 0.0
+            return
+        counts = counts.set_index('id_cheval')['incident_count']
+        df['past_incidents_count'] = df['id_cheval'].map(counts).fillna(0).astype(float)
+
+    def add_weather_features(self, df, history, encode_meteo):
+        """Météo de la réunion et performances passées par conditions similaires."""
+        query = """
+        SELECT pc.id AS id_course, r.temperature, r.forceVent, r.nebulositeLibelleCourt
+        FROM pmu_reunions r
+        JOIN pmu_courses pc ON r.id = pc.reunion_id
+        WHERE pc.id IN :ids
+        """
+        meteo = self._read_in(query, df['id_course'])
+        if meteo.empty:
+            return
+        meteo = meteo.drop_duplicates('id_course')
+
+        rows = self._rows(df, ['id_course'])
+        rows = rows.merge(meteo, on='id_course').set_index('_row', drop=False)
+        if rows.empty:
+            return
+        rows['meteo_code'] = rows['nebulositeLibelleCourt'].map(encode_meteo)
+        self._assign(df, rows, {
+            'temperature': 'temperature',
+            'forceVent': 'force_vent',
+            'meteo_code': 'meteo_code'
+        })
+
+        if 'id_cheval' not in df.columns or history.empty:
+            return
+
+        rows['id_cheval'] = df.loc[rows.index, 'id_cheval'].values
+        similar = rows.dropna(subset=['id_cheval', 'nebulositeLibelleCourt']).merge(
+            history.dropna(subset=['hist_meteo', 'hist_course_ref']),
+            left_on=['id_cheval', 'nebulositeLibelleCourt'],
+            right_on=['id_cheval', 'hist_meteo']
+        )
+        similar = similar[similar['hist_course'] != similar['id_course']]
+        stats = self._position_stats(similar)
+        self._assign(df, stats, {
+            'avg_position': 'similar_weather_perf',
+            'count': 'similar_weather_count'
+        })
+
+    def add_speed_features(self, df):
+        """Vitesse moyenne/maximale et réduction kilométrique des courses passées."""
+        query = """
+        SELECT pp.cheval_id AS id_cheval, pp.tempsObtenu, pp.reductionKilometrique, p.distance
+        FROM pmu_participants pp
+        JOIN pmu_courses p ON pp.id_course = p.id
+        WHERE pp.cheval_id IN :ids
+        AND pp.tempsObtenu IS NOT NULL
+        """
+        temps = self._read_in(query, df['id_cheval'])
+        if temps.empty:
+            return
+
+        temps_s = pd.to_numeric(temps['tempsObtenu'], errors='coerce') / 1000
+        temps['vitesse'] = (temps['distance'] / temps_s).where(temps_s > 0)
+        speed = temps.groupby('id_cheval').agg(
+            avg_speed=('vitesse', 'mean'),
+            max_speed=('vitesse', 'max'),
+            avg_reduction_km=('reductionKilometrique', 'mean')
+        )
+
+        rows = self._rows(df, ['id_cheval'])
+        rows = rows[rows['id_cheval'].isin(speed.index)]
+        per_row = speed.loc[rows['id_cheval']].set_index(rows['_row'])
+        self._assign(df, per_row, {
+            'avg_speed': 'avg_speed',
+            'max_speed': 'max_speed',
+            'avg_reduction_km': 'avg_reduction_km'
+        })
+
+    def add_course_type_features(self, df, history, categorize_prize):
+        """Catégorie de prix et performances passées sur le même type de course."""
+        query = """
+        SELECT id AS id_course, specialite AS course_specialite, montantPrix
+        FROM pmu_courses
+        WHERE id IN :ids
+        """
+        details = self._read_in(query, df['id_course'])
+        if details.empty:
+            return
+        details = details.drop_duplicates('id_course')
+
+        rows = self._rows(df, ['id_course'])
+        rows = rows.merge(details, on='id_course').set_index('_row', drop=False)
+
+        prize = rows[rows['montantPrix'].notna()].copy()
+        if not prize.empty:
+            prize['prize_category'] = prize['montantPrix'].map(categorize_prize)
+            self._assign(df, prize, {'prize_category': 'prize_category'})
+
+        if 'id_cheval' not in df.columns or history.empty:
+            return
+
+        rows['id_cheval'] = df.loc[rows.index, 'id_cheval'].values
+        similar = rows.dropna(subset=['id_cheval', 'course_specialite']).merge(
+            history.dropna(subset=['hist_type_course']),
+            left_on=['id_cheval', 'course_specialite'],
+            right_on=['id_cheval', 'hist_type_course']
+        )
+        similar = similar[similar['hist_course'] != similar['id_course']]
+        stats = self._position_stats(similar)
+        self._assign(df, stats, {
+            'avg_position': 'similar_course_type_perf',
+            'count': 'similar_course_type_count'
+        })
+
+    def add_comment_sentiment(self, df):
+        """Score de sentiment des 5 derniers commentaires de course du cheval."""
+        query = """
+        SELECT p.id_cheval, cc.id_course AS comment_course, pc.heureDepart, cc.texte
+        FROM commentaires_course cc
+        JOIN pmu_courses pc ON cc.id_course = pc.id
+        JOIN participations p ON p.id_course = pc.id
+        WHERE p.id_cheval IN :ids
+        """
+        comments = self._read_in(query, df['id_cheval'])
+        if comments.empty:
+            return
+
+        texte = comments['texte'].fillna('').astype(str).str.lower()
+        score = np.zeros(len(comments))
+        for keyword in POSITIVE_KEYWORDS:
+            score += texte.str.contains(keyword.lower(), regex=False).to_numpy()
+        for keyword in NEGATIVE_KEYWORDS:
+            score -= texte.str.contains(keyword.lower(), regex=False).to_numpy()
+        comments['_score'] = score
+
+        rows = self._rows(df, ['id_cheval', 'id_course'])
+        merged = rows.merge(comments, on='id_cheval')
+        merged = merged[merged['comment_course'] != merged['id_course']]
+        if merged.empty:
+            return
+
+        latest = merged.sort_values(
+            ['_row', 'heureDepart'], ascending=[True, False], kind='mergesort'
+        ).groupby('_row').head(5)
+        sentiment = latest.groupby('_row')[['_score']].sum()
+        self._assign(df, sentiment, {'_score': 'comment_sentiment'})
@@ -6,9 +6,12 @@ from datetime import datetime, timedelta
 import logging
 
 class DataPreparation:
-    def __init__(self, db_path='pmu_ia'):
-        """Initialise la connexion à la base de données et les encodeurs."""
-        self.engine = create_engine(f'mysql://root:@localhost/{db_path}')
+    def __init__(self, db_path='pmu_ia', engine=None):
+        """
+        Initialise la connexion à la base de données et les encodeurs.
+        engine permet de fournir un moteur SQLAlchemy existant (base SQLite de benchmark...).
+        """
+        self.engine = engine if engine is not None else create_engine(f'mysql://root:@localhost/{db_path}')
         self.label_encoders = {}
         self.logger = logging.getLogger(__name__)
         
@@ -7,7 +7,7 @@
 # data_preparation/enhanced_data_prep.py
 import pandas as pd
 import numpy as np
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, text, bindparam
 from sklearn.preprocessing import LabelEncoder, StandardScaler, OneHotEncoder
 from datetime import datetime, timedelta
 import logging
@@ -17,6 +17,13 @@ import os
 import json
 import os
 
+from data_preparation.bulk_features import BulkFeatureBuilder
+from data_preparation.entity_aggregates import EntityAggregates
+from data_preparation.feature_selection import score_features
+from data_preparation.musique import compute_musique_features, parse_musique_matrix
+from data_preparation.odds import compute_cote_variation, extract_rapport, extract_rapport_value
+from data_preparation.rolling_stats import RollingStatsAggregator
+
 # Charger la configuration
 config_path = 'config/config.json'
 db_config = {
@@ -37,20 +44,34 @@ if os.path.exists(config_path):
     except Exception as e:
         print(f"Error loading config: {e}")
 
+# Version des features produites par create_enhanced_features.
+# À incrémenter à chaque modification du calcul pour invalider le feature store.
+FEATURE_VERSION = 3
+
 # Modifier la chaîne de connexion
 #engine = create_engine(f"mysql+{db_config.get('connector', 'pymysql')}://{db_config['user']}:{db_config['password']}@{db_config['host']}:{db_config['port']}/{db_config['database']}")
 
 class EnhancedDataPreparation:
     """Version améliorée de la classe DataPreparation avec des fonctionnalités supplémentaires"""
     
-    def __init__(self, db_path='pmu_ia'):
-        """Initialise la connexion à la base de données et les encodeurs."""
-        self.engine = create_engine(f"mysql+{db_config.get('connector', 'pymysql')}://{db_config['user']}:{db_config['password']}@{db_config['host']}:{db_config['port']}/{db_config['database']}")
+    def __init__(self, db_path='pmu_ia', engine=None):
+        """
+        Initialise la connexion à la base de données et les encodeurs.
+        engine permet de fournir un moteur SQLAlchemy existant (base SQLite de benchmark...).
+        """
+        self.engine = engine if engine is not None else create_engine(f"mysql+{db_config.get('connector', 'pymysql')}://{db_config['user']}:{db_config['password']}@{db_config['host']}:{db_config['port']}/{db_config['database']}")
 
         self.label_encoders = {}
         self.one_hot_encoders = {}
         self.scaler = StandardScaler()
         self.logger = logging.getLogger(__name__)
+
+        # Agrégats à date (point-in-time), calculés à la première utilisation
+        self.rolling_stats = None
+
+        # Tables d'agrégats par père / entraîneur / propriétaire (lecture par clé)
+        self.entity_aggregates = EntityAggregates(self.engine)
+        self._aggregates_available = None
         
         # Créer le dossier pour stocker les encodeurs
         os.makedirs('data_preparation/encoders', exist_ok=True)
@@ -85,8 +106,21 @@ class EnhancedDataPreparation:
             self.logger.error(f"Error saving encoders: {str(e)}")
 
 
-    def get_training_data(self, start_date=None, end_date=None, limit=None):
-        """Récupère un ensemble de données pour l'entraînement avec résultats connus et données enrichies"""
+    def get_training_data(self, start_date=None, end_date=None, limit=None, course_ids=None,
+                          method='bulk', chunk_days=30):
+        """
+        Récupère un ensemble de données pour l'entraînement avec résultats connus et données enrichies.
+        course_ids permet de restreindre le chargement à une liste de courses (rafraîchissement incrémental).
+
+        Args:
+            method: 'bulk' pour charger participants et données PMU avec quelques requêtes
+                jointes par tranche de chunk_days jours (par défaut), 'legacy' pour l'ancien
+                chargement course par course (conservé pour comparaison)
+            chunk_days: taille en jours des tranches de dates du chargement groupé
+        """
+        if method not in ('bulk', 'legacy'):
+            raise ValueError(f"Méthode de chargement inconnue: {method}")
+
         # Récupérer les courses terminées qui ont un lien avec pmu_courses
         courses_query = """
         SELECT 
@@ -106,6 +140,10 @@ class EnhancedDataPreparation:
             conditions.append(f"c.date_heure >= '{start_date}'")
         if end_date:
             conditions.append(f"c.date_heure <= '{end_date}'")
+        if course_ids is not None:
+            if len(course_ids) == 0:
+                return pd.DataFrame()
+            conditions.append(f"c.id IN ({', '.join(str(int(cid)) for cid in course_ids)})")
             
         if conditions:
             courses_query += " AND " + " AND ".join(conditions)
@@ -116,12 +154,210 @@ class EnhancedDataPreparation:
             courses_query += f" LIMIT {limit}"
             
         courses_df = pd.read_sql_query(courses_query, self.engine)
+
+        # c.* contient déjà pmu_course_id: ne garder qu'une colonne de chaque nom
+        courses_df = courses_df.loc[:, ~courses_df.columns.duplicated()]
         
         # Vérifier si nous avons trouvé des courses
         if courses_df.empty:
             self.logger.warning("Aucune course trouvée avec les critères spécifiés")
             return pd.DataFrame()
         
+        if method == 'legacy':
+            return self._get_training_participants_legacy(courses_df)
+        return self._get_training_participants_bulk(courses_df, chunk_days)
+
+    def get_upcoming_data(self, start_date=None, end_date=None, course_ids=None, chunk_days=30):
+        """
+        Participants de toutes les courses d'une période (ou de course_ids), avec les
+        infos de course et les données PMU, chargés en quelques requêtes groupées
+        (même assemblage que get_training_data, sans exiger d'ordre d'arrivée).
+        Sert à la prédiction d'une journée entière en un seul lot.
+        """
+        courses_query = """
+        SELECT 
+            c.*, 
+            h.libelleLong AS hippodrome_nom
+        FROM courses c
+        LEFT JOIN pmu_hippodromes h ON c.lieu = h.libelleLong
+        """
+        
+        conditions = []
+        if start_date:
+            conditions.append(f"c.date_heure >= '{start_date}'")
+        if end_date:
+            conditions.append(f"c.date_heure <= '{end_date}'")
+        if course_ids is not None:
+            if len(course_ids) == 0:
+                return pd.DataFrame()
+            conditions.append(f"c.id IN ({', '.join(str(int(cid)) for cid in course_ids)})")
+            
+        if conditions:
+            courses_query += " WHERE " + " AND ".join(conditions)
+            
+        courses_query += " ORDER BY c.date_heure ASC"
+        
+        courses_df = pd.read_sql_query(courses_query, self.engine)
+        courses_df = courses_df.loc[:, ~courses_df.columns.duplicated()]
+        
+        if courses_df.empty:
+            self.logger.info("Aucune course trouvée avec les critères spécifiés")
+            return pd.DataFrame()
+        
+        return self._get_training_participants_bulk(courses_df, chunk_days)
+
+    def iter_training_data(self, start_date=None, end_date=None, races_per_chunk=None, downcast=True,
+                           end_exclusive=False):
+        """
+        Générateur de données d'entraînement par morceaux, avec features avancées.
+
+        Les courses terminées de la période sont découpées par mois (ou par paquets de
+        races_per_chunk courses), dans l'ordre chronologique; chaque morceau est chargé,
+        enrichi puis réduit (float32, entiers compacts) avant d'être produit. La mémoire
+        reste ainsi bornée par la taille d'un morceau et non par la période.
+
+        Les valeurs manquantes ne sont pas complétées: XGBoost les gère nativement.
+        Avec end_exclusive, la période est semi-ouverte [start_date, end_date[, pour
+        découper entraînement et évaluation sans course commune.
+        """
+        query = """
+        SELECT c.id, c.date_heure
+        FROM courses c
+        INNER JOIN pmu_courses pc ON c.pmu_course_id = pc.id
+        WHERE pc.ordreArrivee IS NOT NULL
+        """
+        if start_date:
+            query += f" AND c.date_heure >= '{start_date}'"
+        if end_date:
+            query += f" AND c.date_heure {'<' if end_exclusive else '<='} '{end_date}'"
+        query += " ORDER BY c.date_heure, c.id"
+
+        courses = pd.read_sql_query(query, self.engine)
+        if courses.empty:
+            self.logger.warning("Aucune course trouvée avec les critères spécifiés")
+            return
+
+        if races_per_chunk:
+            chunk_keys = np.arange(len(courses)) // races_per_chunk
+        else:
+            chunk_keys = pd.to_datetime(courses['date_heure']).dt.strftime('%Y-%m').values
+
+        for chunk_key, chunk_courses in courses.groupby(chunk_keys, sort=False):
+            data = self.get_training_data(course_ids=chunk_courses['id'].tolist())
+            if data.empty:
+                continue
+
+            chunk = self.create_enhanced_features(data, point_in_time=True, fill_missing=False)
+            if downcast:
+                chunk = self.downcast_dtypes(chunk)
+
+            self.logger.info(f"Training chunk {chunk_key}: {len(chunk_courses)} courses, {len(chunk)} rows")
+            yield chunk
+
+    def downcast_dtypes(self, df):
+        """Réduit l'empreinte mémoire: float64 -> float32 et entiers au plus petit type possible."""
+        for col in df.select_dtypes(include=['float64']).columns:
+            df[col] = df[col].astype(np.float32)
+        for col in df.select_dtypes(include=['int64']).columns:
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+        return df
+
+    def _get_training_participants_bulk(self, courses_df, chunk_days=30):
+        """
+        Charge les participants des courses et leurs données pmu_participants
+        avec deux requêtes par tranche de dates, puis assemble en pandas.
+        Produit le même DataFrame que le chargement course par course.
+        """
+        courses_df = courses_df.reset_index(drop=True)
+        dates = pd.to_datetime(courses_df['date_heure'])
+        chunk_keys = (dates - dates.min()) // pd.Timedelta(days=chunk_days)
+
+        participants_query = text("""
+        SELECT 
+            p.*,
+            c.nom AS cheval_nom, 
+            c.age, 
+            c.sexe, 
+            j.nom AS jockey_nom
+        FROM participations p
+        JOIN chevaux c ON p.id_cheval = c.id
+        JOIN jockeys j ON p.id_jockey = j.id
+        WHERE p.id_course IN :course_ids
+        """).bindparams(bindparam('course_ids', expanding=True))
+
+        pmu_participants_query = text("""
+        SELECT 
+            id AS pmu_participant_id,
+            id_course AS pmu_course_id,
+            numPmu,
+            musique,
+            handicapPoids,
+            incident,
+            dernierRapportDirect,
+            dernierRapportReference,
+            entraineur
+        FROM pmu_participants
+        WHERE id_course IN :pmu_course_ids
+        """).bindparams(bindparam('pmu_course_ids', expanding=True))
+        pmu_columns = ['musique', 'handicapPoids', 'incident', 'dernierRapportDirect',
+                       'dernierRapportReference', 'entraineur']
+
+        chunks = []
+        for _, chunk_courses in courses_df.groupby(chunk_keys, sort=False):
+            course_ids = [int(cid) for cid in chunk_courses['id']]
+            participants = pd.read_sql_query(participants_query, self.engine,
+                                             params={'course_ids': course_ids})
+            if participants.empty:
+                continue
+
+            # Ordre du chargement course par course: ordre des courses, puis des participations
+            course_order = pd.Series(np.arange(len(chunk_courses)), index=chunk_courses['id'].values)
+            participants['_course_order'] = participants['id_course'].map(course_order)
+            participants = participants.sort_values(['_course_order', 'id'], kind='mergesort')
+
+            # Ajouter les infos de la course
+            course_cols = [col for col in chunk_courses.columns if col not in participants.columns]
+            participants = participants.merge(
+                chunk_courses[['id'] + course_cols].rename(columns={'id': 'id_course'}),
+                on='id_course', how='left', sort=False
+            )
+
+            # Données complémentaires de pmu_participants (une ligne par course PMU et numéro)
+            pmu_course_ids = [int(cid) for cid in chunk_courses['pmu_course_id'].dropna()]
+            pmu_data = pd.read_sql_query(pmu_participants_query, self.engine,
+                                         params={'pmu_course_ids': pmu_course_ids}) if pmu_course_ids else pd.DataFrame()
+
+            if not pmu_data.empty:
+                pmu_data = pmu_data[pmu_data['numPmu'].notna()]
+                pmu_data = pmu_data.sort_values('pmu_participant_id', kind='mergesort')
+                pmu_data = pmu_data.drop_duplicates(['pmu_course_id', 'numPmu'], keep='first')
+                pmu_data = pmu_data.drop(columns=['pmu_participant_id'])
+                pmu_data = pmu_data.rename(columns={col: f'_pmu_{col}' for col in pmu_columns})
+                pmu_data['_pmu_found'] = True
+
+                participants = participants.merge(pmu_data, on=['pmu_course_id', 'numPmu'], how='left', sort=False)
+                matched = participants['_pmu_found'].eq(True)
+
+                # Les colonnes PMU ne sont ajoutées que pour les participants appariés
+                if matched.any():
+                    for col in pmu_columns:
+                        if col in participants.columns:
+                            participants.loc[matched, col] = participants.loc[matched, f'_pmu_{col}']
+                        else:
+                            participants[col] = participants[f'_pmu_{col}'].where(matched)
+                participants = participants.drop(columns=[f'_pmu_{col}' for col in pmu_columns] + ['_pmu_found'])
+
+            chunks.append(participants.drop(columns=['_course_order']))
+
+        if not chunks:
+            return pd.DataFrame()
+
+        training_data = pd.concat(chunks, ignore_index=True)
+        self.logger.info(f"Loaded {len(training_data)} participations for {len(courses_df)} courses")
+        return training_data
+
+    def _get_training_participants_legacy(self, courses_df):
+        """Ancien chargement des participants course par course (une requête par participant)."""
         # Récupérer les participants pour ces courses avec les données enrichies
         # Récupérer les participants pour ces courses avec les données enrichies
         all_participants = []
@@ -204,25 +440,9 @@ class EnhancedDataPreparation:
 
     def _extract_rapport_from_json(self, json_str):
         """Extrait le rapport (cote) à partir d'une chaîne JSON"""
-        if pd.isna(json_str) or not json_str:
-            return None
-        
-        try:
-            # Si c'est déjà un dictionnaire
-            if isinstance(json_str, dict):
-                data = json_str
-            else:
-                # Sinon, tenter de parser le JSON
-                import json
-                data = json.loads(json_str)
-            
-            # Extraire le rapport s'il existe
-            if 'rapport' in data:
-                return float(data['rapport'])
-            
-            return None
-        except:
+        if not isinstance(json_str, dict) and (pd.isna(json_str) or not json_str):
             return None
+        return extract_rapport_value(json_str)
 
     def _calculate_trend(self, performances):
         """Calcule la tendance entre les performances récentes et anciennes"""
@@ -254,38 +474,197 @@ class EnhancedDataPreparation:
 
 
     
-    def create_enhanced_features(self, df):
+    def create_enhanced_features(self, df, method='bulk', point_in_time=False, fill_missing=True):
         """
         Crée des features avancées en exploitant pleinement les données riches disponibles
         dans les tables PMU.
+
+        Args:
+            df: DataFrame des participants
+            method: 'bulk' pour calculer les features historiques avec quelques requêtes
+                groupées sur tout le lot (par défaut), 'legacy' pour l'ancien calcul
+                ligne par ligne (conservé pour comparaison)
+            point_in_time: avec method='bulk', calcule les statistiques père, entraîneur,
+                propriétaire, jockey-cheval et distance uniquement sur les courses
+                antérieures à chaque ligne (sans fuite des résultats futurs). À activer
+                pour l'entraînement: le premier appel charge tout l'historique des
+                participations. Désactivé par défaut pour la prédiction, où les mêmes
+                statistiques sont les totaux à ce jour des seules entités du lot
+                (voir get_latest_stats)
+            fill_missing: complète les valeurs numériques manquantes par la médiane du lot
+                (désactivé par le feature store, qui applique ce remplissage à la lecture)
         """
-        self.logger.info(f"Creating enhanced features for {len(df)} rows")
-        
+        if method not in ('bulk', 'legacy'):
+            raise ValueError(f"Méthode de calcul des features inconnue: {method}")
+
+        self.logger.info(f"Creating enhanced features for {len(df)} rows (method={method})")
+
+        # Les features sont assignées par étiquette d'index: celle-ci doit être unique
+        if not df.index.is_unique:
+            self.logger.warning("Index dupliqué détecté, réinitialisation de l'index")
+            df = df.reset_index(drop=True)
+
+        if method == 'legacy':
+            df = self._create_enhanced_features_legacy(df)
+        else:
+            df = self._create_enhanced_features_bulk(df, point_in_time)
+
+        if fill_missing:
+            df = self.fill_missing_numeric(df)
+
+        self.logger.info(f"Created {len(df.columns)} features for {len(df)} rows")
+        return df
+
+    def fill_missing_numeric(self, df):
+        """Complète les valeurs manquantes des colonnes numériques par leur médiane."""
+        numeric_cols = df.select_dtypes(include=['float64', 'int64']).columns
+        for col in numeric_cols:
+            if df[col].isna().any():
+                df[col].fillna(df[col].median(), inplace=True)
+        return df
+
+    def get_rolling_stats(self, refresh=False):
+        """Retourne les agrégats à date, recalculés s'ils sont absents ou périmés."""
+        if refresh or self.rolling_stats is None or self.rolling_stats.is_stale():
+            self.rolling_stats = RollingStatsAggregator(self.engine).fit()
+        return self.rolling_stats
+
+    def get_latest_stats(self, df):
+        """
+        Totaux à ce jour des entités du lot pour la prédiction, avec les définitions
+        des agrégats à date de l'entraînement (lus dans les tables agg_* si présentes).
+        """
+        if self._aggregates_available is None:
+            self._aggregates_available = self.entity_aggregates.is_available()
+        aggregates = self.entity_aggregates if self._aggregates_available else None
+        return RollingStatsAggregator(self.engine).fit_latest(df, aggregates)
+
+    def _create_enhanced_features_bulk(self, df, point_in_time=True):
+        """
+        Calcule les features avancées avec des requêtes groupées sur l'ensemble du lot
+        (voir BulkFeatureBuilder), puis des jointures et agrégations pandas.
+        Les statistiques par entité proviennent de RollingStatsAggregator: à date pour
+        l'entraînement, à ce jour pour la prédiction.
+        """
+        rolling = self.get_rolling_stats() if point_in_time else self.get_latest_stats(df)
+        builder = BulkFeatureBuilder(self.engine)
+
         # 1. Traitement de la musique (historique des performances)
+        self._add_musique_features(df)
+
+        # 2. Exploitation des données de lignée
+        rolling.add_family(df, 'pere')
+
+        # 3. Utilisation des données d'incidents
+        if 'incident' in df.columns:
+            self._add_incident_flags(df)
+            if 'id_cheval' in df.columns:
+                builder.add_incident_history(df)
+
+        # Historique des participations partagé par les familles 4 et 10
+        if 'id_cheval' in df.columns:
+            history = builder.load_horse_history(df['id_cheval'])
+        else:
+            history = pd.DataFrame()
+
+        # 4. Exploitation des données météorologiques
+        if 'id_course' in df.columns:
+            builder.add_weather_features(df, history, self._encode_meteo)
+
+        # 5. Statistiques des entraîneurs
+        rolling.add_family(df, 'entraineur')
+
+        # 6. Exploitation des données de propriétaires
+        rolling.add_family(df, 'proprietaire')
+
+        # 7. Analyse détaillée des cotes et leur évolution
+        self._add_cote_features(df)
+
+        # 8. Exploitation des données de handicap/poids
+        self._add_handicap_features(df)
+
+        # 9. Utilisation des temps/vitesses antérieurs
+        if 'id_cheval' in df.columns:
+            builder.add_speed_features(df)
+
+        # 10. Caractéristiques spécifiques des courses
+        if 'id_course' in df.columns:
+            builder.add_course_type_features(df, history, self._categorize_prize)
+
+        # 11. Combinaison jockey-cheval (compatibilité)
+        rolling.add_family(df, 'jockey_cheval')
+
+        # 12. Analyse des commentaires de course (si disponibles)
+        if 'id_course' in df.columns and 'id_cheval' in df.columns:
+            builder.add_comment_sentiment(df)
+
+        # 13. Performance sur la distance
+        rolling.add_family(df, 'distance')
+
+        self.logger.info(f"Bulk features computed with {builder.query_count} SQL queries")
+        return df
+
+    def _add_musique_features(self, df):
+        """Statistiques dérivées de la musique (historique des performances)."""
         if 'musique' in df.columns:
-            df['musique_parsed'] = df['musique'].apply(self._parse_musique)
-            
-            # Calculer des statistiques sur la musique
-            df['musique_win_count'] = df['musique_parsed'].apply(
-                lambda x: sum(1 for perf in x if perf == 1)
-            )
-            df['musique_place_count'] = df['musique_parsed'].apply(
-                lambda x: sum(1 for perf in x if 1 <= perf <= 3)
-            )
-            df['musique_disqualified'] = df['musique_parsed'].apply(
-                lambda x: 'a' in str(x).lower() or 'd' in str(x).lower()
+            # Toute la colonne est tokenisée en une seule passe (noyau vectorisé partagé)
+            features = compute_musique_features(df['musique'])
+            for col in features.columns:
+                df[col] = features[col]
+
+    def _add_incident_flags(self, df):
+        """Indicateurs binaires d'incident et de type d'incident."""
+        # Convertir en variable binaire
+        df['had_incident'] = df['incident'].notna() & (df['incident'] != '')
+        df['had_incident'] = df['had_incident'].astype(int)
+
+        # Catégoriser les types d'incidents
+        incident_types = ['disqualifie', 'arrete', 'tombe', 'refuse', 'gene']
+        for inc_type in incident_types:
+            df[f'incident_{inc_type}'] = df['incident'].str.contains(
+                inc_type, case=False, na=False
             ).astype(int)
-            
-            # Extraire la tendance récente (3 dernières performances)
-            df['recent_trend'] = df['musique_parsed'].apply(
-                lambda x: sum(x[:3]) / len(x[:3]) if len(x) >= 3 and all(isinstance(p, int) and p > 0 for p in x[:3]) else None
-            )
-            
-            # Régularité (écart-type des performances)
-            df['performance_consistency'] = df['musique_parsed'].apply(
-                lambda x: np.std([p for p in x if isinstance(p, int) and p > 0]) if len([p for p in x if isinstance(p, int) and p > 0]) >= 3 else None
+
+    def _add_cote_features(self, df):
+        """Cotes finale/initiale, variation, soutien du marché et rang de favori."""
+        if 'dernierRapportDirect' in df.columns and 'dernierRapportReference' in df.columns:
+            # Extraire les cotes des colonnes JSON en une passe par colonne
+            df['cote_finale'] = extract_rapport(df['dernierRapportDirect'])
+            df['cote_initiale'] = extract_rapport(df['dernierRapportReference'])
+
+            # Calculer la variation des cotes
+            df['cote_variation_pct'] = compute_cote_variation(df['cote_finale'], df['cote_initiale'])
+
+            # Identifier les chevaux dont la cote a significativement baissé (soutenus par le marché)
+            df['market_support'] = (df['cote_variation_pct'] < -10).astype(int)
+
+            # Normaliser les cotes par rapport à la course
+            course_mean = df.groupby('id_course')['cote_finale'].transform('mean')
+            df['cote_finale_normalized'] = (df['cote_finale'] / course_mean).where(course_mean > 0, 1)
+
+            # Rang de favoris basé sur les cotes finales
+            df['favorite_rank'] = df.groupby('id_course')['cote_finale'].rank(method='min')
+
+    def _add_handicap_features(self, df):
+        """Poids normalisé dans la course et ratio poids/âge."""
+        if 'handicapPoids' in df.columns:
+            # Normalisation du poids dans chaque course
+            df['poids_norm_course'] = df.groupby('id_course')['handicapPoids'].transform(
+                lambda x: (x - x.mean()) / x.std() if x.std() > 0 else 0
             )
-        
+
+            # Ratio poids/âge
+            if 'age' in df.columns:
+                df['poids_age_ratio'] = df['handicapPoids'] / df['age']
+
+    def _create_enhanced_features_legacy(self, df):
+        """
+        Ancien calcul des features avancées, avec une requête SQL par ligne.
+        Conservé pour comparer les résultats avec le calcul groupé.
+        """
+        # 1. Traitement de la musique (historique des performances)
+        self._add_musique_features(df)
+
         # 2. Exploitation des données de lignée
         parent_stats = {}
         for index, row in df.iterrows():
@@ -319,17 +698,8 @@ class EnhancedDataPreparation:
                 
         # 3. Utilisation des données d'incidents
         if 'incident' in df.columns:
-            # Convertir en variable binaire
-            df['had_incident'] = df['incident'].notna() & (df['incident'] != '')
-            df['had_incident'] = df['had_incident'].astype(int)
-            
-            # Catégoriser les types d'incidents
-            incident_types = ['disqualifie', 'arrete', 'tombe', 'refuse', 'gene']
-            for inc_type in incident_types:
-                df[f'incident_{inc_type}'] = df['incident'].str.contains(
-                    inc_type, case=False, na=False
-                ).astype(int)
-                
+            self._add_incident_flags(df)
+
             # Historique d'incidents
             for index, row in df.iterrows():
                 if 'id_cheval' in df.columns:
@@ -337,7 +707,7 @@ class EnhancedDataPreparation:
                     query = f"""
                     SELECT COUNT(*) as incident_count
                     FROM pmu_participants
-                    WHERE id_cheval = {row['id_cheval']} AND incident IS NOT NULL AND incident != ''
+                    WHERE cheval_id = {row['id_cheval']} AND incident IS NOT NULL AND incident != ''
                     """
                     incident_history = pd.read_sql_query(query, self.engine)
                     if not incident_history.empty:
@@ -387,7 +757,7 @@ class EnhancedDataPreparation:
                 entraineur = row['entraineur']
                 if pd.notna(entraineur) and entraineur not in entraineur_stats:
                     query = f"""
-                    SELECT p.position
+                    SELECT p.ordreArrivee AS position
                     FROM pmu_participants p
                     WHERE p.entraineur = '{entraineur}'
                     """
@@ -436,41 +806,11 @@ class EnhancedDataPreparation:
                     df.at[index, 'proprietaire_place_rate'] = proprietaire_stats[proprietaire]['place_rate']
         
         # 7. Analyse détaillée des cotes et leur évolution
-        if 'dernierRapportDirect' in df.columns and 'dernierRapportReference' in df.columns:
-            # Extraire les cotes des données JSON
-            df['cote_finale'] = df['dernierRapportDirect'].apply(self._extract_cote)
-            df['cote_initiale'] = df['dernierRapportReference'].apply(self._extract_cote)
-            
-            # Calculer la variation des cotes
-            df['cote_variation_pct'] = df.apply(
-                lambda row: ((row['cote_finale'] - row['cote_initiale']) / row['cote_initiale'] * 100) 
-                if pd.notna(row['cote_finale']) and pd.notna(row['cote_initiale']) and row['cote_initiale'] > 0 
-                else 0,
-                axis=1
-            )
-            
-            # Identifier les chevaux dont la cote a significativement baissé (soutenus par le marché)
-            df['market_support'] = (df['cote_variation_pct'] < -10).astype(int)
-            
-            # Normaliser les cotes par rapport à la course
-            df['cote_finale_normalized'] = df.groupby('id_course')['cote_finale'].transform(
-                lambda x: x / x.mean() if x.mean() > 0 else 1
-            )
-            
-            # Rang de favoris basé sur les cotes finales
-            df['favorite_rank'] = df.groupby('id_course')['cote_finale'].rank(method='min')
-        
+        self._add_cote_features(df)
+
         # 8. Exploitation des données de handicap/poids
-        if 'handicapPoids' in df.columns:
-            # Normalisation du poids dans chaque course
-            df['poids_norm_course'] = df.groupby('id_course')['handicapPoids'].transform(
-                lambda x: (x - x.mean()) / x.std() if x.std() > 0 else 0
-            )
-            
-            # Ratio poids/âge
-            if 'age' in df.columns:
-                df['poids_age_ratio'] = df['handicapPoids'] / df['age']
-        
+        self._add_handicap_features(df)
+
         # 9. Utilisation des temps/vitesses antérieurs
         if 'id_cheval' in df.columns:
             for index, row in df.iterrows():
@@ -607,14 +947,7 @@ class EnhancedDataPreparation:
                     df.at[index, 'distance_place_rate'] = (similar_distance_perf['position'] <= 3).mean() * 100
                     df.at[index, 'distance_avg_position'] = similar_distance_perf['position'].mean()
                     df.at[index, 'distance_perf_count'] = len(similar_distance_perf)
-        
-        # Compléter les valeurs manquantes pour les colonnes numériques
-        numeric_cols = df.select_dtypes(include=['float64', 'int64']).columns
-        for col in numeric_cols:
-            if df[col].isna().any():
-                df[col].fillna(df[col].median(), inplace=True)
-        
-        self.logger.info(f"Created {len(df.columns)} features for {len(df)} rows")
+
         return df
 
     def _parse_musique(self, musique_str):
@@ -626,56 +959,23 @@ class EnhancedDataPreparation:
         - 'D'/'d' (disqualifié) = 0
         - 'T'/'t' (tombé) = 0
         - Autres lettres = 0
+
+        Pour une colonne entière, utiliser parse_musique_matrix directement.
         """
         if pd.isna(musique_str) or not musique_str:
             return []
-        
-        # Expression régulière pour extraire les performances
-        import re
-        
-        # Séparation par les parenthèses pour gérer l'année
-        parts = re.split(r'[\(\)]', musique_str)
-        performances_str = ''.join(parts)
-        
-        # Extraire toutes les performances (chiffres suivis potentiellement de lettres)
-        performances = re.findall(r'(\d+[a-zA-Z]*|[a-zA-Z]+)', performances_str)
-        
-        # Convertir en valeurs numériques
-        numeric_values = []
-        for perf in performances:
-            if perf[0].isdigit():
-                # Extraire la position numérique
-                position = int(''.join(filter(str.isdigit, perf)))
-                numeric_values.append(position)
-            else:
-                # Pour les non-finishes (disqualifié, arrêté, etc.)
-                numeric_values.append(0)
-        
-        return numeric_values
+
+        matrix = parse_musique_matrix([musique_str])
+        return matrix.positions[0, matrix.valid[0]].tolist()
 
     def _extract_cote(self, cote_json):
         """
         Extrait la cote (rapport) d'une chaîne JSON.
+        Pour une colonne entière, utiliser extract_rapport.
         """
-        if pd.isna(cote_json) or not cote_json:
-            return None
-        
-        try:
-            import json
-            
-            # Si c'est une chaîne, convertir en dictionnaire
-            if isinstance(cote_json, str):
-                cote_dict = json.loads(cote_json)
-            else:
-                cote_dict = cote_json
-            
-            # Extraire le rapport s'il existe
-            if 'rapport' in cote_dict:
-                return float(cote_dict['rapport'])
-            
-            return None
-        except:
+        if not isinstance(cote_json, dict) and (pd.isna(cote_json) or not cote_json):
             return None
+        return extract_rapport_value(cote_json)
 
     def _encode_meteo(self, meteo_str):
         """
@@ -839,7 +1139,7 @@ class EnhancedDataPreparation:
         
         return prepared_data
 
-    def select_enhanced_features(self, df, target_col='target', exclude_cols=None, top_n=25):
+    def select_enhanced_features(self, df, target_col='target', exclude_cols=None, top_n=25, use_gain=False):
         """
         Sélectionne les features les plus pertinentes pour la modélisation
         en utilisant une combinaison de filtrage et d'importance.
@@ -849,6 +1149,8 @@ class EnhancedDataPreparation:
             target_col: Colonne cible
             exclude_cols: Colonnes à exclure explicitement
             top_n: Nombre de features à sélectionner
+            use_gain: Combiner les corrélations avec les importances "gain"
+                d'un petit modèle XGBoost (voir feature_selection.score_features)
             
         Returns:
             Liste des colonnes sélectionnées
@@ -887,26 +1189,9 @@ class EnhancedDataPreparation:
         
         # 2. Si target_col existe, calculer l'importance statistique (corrélation)
         if target_col in df.columns:
-            importance_dict = {}
-            target = df[target_col]
-            
-            for feature in all_features:
-                if feature in df.columns:
-                    # Pour les features numériques, utiliser la corrélation
-                    if pd.api.types.is_numeric_dtype(df[feature]):
-                        correlation = abs(df[feature].corr(target))
-                        importance_dict[feature] = correlation if not pd.isna(correlation) else 0
-                    # Pour les features catégorielles, utiliser l'analyse de variance
-                    else:
-                        # Calculer l'association par groupe
-                        group_means = df.groupby(feature)[target_col].mean()
-                        overall_mean = df[target_col].mean()
-                        group_counts = df.groupby(feature)[target_col].count()
-                        
-                        # Calcul simple de l'importance basé sur l'écart des moyennes pondéré par les effectifs
-                        importance = sum(abs(group_mean - overall_mean) * count 
-                                        for group_mean, count in zip(group_means, group_counts)) / len(df)
-                        importance_dict[feature] = importance
+            # Corrélations et écarts par modalité calculés en une passe vectorisée
+            scores = score_features(df, sorted(all_features), df[target_col], use_gain=use_gain)
+            importance_dict = scores.to_dict()
             
             # Trier par importance décroissante et prendre les top_n
             sorted_features = sorted(importance_dict.items(), key=lambda x: x[1], reverse=True)
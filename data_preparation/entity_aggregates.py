@@ -0,0 +1,299 @@
+# data_preparation/entity_aggregates.py
+import logging
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import Column, DateTime, Float, Integer, MetaData, String, Table, bindparam, inspect, text
+
+# Colonnes additives maintenues par entité
+AGG_COLUMNS = ['nb_courses', 'nb_victoires', 'nb_places', 'somme_positions', 'nb_positions']
+
+AGG_METADATA = MetaData()
+
+
+def _aggregate_table(name, key):
+    return Table(
+        name, AGG_METADATA,
+        Column(key, String(100), primary_key=True),
+        Column('nb_courses', Integer, nullable=False, default=0),
+        Column('nb_victoires', Integer, nullable=False, default=0),
+        Column('nb_places', Integer, nullable=False, default=0),
+        Column('somme_positions', Float, nullable=False, default=0),
+        Column('nb_positions', Integer, nullable=False, default=0),
+        Column('updated_at', DateTime, nullable=True)
+    )
+
+
+# Participations sources des agrégats: mêmes jointures que RollingStatsAggregator
+# (entraîneur relevé sur le participant PMU de même numéro dans la même course)
+PARTICIPATIONS_SOURCE = (
+    "participations p"
+    " JOIN courses c ON p.id_course = c.id"
+    " LEFT JOIN chevaux ch ON p.id_cheval = ch.id"
+    " LEFT JOIN pmu_participants pp ON pp.id_course = c.pmu_course_id AND pp.numPmu = p.numPmu"
+)
+
+# Seules les courses datées dont l'arrivée est connue comptent dans les agrégats
+FINISHED_COURSE_FILTER = (
+    "c.date_heure IS NOT NULL AND EXISTS "
+    "(SELECT 1 FROM participations r WHERE r.id_course = p.id_course AND r.position IS NOT NULL)"
+)
+
+# Filtres par course des instantanés: identifiants de la table courses ou de pmu_courses
+COURSE_FILTERS = {
+    'course_ids': 'p.id_course IN :course_ids',
+    'pmu_course_ids': 'c.pmu_course_id IN :pmu_course_ids'
+}
+
+# Familles agrégées: table, clé et expression de la clé dans PARTICIPATIONS_SOURCE
+AGGREGATE_FAMILIES = {
+    'sire': {
+        'table': _aggregate_table('agg_sire', 'nomPere'),
+        'key': 'nomPere',
+        'key_expr': 'ch.nomPere'
+    },
+    'trainer': {
+        'table': _aggregate_table('agg_trainer', 'entraineur'),
+        'key': 'entraineur',
+        'key_expr': 'pp.entraineur'
+    },
+    'owner': {
+        'table': _aggregate_table('agg_owner', 'proprietaire'),
+        'key': 'proprietaire',
+        'key_expr': 'ch.proprietaire'
+    }
+}
+
+
+def arrival_positions(ordre_arrivee):
+    """
+    Positions par numéro PMU à partir d'un ordre d'arrivée.
+
+    L'API PMU renvoie une liste de groupes ([[4], [7], [1, 12]]: ex aequo dans un
+    même groupe) ou une liste plate; les numéros peuvent être des chaînes.
+
+    Returns:
+        dict {numPmu (int): position}
+    """
+    positions = {}
+    for position, group in enumerate(ordre_arrivee or [], start=1):
+        for horse_num in (group if isinstance(group, (list, tuple)) else [group]):
+            try:
+                positions[int(horse_num)] = position
+            except (TypeError, ValueError):
+                continue
+    return positions
+
+
+class EntityAggregates:
+    """
+    Tables d'agrégats par père (agg_sire), entraîneur (agg_trainer) et
+    propriétaire (agg_owner): nombre de courses, victoires, places et positions.
+    Les définitions sont celles de RollingStatsAggregator (courses datées dont
+    l'arrivée est connue, position de la participation): les valeurs lues
+    sont les totaux à ce jour des agrégats à date de l'entraînement.
+
+    Les tables sont tenues à jour à l'ingestion par des deltas: les contributions
+    des courses écrites sont relevées avant et après l'écriture (snapshot), puis
+    leur différence est ajoutée par upsert (record_change), dans la transaction
+    de l'ingestion. La construction des features se réduit ainsi à une lecture
+    par clé primaire. rebuild() les recalcule entièrement depuis les
+    participations; verify() compare sans écrire.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.logger = logging.getLogger(__name__)
+        self._tables_ready = False
+
+    # ------------------------------------------------------------------
+    # Schéma
+    # ------------------------------------------------------------------
+
+    def ensure_tables(self):
+        """Crée les tables d'agrégats si elles n'existent pas."""
+        if not self._tables_ready:
+            AGG_METADATA.create_all(self.engine, checkfirst=True)
+            self._tables_ready = True
+
+    def is_available(self):
+        """Indique si les tables d'agrégats existent dans la base."""
+        try:
+            inspector = inspect(self.engine)
+            return all(inspector.has_table(spec['table'].name) for spec in AGGREGATE_FAMILIES.values())
+        except Exception as e:
+            self.logger.warning(f"Impossible de vérifier les tables d'agrégats: {str(e)}")
+            return False
+
+    # ------------------------------------------------------------------
+    # Mise à jour incrémentale
+    # ------------------------------------------------------------------
+
+    def _upsert_sql(self, dialect, family):
+        spec = AGGREGATE_FAMILIES[family]
+        table, key = spec['table'].name, spec['key']
+        columns = ', '.join([key] + AGG_COLUMNS + ['updated_at'])
+        values = ', '.join(f':{col}' for col in ['key'] + AGG_COLUMNS + ['updated_at'])
+
+        if dialect == 'mysql':
+            updates = ', '.join(f"{col} = {col} + VALUES({col})" for col in AGG_COLUMNS)
+            return (f"INSERT INTO {table} ({columns}) VALUES ({values}) "
+                    f"ON DUPLICATE KEY UPDATE {updates}, updated_at = VALUES(updated_at)")
+
+        updates = ', '.join(f"{col} = {table}.{col} + excluded.{col}" for col in AGG_COLUMNS)
+        return (f"INSERT INTO {table} ({columns}) VALUES ({values}) "
+                f"ON CONFLICT ({key}) DO UPDATE SET {updates}, updated_at = excluded.updated_at")
+
+    def apply_delta(self, connection, family, key, delta):
+        """Ajoute delta (liste alignée sur AGG_COLUMNS) aux agrégats de l'entité key."""
+        if key is None or (isinstance(key, float) and pd.isna(key)) or key == '':
+            return
+        if not any(delta):
+            return
+        params = dict(zip(AGG_COLUMNS, delta))
+        params['key'] = key
+        params['updated_at'] = datetime.now()
+        connection.execute(text(self._upsert_sql(self.engine.dialect.name, family)), params)
+
+    def snapshot(self, connection, course_ids=None, pmu_course_ids=None):
+        """
+        Contributions actuelles de quelques courses aux agrégats.
+
+        À relever avant puis après les écritures d'une ingestion, dans la même
+        transaction (les écritures de la session doivent être flushées).
+
+        Args:
+            connection: Connection ou Session de l'ingestion
+            course_ids: identifiants de la table courses
+            pmu_course_ids: identifiants de pmu_courses (courses.pmu_course_id)
+
+        Returns:
+            dict famille -> {clé: valeurs alignées sur AGG_COLUMNS}
+        """
+        params = {name: list(ids) for name, ids in
+                  (('course_ids', course_ids), ('pmu_course_ids', pmu_course_ids)) if ids}
+        if not params:
+            return {}
+        course_filter = ' OR '.join(COURSE_FILTERS[name] for name in params)
+
+        contributions = {}
+        for family in AGGREGATE_FAMILIES:
+            statement = text(self._source_query(family, f" AND ({course_filter})")).bindparams(
+                *[bindparam(name, expanding=True) for name in params]
+            )
+            contributions[family] = {
+                row[0]: [value or 0 for value in row[1:]]
+                for row in connection.execute(statement, params)
+            }
+        return contributions
+
+    def record_change(self, connection, before, after):
+        """
+        Applique la différence entre deux instantanés (snapshot) des mêmes courses.
+
+        Les entités sont mises à jour dans l'ordre des clés, pour que deux
+        ingestions concurrentes verrouillent les lignes dans le même ordre.
+        """
+        zero = [0] * len(AGG_COLUMNS)
+        for family in AGGREGATE_FAMILIES:
+            old, new = before.get(family, {}), after.get(family, {})
+            for key in sorted(set(old) | set(new)):
+                delta = [n - o for n, o in zip(new.get(key, zero), old.get(key, zero))]
+                self.apply_delta(connection, family, key, delta)
+
+    # ------------------------------------------------------------------
+    # Reconstruction et vérification
+    # ------------------------------------------------------------------
+
+    def _source_query(self, family, extra_filter=''):
+        spec = AGGREGATE_FAMILIES[family]
+        query = f"""
+        SELECT
+            {spec['key_expr']} AS {spec['key']},
+            COUNT(*) AS nb_courses,
+            SUM(CASE WHEN p.position = 1 THEN 1 ELSE 0 END) AS nb_victoires,
+            SUM(CASE WHEN p.position <= 3 THEN 1 ELSE 0 END) AS nb_places,
+            COALESCE(SUM(p.position), 0) AS somme_positions,
+            COUNT(p.position) AS nb_positions
+        FROM {PARTICIPATIONS_SOURCE}
+        WHERE {spec['key_expr']} IS NOT NULL AND {spec['key_expr']} != ''
+        AND {FINISHED_COURSE_FILTER}{extra_filter}
+        GROUP BY {spec['key_expr']}
+        """
+        return query
+
+    def read(self, family, keys, chunk_size=1000):
+        """
+        Lecture par clé primaire des agrégats d'un lot d'entités.
+
+        Returns:
+            DataFrame indexé par clé, colonnes AGG_COLUMNS
+        """
+        spec = AGGREGATE_FAMILIES[family]
+        keys = sorted({key for key in keys if isinstance(key, str) and key})
+        statement = text(
+            f"SELECT {spec['key']}, {', '.join(AGG_COLUMNS)} FROM {spec['table'].name} "
+            f"WHERE {spec['key']} IN :keys"
+        ).bindparams(bindparam('keys', expanding=True))
+
+        frames = [
+            pd.read_sql_query(statement, self.engine, params={'keys': keys[start:start + chunk_size]})
+            for start in range(0, len(keys), chunk_size)
+        ]
+        if not frames:
+            return pd.DataFrame(columns=AGG_COLUMNS, index=pd.Index([], name=spec['key']))
+        return pd.concat(frames, ignore_index=True).set_index(spec['key'])[AGG_COLUMNS]
+
+    def rebuild(self, families=None):
+        """
+        Recalcule entièrement les tables d'agrégats depuis les participations.
+
+        Returns:
+            Nombre d'entités par table reconstruite
+        """
+        self.ensure_tables()
+        counts = {}
+        for family in families or AGGREGATE_FAMILIES:
+            spec = AGGREGATE_FAMILIES[family]
+            table = spec['table'].name
+            columns = ', '.join([spec['key']] + AGG_COLUMNS + ['updated_at'])
+            with self.engine.begin() as connection:
+                connection.execute(text(f"DELETE FROM {table}"))
+                connection.execute(
+                    text(f"INSERT INTO {table} ({columns}) "
+                         f"SELECT agg.*, :updated_at FROM ({self._source_query(family)}) agg"),
+                    {'updated_at': datetime.now()}
+                )
+                counts[table] = connection.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+            self.logger.info(f"Table {table} reconstruite: {counts[table]} entités")
+        return counts
+
+    def verify(self, families=None):
+        """
+        Compare les tables d'agrégats à un recalcul complet, sans rien écrire.
+
+        Returns:
+            Nombre d'entités divergentes par table
+        """
+        mismatches = {}
+        for family in families or AGGREGATE_FAMILIES:
+            spec = AGGREGATE_FAMILIES[family]
+            key = spec['key']
+            expected = pd.read_sql_query(self._source_query(family), self.engine).set_index(key)
+            stored = pd.read_sql_query(
+                f"SELECT {key}, {', '.join(AGG_COLUMNS)} FROM {spec['table'].name}", self.engine
+            ).set_index(key)
+
+            # Les entités dont toutes les contributions ont été retirées valent zéro
+            stored = stored[(stored[AGG_COLUMNS] != 0).any(axis=1)]
+            index = expected.index.union(stored.index)
+            expected = expected.reindex(index, fill_value=0)[AGG_COLUMNS].astype(float)
+            stored = stored.reindex(index, fill_value=0)[AGG_COLUMNS].astype(float)
+            diff = ((expected - stored).abs() > 1e-6).any(axis=1)
+            mismatches[spec['table'].name] = int(diff.sum())
+            if diff.any():
+                self.logger.warning(
+                    f"{int(diff.sum())} entités divergentes dans {spec['table'].name}: "
+                    f"{list(index[diff][:5])}"
+                )
+        return mismatches
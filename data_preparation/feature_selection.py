@@ -0,0 +1,191 @@
+# data_preparation/feature_selection.py
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Modèle sonde (importances "gain" XGBoost): échantillon et nombre d'arbres
+PROBE_SAMPLE_SIZE = 20000
+PROBE_ROUNDS = 50
+
+
+def correlation_scores(df, feature_cols, target):
+    """
+    |corrélation de Pearson| de chaque feature numérique avec la cible, calculée
+    pour toutes les colonnes à la fois.
+
+    Les colonnes sont centrées en float32 et la cible réduite, puis un seul
+    produit matriciel contre [1, y, y²] donne les sommes de chaque colonne; pour
+    les colonnes incomplètes, le masque de présence corrige ces sommes afin de
+    reproduire df[col].corr(target) (observations complètes par paire).
+
+    Returns:
+        Series de scores (0 pour une colonne constante ou vide)
+    """
+    feature_cols = list(feature_cols)
+    if not feature_cols:
+        return pd.Series(dtype=np.float64)
+
+    y = np.asarray(target, dtype=np.float64)
+    rows = ~np.isnan(y)
+    rows = slice(None) if rows.all() else rows
+    y = y[rows]
+
+    # Matrice remplie colonne par colonne (ordre Fortran): évite la conversion
+    # d'un bloc de types mixtes par DataFrame.to_numpy
+    X = np.empty((len(y), len(feature_cols)), dtype=np.float32, order='F')
+    for i, col in enumerate(feature_cols):
+        X[:, i] = df[col].to_numpy(dtype=np.float32, na_value=np.nan)[rows]
+    y = ((y - y.mean()) / (y.std() or 1.0)).astype(np.float32)
+
+    # Centrage sur les valeurs renseignées: les valeurs manquantes valent alors
+    # -moyenne, leur contribution est retirée des sommes ci-dessous
+    present = ~np.isnan(X)
+    X[~present] = 0
+    n = present.sum(axis=0).astype(np.float64)
+    mean = X.sum(axis=0, dtype=np.float64) / np.maximum(n, 1)
+    X -= mean.astype(np.float32)
+
+    Y = np.column_stack([np.ones_like(y), y, y * y])
+    sums = (X.T @ Y).astype(np.float64)                  # Σx, Σxy, Σxy² sur toutes les lignes
+    sum_xx = np.einsum('ij,ij->j', X, X, dtype=np.float64)
+    counts = np.tile(Y.sum(axis=0, dtype=np.float64), (len(feature_cols), 1))
+    partial = np.flatnonzero(n < len(y))
+    if len(partial):
+        # n, Σy, Σy² sur les lignes renseignées, pour les seules colonnes incomplètes
+        counts[partial] = present[:, partial].T.astype(np.float32) @ Y
+        sums[partial] += mean[partial, None] * (Y.sum(axis=0, dtype=np.float64) - counts[partial])
+        sum_xx[partial] -= (len(y) - n[partial]) * mean[partial] ** 2
+
+    sx, sxy = sums[:, 0], sums[:, 1]
+    sy, syy = counts[:, 1], counts[:, 2]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        corr = (n * sxy - sx * sy) / np.sqrt((n * sum_xx - sx ** 2) * (n * syy - sy ** 2))
+    return pd.Series(np.nan_to_num(np.abs(corr)), index=feature_cols)
+
+
+def categorical_scores(df, feature_cols, target):
+    """
+    Écart des moyennes de la cible par modalité, pondéré par les effectifs
+    (somme |moyenne(modalité) - moyenne globale| * effectif / nombre de lignes,
+    cible manquante comprise),
+    pour toutes les colonnes catégorielles en une seule agrégation: les modalités
+    de chaque colonne sont numérotées puis décalées pour ne former qu'une clé.
+
+    Returns:
+        Series de scores
+    """
+    feature_cols = list(feature_cols)
+    if not feature_cols:
+        return pd.Series(dtype=np.float64)
+
+    y = np.asarray(target, dtype=np.float64)
+    rows = ~np.isnan(y)
+    y = y[rows]
+
+    codes, offsets, total = [], [], 0
+    for col in feature_cols:
+        col_codes, uniques = pd.factorize(df[col].to_numpy()[rows])
+        codes.append(np.where(col_codes >= 0, col_codes + total, -1))
+        offsets.append(total)
+        total += len(uniques)
+
+    keys = np.concatenate(codes)
+    values = np.tile(y, len(feature_cols))
+    valid = keys >= 0
+    counts = np.bincount(keys[valid], minlength=total)
+    sums = np.bincount(keys[valid], weights=values[valid], minlength=total)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        deviation = np.nan_to_num(np.abs(sums / counts - y.mean())) * counts
+    owner = np.repeat(np.arange(len(feature_cols)), np.diff(offsets + [total]))
+    scores = np.bincount(owner, weights=deviation, minlength=len(feature_cols)) / max(len(rows), 1)
+    return pd.Series(scores, index=feature_cols)
+
+
+def gain_importances(df, feature_cols, target, sample_size=PROBE_SAMPLE_SIZE, n_estimators=PROBE_ROUNDS,
+                     random_state=42):
+    """
+    Importances "gain" d'un petit modèle XGBoost entraîné sur un échantillon
+    (classifieur pour une cible binaire, régression sinon), normalisées à 1.
+
+    Returns:
+        Series d'importances (0 pour les features jamais utilisées)
+    """
+    from xgboost import XGBClassifier, XGBRegressor
+
+    feature_cols = list(feature_cols)
+    y = pd.Series(np.asarray(target, dtype=np.float64), index=df.index)
+    data = df.loc[y.notna(), feature_cols]
+    y = y[y.notna()]
+    if len(data) > sample_size:
+        data = data.sample(n=sample_size, random_state=random_state)
+        y = y.loc[data.index]
+
+    X = pd.DataFrame(index=data.index)
+    for col in feature_cols:
+        if pd.api.types.is_numeric_dtype(data[col]):
+            X[col] = data[col].astype(np.float32)
+        else:
+            X[col] = data[col].astype(str).where(data[col].notna()).astype('category')
+
+    params = dict(n_estimators=n_estimators, max_depth=6, learning_rate=0.1, subsample=0.8,
+                  tree_method='hist', enable_categorical=True, random_state=random_state)
+    binary = set(np.unique(y)) <= {0.0, 1.0}
+    probe = XGBClassifier(**params) if binary else XGBRegressor(**params)
+    probe.fit(X, y.astype(int) if binary else y)
+
+    gains = pd.Series(probe.get_booster().get_score(importance_type='gain'), dtype=np.float64)
+    gains = gains.reindex(feature_cols).fillna(0.0)
+    return gains / gains.sum() if gains.sum() > 0 else gains
+
+
+def score_features(df, feature_cols, target, use_gain=False, **probe_kwargs):
+    """
+    Score de pertinence de chaque feature: corrélation pour les numériques,
+    écart des moyennes par modalité pour les catégorielles; avec use_gain, la
+    moyenne des rangs de ce score et des importances du modèle sonde.
+
+    Returns:
+        Series de scores triée par ordre décroissant
+    """
+    feature_cols = [col for col in dict.fromkeys(feature_cols) if col in df.columns]
+    numeric = [col for col in feature_cols if pd.api.types.is_numeric_dtype(df[col])]
+    categorical = [col for col in feature_cols if col not in numeric]
+
+    scores = pd.concat([correlation_scores(df, numeric, target),
+                        categorical_scores(df, categorical, target)]).reindex(feature_cols)
+    if use_gain and feature_cols:
+        gains = gain_importances(df, feature_cols, target, **probe_kwargs)
+        scores = (scores.rank(pct=True) + gains.rank(pct=True)) / 2
+    return scores.sort_values(ascending=False, kind='mergesort')
+
+
+def scores_cache_key(df, feature_cols, target_col, use_gain=False):
+    """
+    Clé des scores de score_features: cible, liste des features, use_gain et
+    empreinte des données (valeurs de la cible, sommes des colonnes). Des scores
+    ne sont réutilisés que pour des entrées identiques.
+    """
+    feature_cols = list(feature_cols)
+    digest = hashlib.sha1()
+    digest.update(np.ascontiguousarray(df[target_col].to_numpy(dtype=np.float64, na_value=np.nan)).tobytes())
+    sums = df[feature_cols].sum(numeric_only=True).reindex(feature_cols)
+    digest.update(np.ascontiguousarray(sums.to_numpy(dtype=np.float64, na_value=np.nan)).tobytes())
+    return (target_col, tuple(feature_cols), bool(use_gain), len(df), digest.hexdigest())
+
+
+def save_selected_features(path, features, scores=None, **metadata):
+    """Écrit la liste de features retenue (et leurs scores) à côté du modèle."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    payload = {
+        'features': list(features),
+        'scores': {} if scores is None else {k: float(v) for k, v in scores.items() if k in set(features)},
+        **metadata
+    }
+    with open(path, 'w') as f:
+        json.dump(payload, f, indent=4)
+    return path
+
@@ -0,0 +1,290 @@
+# data_preparation/feature_store.py
+import json
+import logging
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from data_preparation.enhanced_data_prep import FEATURE_VERSION
+
+# Répertoire par défaut du feature store
+DEFAULT_STORE_PATH = 'data/feature_store'
+
+# Colonnes intermédiaires non persistées
+EXCLUDED_COLUMNS = ['musique_parsed']
+
+try:
+    import pyarrow  # noqa: F401
+    STORAGE_FORMAT = 'parquet'
+except ImportError:
+    STORAGE_FORMAT = 'pickle'
+
+
+class FeatureStore:
+    """
+    Feature store persistant: une ligne par participation (id_course, id_cheval)
+    avec les features produites par create_enhanced_features.
+
+    Les données sont partitionnées par mois dans des fichiers Parquet. Un manifeste
+    conserve la version des features et une signature par course (participants,
+    résultats, données PMU et cotes); seules les courses nouvelles ou modifiées depuis le dernier
+    rafraîchissement sont recalculées. Un changement de FEATURE_VERSION déclenche
+    une reconstruction complète.
+    """
+
+    def __init__(self, data_prep, store_path=DEFAULT_STORE_PATH, feature_version=FEATURE_VERSION):
+        self.data_prep = data_prep
+        self.engine = data_prep.engine
+        self.store_path = store_path
+        self.feature_version = feature_version
+        self.logger = logging.getLogger(__name__)
+
+        os.makedirs(self.store_path, exist_ok=True)
+        self.manifest_path = os.path.join(self.store_path, 'manifest.json')
+
+    # ------------------------------------------------------------------
+    # Manifeste et partitions
+    # ------------------------------------------------------------------
+
+    def _load_manifest(self):
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, 'r') as f:
+                    return json.load(f)
+            except Exception as e:
+                self.logger.error(f"Erreur lors de la lecture du manifeste: {str(e)}")
+        return {'feature_version': None, 'courses': {}}
+
+    def _save_manifest(self, manifest):
+        manifest['updated_at'] = datetime.now().isoformat()
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _partition_path(self, month):
+        extension = 'parquet' if STORAGE_FORMAT == 'parquet' else 'pkl'
+        return os.path.join(self.store_path, f'features_{month}.{extension}')
+
+    def _read_partition(self, month):
+        path = self._partition_path(month)
+        if not os.path.exists(path):
+            return pd.DataFrame()
+        if STORAGE_FORMAT == 'parquet':
+            return pd.read_parquet(path)
+        return pd.read_pickle(path)
+
+    def _write_partition(self, month, df):
+        path = self._partition_path(month)
+        tmp_path = f"{path}.tmp"
+        if STORAGE_FORMAT == 'parquet':
+            self._normalize_for_storage(df).to_parquet(tmp_path, index=False)
+        else:
+            df.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _normalize_for_storage(df):
+        """Convertit les colonnes objet hétérogènes (JSON, types mixtes) en chaînes."""
+        df = df.copy()
+        for col in df.select_dtypes(include=['object']).columns:
+            values = df[col]
+            non_null = values.dropna()
+            if non_null.map(lambda v: isinstance(v, str)).all():
+                continue
+            df[col] = values.map(
+                lambda v: v if v is None or (isinstance(v, float) and pd.isna(v))
+                else json.dumps(v) if isinstance(v, (dict, list)) else str(v)
+            )
+        return df
+
+    # ------------------------------------------------------------------
+    # Détection des courses à rafraîchir
+    # ------------------------------------------------------------------
+
+    def get_course_signatures(self, start_date=None, end_date=None):
+        """
+        Signature de chaque course terminée: elle change quand des participants
+        ou des résultats sont ajoutés ou modifiés, quand les données PMU des
+        partants changent (lignes de pmu_participants, entraîneur, musique,
+        incident, poids) ou quand de nouvelles cotes sont enregistrées.
+        """
+        date_filter = ""
+        if start_date:
+            date_filter += f" AND c.date_heure >= '{start_date}'"
+        if end_date:
+            date_filter += f" AND c.date_heure <= '{end_date}'"
+
+        query = f"""
+        SELECT
+            c.id AS id_course,
+            c.date_heure,
+            COUNT(p.id) AS nb_participants,
+            COUNT(p.position) AS nb_positions,
+            COALESCE(SUM(p.position), 0) AS somme_positions,
+            COALESCE(MAX(p.id), 0) AS max_participation,
+            MAX(ch.horodatage) AS derniere_cote
+        FROM courses c
+        INNER JOIN pmu_courses pc ON c.pmu_course_id = pc.id
+        LEFT JOIN participations p ON p.id_course = c.id
+        LEFT JOIN (
+            SELECT id_participation, MAX(horodatage) AS horodatage
+            FROM cote_historique
+            GROUP BY id_participation
+        ) ch ON ch.id_participation = p.id
+        WHERE pc.ordreArrivee IS NOT NULL{date_filter}
+        GROUP BY c.id, c.date_heure
+        """
+
+        # Données PMU des partants: pas de date de mise à jour dans la table, les
+        # modifications en place sont détectées par les longueurs des textes et
+        # la somme des poids, les nouvelles cotes par pmu_cote_evolution
+        pmu_query = f"""
+        SELECT
+            c.id AS id_course,
+            COUNT(pp.id) AS nb_pmu,
+            COALESCE(MAX(pp.id), 0) AS max_pmu,
+            MAX(pp.created_at) AS pmu_created_at,
+            COALESCE(SUM(LENGTH(COALESCE(pp.entraineur, '')) + LENGTH(COALESCE(pp.musique, ''))
+                         + LENGTH(COALESCE(pp.incident, ''))), 0) AS pmu_textes,
+            COALESCE(SUM(pp.handicapPoids), 0) AS pmu_poids,
+            MAX(ce.horodatage) AS derniere_cote_pmu
+        FROM courses c
+        INNER JOIN pmu_courses pc ON c.pmu_course_id = pc.id
+        INNER JOIN pmu_participants pp ON pp.id_course = pc.id
+        LEFT JOIN (
+            SELECT id_participant, MAX(horodatage) AS horodatage
+            FROM pmu_cote_evolution
+            GROUP BY id_participant
+        ) ce ON ce.id_participant = pp.id
+        WHERE pc.ordreArrivee IS NOT NULL{date_filter}
+        GROUP BY c.id
+        """
+
+        signatures = pd.read_sql_query(query, self.engine)
+        if signatures.empty:
+            return signatures
+        pmu = pd.read_sql_query(pmu_query, self.engine)
+        signatures = signatures.merge(pmu, on='id_course', how='left')
+
+        signatures['date_heure'] = pd.to_datetime(signatures['date_heure'])
+        signatures['month'] = signatures['date_heure'].dt.strftime('%Y-%m')
+        signatures['signature'] = signatures[[
+            'nb_participants', 'nb_positions', 'somme_positions', 'max_participation', 'derniere_cote',
+            'nb_pmu', 'max_pmu', 'pmu_created_at', 'pmu_textes', 'pmu_poids', 'derniere_cote_pmu'
+        ]].apply(lambda row: ':'.join(self._signature_value(value) for value in row), axis=1)
+        return signatures[['id_course', 'month', 'signature']]
+
+    @staticmethod
+    def _signature_value(value):
+        """Représentation stable d'une valeur (indépendante du type entier / flottant de la colonne)."""
+        if value is None or (not isinstance(value, str) and pd.isna(value)):
+            return ''
+        if isinstance(value, (int, float, np.integer, np.floating)):
+            return f"{float(value):.10g}" if not float(value).is_integer() else str(int(value))
+        return str(value)
+
+    # ------------------------------------------------------------------
+    # API publique
+    # ------------------------------------------------------------------
+
+    def refresh(self, start_date=None, end_date=None, full=False):
+        """
+        Recalcule les features des courses nouvelles ou modifiées.
+
+        Returns:
+            Nombre de courses recalculées
+        """
+        manifest = self._load_manifest()
+        if full or manifest.get('feature_version') != self.feature_version:
+            self.logger.info(
+                f"Reconstruction complète du feature store (version {manifest.get('feature_version')} "
+                f"-> {self.feature_version})"
+            )
+            for month in {entry['month'] for entry in manifest.get('courses', {}).values()}:
+                path = self._partition_path(month)
+                if os.path.exists(path):
+                    os.remove(path)
+            manifest = {'feature_version': self.feature_version, 'courses': {}}
+            self._save_manifest(manifest)
+
+        signatures = self.get_course_signatures(start_date, end_date)
+        if signatures.empty:
+            self.logger.info("Aucune course terminée à indexer")
+            return 0
+
+        known = manifest['courses']
+        stale = signatures[[
+            known.get(str(row.id_course), {}).get('signature') != row.signature
+            for row in signatures.itertuples()
+        ]]
+        if stale.empty:
+            self.logger.info("Feature store à jour")
+            return 0
+
+        self.logger.info(f"Rafraîchissement de {len(stale)} courses dans le feature store")
+
+        # Une partition à la fois pour borner la mémoire
+        for month, month_courses in stale.groupby('month'):
+            course_ids = month_courses['id_course'].tolist()
+            data = self.data_prep.get_training_data(course_ids=course_ids)
+            if not data.empty:
+                features = self.data_prep.create_enhanced_features(data, point_in_time=True, fill_missing=False)
+                features = features.drop(columns=[c for c in EXCLUDED_COLUMNS if c in features.columns])
+                features['feature_version'] = self.feature_version
+                features['computed_at'] = datetime.now()
+            else:
+                features = pd.DataFrame()
+
+            existing = self._read_partition(month)
+            if not existing.empty:
+                existing = existing[~existing['id_course'].isin(course_ids)]
+            partition = pd.concat([existing, features], ignore_index=True)
+            if not partition.empty:
+                partition = partition.drop_duplicates(['id_course', 'id_cheval'], keep='last')
+                self._write_partition(month, partition)
+
+            for row in month_courses.itertuples():
+                known[str(row.id_course)] = {'month': row.month, 'signature': row.signature}
+            self._save_manifest(manifest)
+            self.logger.info(f"Partition {month}: {len(course_ids)} courses recalculées")
+
+        return len(stale)
+
+    def load(self, start_date=None, end_date=None, refresh=True, fill_missing=True):
+        """
+        Retourne les features précalculées des courses de la période,
+        après rafraîchissement incrémental si demandé.
+        """
+        if refresh:
+            self.refresh(start_date, end_date)
+
+        manifest = self._load_manifest()
+        months = sorted({entry['month'] for entry in manifest.get('courses', {}).values()})
+        if start_date:
+            months = [m for m in months if m >= pd.Timestamp(start_date).strftime('%Y-%m')]
+        if end_date:
+            months = [m for m in months if m <= pd.Timestamp(end_date).strftime('%Y-%m')]
+
+        frames = [self._read_partition(month) for month in months]
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            self.logger.warning("Aucune feature disponible dans le feature store pour cette période")
+            return pd.DataFrame()
+
+        df = pd.concat(frames, ignore_index=True)
+        if 'date_heure' in df.columns:
+            dates = pd.to_datetime(df['date_heure'])
+            if start_date:
+                df = df[dates >= pd.Timestamp(start_date)]
+            if end_date:
+                df = df[dates <= pd.Timestamp(end_date)]
+        df = df.reset_index(drop=True)
+
+        self.logger.info(f"{len(df)} participations chargées depuis le feature store")
+
+        if fill_missing:
+            df = self.data_prep.fill_missing_numeric(df)
+        return df
@@ -0,0 +1,143 @@
+# data_preparation/musique.py
+import re
+
+import numpy as np
+import pandas as pd
+
+# Tokeniseur appliqué en une passe à toute la colonne: une performance est une
+# position (chiffres) ou un code de non-arrivée d'une lettre (D = disqualifié,
+# A = arrêté, T = tombé...), suivi au plus d'une lettre minuscule de discipline
+# (a = attelé, m = monté, p = plat, h = haies, s = steeple, c = cross); le saut
+# de ligne sépare les musiques de deux lignes consécutives.
+MUSIQUE_TOKENIZER = re.compile(r'\d+[a-z]?|[A-Za-z][a-z]?|\n')
+
+# Même découpage, ne capturant que la position numérique ('' pour les codes et séparateurs)
+MUSIQUE_POSITION = re.compile(r'(\d+)[a-z]?|[A-Za-z][a-z]?|\n')
+
+# Marqueur d'année, ex. "(24)": séparateur, ne doit pas être lu comme une position
+YEAR_MARKER = re.compile(r'\(\d*\)')
+
+# Codes de non-arrivée comptés comme disqualification / arrêt
+DISQUALIFICATION_CODES = ('D', 'A')
+
+
+class MusiqueMatrix:
+    """
+    Musiques d'une colonne tokenisées en une matrice complétée (une ligne par
+    cheval, une colonne par performance, la plus récente en premier).
+
+    Attributes:
+        positions: positions numériques (0 pour les non-arrivées et le remplissage)
+        valid: masque des performances présentes
+        non_finish: masque des performances sans classement (codes en lettres)
+        codes: première lettre des codes de non-arrivée ('' sinon)
+    """
+
+    def __init__(self, positions, valid, non_finish, codes):
+        self.positions = positions
+        self.valid = valid
+        self.non_finish = non_finish
+        self.codes = codes
+
+    @property
+    def counts(self):
+        """Nombre de performances par ligne."""
+        return self.valid.sum(axis=1)
+
+
+def parse_musique_matrix(musique, max_len=None):
+    """
+    Tokenise toute une colonne de musiques en une seule passe.
+
+    Les marqueurs d'année entre parenthèses sont ignorés; les chiffres donnent la
+    position, les codes en lettres (non-arrivées) valent 0.
+    Toutes les musiques sont tokenisées par un seul appel au tokeniseur compilé,
+    puis dispersées dans la matrice par indexation NumPy.
+
+    Args:
+        musique: Series (ou itérable) de chaînes musique
+        max_len: nombre maximal de performances conservées (toutes par défaut)
+
+    Returns:
+        MusiqueMatrix
+    """
+    musique = pd.Series(musique).reset_index(drop=True)
+    n_rows = len(musique)
+
+    text = musique.where(musique.notna(), '').astype(str)
+    joined = '\n'.join(value.replace('\n', ' ') for value in text)
+    joined = YEAR_MARKER.sub(' ', joined).replace('(', '').replace(')', '')
+
+    # Deux passes alignées du même découpage: premier caractère et position
+    first_char = np.array(MUSIQUE_TOKENIZER.findall(joined), dtype='<U1')
+    digits = np.array(MUSIQUE_POSITION.findall(joined), dtype=str)
+
+    # Numéro de ligne de chaque performance = nombre de séparateurs qui la précèdent
+    is_separator = first_char == '\n'
+    rows = np.cumsum(is_separator)[~is_separator]
+    first_char, digits = first_char[~is_separator], digits[~is_separator]
+
+    lengths = np.bincount(rows, minlength=n_rows)
+    cols = np.arange(len(rows)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+    width = int(lengths.max()) if n_rows else 0
+    if max_len is not None:
+        width = min(width, max_len)
+
+    positions = np.zeros((n_rows, width), dtype=np.int32)
+    valid = np.zeros((n_rows, width), dtype=bool)
+    non_finish = np.zeros((n_rows, width), dtype=bool)
+    codes = np.full((n_rows, width), '', dtype='<U1')
+
+    keep = cols < width
+    if keep.any():
+        rows, cols = rows[keep], cols[keep]
+        is_non_finish = digits[keep] == ''
+        values = np.where(is_non_finish, '0', digits[keep]).astype(np.float64)
+
+        valid[rows, cols] = True
+        positions[rows, cols] = np.minimum(values, np.iinfo(np.int32).max)
+        non_finish[rows, cols] = is_non_finish
+        codes[rows, cols] = np.where(is_non_finish, np.char.upper(first_char[keep]), '')
+
+    return MusiqueMatrix(positions, valid, non_finish, codes)
+
+
+def compute_musique_features(musique):
+    """
+    Calcule les features dérivées de la musique sous forme d'opérations sur tableaux.
+
+    Returns:
+        DataFrame (même index que musique) avec musique_win_count, musique_place_count,
+        musique_disqualified, recent_trend et performance_consistency
+    """
+    index = musique.index if isinstance(musique, pd.Series) else None
+    matrix = parse_musique_matrix(musique)
+    positions = matrix.positions.astype(np.float64)
+    valid = matrix.valid
+
+    placed = valid & (positions > 0)
+    features = pd.DataFrame(index=index if index is not None else pd.RangeIndex(len(positions)))
+    features['musique_win_count'] = (valid & (positions == 1)).sum(axis=1)
+    features['musique_place_count'] = (placed & (positions <= 3)).sum(axis=1)
+    features['musique_disqualified'] = (
+        matrix.non_finish & np.isin(matrix.codes, DISQUALIFICATION_CODES)
+    ).any(axis=1).astype(int)
+
+    # Tendance récente: moyenne des 3 dernières performances si toutes classées
+    recent = positions[:, :3]
+    has_recent = placed[:, :3].sum(axis=1) == 3 if positions.shape[1] >= 3 else np.zeros(len(positions), dtype=bool)
+    recent_trend = np.full(len(positions), np.nan)
+    if has_recent.any():
+        recent_trend[has_recent] = recent[has_recent].mean(axis=1)
+    features['recent_trend'] = recent_trend
+
+    # Régularité: écart-type des positions classées (au moins 3)
+    consistency = np.full(len(positions), np.nan)
+    enough = placed.sum(axis=1) >= 3
+    if enough.any():
+        values = np.where(placed[enough], positions[enough], np.nan)
+        consistency[enough] = np.nanstd(values, axis=1)
+    features['performance_consistency'] = consistency
+
+    return features
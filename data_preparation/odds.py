@@ -0,0 +1,66 @@
+# data_preparation/odds.py
+import json
+
+import numpy as np
+import pandas as pd
+
+# Clé "rapport" de premier niveau des JSON dernierRapportDirect / dernierRapportReference
+# (ne correspond pas à "typeRapport", dont la clé entre guillemets diffère)
+RAPPORT_PATTERN = r'"rapport"\s*:\s*"?(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)'
+
+
+def extract_rapport(values):
+    """
+    Extrait le rapport (cote) d'une colonne de JSON PMU en une seule passe.
+
+    Les chaînes JSON sont lues par une expression régulière appliquée à toute la
+    colonne (pas de json.loads par ligne); les valeurs déjà désérialisées (dict,
+    colonnes JSON lues via l'ORM) sont lues directement.
+
+    Args:
+        values: Series de chaînes JSON, de dict ou de valeurs nulles
+
+    Returns:
+        Series float (NaN si le rapport est absent ou illisible), même index
+    """
+    values = pd.Series(values)
+    rapport = pd.Series(np.nan, index=values.index, dtype=float)
+    if values.empty:
+        return rapport
+
+    is_str = values.map(type).eq(str)
+    if is_str.any():
+        extracted = values[is_str].str.extract(RAPPORT_PATTERN, expand=False)
+        rapport[is_str] = pd.to_numeric(extracted, errors='coerce')
+
+    is_dict = values.map(lambda v: isinstance(v, dict))
+    if is_dict.any():
+        rapport[is_dict] = pd.to_numeric(
+            values[is_dict].map(lambda d: d.get('rapport')), errors='coerce'
+        )
+
+    return rapport
+
+
+def extract_rapport_value(value):
+    """Rapport d'une seule valeur JSON (chaîne ou dict); None si absent."""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return None
+    if isinstance(value, dict) and 'rapport' in value:
+        try:
+            return float(value['rapport'])
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+def compute_cote_variation(cote_finale, cote_initiale):
+    """Variation en % entre cote initiale et finale (0 si l'une manque ou cote initiale <= 0)."""
+    finale = pd.to_numeric(cote_finale, errors='coerce')
+    initiale = pd.to_numeric(cote_initiale, errors='coerce')
+    valid = finale.notna() & initiale.notna() & (initiale > 0)
+    variation = (finale - initiale) / initiale.where(valid) * 100
+    return variation.where(valid, 0.0)
@@ -0,0 +1,397 @@
+# data_preparation/rolling_stats.py
+import logging
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+from data_preparation.entity_aggregates import AGG_COLUMNS
+
+# Durée de validité (en secondes) des agrégats calculés avant rechargement
+ROLLING_STATS_TTL = 3600
+
+# Sommes cumulées maintenues pour chaque entité
+SUM_COLS = ['runs', 'wins', 'places', 'pos_sum', 'pos_n']
+
+# Nombre maximal de clés par clause IN lors des chargements ciblés
+HISTORY_CHUNK_SIZE = 1000
+
+HISTORY_QUERY = """
+SELECT
+    p.id_course,
+    p.id_cheval,
+    p.id_jockey,
+    p.position,
+    c.date_heure,
+    c.distance,
+    ch.nomPere,
+    ch.proprietaire,
+    pp.entraineur{columns}
+FROM participations p
+JOIN courses c ON p.id_course = c.id
+LEFT JOIN chevaux ch ON p.id_cheval = ch.id
+LEFT JOIN pmu_participants pp ON pp.id_course = c.pmu_course_id AND pp.numPmu = p.numPmu
+{where}
+"""
+
+# Arrivée connue de la course, calculée en SQL lorsque l'historique chargé
+# ne contient pas tous les partants de chaque course
+HAS_RESULT_COLUMN = """,
+    CASE WHEN EXISTS (
+        SELECT 1 FROM participations r WHERE r.id_course = p.id_course AND r.position IS NOT NULL
+    ) THEN 1 ELSE 0 END AS has_result"""
+
+# Expression SQL des clés d'entité utilisables pour un chargement ciblé
+HISTORY_KEY_COLUMNS = {
+    'id_cheval': 'p.id_cheval',
+    'nomPere': 'ch.nomPere',
+    'proprietaire': 'ch.proprietaire',
+    'entraineur': 'pp.entraineur'
+}
+
+# Colonnes des tables agg_* (EntityAggregates) -> sommes de l'agrégateur
+AGGREGATE_SUM_COLS = dict(zip(AGG_COLUMNS, SUM_COLS))
+
+# Familles de statistiques: clés d'entité, colonnes de df requises,
+# correspondance statistique -> feature et seuil minimal de courses
+ENTITY_FAMILIES = {
+    'pere': {
+        'keys': ['nomPere'],
+        'required': ['nomPere'],
+        'features': {
+            'win_rate': 'pere_win_rate',
+            'place_rate': 'pere_place_rate',
+            'avg_position': 'pere_avg_position'
+        },
+        'min_count': 5,
+        'aggregate': 'sire'
+    },
+    'entraineur': {
+        'keys': ['entraineur'],
+        'required': ['entraineur'],
+        'features': {
+            'win_rate': 'entraineur_win_rate',
+            'place_rate': 'entraineur_place_rate',
+            'avg_position': 'entraineur_avg_position'
+        },
+        'min_count': 0,
+        'aggregate': 'trainer'
+    },
+    'proprietaire': {
+        'keys': ['proprietaire'],
+        'required': ['proprietaire'],
+        'features': {
+            'win_rate': 'proprietaire_win_rate',
+            'place_rate': 'proprietaire_place_rate'
+        },
+        'min_count': 0,
+        'aggregate': 'owner'
+    },
+    'jockey_cheval': {
+        'keys': ['id_cheval', 'id_jockey'],
+        'required': ['id_cheval', 'id_jockey', 'id_course'],
+        'features': {
+            'win_rate': 'jockey_cheval_win_rate',
+            'place_rate': 'jockey_cheval_place_rate',
+            'avg_position': 'jockey_cheval_avg_position',
+            'count': 'jockey_cheval_count'
+        },
+        'min_count': 0
+    }
+}
+
+DISTANCE_FAMILY = {
+    'required': ['id_cheval', 'distance', 'id_course'],
+    'features': {
+        'win_rate': 'distance_win_rate',
+        'place_rate': 'distance_place_rate',
+        'avg_position': 'distance_avg_position',
+        'count': 'distance_perf_count'
+    },
+    'window': 200,
+    'min_count': 0
+}
+
+
+class RollingStatsAggregator:
+    """
+    Agrégats "à date" (point-in-time) des performances par père, entraîneur,
+    propriétaire, couple jockey-cheval et distance.
+
+    L'historique complet participations × courses est parcouru une seule fois
+    dans l'ordre chronologique: pour chaque entité, les sommes cumulées
+    (courses, victoires, places, positions) sont décalées d'une course, de sorte
+    que chaque ligne ne voit que les résultats des courses strictement
+    antérieures. Aucun résultat futur ne fuit ainsi dans l'entraînement.
+
+    fit_latest() calcule avec les mêmes définitions les seuls totaux à ce jour
+    des entités d'un lot (prédiction), à partir d'un historique ciblé ou des
+    tables d'agrégats agg_* lorsqu'elles sont disponibles.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.logger = logging.getLogger(__name__)
+        self.as_of = None
+        self.totals = {}
+        self.distance_totals = None
+        self.fitted_at = None
+
+    def load_history(self, filters=None):
+        """
+        Charge l'historique des participations: complet en une requête, ou restreint
+        aux lignes dont une clé d'entité prend l'une des valeurs de filters
+        ({'id_cheval': [...], 'nomPere': [...], ...}).
+        """
+        if not filters:
+            query = HISTORY_QUERY.format(columns='', where='')
+            history = pd.read_sql_query(query, self.engine)
+            return history.drop_duplicates(['id_course', 'id_cheval'])
+
+        frames = []
+        for column, values in filters.items():
+            values = [v.item() if isinstance(v, np.generic) else v
+                      for v in pd.unique(pd.Series(values).dropna())]
+            query = HISTORY_QUERY.format(
+                columns=HAS_RESULT_COLUMN, where=f"WHERE {HISTORY_KEY_COLUMNS[column]} IN :keys"
+            )
+            statement = text(query).bindparams(bindparam('keys', expanding=True))
+            for start in range(0, len(values), HISTORY_CHUNK_SIZE):
+                chunk = values[start:start + HISTORY_CHUNK_SIZE]
+                frames.append(pd.read_sql_query(statement, self.engine, params={'keys': chunk}))
+
+        if not frames:
+            return pd.DataFrame(columns=['id_course', 'id_cheval', 'id_jockey', 'position', 'date_heure',
+                                         'distance', 'nomPere', 'proprietaire', 'entraineur', 'has_result'])
+        history = pd.concat(frames, ignore_index=True)
+        return history.drop_duplicates(['id_course', 'id_cheval'])
+
+    @staticmethod
+    def _prepare(history):
+        """Ajoute les indicateurs additifs (courses, victoires, places, positions)."""
+        history = history.copy()
+        history['date_heure'] = pd.to_datetime(history['date_heure'])
+        position = pd.to_numeric(history['position'], errors='coerce')
+
+        # Une clé vide n'identifie aucune entité (comme dans les tables agg_*)
+        for key in ['nomPere', 'proprietaire', 'entraineur']:
+            if key in history.columns:
+                history[key] = history[key].replace('', np.nan)
+
+        # Seules les courses dont l'arrivée est connue comptent dans les statistiques
+        if 'has_result' in history.columns:
+            has_result = history['has_result'].astype(bool)
+        else:
+            has_result = position.notna().groupby(history['id_course']).transform('any')
+
+        history['runs'] = has_result.astype(float)
+        history['wins'] = ((position == 1) & has_result).astype(float)
+        history['places'] = ((position <= 3) & has_result).astype(float)
+        history['pos_sum'] = position.where(has_result).fillna(0)
+        history['pos_n'] = (position.notna() & has_result).astype(float)
+        return history
+
+    @staticmethod
+    def _finalize(sums, features, min_count):
+        """Convertit les sommes en taux et applique le seuil minimal de courses."""
+        runs = sums['runs'].where(sums['runs'] > min_count)
+        stats = pd.DataFrame(index=sums.index)
+        stats['win_rate'] = sums['wins'] / runs * 100
+        stats['place_rate'] = sums['places'] / runs * 100
+        stats['avg_position'] = sums['pos_sum'] / sums['pos_n'].where(sums['pos_n'] > 0)
+        stats['count'] = runs
+        stats.loc[runs.isna(), 'avg_position'] = np.nan
+        return stats[list(features)].rename(columns=features)
+
+    def _entity_as_of(self, history, keys):
+        """Sommes cumulées par entité, décalées d'une course."""
+        data = history.dropna(subset=keys + ['date_heure'])
+        per_race = data.groupby(keys + ['date_heure', 'id_course'])[SUM_COLS].sum().reset_index()
+
+        # groupby trie par entité puis par date: le cumul suit l'ordre chronologique
+        cumulative = per_race.groupby(keys, sort=False)[SUM_COLS].cumsum()
+        as_of = per_race[keys + ['id_course']].copy()
+        as_of[SUM_COLS] = cumulative.values - per_race[SUM_COLS].values
+
+        totals = self._entity_totals(history, keys)
+        rows = data[['id_course', 'id_cheval'] + [k for k in keys if k != 'id_cheval']]
+        row_sums = rows.merge(as_of, on=keys + ['id_course'], how='left')
+        return row_sums.set_index(['id_course', 'id_cheval'])[SUM_COLS], totals
+
+    @staticmethod
+    def _entity_totals(history, keys):
+        """Sommes par entité sur tout l'historique."""
+        data = history.dropna(subset=keys + ['date_heure'])
+        return data.groupby(keys)[SUM_COLS].sum()
+
+    @staticmethod
+    def _distance_totals(history):
+        """Sommes par cheval et distance sur tout l'historique."""
+        data = history.dropna(subset=['id_cheval', 'distance', 'date_heure'])
+        totals = data.groupby(['id_cheval', 'distance'])[SUM_COLS].sum()
+        return totals.rename_axis(['id_cheval', 'cand_distance'])
+
+    def _distance_as_of(self, history):
+        """Performances antérieures du cheval sur des distances proches (± fenêtre)."""
+        window = DISTANCE_FAMILY['window']
+        data = history.dropna(subset=['id_cheval', 'distance', 'date_heure'])
+
+        per_race = data.groupby(
+            ['id_cheval', 'distance', 'date_heure', 'id_course']
+        )[SUM_COLS].sum().reset_index()
+        per_race[SUM_COLS] = per_race.groupby(['id_cheval', 'distance'], sort=False)[SUM_COLS].cumsum()
+        per_race = per_race.rename(columns={'distance': 'cand_distance', 'id_course': 'src_course'})
+
+        # Paires (ligne, distance candidate du même cheval dans la fenêtre)
+        candidates = per_race[['id_cheval', 'cand_distance']].drop_duplicates()
+        pairs = data[['id_course', 'id_cheval', 'distance', 'date_heure']].merge(candidates, on='id_cheval')
+        pairs = pairs[(pairs['cand_distance'] - pairs['distance']).abs() <= window]
+
+        # Cumul à la dernière course strictement antérieure pour chaque distance candidate
+        matched = pd.merge_asof(
+            pairs.sort_values('date_heure'),
+            per_race.sort_values('date_heure'),
+            on='date_heure',
+            by=['id_cheval', 'cand_distance'],
+            allow_exact_matches=False
+        )
+        row_sums = matched.groupby(['id_course', 'id_cheval'])[SUM_COLS].sum()
+
+        return row_sums, self._distance_totals(history)
+
+    def fit(self, history=None):
+        """Calcule les agrégats à date pour toutes les lignes de l'historique."""
+        if history is None:
+            history = self.load_history()
+
+        self.logger.info(f"Computing point-in-time statistics over {len(history)} participations")
+        history = self._prepare(history)
+
+        frames = []
+        self.totals = {}
+        for family, spec in ENTITY_FAMILIES.items():
+            row_sums, totals = self._entity_as_of(history, spec['keys'])
+            frames.append(self._finalize(row_sums, spec['features'], spec['min_count']))
+            self.totals[family] = totals
+
+        row_sums, self.distance_totals = self._distance_as_of(history)
+        frames.append(self._finalize(row_sums, DISTANCE_FAMILY['features'], DISTANCE_FAMILY['min_count']))
+
+        index = pd.MultiIndex.from_frame(history[['id_course', 'id_cheval']])
+        self.as_of = pd.concat(
+            [frame[~frame.index.duplicated()].reindex(index) for frame in frames], axis=1
+        )
+        self.fitted_at = datetime.now()
+        return self
+
+    def fit_latest(self, df, entity_aggregates=None):
+        """
+        Calcule les totaux à ce jour des seules entités de df (prédiction).
+
+        Les statistiques par père, entraîneur et propriétaire sont lues par clé dans
+        les tables agg_* si entity_aggregates est fourni; les autres familles sont
+        calculées sur l'historique des chevaux (et entités) du lot. Après cet appel,
+        add_family() attribue à toutes les lignes les valeurs à ce jour.
+        """
+        from_tables = {}
+        if entity_aggregates is not None:
+            from_tables = {
+                family: spec['aggregate'] for family, spec in ENTITY_FAMILIES.items()
+                if 'aggregate' in spec and spec['keys'][0] in df.columns
+            }
+
+        filters = {}
+        if 'id_cheval' in df.columns:
+            filters['id_cheval'] = df['id_cheval']
+        for family, spec in ENTITY_FAMILIES.items():
+            key = spec['keys'][0]
+            if family not in from_tables and key != 'id_cheval' and key in df.columns:
+                filters[key] = df[key]
+
+        history = self._prepare(self.load_history(filters))
+        self.logger.info(f"Computing latest statistics over {len(history)} participations")
+
+        self.as_of = None
+        self.totals = {}
+        for family, spec in ENTITY_FAMILIES.items():
+            if family in from_tables:
+                keys = df[spec['keys'][0]].dropna().unique()
+                totals = entity_aggregates.read(from_tables[family], keys)
+                self.totals[family] = totals.rename(columns=AGGREGATE_SUM_COLS)[SUM_COLS].astype(float)
+            else:
+                self.totals[family] = self._entity_totals(history, spec['keys'])
+        self.distance_totals = self._distance_totals(history)
+        self.fitted_at = datetime.now()
+        return self
+
+    def is_stale(self, ttl=ROLLING_STATS_TTL):
+        """Indique si les agrégats doivent être recalculés."""
+        if self.fitted_at is None:
+            return True
+        return (datetime.now() - self.fitted_at).total_seconds() > ttl
+
+    def _lookup(self, df):
+        """Valeurs à date des lignes connues et masque des lignes absentes de l'historique."""
+        if self.as_of is not None and 'id_course' in df.columns and 'id_cheval' in df.columns:
+            index = pd.MultiIndex.from_frame(df[['id_course', 'id_cheval']])
+            known = index.isin(self.as_of.index)
+            values = self.as_of.reindex(index)
+            values.index = df.index
+            return values, pd.Series(known, index=df.index)
+        return pd.DataFrame(index=df.index), pd.Series(False, index=df.index)
+
+    @staticmethod
+    def _assign(df, values):
+        """Copie les valeurs non nulles dans df (colonnes créées seulement si utiles)."""
+        for col in values.columns:
+            present = values[col].notna()
+            if present.any():
+                df.loc[present[present].index, col] = values.loc[present, col]
+
+    def add_family(self, df, family):
+        """
+        Ajoute à df les features à date d'une famille ('pere', 'entraineur',
+        'proprietaire', 'jockey_cheval' ou 'distance').
+
+        Les lignes absentes de l'historique (nouvelles courses), ou toutes les lignes
+        après fit_latest(), reçoivent les statistiques sur l'ensemble de l'historique
+        connu, qui leur est antérieur.
+        """
+        spec = DISTANCE_FAMILY if family == 'distance' else ENTITY_FAMILIES[family]
+        if not all(col in df.columns for col in spec['required']):
+            return
+
+        known_values, known = self._lookup(df)
+        values = pd.DataFrame(index=df.index, columns=list(spec['features'].values()), dtype=float)
+        if known.any():
+            values.loc[known] = known_values.loc[known, values.columns].values
+
+        unknown = df[~known]
+        if not unknown.empty:
+            if family == 'distance':
+                sums = self._distance_totals_for(unknown)
+            else:
+                rows = unknown[spec['keys']].dropna()
+                if len(spec['keys']) > 1:
+                    keys = pd.MultiIndex.from_frame(rows)
+                else:
+                    keys = pd.Index(rows[spec['keys'][0]])
+                sums = self.totals[family].reindex(keys)
+                sums.index = rows.index
+                sums = sums.dropna(how='all')
+            if not sums.empty:
+                stats = self._finalize(sums, spec['features'], spec['min_count'])
+                values.loc[stats.index, stats.columns] = stats.values
+
+        self._assign(df, values)
+
+    def _distance_totals_for(self, rows):
+        """Statistiques de distance sur tout l'historique pour des lignes inconnues."""
+        rows = rows[['id_cheval', 'distance']].dropna()
+        if rows.empty or self.distance_totals is None:
+            return pd.DataFrame(columns=SUM_COLS)
+        rows = rows.assign(_row=rows.index)
+        merged = rows.merge(self.distance_totals.reset_index(), on='id_cheval')
+        merged = merged[(merged['cand_distance'] - merged['distance']).abs() <= DISTANCE_FAMILY['window']]
+        return merged.groupby('_row')[SUM_COLS].sum()
@@ -9,6 +9,10 @@ from database.setup_database import (
     PmuCourse, CoteEvolution
 )
 from scraping import save_commentaire, save_incidents
+from data_preparation.entity_aggregates import EntityAggregates
+
+# Agrégats par père / entraîneur / propriétaire tenus à jour à chaque ingestion
+entity_aggregates = EntityAggregates(engine)
 
 
 def save_pays(pays_data):
@@ -146,6 +150,10 @@ def save_participants_data(participants_data, course_id):
     
     participants = participants_data.get('participants', [])
     
+    # Contributions de la course aux agrégats avant écriture
+    entity_aggregates.ensure_tables()
+    before = entity_aggregates.snapshot(session, pmu_course_ids=[course.id])
+    
     for participant_data in participants:
         # Vérifier si le participant existe déjà
         existing_participant = session.query(Participant).filter_by(
@@ -185,8 +193,8 @@ def save_participants_data(participants_data, course_id):
                 cote_value = participant_data['dernierRapportDirect']['rapport']
                 
                 # Sauvegarder la cote initiale dans l'historique des cotes
-                # Nous devons d'abord commit pour obtenir l'ID du participant
-                session.commit()
+                # Nous devons d'abord flush pour obtenir l'ID du participant
+                session.flush()
                 
                 cote_record = CoteEvolution(
                     id_participant=participant.id,
@@ -195,6 +203,10 @@ def save_participants_data(participants_data, course_id):
                 )
                 session.add(cote_record)
     
+    # Agrégats mis à jour par deltas dans la même transaction
+    session.flush()
+    after = entity_aggregates.snapshot(session, pmu_course_ids=[course.id])
+    entity_aggregates.record_change(session, before, after)
     session.commit()
     session.close()
 
@@ -205,6 +217,10 @@ def save_participation(cheval_data, jockey_data, participation_data):
     session = Session()
     
     try:
+        # Contributions de la course aux agrégats avant écriture
+        entity_aggregates.ensure_tables()
+        before = entity_aggregates.snapshot(session, course_ids=[participation_data['id_course']])
+        
         # Vérifier/sauvegarder le cheval
         cheval = session.query(Cheval).filter_by(nom=cheval_data['nom']).first()
         if not cheval:
@@ -254,6 +270,10 @@ def save_participation(cheval_data, jockey_data, participation_data):
             )
             session.add(cote_historique)
         
+        # Agrégats mis à jour par deltas dans la même transaction
+        session.flush()
+        after = entity_aggregates.snapshot(session, course_ids=[participation_data['id_course']])
+        entity_aggregates.record_change(session, before, after)
         session.commit()
     
     except SQLAlchemyError as e:
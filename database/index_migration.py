@@ -0,0 +1,198 @@
+# database/index_migration.py
+"""
+Migration des index secondaires utilisés par les chemins chauds
+(scraping, préparation des features, API).
+
+La migration est idempotente: un index n'est créé que si aucun index existant
+ne commence déjà par les mêmes colonnes (clés étrangères MySQL comprises).
+Les plans d'exécution (EXPLAIN) des requêtes représentatives sont relevés
+avant et après la création pour vérifier que les parcours complets disparaissent.
+
+Usage:
+    python -m database.index_migration              # créer les index manquants
+    python -m database.index_migration --dry-run    # afficher le plan sans rien créer
+"""
+import argparse
+import json
+import logging
+
+from sqlalchemy import inspect, text
+
+logger = logging.getLogger(__name__)
+
+# (nom, table, colonnes). Les index composites sont listés avant leurs préfixes
+# afin que ces derniers soient reconnus comme déjà couverts.
+HOT_INDEXES = [
+    ('ix_participations_course_numpmu', 'participations', ['id_course', 'numPmu']),
+    ('ix_participations_course', 'participations', ['id_course']),
+    ('ix_participations_cheval', 'participations', ['id_cheval']),
+    ('ix_participations_jockey', 'participations', ['id_jockey']),
+    ('ix_pmu_participants_course_numpmu', 'pmu_participants', ['id_course', 'numPmu']),
+    ('ix_pmu_participants_cheval', 'pmu_participants', ['cheval_id']),
+    ('ix_courses_date_heure', 'courses', ['date_heure']),
+    ('ix_courses_pmu_course', 'courses', ['pmu_course_id']),
+    ('ix_chevaux_nom', 'chevaux', ['nom']),
+    ('ix_jockeys_nom', 'jockeys', ['nom']),
+    ('ix_cote_historique_participation_horodatage', 'cote_historique', ['id_participation', 'horodatage']),
+    ('ix_predictions_course_horodatage', 'predictions', ['id_course', 'horodatage']),
+]
+
+# Requêtes représentatives des chemins chauds, vérifiées par EXPLAIN
+HOT_QUERIES = {
+    'save_cheval': ("SELECT id FROM chevaux WHERE nom = :nom", {'nom': 'X'}),
+    'save_jockey': ("SELECT id FROM jockeys WHERE nom = :nom", {'nom': 'X'}),
+    'participations_course': ("SELECT * FROM participations WHERE id_course = :id", {'id': 1}),
+    'participations_cheval': ("SELECT * FROM participations WHERE id_cheval = :id", {'id': 1}),
+    'participations_jockey': ("SELECT * FROM participations WHERE id_jockey = :id", {'id': 1}),
+    'participations_numpmu': (
+        "SELECT * FROM participations WHERE id_course = :id AND numPmu = :num", {'id': 1, 'num': 1}
+    ),
+    'pmu_participants_numpmu': (
+        "SELECT * FROM pmu_participants WHERE id_course = :id AND numPmu = :num", {'id': 1, 'num': 1}
+    ),
+    'pmu_participants_cheval': ("SELECT * FROM pmu_participants WHERE cheval_id = :id", {'id': 1}),
+    'courses_periode': (
+        "SELECT id FROM courses WHERE date_heure BETWEEN :start AND :end",
+        {'start': '2024-01-01', 'end': '2024-01-31'}
+    ),
+    'courses_pmu': ("SELECT id FROM courses WHERE pmu_course_id = :id", {'id': 1}),
+    'cote_historique': (
+        "SELECT cote FROM cote_historique WHERE id_participation = :id ORDER BY horodatage", {'id': 1}
+    ),
+    'derniere_prediction': (
+        "SELECT * FROM predictions WHERE id_course = :id ORDER BY horodatage DESC LIMIT 1", {'id': 1}
+    ),
+}
+
+
+def _existing_indexes(inspector, table):
+    """Listes de colonnes des index existants (clé primaire comprise)."""
+    indexes = [idx['column_names'] for idx in inspector.get_indexes(table)]
+    primary = inspector.get_pk_constraint(table).get('constrained_columns') or []
+    if primary:
+        indexes.append(primary)
+    return indexes
+
+
+def _is_covered(existing, columns):
+    """Un index existant commençant par les mêmes colonnes rend l'index inutile."""
+    return any(list(cols[:len(columns)]) == list(columns) for cols in existing)
+
+
+def plan_indexes(engine):
+    """
+    Détermine les index à créer.
+
+    Returns:
+        Liste de (nom, table, colonnes) manquants
+    """
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    missing = []
+    existing_by_table = {}
+
+    for name, table, columns in HOT_INDEXES:
+        if table not in tables:
+            logger.warning(f"Table {table} absente: index {name} ignoré")
+            continue
+        existing = existing_by_table.setdefault(table, _existing_indexes(inspector, table))
+        if _is_covered(existing, columns):
+            continue
+        missing.append((name, table, columns))
+        # Les index suivants de la même table voient celui-ci comme existant
+        existing.append(columns)
+
+    return missing
+
+
+def create_indexes(engine, dry_run=False):
+    """
+    Crée les index manquants.
+
+    Returns:
+        Liste des noms d'index créés (ou à créer si dry_run)
+    """
+    quote = engine.dialect.identifier_preparer.quote
+    created = []
+    for name, table, columns in plan_indexes(engine):
+        statement = f"CREATE INDEX {quote(name)} ON {quote(table)} ({', '.join(quote(c) for c in columns)})"
+        if dry_run:
+            logger.info(f"[dry-run] {statement}")
+        else:
+            with engine.begin() as connection:
+                connection.execute(text(statement))
+            logger.info(f"Index créé: {statement}")
+        created.append(name)
+    return created
+
+
+def explain(engine, query, params):
+    """
+    Plan d'exécution d'une requête.
+
+    Returns:
+        dict avec 'full_scan' (bool) et 'plan' (lignes de l'EXPLAIN)
+    """
+    dialect = engine.dialect.name
+    prefix = 'EXPLAIN QUERY PLAN' if dialect == 'sqlite' else 'EXPLAIN'
+    with engine.connect() as connection:
+        rows = [dict(row._mapping) for row in connection.execute(text(f"{prefix} {query}"), params)]
+
+    if dialect == 'sqlite':
+        full_scan = any(
+            str(row.get('detail', '')).startswith('SCAN') and 'INDEX' not in str(row.get('detail', ''))
+            for row in rows
+        )
+    else:
+        full_scan = any(str(row.get('type', '')).upper() == 'ALL' for row in rows)
+
+    return {'full_scan': full_scan, 'plan': rows}
+
+
+def explain_hot_queries(engine):
+    """EXPLAIN de chaque requête représentative dont les tables existent."""
+    tables = set(inspect(engine).get_table_names())
+    report = {}
+    for name, (query, params) in HOT_QUERIES.items():
+        table = query.split(' FROM ')[1].split()[0]
+        if table not in tables:
+            continue
+        try:
+            report[name] = explain(engine, query, params)
+        except Exception as e:
+            logger.error(f"Erreur lors de l'EXPLAIN de {name}: {str(e)}")
+    return report
+
+
+def run_migration(engine, dry_run=False):
+    """
+    Relève les plans, crée les index manquants puis relève à nouveau les plans.
+
+    Returns:
+        dict avec les index créés et, par requête, le parcours complet avant/après
+    """
+    before = explain_hot_queries(engine)
+    created = create_indexes(engine, dry_run=dry_run)
+    after = before if dry_run else explain_hot_queries(engine)
+
+    checks = {
+        name: {'full_scan_before': before[name]['full_scan'],
+               'full_scan_after': after.get(name, before[name])['full_scan']}
+        for name in before
+    }
+    remaining = [name for name, check in checks.items() if check['full_scan_after']]
+    if remaining and not dry_run:
+        logger.warning(f"Requêtes encore en parcours complet après migration: {remaining}")
+
+    logger.info(f"Migration des index terminée: {len(created)} index créés")
+    return {'created': created, 'checks': checks}
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Création des index secondaires des chemins chauds')
+    parser.add_argument('--dry-run', action='store_true', help='Afficher les index manquants sans les créer')
+    args = parser.parse_args()
+
+    from database.setup_database import engine
+    print(json.dumps(run_migration(engine, dry_run=args.dry_run), indent=2))
@@ -382,6 +382,14 @@ class PhotoArrivee(Base):
 def create_tables():
     Base.metadata.create_all(engine)
 
+    # Tables d'agrégats par père / entraîneur / propriétaire
+    from data_preparation.entity_aggregates import AGG_METADATA
+    AGG_METADATA.create_all(engine)
+
+    # Index secondaires des chemins chauds (idempotent)
+    from database.index_migration import create_indexes
+    create_indexes(engine)
+
 # Fonction pour supprimer toutes les tables
 def drop_tables():
     Base.metadata.drop_all(engine)
@@ -0,0 +1,146 @@
+# model/chunk_iterator.py
+import logging
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+
+class ChunkCache:
+    """
+    Morceaux de données d'entraînement matérialisés une seule fois sur disque.
+
+    La requête SQL et le calcul des features de chunk_factory ne sont exécutés
+    qu'une fois (build); les passes suivantes de XGBoost, et l'entraînement des
+    deux modèles, relisent les fichiers. common_columns est la liste des colonnes
+    présentes dans tous les morceaux, fixée avant tout parcours.
+    """
+
+    def __init__(self, cache_dir, paths, common_columns, rows):
+        self.cache_dir = cache_dir
+        self.paths = list(paths)
+        self.common_columns = list(common_columns)
+        self.rows = rows
+
+    @classmethod
+    def build(cls, chunk_factory, cache_dir, prepare_chunk=None):
+        """Parcourt chunk_factory une fois et écrit chaque morceau (préparé) dans cache_dir."""
+        os.makedirs(cache_dir, exist_ok=True)
+        chunk_dir = tempfile.mkdtemp(prefix='chunks_', dir=cache_dir)
+        paths, columns, common, rows = [], [], None, 0
+        for chunk in chunk_factory():
+            if prepare_chunk is not None:
+                chunk = prepare_chunk(chunk)
+            if chunk is None or chunk.empty:
+                continue
+            path = os.path.join(chunk_dir, f'chunk_{len(paths):05d}.pkl')
+            chunk.to_pickle(path)
+            paths.append(path)
+            if common is None:
+                columns, common = list(chunk.columns), set(chunk.columns)
+            else:
+                common &= set(chunk.columns)
+            rows += len(chunk)
+
+        common_columns = [col for col in columns if col in (common or set())]
+        logging.getLogger(__name__).info(f"{len(paths)} training chunks cached in {chunk_dir} ({rows} rows)")
+        return cls(chunk_dir, paths, common_columns, rows)
+
+    def __call__(self):
+        return (pd.read_pickle(path) for path in self.paths)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def first(self):
+        """Premier morceau restreint aux colonnes communes (sélection des features)."""
+        return pd.read_pickle(self.paths[0])[self.common_columns] if self.paths else None
+
+    def cleanup(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+
+class TrainingChunkIter(xgb.DataIter):
+    """
+    Itérateur XGBoost sur des morceaux de données d'entraînement.
+
+    chunk_factory est un callable qui retourne un nouvel itérable de DataFrames
+    (en pratique un ChunkCache); il est rappelé à chaque passe de XGBoost. Chaque morceau est converti en matrice float32 sur
+    la liste de features fixée, de sorte que seul un morceau est en mémoire à la fois.
+    """
+
+    def __init__(self, chunk_factory, feature_cols, target_col, group_col=None,
+                 prepare_chunk=None, cache_prefix=None):
+        self.chunk_factory = chunk_factory
+        self.feature_cols = list(feature_cols)
+        self.target_col = target_col
+        self.group_col = group_col
+        self.prepare_chunk = prepare_chunk
+        self.logger = logging.getLogger(__name__)
+
+        self._chunks = None
+        self._qid_offset = 0
+        self.rows_seen = 0
+
+        super().__init__(cache_prefix=cache_prefix)
+
+    def reset(self):
+        """Recommence le parcours des morceaux."""
+        self._chunks = None
+        self._qid_offset = 0
+
+    def next(self, input_data):
+        """Transmet le morceau suivant à XGBoost; retourne False à la fin du parcours."""
+        if self._chunks is None:
+            self._chunks = iter(self.chunk_factory())
+            self.rows_seen = 0
+
+        chunk = None
+        while chunk is None or chunk.empty:
+            try:
+                chunk = next(self._chunks)
+            except StopIteration:
+                return False
+            if self.prepare_chunk is not None:
+                chunk = self.prepare_chunk(chunk)
+            chunk = chunk[chunk[self.target_col].notna()] if self.target_col in chunk.columns else chunk
+
+        kwargs = {}
+        if self.group_col is not None:
+            # Le classement exige des groupes contigus et des qid croissants
+            chunk = chunk.sort_values(self.group_col, kind='mergesort')
+            codes, uniques = pd.factorize(chunk[self.group_col])
+            kwargs['qid'] = codes + self._qid_offset
+            self._qid_offset += len(uniques)
+
+        input_data(
+            data=self.to_matrix(chunk),
+            label=chunk[self.target_col].to_numpy(dtype=np.float32),
+            **kwargs
+        )
+        self.rows_seen += len(chunk)
+        return True
+
+    def to_matrix(self, chunk):
+        """Matrice float32 alignée sur la liste de features (colonnes absentes = NaN)."""
+        return chunk.reindex(columns=self.feature_cols).to_numpy(dtype=np.float32, na_value=np.nan)
+
+
+def build_chunk_dmatrix(chunk_iter, external_memory=False, max_bin=256):
+    """
+    Construit la DMatrix d'entraînement à partir d'un TrainingChunkIter.
+
+    - En mémoire: QuantileDMatrix, qui ne conserve que la matrice quantifiée.
+    - external_memory=True: la matrice est mise en cache sur disque
+      (cache_prefix de l'itérateur requis).
+    """
+    if external_memory:
+        if getattr(chunk_iter, 'cache_prefix', None) is None:
+            raise ValueError("external_memory nécessite un cache_prefix sur l'itérateur")
+        if hasattr(xgb, 'ExtMemQuantileDMatrix'):
+            return xgb.ExtMemQuantileDMatrix(chunk_iter, max_bin=max_bin)
+        return xgb.DMatrix(chunk_iter, missing=np.nan)
+    return xgb.QuantileDMatrix(chunk_iter, max_bin=max_bin, missing=np.nan)
@@ -0,0 +1,153 @@
+# model/concurrent_training.py
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import GroupShuffleSplit
+
+from model.feature_matrix import build_compact_matrix, compute_fill_values
+from model.walk_forward import _with_threads
+
+# Matrice d'entraînement partagée, chargée une seule fois par processus de travail
+_SHARED_DATA = {}
+
+
+def _init_worker(data):
+    _SHARED_DATA.clear()
+    _SHARED_DATA.update(data)
+
+
+def build_shared_matrix(df, feature_cols, test_size=0.2, random_state=42):
+    """
+    Construit une seule fois la matrice compacte commune aux deux modèles
+    (bloc float32 et catégorielles natives, voir model/feature_matrix.py).
+
+    Un seul découpage entraînement / test par course (GroupShuffleSplit) est
+    partagé par le classifieur et le ranker. Les valeurs manquantes sont
+    remplacées par la médiane de la colonne sur les lignes d'entraînement
+    seulement (0 si la colonne y est entièrement vide).
+
+    Args:
+        df: données avec cibles (position, target_place, id_course, date_heure)
+        feature_cols: liste ordonnée des features
+
+    Returns:
+        dict (X, categories, fill_values, position, target_place, groups, dates, train_idx, test_idx)
+    """
+    data = df[df['position'].notna()].reset_index(drop=True)
+
+    groups = data['id_course'].to_numpy()
+    splitter = GroupShuffleSplit(n_splits=1, test_size=test_size, random_state=random_state)
+    train_idx, test_idx = next(splitter.split(np.zeros(len(data)), groups=groups))
+
+    # Médianes d'entraînement: les courses de test ne participent pas à l'imputation
+    fill_values = compute_fill_values(data.iloc[train_idx], feature_cols)
+    X, categories = build_compact_matrix(data, feature_cols, fill_values=fill_values)
+
+    return {
+        'X': X,
+        'categories': categories,
+        'fill_values': fill_values,
+        'feature_cols': list(feature_cols),
+        'position': data['position'].to_numpy(dtype=np.float64),
+        'target_place': (data['position'] <= 3).to_numpy(dtype=np.int32),
+        'groups': groups,
+        'dates': pd.to_datetime(data['date_heure']).to_numpy() if 'date_heure' in data.columns else None,
+        'train_idx': train_idx,
+        'test_idx': test_idx
+    }
+
+
+def _frame(rows):
+    """Sous-matrice des lignes demandées."""
+    return _SHARED_DATA['X'].iloc[rows]
+
+
+def _fit_task(category, estimator, n_jobs, base_path):
+    """
+    Entraîne un modèle sur les lignes d'entraînement de la matrice partagée
+    (exécuté dans un processus de travail).
+
+    Returns:
+        tuple: (catégorie, estimateur entraîné, informations d'arrêt anticipé)
+    """
+    from model.dual_prediction_model import DualPredictionModel
+
+    trainer = DualPredictionModel(base_path=base_path)
+    train = _SHARED_DATA['train_idx']
+    dates = _SHARED_DATA['dates']
+    groups = _SHARED_DATA['groups'][train]
+    target = _SHARED_DATA['target_place' if category == 'standard' else 'position'][train]
+
+    model = _with_threads(estimator, n_jobs)
+    model.feature_categories_ = _SHARED_DATA['categories']
+    X_fit, y_fit, X_val, y_val, groups_fit, groups_val = trainer._split_validation(
+        _frame(train), target, None if dates is None else dates[train], groups)
+
+    is_ranker = category == 'simulation' and 'rank' in type(model).__name__.lower()
+    if is_ranker:
+        training_info = trainer._fit_with_early_stopping(
+            model, X_fit, y_fit, X_val, y_val, groups_fit, groups_val)
+    else:
+        training_info = trainer._fit_with_early_stopping(model, X_fit, y_fit, X_val, y_val)
+    return category, model, training_info
+
+
+class ConcurrentTrainer:
+    """
+    Entraîne le modèle standard et le modèle de simulation en parallèle.
+
+    La sélection de features, le remplissage des valeurs manquantes et la
+    construction de la matrice compacte ne sont faits qu'une fois; la matrice
+    est transmise une fois à chaque processus de travail et les threads XGBoost
+    sont répartis entre les deux modèles.
+    """
+
+    def __init__(self, max_workers=None, base_path='model/trained_models'):
+        self.max_workers = max_workers
+        self.base_path = base_path
+        self.logger = logging.getLogger(__name__)
+
+    def _pool_size(self, n_tasks):
+        cpu_count = os.cpu_count() or 1
+        workers = max(min(n_tasks, self.max_workers or cpu_count), 1)
+        return workers, max(cpu_count // workers, 1)
+
+    def fit(self, shared, estimators):
+        """
+        Entraîne les estimateurs (non modifiés) sur la matrice partagée.
+
+        Args:
+            shared: résultat de build_shared_matrix
+            estimators: dict {'standard': classifieur, 'simulation': ranker ou régresseur}
+
+        Returns:
+            dict {catégorie: (estimateur entraîné, informations d'entraînement)}
+        """
+        tasks = [(category, estimator) for category, estimator in estimators.items() if estimator is not None]
+        workers, n_jobs = self._pool_size(len(tasks))
+        self.logger.info(f"Entraînement concurrent: {len(tasks)} modèles, {workers} processus, "
+                         f"{n_jobs} threads par modèle, matrice {shared['X'].shape}")
+
+        if workers == 1:
+            _init_worker(shared)
+            results = [_fit_task(category, estimator, n_jobs, self.base_path) for category, estimator in tasks]
+        else:
+            # spawn: pas de fork d'un processus dont les pools OpenMP sont déjà actifs
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=_init_worker, initargs=(shared,)) as executor:
+                futures = [executor.submit(_fit_task, category, estimator, n_jobs, self.base_path)
+                           for category, estimator in tasks]
+                results = [future.result() for future in futures]
+
+        fitted = {}
+        for category, model, training_info in results:
+            # Rendre au modèle entraîné le nombre de threads du gabarit pour la prédiction
+            template_params = estimators[category].get_params()
+            if 'n_jobs' in template_params:
+                model.set_params(n_jobs=template_params['n_jobs'])
+            fitted[category] = (model, training_info)
+        return fitted
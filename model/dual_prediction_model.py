@@ -148,51 +148,16 @@
         
 #         return training_data
     
-#     def parse_musique(self, musique_str):
-#         """Parse la chaîne 'musique' (performances passées) en valeurs numériques"""
-#         if pd.isna(musique_str) or not musique_str:
-#             return []
-        
-#         # Extraire tous les chiffres et 'p' (positions)
-#         performances = re.findall(r'(\d+|[pPaAtTdDrR])', musique_str)
-        
-#         # Convertir en valeurs numériques (p=0 pour les abandons, etc.)
-#         numeric_values = []
-#         for perf in performances[:5]:  # Limiter aux 5 dernières performances
-#             if perf.isdigit():
-#                 numeric_values.append(int(perf))
-#             else:
-#                 numeric_values.append(0)  # 0 pour les non-finishes
-        
-#         # Ajouter des zéros si moins de 5 performances
-#         while len(numeric_values) < 5:
-#             numeric_values.append(0)
-        
-#         return numeric_values
+#     # parse_musique: remplacé par DualPredictionModel.parse_musique, qui s'appuie sur
+#     # le noyau vectorisé data_preparation.musique.parse_musique_matrix
     
 #     def create_advanced_features(self, df):
 #         """Crée des features avancées basées sur les données historiques et statiques"""
 #         self.logger.info(f"Creating advanced features for {len(df)} rows")
         
 #         # 1. Extraire et analyser la musique (performances passées)
-#         df['musique_parsed'] = df['musique'].apply(self.parse_musique)
-        
-#         # Créer des colonnes pour chaque position passée
-#         for i in range(5):
-#             df[f'perf_{i+1}'] = df['musique_parsed'].apply(
-#                 lambda x: x[i] if i < len(x) else 0
-#             )
-        
-#         # Calculer des métriques sur les performances passées
-#         df['perf_mean'] = df['musique_parsed'].apply(
-#             lambda x: np.mean([v for v in x if v > 0]) if any(v > 0 for v in x) else 0
-#         )
-        
-#         df['perf_trend'] = df['musique_parsed'].apply(
-#             lambda x: (np.mean([x[i] for i in range(min(2, len(x))) if x[i] > 0]) - 
-#                        np.mean([x[i] for i in range(2, min(5, len(x))) if x[i] > 0]))
-#             if len([v for v in x if v > 0]) >= 3 else 0
-#         )
+#         # perf_1..perf_5, perf_mean et perf_trend: voir DualPredictionModel.create_musique_features
+#         df = DualPredictionModel().create_musique_features(df)
         
 #         # 2. Extraire les données de cotes depuis JSON
 #         if 'dernierRapportDirect' in df.columns:
@@ -537,8 +502,29 @@ from datetime import datetime
 import matplotlib.pyplot as plt
 import seaborn as sns
 import json
+import warnings
 from sqlalchemy import text
 
+from data_preparation.musique import parse_musique_matrix
+from model.ranking_metrics import compute_ranking_metrics, make_top_k_eval_metric, top_k_accuracy
+from data_preparation.feature_selection import save_selected_features, score_features, scores_cache_key
+from model.feature_matrix import (build_compact_matrix, compute_fill_values, native_feature_columns,
+                                  supports_native_categorical)
+from model.model_bundle import LATEST_MODEL_FILES, ModelBundle, bundle_path, collect_encoders
+
+# Entraînement XGBoost: méthode histogramme, nombre de threads explicite et arrêt
+# anticipé sur un ensemble de validation chronologique (dernières courses)
+XGB_N_JOBS = os.cpu_count() or 1
+EARLY_STOPPING_ROUNDS = 50
+# Places évaluées par la métrique d'arrêt anticipé des modèles de classement
+EARLY_STOPPING_TOP_K = 7
+VALIDATION_SIZE = 0.15
+
+# Mise à jour incrémentale: arbres ajoutés au modèle actif à partir des nouvelles courses
+INCREMENTAL_ROUNDS = 100
+# Meilleurs paramètres de la recherche du ranker Top 7, repris à l'initialisation
+TUNED_PARAMS_FILE = 'simulation_top7_tuned_params.json'
+
 class DualPredictionModel:
     """Classe pour la gestion des deux types de modèles: inférence standard et simulation"""
     
@@ -559,6 +545,14 @@ class DualPredictionModel:
         # Caractéristiques importantes
         self.feature_importances = {}
         
+        # Scores de la dernière sélection de features (écrits dans <modèle>_features.json)
+        self.feature_scores = None
+        # Derniers scores calculés et la clé de leurs entrées (voir scores_cache_key)
+        self._scores_cache = (None, None)
+        
+        # Bundles d'inférence (schéma de features figé) par catégorie: 'standard', 'simulation'
+        self.bundles = {}
+        
         # Créer le répertoire si nécessaire
         os.makedirs(base_path, exist_ok=True)
     
@@ -628,7 +622,7 @@ class DualPredictionModel:
                 if not os.path.isabs(model_path):
                     model_path = os.path.normpath(model_path)  # Normaliser pour éviter les doublons
             
-            self.standard_model = joblib.load(model_path)
+            self.standard_model = self._load_model_file('standard', model_path)
             self.logger.info(f"Standard model loaded from {model_path}")
             return True
         except Exception as e:
@@ -650,13 +644,78 @@ class DualPredictionModel:
                 if not os.path.isabs(model_path):
                     model_path = os.path.normpath(model_path)  # Normaliser pour éviter les doublons
             
-            self.simulation_model = joblib.load(model_path)
+            self.simulation_model = self._load_model_file('simulation', model_path)
             self.logger.info(f"Simulation model loaded from {model_path}")
             return True
         except Exception as e:
             self.logger.error(f"Error loading simulation model: {str(e)}")
             return False
         
+    def _load_model_file(self, model_category, model_path):
+        """
+        Charge un modèle: depuis son bundle s'il existe (un seul fichier avec le
+        schéma de features et les encodeurs), sinon depuis le pickle seul.
+        """
+        path = bundle_path(model_path)
+        if os.path.exists(path):
+            bundle = ModelBundle.load(path)
+        else:
+            bundle = joblib.load(model_path)
+            if not isinstance(bundle, ModelBundle):
+                self.bundles.pop(model_category, None)
+                return bundle
+        self.bundles[model_category] = bundle
+        self.logger.info(f"Model bundle v{bundle.metadata.get('bundle_version')} loaded "
+                         f"({len(bundle.feature_cols)} features)")
+        return bundle.model
+
+    def install_encoders(self, data_prep):
+        """
+        Donne à data_prep les encodeurs embarqués dans les bundles chargés, à la
+        place des pickles de data_preparation/encoders.
+
+        Returns:
+            bool: True si des encodeurs ont été installés
+        """
+        for model_category in ('standard', 'simulation'):
+            bundle = self.bundles.get(model_category)
+            if bundle is not None and bundle.install_encoders(data_prep):
+                return True
+        return False
+
+    def _inference_matrix(self, model_category, data, importance_key):
+        """
+        Matrice d'inférence du modèle courant: schéma du bundle s'il correspond au
+        modèle chargé, sinon features enregistrées (importances ou booster).
+
+        Returns:
+            DataFrame des features, ou None s'il en manque plus d'un tiers
+        """
+        model = self.standard_model if model_category == 'standard' else self.simulation_model
+        bundle = self.bundles.get(model_category)
+        if bundle is not None and bundle.model is model:
+            feature_cols = bundle.feature_cols
+            missing_features = bundle.missing_features(data)
+        else:
+            bundle = None
+            # Conserver l'ordre des features de l'entraînement (attendu par XGBoost)
+            feature_cols = list(self.feature_importances.get(importance_key, {}).keys())
+            if not feature_cols and hasattr(model, 'get_booster'):
+                feature_cols = list(model.get_booster().feature_names or [])
+            missing_features = [col for col in feature_cols if col not in data.columns]
+        
+        if missing_features and len(missing_features) > len(feature_cols) / 3:  # Si plus d'un tiers des features manquent
+            self.logger.error(f"Too many missing features for {model_category} prediction: {missing_features[:10]}...")
+            return None
+        
+        if bundle is not None:
+            return bundle.matrix(data)
+        
+        # Matrice compacte avec les catégories de l'entraînement (valeurs manquantes: médiane)
+        available_features = [col for col in feature_cols if col in data.columns]
+        return build_compact_matrix(data, available_features,
+                                    categories=getattr(model, 'feature_categories_', None))[0]
+
     def initialize_standard_model(self, model_type='xgboost'):
         """Initialise le modèle pour les prédictions standard"""
         self.standard_model_type = model_type
@@ -672,7 +731,10 @@ class DualPredictionModel:
                 scale_pos_weight=4,
                 gamma=0.5,
                 min_child_weight=3,
-
+                tree_method='hist',
+                enable_categorical=True,
+                n_jobs=XGB_N_JOBS,
+                eval_metric='logloss'
             )
 
         elif model_type == 'lightgbm':
@@ -716,7 +778,11 @@ class DualPredictionModel:
                 gamma=1.0,
                 min_child_weight=2,
                 max_delta_step=1,
-
+                tree_method='hist',
+                enable_categorical=True,
+                n_jobs=XGB_N_JOBS,
+                # Cible = position (plus petit = meilleur): NDCG favoriserait les derniers
+                eval_metric=make_top_k_eval_metric(EARLY_STOPPING_TOP_K)
             )
         elif model_type == 'xgboost_regression':
             self.simulation_model = XGBRegressor(
@@ -726,7 +792,10 @@ class DualPredictionModel:
                 subsample=0.8,
                 colsample_bytree=0.8,
                 objective='reg:squarederror',
-                random_state=42
+                random_state=42,
+                tree_method='hist',
+                enable_categorical=True,
+                n_jobs=XGB_N_JOBS
             )
         elif model_type == 'lightgbm_ranking':
             self.simulation_model = LGBMRanker(
@@ -752,6 +821,105 @@ class DualPredictionModel:
         self.logger.info(f"Initialized simulation model with type {model_type}")
         return self.simulation_model
     
+    def _split_validation(self, X_train, y_train, dates=None, groups=None, validation_size=VALIDATION_SIZE):
+        """
+        Réserve les courses les plus récentes de l'ensemble d'entraînement pour la
+        validation (arrêt anticipé). Les courses ne sont jamais coupées en deux.
+
+        Args:
+            dates: date_heure alignée sur X_train (ordre des lignes si absent)
+            groups: identifiants de course alignés sur X_train
+
+        Returns:
+            tuple: (X_fit, y_fit, X_val, y_val, groups_fit, groups_val)
+        """
+        n_rows = len(X_train)
+        if n_rows < 10 or not validation_size:
+            return X_train, y_train, None, None, groups, None
+
+        order_key = (pd.to_datetime(pd.Series(np.asarray(dates))) if dates is not None
+                     else pd.Series(np.arange(n_rows)))
+        race = pd.Series(np.asarray(groups) if groups is not None else np.arange(n_rows))
+
+        # Date d'une course = sa dernière ligne; les dernières courses vont en validation
+        race_time = order_key.groupby(race.values).max().sort_values(kind='mergesort')
+        n_val = max(1, int(round(len(race_time) * validation_size)))
+        if n_val >= len(race_time):
+            return X_train, y_train, None, None, groups, None
+        is_val = race.isin(race_time.index[-n_val:]).to_numpy()
+
+        def subset(values, mask):
+            if values is None:
+                return None
+            return values.iloc[mask] if hasattr(values, 'iloc') else np.asarray(values)[mask]
+
+        return (subset(X_train, ~is_val), subset(y_train, ~is_val),
+                subset(X_train, is_val), subset(y_train, is_val),
+                subset(groups, ~is_val), subset(groups, is_val))
+
+    def _fit_with_early_stopping(self, estimator, X_train, y_train, X_val=None, y_val=None,
+                                 groups_train=None, groups_val=None):
+        """
+        Entraîne estimator; les modèles XGBoost s'arrêtent lorsque la métrique de
+        validation ne progresse plus depuis EARLY_STOPPING_ROUNDS arbres (logloss, ou
+        erreur Top-7 course par course pour XGBRanker: positions, plus petit = meilleur).
+        Pour les modèles de classement, groups_* sont les identifiants de course:
+        les lignes sont regroupées par course avant l'entraînement.
+
+        Returns:
+            dict: nombre d'arbres retenu (best_iteration, base 0), score et taille de validation
+        """
+        def by_race(X, y, groups):
+            order = np.argsort(np.asarray(groups), kind='stable')
+            ordered_groups = np.asarray(groups)[order]
+            boundaries = np.flatnonzero(ordered_groups[1:] != ordered_groups[:-1]) + 1
+            sizes = np.diff(np.concatenate([[0], boundaries, [len(ordered_groups)]]))
+            X = X.iloc[order] if hasattr(X, 'iloc') else np.asarray(X)[order]
+            y = y.iloc[order] if hasattr(y, 'iloc') else np.asarray(y)[order]
+            return X, y, sizes
+
+        # Les groupes ne concernent que les modèles de classement
+        is_ranker = isinstance(estimator, (XGBRanker, LGBMRanker))
+        if not is_ranker:
+            groups_train = groups_val = None
+
+        fit_kwargs = {}
+        if groups_train is not None:
+            X_train, y_train, fit_kwargs['group'] = by_race(X_train, y_train, groups_train)
+
+        is_xgboost = isinstance(estimator, (XGBClassifier, XGBRanker, XGBRegressor))
+        early_stopping = is_xgboost and X_val is not None and len(X_val) > 0
+        if early_stopping:
+            estimator.set_params(early_stopping_rounds=EARLY_STOPPING_ROUNDS)
+            if isinstance(estimator, XGBRanker):
+                estimator.set_params(eval_metric=make_top_k_eval_metric(EARLY_STOPPING_TOP_K))
+            if groups_val is not None:
+                X_val, y_val, group_val = by_race(X_val, y_val, groups_val)
+                fit_kwargs['eval_group'] = [group_val]
+            fit_kwargs['eval_set'] = [(X_val, y_val)]
+            fit_kwargs['verbose'] = False
+        elif is_xgboost:
+            estimator.set_params(early_stopping_rounds=None)
+
+        estimator.fit(X_train, y_train, **fit_kwargs)
+        if early_stopping:
+            # Les clones (walk-forward, réentraînement) sont ajustés sans eval_set
+            estimator.set_params(early_stopping_rounds=None)
+
+        training_info = {
+            'early_stopping': early_stopping,
+            'n_estimators': estimator.get_params().get('n_estimators'),
+            'validation_size': 0 if X_val is None else len(X_val)
+        }
+        if early_stopping:
+            training_info['best_iteration'] = int(estimator.best_iteration)
+            training_info['best_score'] = float(estimator.best_score)
+            self.logger.info(
+                f"Arrêt anticipé: {estimator.best_iteration + 1} arbres retenus sur "
+                f"{training_info['n_estimators']} (score de validation {estimator.best_score:.4f})"
+            )
+        return training_info
+
     def create_target_variables(self, df):
         """Crée différentes variables cibles pour différents objectifs de modélisation"""
         if 'position' not in df.columns:
@@ -779,6 +947,48 @@ class DualPredictionModel:
         self.logger.info("Created multiple target variables for different modeling approaches")
         return df
     
+    def parse_musique(self, musique, n_perf=5):
+        """
+        Parse la musique (performances passées) en valeurs numériques via le noyau
+        vectorisé partagé avec EnhancedDataPreparation.
+
+        Args:
+            musique: chaîne musique ou Series de musiques
+            n_perf: nombre de performances conservées (complétées par des 0)
+
+        Returns:
+            Liste de n_perf valeurs pour une chaîne, matrice (n, n_perf) pour une Series
+        """
+        single = isinstance(musique, str) or musique is None or (np.isscalar(musique) and pd.isna(musique))
+        matrix = parse_musique_matrix([musique] if single else musique, max_len=n_perf)
+
+        values = np.zeros((len(matrix.positions), n_perf), dtype=np.int32)
+        values[:, :matrix.positions.shape[1]] = matrix.positions
+        return values[0].tolist() if single else values
+
+    def create_musique_features(self, df, n_perf=5):
+        """
+        Ajoute perf_1..perf_n, perf_mean et perf_trend à partir de la colonne musique
+        (0 pour les non-arrivées et les performances absentes).
+        """
+        if 'musique' not in df.columns:
+            return df
+
+        values = self.parse_musique(df['musique'], n_perf=n_perf).astype(np.float64)
+        for i in range(n_perf):
+            df[f'perf_{i+1}'] = values[:, i]
+
+        placed = np.where(values > 0, values, np.nan)
+        n_placed = (values > 0).sum(axis=1)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            perf_mean = np.nanmean(placed, axis=1)
+            perf_trend = np.nanmean(placed[:, :2], axis=1) - np.nanmean(placed[:, 2:], axis=1)
+
+        df['perf_mean'] = np.where(n_placed > 0, perf_mean, 0)
+        df['perf_trend'] = np.where(n_placed >= 3, perf_trend, 0)
+        return df
+
     def calcul_top_k_accuracy(self, y_true, y_pred, k=7):
         """
         Calcule la précision des prédictions dans le top k.
@@ -791,31 +1001,7 @@ class DualPredictionModel:
         Returns:
             Pourcentage de chevaux correctement prédits dans le top k
         """
-        # Grouper par course
-        unique_groups = np.unique(self.current_groups)
-        
-        correct = 0
-        total = 0
-        
-        for group in unique_groups:
-            # Filtrer les données pour cette course
-            mask = self.current_groups == group
-            y_true_group = y_true[mask]
-            y_pred_group = y_pred[mask]
-            
-            # Trouver les indices des k meilleurs selon la prédiction
-            top_k_pred_indices = np.argsort(y_pred_group)[:k]
-            
-            # Trouver les indices des k meilleurs selon la vérité terrain
-            top_k_true_indices = np.argsort(y_true_group)[:k]
-            
-            # Compter combien de chevaux sont correctement dans le top k
-            correct_in_top_k = len(set(top_k_pred_indices) & set(top_k_true_indices))
-            
-            correct += correct_in_top_k
-            total += min(k, len(top_k_true_indices))
-        
-        return correct / total if total > 0 else 0
+        return top_k_accuracy(self.current_groups, y_true, y_pred, k=k)
     
     # def select_features(self, df, target_col, exclude_cols=None):
     #     """Sélectionne les features pertinentes pour la modélisation"""
@@ -885,9 +1071,11 @@ class DualPredictionModel:
         from sklearn.model_selection import train_test_split
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=42)
         
-        # Entraîner le modèle
+        # Entraîner le modèle (validation sur les dernières courses de l'ensemble d'entraînement)
         self.logger.info(f"Training standard model on {len(X_train)} samples")
-        self.standard_model.fit(X_train, y_train)
+        dates = df['date_heure'].reindex(X_train.index) if 'date_heure' in df.columns else None
+        X_fit, y_fit, X_val, y_val, _, _ = self._split_validation(X_train, y_train, dates)
+        training_info = self._fit_with_early_stopping(self.standard_model, X_fit, y_fit, X_val, y_val)
         
         # Évaluer le modèle
         from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
@@ -948,7 +1136,8 @@ class DualPredictionModel:
             'test_size': len(X_test),
             'timestamp': timestamp,
             'feature_count': len(feature_cols),
-            'balanced': 'class_weight' in self.standard_model.get_params()
+            'balanced': 'class_weight' in self.standard_model.get_params(),
+            **training_info
         }
         
         info_path = model_path.replace('.pkl', '_info.json')
@@ -1003,12 +1192,14 @@ class DualPredictionModel:
             X_train, X_test = X.iloc[train_idx], X.iloc[test_idx]
             y_train, y_test = y.iloc[train_idx], y.iloc[test_idx]
             groups_train = groups.iloc[train_idx]
-            groups_array = np.array([sum(groups_train == g) for g in np.unique(groups_train)])
+            dates = df['date_heure'].iloc[train_idx] if 'date_heure' in df.columns else None
             
-            # Entraîner le modèle
+            # Entraîner le modèle (validation sur les dernières courses de l'ensemble d'entraînement)
             self.logger.info(f"Training simulation ranking model on {len(X_train)} samples")
-            #self.simulation_model.fit(X_train, y_train, group=groups_train)
-            self.simulation_model.fit(X_train, y_train, group=groups_array)
+            X_fit, y_fit, X_val, y_val, groups_fit, groups_val = self._split_validation(
+                X_train, y_train, dates, groups_train)
+            training_info = self._fit_with_early_stopping(
+                self.simulation_model, X_fit, y_fit, X_val, y_val, groups_fit, groups_val)
             
             # Évaluer avec des métriques spécifiques au ranking
             from sklearn.metrics import ndcg_score
@@ -1073,7 +1264,7 @@ class DualPredictionModel:
 
             # Ajouter l'évaluation du top 7
             self.current_groups = groups.iloc[test_idx]  # Stocker les groupes pour l'évaluation
-            top_7_accuracy = self.calcul_top_k_accuracy(y_test, y_pred, k=7)
+            top_7_accuracy = self.calcul_top_k_accuracy(y_test, self.simulation_model.predict(X_test), k=7)
             
             self.logger.info(f"Top-7 accuracy: {top_7_accuracy:.4f}")
             
@@ -1089,7 +1280,9 @@ class DualPredictionModel:
             
             # Entraîner le modèle
             self.logger.info(f"Training simulation regression model on {len(X_train)} samples")
-            self.simulation_model.fit(X_train, y_train)
+            dates = df['date_heure'].reindex(X_train.index) if 'date_heure' in df.columns else None
+            X_fit, y_fit, X_val, y_val, _, _ = self._split_validation(X_train, y_train, dates)
+            training_info = self._fit_with_early_stopping(self.simulation_model, X_fit, y_fit, X_val, y_val)
             
             # Évaluer le modèle avec des métriques de régression
             from sklearn.metrics import mean_squared_error, r2_score
@@ -1150,7 +1343,8 @@ class DualPredictionModel:
             'training_size': len(X_train),
             'test_size': len(X_test),
             'timestamp': timestamp,
-            'feature_count': len(feature_cols)
+            'feature_count': len(feature_cols),
+            **training_info
         }
         
         info_path = model_path.replace('.pkl', '_info.json')
@@ -1202,7 +1396,8 @@ class DualPredictionModel:
                     'learning_rate': model_params.get('learning_rate', model_params.get('eta')),
                     'subsample': model_params.get('subsample'),
                     'colsample_bytree': model_params.get('colsample_bytree'),
-                    'objective': model_params.get('objective')
+                    'objective': model_params.get('objective'),
+                    'best_iteration': model_info.get('best_iteration')
                 }
                 hyperparameters = json.dumps(important_params)
             else:
@@ -1213,7 +1408,8 @@ class DualPredictionModel:
                     'learning_rate': model_params.get('learning_rate', model_params.get('eta')),
                     'subsample': model_params.get('subsample'),
                     'colsample_bytree': model_params.get('colsample_bytree'),
-                    'objective': model_params.get('objective')
+                    'objective': model_params.get('objective'),
+                    'best_iteration': model_info.get('best_iteration')
                 }
                 hyperparameters = json.dumps(important_params)
             
@@ -1238,7 +1434,13 @@ class DualPredictionModel:
                 'created_at': current_time,
                 'updated_at': current_time
             }
-            
+
+            # Nombre d'arbres retenu par l'arrêt anticipé
+            if model_info.get('early_stopping'):
+                params['validation_method'] = 'train_test_split+early_stopping'
+                params['notes'] += (f" Early stopping: {model_info['best_iteration'] + 1} trees kept"
+                                    f" (validation score {model_info['best_score']:.4f}).")
+
             # Ajouter les métriques spécifiques à chaque type de modèle
             if model_category == 'standard':
                 params.update({
@@ -1289,17 +1491,34 @@ class DualPredictionModel:
             self.logger.error("Standard model not loaded")
             return None
         
-        # Vérifier si les features nécessaires sont disponibles
-        feature_cols = self.select_features(data, 'target_place')
-        missing_features = [col for col in feature_cols if col not in data.columns]
+        # Schéma de features du modèle (bundle): un reindex, sans sélection
+        X = self._inference_matrix('standard', data, 'enhanced')
+        if X is None:
+            return None
         
-        if missing_features:
-            self.logger.error(f"Missing features for prediction: {missing_features}")
+        return self._standard_results(data, X, return_probabilities)
+    
+    def predict_standard_batch(self, data, group_col='id_course', return_probabilities=True):
+        """
+        Prédictions standard de toutes les courses de data (une journée) avec une
+        seule matrice et un seul appel au modèle, puis découpage par course.
+        
+        Returns:
+            dict {course: DataFrame au format de predict_standard}, ou None
+        """
+        if self.standard_model is None:
+            self.logger.error("Standard model not loaded")
             return None
         
-        # Prédire
-        X = data[feature_cols]
+        X = self._inference_matrix('standard', data, 'enhanced')
+        if X is None:
+            return None
         
+        results = self._standard_results(data, X, return_probabilities, groups=data[group_col].values)
+        return self._split_by_course(results)
+    
+    def _standard_results(self, data, X, return_probabilities=True, groups=None):
+        """Résultats standard triés et classés par course (groups), une seule prédiction pour tout X."""
         if return_probabilities:
             # Retourner les probabilités d'être dans le top 3
             predictions = self.standard_model.predict_proba(X)[:, 1]
@@ -1309,21 +1528,36 @@ class DualPredictionModel:
         
         # Créer un DataFrame avec les résultats
         results = pd.DataFrame({
-            'id_cheval': data['id_cheval'],
-            'cheval_nom': data['cheval_nom'] if 'cheval_nom' in data.columns else data['id_cheval'],
+            'id_cheval': data['id_cheval'].values,
+            'cheval_nom': (data['cheval_nom'] if 'cheval_nom' in data.columns else data['id_cheval']).values,
             'top3_probability': predictions if return_probabilities else None,
             'in_top3_prediction': predictions if not return_probabilities else (predictions >= 0.5).astype(int)
         })
         
-        # Trier par probabilité décroissante
-        results = results.sort_values('top3_probability' if return_probabilities else 'in_top3_prediction', 
-                                      ascending=False).reset_index(drop=True)
-        
-        # Calculer le rang prédit
-        results['predicted_rank'] = results.index + 1
-        
+        # Trier par probabilité décroissante et calculer le rang prédit dans chaque course
+        return self._rank_by_course(results, 'top3_probability' if return_probabilities else 'in_top3_prediction',
+                                    ascending=False, groups=groups)
+    
+    def _rank_by_course(self, results, score_col, ascending, groups=None):
+        """
+        Trie les résultats par course puis par score et numérote predicted_rank
+        dans chaque course. Sans groups, toutes les lignes forment une seule course.
+        """
+        results['_course'] = 0 if groups is None else groups
+        results = results.sort_values(['_course', score_col], ascending=[True, ascending],
+                                      kind='mergesort').reset_index(drop=True)
+        results['predicted_rank'] = results.groupby('_course', sort=False).cumcount() + 1
+        if groups is None:
+            results = results.drop(columns=['_course'])
         return results
     
+    def _split_by_course(self, results):
+        """Découpe des résultats classés par _rank_by_course en un DataFrame par course."""
+        return {
+            course: group.drop(columns=['_course']).reset_index(drop=True)
+            for course, group in results.groupby('_course', sort=False)
+        }
+    
     def predict_simulation(self, data):
         """Effectue une prédiction avec le modèle de simulation (classement complet)"""
         if self.simulation_model is None:
@@ -1389,16 +1623,42 @@ class DualPredictionModel:
             min_child_weight=2,
             max_delta_step=1,
             reg_lambda=1.5,  # Utilisez reg_lambda au lieu de lambda_
-            random_state=42
-            # Supprimez ndcg_at s'il n'est pas supporté
+            random_state=42,
+            tree_method='hist',
+            enable_categorical=True,
+            n_jobs=XGB_N_JOBS,
+            # Cible = position (plus petit = meilleur): NDCG favoriserait les derniers
+            eval_metric=make_top_k_eval_metric(EARLY_STOPPING_TOP_K)
         )
         
+        # Paramètres retenus par la dernière recherche (tune_simulation_model)
+        tuned_params = self._load_tuned_params()
+        if tuned_params:
+            self.simulation_model.set_params(**tuned_params)
+            self.logger.info(f"Paramètres de recherche appliqués au modèle Top 7: {tuned_params}")
+        
         self.logger.info(f"Initialized Top-7 simulation model with XGBoost Ranking")
         return self.simulation_model
 
-    def train_top7_simulation_model(self, df, test_size=0.2, top_n_features=30, data_prep=None):
+    def _load_tuned_params(self):
+        """Paramètres enregistrés par tune_simulation_model (dict vide si absents)."""
+        params_path = os.path.join(self.base_path, TUNED_PARAMS_FILE)
+        if not os.path.exists(params_path):
+            return {}
+        try:
+            with open(params_path, 'r') as f:
+                return json.load(f).get('params', {})
+        except Exception as e:
+            self.logger.warning(f"Impossible de lire les paramètres de recherche {params_path}: {str(e)}")
+            return {}
+
+    def train_top7_simulation_model(self, df, test_size=0.2, top_n_features=30, data_prep=None, use_gain=False):
         """
         Entraîne le modèle de simulation optimisé pour le Top 7 avec features améliorées.
+
+        lieu, jockey_nom, sexe et type_course sont passés comme catégorielles natives
+        XGBoost (matrice compacte float32, voir model/feature_matrix.py): data_prep
+        n'est plus utilisé pour l'encodage et reste accepté pour compatibilité.
         """
         if self.simulation_model is None:
             self.initialize_top7_simulation_model()
@@ -1408,49 +1668,44 @@ class DualPredictionModel:
             self.logger.error("Position column required for training simulation model")
             return None, None
         
-        # Vérifier si les données sont déjà encodées
-        encoded_columns = [col for col in df.columns if col.endswith('_encoded') or col.endswith('_norm')]
-        if not encoded_columns and data_prep:
-            self.logger.info("Encodage des données pour le modèle de simulation")
-            df = data_prep.encode_features_for_model(df, is_training=False)
-        
         # Utiliser la sélection améliorée de features
-        feature_cols = self.select_features_enhanced(df, target_col='position')
-        
-        # Limiter aux top_n_features si nécessaire
-        if len(feature_cols) > top_n_features:
-            feature_cols = feature_cols[:top_n_features]
+        # Garder les top_n_features les plus liées à la position
+        feature_cols = self.select_features_enhanced(df, target_col='position', top_n=top_n_features,
+                                                     use_gain=use_gain)
         
+        # Catégorielles natives à la place des colonnes encodées (si le modèle les accepte)
+        feature_cols = native_feature_columns(df, feature_cols,
+                                              native=supports_native_categorical(self.simulation_model))
         self.logger.info(f"Training simulation model with {len(feature_cols)} features")
         
-        # Séparer les features et la cible
-        X = df[feature_cols]
         y = df['position']  # Position réelle (plus petite = meilleure)
         
         # Récupérer les groupes (courses)
         groups = df['id_course']
         
-        # Gérer les valeurs manquantes
-        for col in X.columns:
-            if X[col].isna().any():
-                X[col] = X[col].fillna(X[col].median() if not pd.isna(X[col].median()) else 0)
-        
         # Diviser en ensembles d'entraînement et de test en préservant les groupes
         from sklearn.model_selection import GroupShuffleSplit
         gss = GroupShuffleSplit(n_splits=1, test_size=test_size, random_state=42)
-        train_idx, test_idx = next(gss.split(X, y, groups))
+        train_idx, test_idx = next(gss.split(np.zeros(len(df)), y, groups))
+        
+        # Séparer les features et la cible (valeurs manquantes remplacées par la médiane
+        # des seules courses d'entraînement)
+        fill_values = compute_fill_values(df.iloc[train_idx], feature_cols)
+        X, categories = build_compact_matrix(df, feature_cols, fill_values=fill_values)
         
         X_train, X_test = X.iloc[train_idx], X.iloc[test_idx]
         y_train, y_test = y.iloc[train_idx], y.iloc[test_idx]
         groups_train = groups.iloc[train_idx]
         groups_test = groups.iloc[test_idx]
+        dates = df['date_heure'].iloc[train_idx] if 'date_heure' in df.columns else None
         
-        # Transformer les groupes en array pour XGBoost
-        groups_array = np.array([sum(groups_train == g) for g in np.unique(groups_train)])
-        
-        # Entraîner le modèle
+        # Entraîner le modèle (regroupé par course, arrêt anticipé sur les dernières courses)
         self.logger.info(f"Training Top-7 simulation model on {len(X_train)} samples")
-        self.simulation_model.fit(X_train, y_train, group=groups_array)
+        X_fit, y_fit, X_val, y_val, groups_fit, groups_val = self._split_validation(
+            X_train, y_train, dates, groups_train)
+        training_info = self._fit_with_early_stopping(
+            self.simulation_model, X_fit, y_fit, X_val, y_val, groups_fit, groups_val)
+        self.simulation_model.feature_categories_ = categories
         
         # Évaluer le modèle avec des métriques pour le Top-7
         unique_test_groups = groups_test.unique()
@@ -1483,6 +1738,7 @@ class DualPredictionModel:
             importance_path = model_path.replace('.pkl', '_importance.json')
             with open(importance_path, 'w') as f:
                 json.dump(self.feature_importances['simulation_top7'], f, indent=4)
+        self._save_feature_selection(model_path, feature_cols)
         
         # Sauvegarder les informations de performance
         model_info = {
@@ -1492,7 +1748,9 @@ class DualPredictionModel:
             'test_size': len(X_test),
             'timestamp': timestamp,
             'feature_count': len(feature_cols),
-            'top7_optimized': True
+            'categorical_features': list(categories),
+            'top7_optimized': True,
+            **training_info
         }
         
         info_path = model_path.replace('.pkl', '_info.json')
@@ -1500,119 +1758,36 @@ class DualPredictionModel:
             json.dump(model_info, f, indent=4)
         
         self.logger.info(f"Top-7 simulation model saved to {model_path}")
+        self._save_bundle('simulation', model_path, feature_cols, categories, fill_values, model_info, data_prep)
         self._save_model_to_db('simulation', model_path, model_info)
         
         return metrics, model_path
 
 
     def evaluate_top7_performance(self, X_test, y_test, groups_test, unique_test_groups):
-        """Évalue la performance du modèle pour le Top 7."""
+        """
+        Évalue la performance du modèle pour le Top 7.
+
+        Une seule prédiction est faite sur toute la matrice de test, puis les
+        métriques (NDCG, gagnant, Top 3/5/7, quinté) sont calculées pour toutes
+        les courses à la fois par tri segmenté (voir model/ranking_metrics.py).
+        """
         try:
-            from sklearn.metrics import ndcg_score
-            
-            ndcg_scores = []
-            winners_correct = 0
-            top3_correct = 0
-            top5_correct = 0
-            top7_correct = 0
-            quinte_exact_count = 0    # Cette variable était manquante
-            quinte_desordre_count = 0 # Cette variable était manquante
-            total_races = 0
-            
-            for group in unique_test_groups:
-                # Filtrer pour cette course
-                group_mask = groups_test == group
-                X_group = X_test[group_mask].copy()
-                y_group = y_test[group_mask].copy()
-                
-                if len(X_group) > 4:  # Besoin d'au moins 5 chevaux
-                    # Prédire les positions
-                    y_pred = self.simulation_model.predict(X_group)
-                    
-                    # Convertir en indices pour le tri
-                    y_pred_with_idx = [(i, pred) for i, pred in enumerate(y_pred)]
-                    y_true_with_idx = [(i, true) for i, true in enumerate(y_group)]
-                    
-                    # Trier par score prédit (plus petit = meilleur)
-                    y_pred_sorted = sorted(y_pred_with_idx, key=lambda x: x[1])
-                    y_pred_sorted_idx = [idx for idx, _ in y_pred_sorted]
-                    
-                    # Trier par position réelle (plus petit = meilleur)
-                    y_true_sorted = sorted(y_true_with_idx, key=lambda x: x[1])
-                    y_true_sorted_idx = [idx for idx, _ in y_true_sorted]
-                    
-                    # NDCG score pour cette course
-                    try:
-                        # Pour ndcg_score, inverser les positions (plus petit = meilleur)
-                        max_pos = y_group.max()
-                        y_true_ndcg = max_pos - y_group.values + 1  # Assurez-vous d'avoir des valeurs
-                        score = ndcg_score([y_true_ndcg.tolist()], [y_pred.tolist()])
-                        ndcg_scores.append(score)
-                    except Exception as ndcg_error:
-                        self.logger.debug(f"Erreur calcul NDCG: {ndcg_error}")
-                        # Continue même si le calcul NDCG échoue
-                    
-                    # Vérifier si le gagnant est correctement prédit
-                    if len(y_true_sorted_idx) > 0 and len(y_pred_sorted_idx) > 0:
-                        if y_true_sorted_idx[0] == y_pred_sorted_idx[0]:
-                            winners_correct += 1
-                    
-                    # Vérifier le Top 3
-                    if len(y_true_sorted_idx) >= 3 and len(y_pred_sorted_idx) >= 3:
-                        pred_top3 = set(y_pred_sorted_idx[:3])
-                        true_top3 = set(y_true_sorted_idx[:3])
-                        if len(pred_top3.intersection(true_top3)) >= 2:  # Au moins 2 sur 3 corrects
-                            top3_correct += 1
-                    
-                    # Vérifier le Top 5 (Quinté)
-                    if len(y_true_sorted_idx) >= 5 and len(y_pred_sorted_idx) >= 5:
-                        pred_top5 = set(y_pred_sorted_idx[:5])
-                        true_top5 = set(y_true_sorted_idx[:5])
-                        if len(pred_top5.intersection(true_top5)) >= 3:  # Au moins 3 sur 5 corrects
-                            top5_correct += 1
-                            
-                            # Quinté dans le désordre (tous les 5 chevaux sans ordre)
-                            if len(pred_top5.intersection(true_top5)) == 5:
-                                quinte_desordre_count += 1
-                                
-                                # Quinté exact (5 dans l'ordre)
-                                if all(y_pred_sorted_idx[i] == y_true_sorted_idx[i] for i in range(5)):
-                                    quinte_exact_count += 1
-                    
-                    # Vérifier le Top 7
-                    if len(y_true_sorted_idx) >= 7 and len(y_pred_sorted_idx) >= 7:
-                        pred_top7 = set(y_pred_sorted_idx[:7])
-                        true_top7 = set(y_true_sorted_idx[:7])
-                        if len(pred_top7.intersection(true_top7)) >= 4:  # Au moins 4 sur 7 corrects
-                            top7_correct += 1
-                    
-                    total_races += 1
-        
-            # S'assurer que total_races n'est pas zéro pour éviter la division par zéro
-            if total_races == 0:
+            group_mask = np.asarray(pd.Series(groups_test).isin(unique_test_groups))
+            X_eval = X_test[group_mask]
+            y_eval = np.asarray(y_test, dtype=np.float64)[group_mask]
+            groups_eval = np.asarray(groups_test)[group_mask]
+
+            if len(X_eval) == 0:
+                y_pred = np.array([], dtype=np.float64)
+            else:
+                y_pred = self.simulation_model.predict(X_eval)
+
+            metrics = compute_ranking_metrics(groups_eval, y_eval, y_pred)
+
+            if metrics['total_races_evaluated'] == 0:
                 self.logger.warning("Aucune course valide pour l'évaluation")
-                return {
-                    'ndcg_score': 0.0,
-                    'winner_accuracy': 0.0,
-                    'top3_accuracy': 0.0,
-                    'top5_accuracy': 0.0,
-                    'top7_accuracy': 0.0,
-                    'quinte_exact_rate': 0.0,
-                    'quinte_desordre_rate': 0.0,
-                    'total_races_evaluated': 0
-                }
-            
-            # Calculer les métriques finales
-            metrics = {
-                'ndcg_score': float(np.mean(ndcg_scores)) if ndcg_scores else 0.0,
-                'winner_accuracy': float(winners_correct / total_races),
-                'top3_accuracy': float(top3_correct / total_races),
-                'top5_accuracy': float(top5_correct / total_races),
-                'top7_accuracy': float(top7_correct / total_races),
-                'quinte_exact_rate': float(quinte_exact_count / total_races),
-                'quinte_desordre_rate': float(quinte_desordre_count / total_races),
-                'total_races_evaluated': total_races
-            }
+                return metrics
             
             # Afficher les métriques dans les logs
             self.logger.info(f"Résultats d'évaluation Top-7:")
@@ -1629,6 +1804,7 @@ class DualPredictionModel:
             # Retourner des métriques par défaut en cas d'erreur
             return {
                 'ndcg_score': 0.0,
+                'ndcg_at_7': 0.0,
                 'winner_accuracy': 0.0,
                 'top3_accuracy': 0.0,
                 'top5_accuracy': 0.0,
@@ -1647,54 +1823,61 @@ class DualPredictionModel:
             self.logger.error("Top-7 simulation model not loaded")
             return None
         
-        # Vérifier si les features nécessaires sont disponibles
-        feature_cols = set(self.feature_importances.get('simulation_top7', {}).keys())
-        missing_features = [col for col in feature_cols if col not in data.columns]
-        
-        if missing_features and len(missing_features) > len(feature_cols) / 3:  # Si plus d'un tiers des features manquent
-            self.logger.error(f"Too many missing features for Top-7 prediction: {missing_features[:10]}...")
+        # Schéma de features du modèle (bundle): un reindex, sans sélection
+        X = self._inference_matrix('simulation', data, 'simulation_top7')
+        if X is None:
             return None
         
-        # Utiliser toutes les features disponibles
-        available_features = [col for col in feature_cols if col in data.columns]
-        X = data[available_features]
+        return self._top7_results(data, X)
+    
+    def predict_top7_batch(self, data, group_col='id_course'):
+        """
+        Prédictions Top 7 de toutes les courses de data (une journée) avec une
+        seule matrice et un seul appel au modèle, puis découpage par course.
         
-        # Remplir les valeurs manquantes
-        for col in X.columns:
-            if X[col].isna().any():
-                X[col] = X[col].fillna(X[col].median() if not pd.isna(X[col].median()) else 0)
+        Returns:
+            dict {course: DataFrame au format de predict_top7}, ou None
+        """
+        if self.simulation_model is None:
+            self.logger.error("Top-7 simulation model not loaded")
+            return None
+        
+        X = self._inference_matrix('simulation', data, 'simulation_top7')
+        if X is None:
+            return None
         
+        results = self._top7_results(data, X, groups=data[group_col].values)
+        return self._split_by_course(results)
+    
+    def _top7_results(self, data, X, groups=None):
+        """Résultats Top 7 classés et normalisés par course (groups), une seule prédiction pour tout X."""
         # Prédire
         predictions = self.simulation_model.predict(X)
         
         # Créer un DataFrame avec les résultats
         results = pd.DataFrame({
-            'id_cheval': data['id_cheval'],
-            'cheval_nom': data['cheval_nom'] if 'cheval_nom' in data.columns else data['id_cheval'],
+            'id_cheval': data['id_cheval'].values,
+            'cheval_nom': (data['cheval_nom'] if 'cheval_nom' in data.columns else data['id_cheval']).values,
             'predicted_rank_score': predictions
         })
         
-        # Trier par score prédit (plus petit = meilleur rang)
-        results = results.sort_values('predicted_rank_score').reset_index(drop=True)
+        # Ajouter les informations originales si disponibles
+        info_cols = [col for col in ['jockey_nom', 'poids', 'cote_finale', 'age', 'sexe', 'musique']
+                     if col in data.columns]
+        for col in info_cols:
+            results[col] = data[col].values
         
-        # Ajouter le rang prédit (1 à n)
-        results['predicted_rank'] = results.index + 1
+        # Trier par score prédit (plus petit = meilleur rang) et ajouter le rang prédit (1 à n)
+        results = self._rank_by_course(results, 'predicted_rank_score', ascending=True, groups=groups)
+        course = results['_course'] if groups is not None else np.zeros(len(results))
         
         # Calculer les probabilités de finir dans le top-k
-        # (Estimation basée sur un modèle de scoring)
-        results['in_top1_prob'] = np.exp(-0.5 * results['predicted_rank_score'])
-        results['in_top3_prob'] = np.exp(-0.2 * results['predicted_rank_score'])
-        results['in_top5_prob'] = np.exp(-0.1 * results['predicted_rank_score'])
-        results['in_top7_prob'] = np.exp(-0.05 * results['predicted_rank_score'])
-        
-        # Normaliser les probabilités
-        for prob_col in ['in_top1_prob', 'in_top3_prob', 'in_top5_prob', 'in_top7_prob']:
-            results[prob_col] = results[prob_col] / results[prob_col].sum()
-        
-        # Ajouter les informations originales si disponibles
-        for col in ['jockey_nom', 'poids', 'cote_finale', 'age', 'sexe', 'musique']:
-            if col in data.columns:
-                results[col] = data.set_index('id_cheval').loc[results['id_cheval']][col].values
+        # (Estimation basée sur un modèle de scoring), normalisées dans chaque course
+        for prob_col, decay in [('in_top1_prob', 0.5), ('in_top3_prob', 0.2),
+                                ('in_top5_prob', 0.1), ('in_top7_prob', 0.05)]:
+            prob = np.exp(-decay * results['predicted_rank_score'])
+            results[prob_col] = prob / prob.groupby(course).transform('sum')
+        results = results[[col for col in results.columns if col not in info_cols] + info_cols]
         
         # Marquer les picks pour différents types de paris
         results['tierce_pick'] = (results['predicted_rank'] <= 3).astype(int)
@@ -1704,7 +1887,8 @@ class DualPredictionModel:
         
         return results
 
-    def train_with_enhanced_features(self, df, target_col='target_place', test_size=0.2, top_n_features=30, data_prep=None):
+    def train_with_enhanced_features(self, df, target_col='target_place', test_size=0.2, top_n_features=30, data_prep=None,
+                                     use_gain=False):
 
         """
         Entraîne le modèle avec la sélection améliorée de features.
@@ -1714,6 +1898,8 @@ class DualPredictionModel:
             target_col: Colonne cible (par défaut 'target_place')
             test_size: Proportion des données pour le test (par défaut 0.2)
             top_n_features: Nombre de features importantes à sélectionner (par défaut 30)
+            data_prep: conservé pour compatibilité; lieu, jockey_nom, sexe et type_course
+                sont passés comme catégorielles natives XGBoost au lieu d'être encodés
             
         Returns:
             tuple: (accuracy, model_path) pour le modèle standard
@@ -1727,20 +1913,9 @@ class DualPredictionModel:
             self.logger.error(f"La colonne cible {target_col} n'existe pas dans les données")
             return None, None
         
-        # Vérifier si les données sont déjà encodées
-        encoded_columns = [col for col in df.columns if col.endswith('_encoded') or col.endswith('_norm')]
-        if not encoded_columns:
-            self.logger.info("Les données ne sont pas encore encodées, application de l'encodage")
-            # Vous devez avoir accès à data_prep ou implémenter l'encodage ici
-            # Par exemple: df = self.data_prep.encode_features_for_model(df)
-            # Si vous n'avez pas accès à data_prep, vous pouvez utiliser une approche de secours
-
-        if data_prep and not encoded_columns:
-            self.logger.info("Encodage des données avec data_prep")
-            df = data_prep.encode_features_for_model(df)
-        
         # Méthode de sélection de features modifiée pour s'assurer qu'elle trouve toujours quelque chose
-        feature_cols = self.select_features_enhanced(df, target_col)
+        # (classées par pertinence vis-à-vis de la cible, top_n_features gardées)
+        feature_cols = self.select_features_enhanced(df, target_col, top_n=top_n_features, use_gain=use_gain)
         
         if not feature_cols:
             self.logger.warning("Aucune feature trouvée avec la méthode habituelle, utilisation d'une méthode de secours")
@@ -1749,45 +1924,33 @@ class DualPredictionModel:
                             'target_place', 'target_win', 'target_rank', 'target_position_score']
             feature_cols = [col for col in df.columns 
                             if pd.api.types.is_numeric_dtype(df[col]) and col not in exclude_cols]
+            feature_cols = feature_cols[:top_n_features]
         
         self.logger.info(f"Entraînement avec {len(feature_cols)} features")
         
-        # Limiter aux top_n_features si nécessaire
-        if len(feature_cols) > top_n_features:
-            # Utiliser les top_n_features les plus importantes si disponibles
-            if hasattr(self, 'feature_importances') and 'standard' in self.feature_importances:
-                # Trier les features par importance
-                sorted_features = sorted(
-                    self.feature_importances['standard'].items(), 
-                    key=lambda x: x[1], 
-                    reverse=True
-                )
-                # Prendre les top_n_features
-                feature_cols = [f for f, _ in sorted_features[:top_n_features] if f in feature_cols]
-            else:
-                # Sinon juste prendre les premières
-                feature_cols = feature_cols[:top_n_features]
-        
-        # Séparer les features et la cible
-        X = df[feature_cols]
-        y = df[target_col]
-        
-        # Gérer les valeurs manquantes
-        for col in X.columns:
-            if X[col].isna().any():
-                median_value = X[col].median()
-                if pd.isna(median_value):  # Si la médiane est aussi NaN
-                    X[col] = X[col].fillna(0)
-                else:
-                    X[col] = X[col].fillna(median_value)
+        # Catégorielles natives à la place des colonnes encodées (si le modèle les accepte)
+        feature_cols = native_feature_columns(df, feature_cols,
+                                              native=supports_native_categorical(self.standard_model))
         
         # Diviser en ensembles d'entraînement et de test
         from sklearn.model_selection import train_test_split
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=42)
+        train_idx, test_idx = train_test_split(np.arange(len(df)), test_size=test_size, random_state=42)
+        
+        # Séparer les features et la cible (matrice compacte float32, médiane des lignes
+        # d'entraînement pour les manquants)
+        fill_values = compute_fill_values(df.iloc[train_idx], feature_cols)
+        X, categories = build_compact_matrix(df, feature_cols, fill_values=fill_values)
+        y = df[target_col]
+        X_train, X_test = X.iloc[train_idx], X.iloc[test_idx]
+        y_train, y_test = y.iloc[train_idx], y.iloc[test_idx]
         
-        # Entraîner le modèle
+        # Entraîner le modèle (validation sur les dernières courses de l'ensemble d'entraînement)
         self.logger.info(f"Training enhanced model on {len(X_train)} samples with {len(feature_cols)} features")
-        self.standard_model.fit(X_train, y_train)
+        dates = df['date_heure'].reindex(X_train.index) if 'date_heure' in df.columns else None
+        groups = df['id_course'].reindex(X_train.index) if 'id_course' in df.columns else None
+        X_fit, y_fit, X_val, y_val, _, _ = self._split_validation(X_train, y_train, dates, groups)
+        training_info = self._fit_with_early_stopping(self.standard_model, X_fit, y_fit, X_val, y_val)
+        self.standard_model.feature_categories_ = categories
         
         # Évaluer le modèle
         from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
@@ -1836,6 +1999,7 @@ class DualPredictionModel:
             importance_path = model_path.replace('.pkl', '_importance.json')
             with open(importance_path, 'w') as f:
                 json.dump(self.feature_importances['enhanced'], f, indent=4)
+        self._save_feature_selection(model_path, feature_cols)
         
         # Sauvegarder les informations de performance
         model_info = {
@@ -1848,7 +2012,9 @@ class DualPredictionModel:
             'test_size': len(X_test),
             'timestamp': timestamp,
             'feature_count': len(feature_cols),
-            'enhanced': True
+            'categorical_features': list(categories),
+            'enhanced': True,
+            **training_info
         }
         
         info_path = model_path.replace('.pkl', '_info.json')
@@ -1856,15 +2022,466 @@ class DualPredictionModel:
             json.dump(model_info, f, indent=4)
         
         self.logger.info(f"Enhanced model saved to {model_path}")
+        self._save_bundle('standard', model_path, feature_cols, categories, fill_values, model_info, data_prep)
         # Enregistrer dans la base de données (table model_versions)
         self._save_model_to_db('standard', model_path, model_info)
         
         return accuracy, model_path
     
-    def select_features_enhanced(self, df, target_col='target_place', exclude_cols=None):
+    def train_from_chunks(self, chunk_factory, model_category='standard', feature_cols=None,
+                          target_col=None, eval_data=None, external_memory=False, cache_dir=None):
+        """
+        Entraîne un modèle XGBoost en flux à partir de morceaux de données, sans
+        charger toute la période en mémoire.
+
+        Args:
+            chunk_factory: ChunkCache, ou callable retournant un nouvel itérable de
+                DataFrames enrichis (par exemple lambda: data_prep.iter_training_data(start_date, end_date)),
+                matérialisé alors une fois sur disque dans cache_dir
+            model_category: 'standard' (classification top 3) ou 'simulation' (classement)
+            feature_cols: liste de features; sélectionnée sur le premier morceau parmi
+                les colonnes présentes dans tous les morceaux si absente
+            target_col: colonne cible ('target_place' ou 'position' par défaut)
+            eval_data: DataFrame optionnel (par exemple le dernier mois) pour l'évaluation
+            external_memory: met la matrice en cache sur disque au lieu de la garder en mémoire
+            cache_dir: répertoire des morceaux matérialisés et du cache external_memory
+
+        Returns:
+            tuple: (metrics, model_path)
+        """
+        import xgboost as xgb
+        from model.chunk_iterator import ChunkCache, TrainingChunkIter, build_chunk_dmatrix
+
+        if model_category == 'standard':
+            if self.standard_model is None:
+                self.initialize_standard_model()
+            estimator, model_type = self.standard_model, self.standard_model_type
+            target_col = target_col or 'target_place'
+            group_col = None
+        elif model_category == 'simulation':
+            if self.simulation_model is None:
+                self.initialize_simulation_model()
+            estimator, model_type = self.simulation_model, self.simulation_model_type
+            target_col = target_col or 'position'
+            group_col = 'id_course'
+        else:
+            raise ValueError(f"Catégorie de modèle inconnue: {model_category}")
+
+        if not isinstance(estimator, (XGBClassifier, XGBRanker)):
+            raise ValueError(f"L'entraînement en flux nécessite un modèle XGBoost (type actuel: {model_type})")
+
+        cache_dir = cache_dir or os.path.join(self.base_path, 'cache')
+
+        # Requêtes et features exécutées une seule fois: les passes de XGBoost relisent le disque
+        owned_cache = not isinstance(chunk_factory, ChunkCache)
+        chunks = ChunkCache.build(chunk_factory, cache_dir, prepare_chunk=self.create_target_variables) \
+            if owned_cache else chunk_factory
+        try:
+            if not len(chunks):
+                self.logger.error("Aucune donnée d'entraînement trouvée")
+                return None, None
+
+            if feature_cols is None:
+                feature_cols = sorted(self.select_features_enhanced(chunks.first()))
+
+            cache_prefix = None
+            if external_memory:
+                cache_prefix = os.path.join(cache_dir, f'{model_category}_chunks')
+
+            chunk_iter = TrainingChunkIter(
+                chunks, feature_cols, target_col, group_col=group_col, cache_prefix=cache_prefix
+            )
+            dtrain = build_chunk_dmatrix(chunk_iter, external_memory=external_memory)
+        finally:
+            if owned_cache:
+                chunks.cleanup()
+
+        params = {k: v for k, v in estimator.get_xgb_params().items() if v is not None}
+        params['tree_method'] = 'hist'
+        num_boost_round = estimator.get_params().get('n_estimators') or 100
+
+        self.logger.info(
+            f"Training {model_category} model from chunks: {dtrain.num_row()} rows, "
+            f"{len(feature_cols)} features, {num_boost_round} rounds"
+        )
+        booster = xgb.train(params, dtrain, num_boost_round=num_boost_round)
+        del dtrain
+
+        # Recharger le booster dans l'estimateur scikit-learn pour les prédictions existantes
+        estimator.load_model(bytearray(booster.save_raw(raw_format='ubj')))
+
+        metrics = {}
+        if eval_data is not None and not eval_data.empty:
+            eval_data = self.create_target_variables(eval_data)
+            eval_data = eval_data[eval_data[target_col].notna()]
+            X_eval = chunk_iter.to_matrix(eval_data)
+            if model_category == 'standard':
+                y_pred = estimator.predict(X_eval)
+                y_eval = eval_data[target_col]
+                metrics = {
+                    'accuracy': float(accuracy_score(y_eval, y_pred)),
+                    'precision': float(precision_score(y_eval, y_pred, zero_division=0)),
+                    'recall': float(recall_score(y_eval, y_pred, zero_division=0)),
+                    'f1_score': float(f1_score(y_eval, y_pred, zero_division=0))
+                }
+            else:
+                scores = estimator.predict(X_eval)
+                eval_frame = pd.DataFrame({
+                    'id_course': eval_data['id_course'].values,
+                    'position': eval_data['position'].values,
+                    'score': scores
+                })
+                # Même convention que train_simulation_model: score le plus faible = gagnant prédit
+                best = eval_frame.loc[eval_frame.groupby('id_course')['score'].idxmin()]
+                metrics = {'winner_accuracy': float((best['position'] == 1).mean())}
+            self.logger.info(f"Streaming model evaluation: {metrics}")
+
+        feature_importances = {
+            feature: float(importance)
+            for feature, importance in zip(feature_cols, estimator.feature_importances_)
+        }
+        self.feature_importances[model_category] = feature_importances
+
+        # Sauvegarder le modèle
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        model_path = f"{self.base_path}/{model_category}_{model_type}_streaming_{timestamp}.pkl"
+        joblib.dump(estimator, model_path)
+
+        with open(model_path.replace('.pkl', '_importance.json'), 'w') as f:
+            json.dump(feature_importances, f, indent=4)
+
+        model_info = {
+            'model_type': model_type,
+            'training_size': int(chunk_iter.rows_seen),
+            'test_size': 0 if eval_data is None else len(eval_data),
+            'timestamp': timestamp,
+            'feature_count': len(feature_cols),
+            'features': list(feature_cols),
+            'streaming': True,
+            'external_memory': external_memory
+        }
+        if model_category == 'standard':
+            for key in ('accuracy', 'precision', 'recall', 'f1_score'):
+                model_info[key] = metrics.get(key)
+        else:
+            model_info['metrics'] = metrics
+
+        with open(model_path.replace('.pkl', '_info.json'), 'w') as f:
+            json.dump(model_info, f, indent=4)
+
+        self.logger.info(f"Streaming {model_category} model saved to {model_path}")
+        self._save_model_to_db(model_category, model_path, model_info)
+
+        return metrics, model_path
+
+    def walk_forward_validate(self, df, feature_cols=None, min_train_days=60, test_days=7,
+                              max_folds=None, max_workers=None, engine=None):
+        """
+        Validation croisée chronologique des modèles standard et de simulation:
+        fenêtre d'entraînement croissante sur date_heure, évaluation sur la semaine
+        suivante, folds exécutés en parallèle (voir model/walk_forward.py).
+        Les modèles courants servent de gabarits et ne sont pas modifiés.
+
+        Returns:
+            tuple: (rapport des métriques par fold et agrégées, chemin du rapport JSON)
+        """
+        from model.walk_forward import WalkForwardValidator
+
+        if self.standard_model is None:
+            self.initialize_standard_model()
+        if self.simulation_model is None:
+            self.initialize_simulation_model()
+
+        df = self.create_target_variables(df)
+        if feature_cols is None:
+            feature_cols = sorted(self.select_features_enhanced(df))
+
+        validator = WalkForwardValidator(
+            min_train_days=min_train_days, test_days=test_days, max_folds=max_folds,
+            max_workers=max_workers, report_dir=os.path.join(self.base_path, 'cv'), engine=engine
+        )
+        report = validator.run(df, feature_cols, self.standard_model, self.simulation_model)
+        if not report['folds']:
+            return report, None
+
+        report_path = validator.save_report(report, self.standard_model, self.simulation_model)
+        return report, report_path
+
+    def tune_simulation_model(self, df, feature_cols=None, n_candidates=27, factor=3, n_splits=3,
+                              max_workers=None, max_seconds=None, apply_best=True):
+        """
+        Recherche d'hyperparamètres du ranker de simulation par divisions successives,
+        le nombre d'arbres servant de ressource (voir model/ranker_tuning.py).
+        Le nombre d'arbres maximal est celui du modèle courant.
+
+        Args:
+            apply_best: enregistrer les meilleurs paramètres (TUNED_PARAMS_FILE, repris
+                par initialize_top7_simulation_model) puis réentraîner et sauvegarder
+                le modèle Top 7 avec ces paramètres
+
+        Returns:
+            tuple: (rapport avec le classement des essais et, avec apply_best, le
+            modèle réentraîné dans report['refit'], chemin du rapport JSON)
+        """
+        from model.ranker_tuning import RankerHalvingTuner
+
+        if self.simulation_model is None:
+            self.initialize_top7_simulation_model()
+        if not isinstance(self.simulation_model, XGBRanker):
+            raise ValueError(f"La recherche par divisions successives nécessite un XGBRanker "
+                             f"(type actuel: {self.simulation_model_type})")
+
+        if feature_cols is None:
+            feature_cols = sorted(self.select_features_enhanced(df))
+
+        tuner = RankerHalvingTuner(
+            n_candidates=n_candidates, factor=factor, n_splits=n_splits,
+            max_resource=self.simulation_model.get_params().get('n_estimators') or 1500,
+            max_workers=max_workers, max_seconds=max_seconds,
+            report_dir=os.path.join(self.base_path, 'tuning')
+        )
+        report = tuner.run(df, feature_cols, self.simulation_model)
+        report_path = tuner.save_leaderboard(report)
+
+        if apply_best:
+            params_path = os.path.join(self.base_path, TUNED_PARAMS_FILE)
+            with open(params_path, 'w') as f:
+                json.dump({'params': report['best_params'], 'metric': report['metric'],
+                           'best_score': report['best_score'], 'report_path': report_path,
+                           'timestamp': datetime.now().strftime('%Y%m%d_%H%M%S')}, f, indent=4, default=str)
+            self.logger.info(f"Paramètres du modèle de simulation enregistrés dans {params_path}: "
+                             f"{report['best_params']}")
+
+            # Nouveau ranker avec les meilleurs paramètres, entraîné et sauvegardé
+            self.simulation_model = None
+            self.initialize_top7_simulation_model()
+            metrics, model_path = self.train_top7_simulation_model(df)
+            report['refit'] = {'model_path': model_path, 'metrics': metrics}
+        return report, report_path
+
+    def train_concurrently(self, df, test_size=0.2, top_n_features=30, data_prep=None, max_workers=None,
+                           use_gain=False):
+        """
+        Entraîne en parallèle le modèle standard (top 3) et le modèle de simulation
+        Top 7 à partir d'une seule matrice float32 (sélection de features et
+        remplissage par la médiane faits une fois, même découpage par course).
+        Les modèles courants servent de gabarits (voir model/concurrent_training.py);
+        data_prep est conservé pour compatibilité (catégorielles natives, sans encodage).
+
+        Returns:
+            dict: standard_accuracy, standard_path, simulation_metrics, simulation_path
+        """
+        from model.concurrent_training import ConcurrentTrainer, build_shared_matrix
+
+        if self.standard_model is None:
+            self.initialize_standard_model()
+        if self.simulation_model is None:
+            self.initialize_top7_simulation_model()
+
+        if 'position' not in df.columns:
+            self.logger.error("Position column required for training")
+            return None
+
+        if 'target_place' not in df.columns:
+            df = self.create_target_variables(df)
+
+        # Sélection commune aux deux modèles: les plus liées à la position
+        feature_cols = self.select_features_enhanced(df, target_col='position', top_n=top_n_features,
+                                                     use_gain=use_gain)
+        feature_cols = native_feature_columns(
+            df, feature_cols, native=supports_native_categorical(self.standard_model, self.simulation_model))
+
+        shared = build_shared_matrix(df, feature_cols, test_size=test_size)
+        trainer = ConcurrentTrainer(max_workers=max_workers, base_path=self.base_path)
+        fitted = trainer.fit(shared, {'standard': self.standard_model, 'simulation': self.simulation_model})
+        self.standard_model, standard_info = fitted['standard']
+        self.simulation_model, simulation_info = fitted['simulation']
+
+        train_idx, test_idx = shared['train_idx'], shared['test_idx']
+        X_test = shared['X'].iloc[test_idx]
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+        # Modèle standard
+        y_test = shared['target_place'][test_idx]
+        y_pred = self.standard_model.predict(X_test)
+        standard_metrics = {
+            'accuracy': float(accuracy_score(y_test, y_pred)),
+            'precision': float(precision_score(y_test, y_pred, zero_division=0)),
+            'recall': float(recall_score(y_test, y_pred, zero_division=0)),
+            'f1_score': float(f1_score(y_test, y_pred, zero_division=0))
+        }
+        self.logger.info(f"Enhanced model performance: {standard_metrics}")
+        standard_path = self._save_concurrent_model(
+            'standard', 'enhanced', f"enhanced_{self.standard_model_type}_{timestamp}.pkl", feature_cols,
+            shared, {'model_type': self.standard_model_type, **standard_metrics, 'training_size': len(train_idx),
+             'test_size': len(test_idx), 'timestamp': timestamp, 'feature_count': len(feature_cols),
+             'categorical_features': list(shared['categories']), 'enhanced': True, 'concurrent': True,
+             **standard_info})
+
+        # Modèle de simulation Top 7
+        groups_test = pd.Series(shared['groups'][test_idx])
+        simulation_metrics = self.evaluate_top7_performance(
+            X_test, shared['position'][test_idx], groups_test, groups_test.unique())
+        simulation_path = self._save_concurrent_model(
+            'simulation', 'simulation_top7', f"simulation_top7_{self.simulation_model_type}_{timestamp}.pkl",
+            feature_cols, shared,
+            {'model_type': self.simulation_model_type, 'metrics': simulation_metrics,
+             'training_size': len(train_idx), 'test_size': len(test_idx), 'timestamp': timestamp,
+             'feature_count': len(feature_cols), 'categorical_features': list(shared['categories']),
+             'top7_optimized': True, 'concurrent': True, **simulation_info})
+
+        return {
+            'standard_accuracy': standard_metrics['accuracy'],
+            'standard_path': standard_path,
+            'simulation_metrics': simulation_metrics,
+            'simulation_path': simulation_path
+        }
+
+    def _save_concurrent_model(self, model_category, importance_key, file_name, feature_cols, shared, model_info):
+        """
+        Écrit le modèle, ses importances, _features.json, _info.json et son bundle
+        (schéma de la matrice partagée) puis l'enregistre dans model_versions.
+        """
+        model = self.standard_model if model_category == 'standard' else self.simulation_model
+
+        if hasattr(model, 'feature_importances_'):
+            self.feature_importances[importance_key] = {
+                feature: float(importance)
+                for feature, importance in zip(feature_cols, model.feature_importances_)
+            }
+
+        model_path = f"{self.base_path}/{file_name}"
+        joblib.dump(model, model_path)
+
+        if importance_key in self.feature_importances:
+            with open(model_path.replace('.pkl', '_importance.json'), 'w') as f:
+                json.dump(self.feature_importances[importance_key], f, indent=4)
+        self._save_feature_selection(model_path, feature_cols)
+
+        with open(model_path.replace('.pkl', '_info.json'), 'w') as f:
+            json.dump(model_info, f, indent=4)
+
+        self.logger.info(f"{importance_key} model saved to {model_path}")
+        self._save_bundle(model_category, model_path, feature_cols, shared['categories'], shared['fill_values'],
+                          model_info)
+        self._save_model_to_db(model_category, model_path, model_info)
+        return model_path
+
+    def continue_training(self, estimator, new_data, holdout_data, extra_rounds=INCREMENTAL_ROUNDS,
+                          max_regression=0.0):
+        """
+        Ajoute extra_rounds arbres à un modèle XGBoost entraîné, à partir des courses
+        terminées depuis son entraînement (continuation xgb_model=), puis compare
+        l'ancien et le nouveau modèle sur les courses réservées (holdout_data).
+
+        Le classifieur top 3 est comparé sur le log loss, les modèles de classement
+        sur le NDCG@7. Les features sont celles enregistrées dans le booster.
+
+        Args:
+            estimator: modèle XGBoost (XGBClassifier, XGBRanker ou XGBRegressor) chargé
+            new_data: courses terminées depuis l'entraînement (avec cibles)
+            holdout_data: courses les plus récentes, exclues de la mise à jour
+            max_regression: dégradation tolérée de la métrique de validation
+
+        Returns:
+            tuple: (modèle mis à jour ou None s'il régresse, rapport de comparaison)
+        """
+        from sklearn.base import clone
+        from sklearn.metrics import log_loss
+
+        if not isinstance(estimator, (XGBClassifier, XGBRanker, XGBRegressor)):
+            raise ValueError(f"La mise à jour incrémentale nécessite un modèle XGBoost ({type(estimator).__name__})")
+
+        booster = estimator.get_booster()
+        feature_cols = list(booster.feature_names or [])
+        if not feature_cols:
+            raise ValueError("Le modèle ne contient pas la liste de ses features")
+
+        is_classifier = isinstance(estimator, XGBClassifier)
+        target_col = 'target_place' if is_classifier else 'position'
+
+        categories = getattr(estimator, 'feature_categories_', None)
+
+        def matrix(data):
+            data = data[data[target_col].notna()]
+            if isinstance(estimator, XGBRanker):
+                data = data.sort_values('id_course', kind='mergesort')
+            return data, build_compact_matrix(data, feature_cols, categories=categories)[0]
+
+        def evaluate(model, data, X):
+            if is_classifier:
+                proba = model.predict_proba(X)[:, 1]
+                y_true = data[target_col].to_numpy()
+                y_pred = (proba >= 0.5).astype(int)
+                return {
+                    'log_loss': float(log_loss(y_true, proba, labels=[0, 1])),
+                    'accuracy': float(accuracy_score(y_true, y_pred)),
+                    'precision': float(precision_score(y_true, y_pred, zero_division=0)),
+                    'recall': float(recall_score(y_true, y_pred, zero_division=0)),
+                    'f1': float(f1_score(y_true, y_pred, zero_division=0))
+                }
+            metrics = compute_ranking_metrics(data['id_course'].to_numpy(), data['position'].to_numpy(),
+                                              model.predict(X))
+            return {**metrics, 'accuracy': metrics['winner_accuracy']}
+
+        train_data, X_train = matrix(new_data)
+        holdout_data, X_holdout = matrix(holdout_data)
+        if X_train.empty or X_holdout.empty:
+            raise ValueError("Pas de nouvelles courses à apprendre ou à valider")
+
+        # Repartir des arbres retenus par l'arrêt anticipé, sans les arbres de patience
+        try:
+            kept_rounds = estimator.best_iteration + 1
+        except AttributeError:
+            kept_rounds = booster.num_boosted_rounds()
+        base_booster = booster[:kept_rounds]
+        base_booster.set_attr(best_iteration=None, best_score=None)
+
+        updated = clone(estimator)
+        updated.set_params(n_estimators=extra_rounds, early_stopping_rounds=None)
+        fit_kwargs = {'xgb_model': base_booster}
+        if isinstance(estimator, XGBRanker):
+            fit_kwargs['group'] = train_data.groupby('id_course', sort=True).size().to_numpy()
+        updated.fit(X_train, train_data[target_col].to_numpy(), **fit_kwargs)
+        updated.feature_categories_ = categories
+
+        metric = 'log_loss' if is_classifier else 'ndcg_at_7'
+        before = evaluate(estimator, holdout_data, X_holdout)
+        after = evaluate(updated, holdout_data, X_holdout)
+        change = after[metric] - before[metric]
+        regression = change if is_classifier else -change
+        accepted = regression <= max_regression
+
+        report = {
+            'metric': metric,
+            'before': before,
+            'after': after,
+            'accepted': bool(accepted),
+            'base_rounds': int(kept_rounds),
+            'extra_rounds': int(extra_rounds),
+            'total_rounds': int(updated.get_booster().num_boosted_rounds()),
+            'training_size': len(train_data),
+            'holdout_size': len(holdout_data),
+            'feature_count': len(feature_cols)
+        }
+        self.logger.info(f"Mise à jour incrémentale ({type(estimator).__name__}): {metric} "
+                         f"{before[metric]:.4f} -> {after[metric]:.4f} "
+                         f"({'acceptée' if accepted else 'rejetée'})")
+        return (updated if accepted else None), report
+
+    def select_features_enhanced(self, df, target_col='target_place', exclude_cols=None, top_n=None,
+                                 use_gain=False):
         """
         Version améliorée de select_features qui utilise toutes les colonnes numériques disponibles
+
+        Avec top_n, les features sont classées par pertinence vis-à-vis de target_col
+        (corrélations calculées en une passe, voir data_preparation/feature_selection.py,
+        et importances d'un modèle sonde avec use_gain) et seules les top_n premières
+        sont gardées; leurs scores (feature_scores) sont réutilisés tant que les
+        entrées sont identiques. Sans top_n, feature_scores est remis à None.
         """
+        self.feature_scores = None
+
         if exclude_cols is None:
             exclude_cols = []
             
@@ -1880,8 +2497,8 @@ class DualPredictionModel:
         #exclude_cols = list(set(exclude_cols + default_exclude) - {target_col})
         exclude_cols = list(set(exclude_cols + default_exclude))
         
-        # Sélectionner toutes les colonnes numériques qui ne sont pas dans la liste d'exclusion
-        numeric_cols = df.select_dtypes(include=['int64', 'float64']).columns
+        # Sélectionner toutes les colonnes numériques (y compris réduites en float32/int8...)
+        numeric_cols = df.select_dtypes(include=[np.number]).columns
         feature_cols = [col for col in numeric_cols if col not in exclude_cols]
         
         # Ajouter également les colonnes catégorielles encodées (si elles existent)
@@ -1904,8 +2521,57 @@ class DualPredictionModel:
             sample_size = min(10, len(feature_cols))
             self.logger.info(f"Sample features: {sorted(feature_cols)[:sample_size]}...")
         
+        if top_n is not None and target_col in df.columns:
+            candidates = sorted(feature_cols)
+            key = scores_cache_key(df, candidates, target_col, use_gain)
+            if self._scores_cache[0] != key:
+                self._scores_cache = (key, score_features(df, candidates, df[target_col], use_gain=use_gain))
+            self.feature_scores = self._scores_cache[1]
+            feature_cols = list(self.feature_scores.index[:top_n])
+            self.logger.info(f"Top {len(feature_cols)} features by relevance to {target_col}: {feature_cols[:10]}...")
+        
         return feature_cols
 
+    def _save_feature_selection(self, model_path, feature_cols):
+        """Écrit la liste de features du modèle (et leurs scores) dans <modèle>_features.json."""
+        features_path = model_path.replace('.pkl', '_features.json')
+        try:
+            save_selected_features(features_path, feature_cols, self.feature_scores)
+        except Exception as e:
+            self.logger.error(f"Error saving feature selection: {str(e)}")
+        return features_path
+
+    def _save_bundle(self, model_category, model_path, feature_cols, categories, fill_values, model_info,
+                     data_prep=None):
+        """
+        Écrit le bundle d'inférence du modèle courant (voir model/model_bundle.py) à
+        côté de son fichier .pkl et le garde pour les prédictions suivantes. Le
+        modèle et son bundle sont aussi copiés sous LATEST_MODEL_FILES.
+        """
+        model = self.standard_model if model_category == 'standard' else self.simulation_model
+        try:
+            bundle = ModelBundle(
+                model, feature_cols, fill_values, categories=categories,
+                encoders=collect_encoders(data_prep),
+                metadata={
+                    'model_category': model_category,
+                    'model_type': model_info.get('model_type'),
+                    'model_path': model_path,
+                    'timestamp': model_info.get('timestamp')
+                }
+            )
+            bundle.save(bundle_path(model_path))
+            self.bundles[model_category] = bundle
+
+            # Sauvegarder aussi comme "latest" pour un accès facile
+            latest_path = os.path.join(self.base_path, LATEST_MODEL_FILES[model_category])
+            joblib.dump(model, latest_path)
+            bundle.save(bundle_path(latest_path))
+            return bundle
+        except Exception as e:
+            self.logger.error(f"Error saving model bundle: {str(e)}")
+            return None
+
 # 3. ORCHESTRATION DU SYSTÈME
 # ------------------------------
 
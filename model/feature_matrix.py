@@ -0,0 +1,116 @@
+# model/feature_matrix.py
+import numpy as np
+import pandas as pd
+
+# Colonnes passées telles quelles à XGBoost (support natif des catégorielles)
+CATEGORICAL_FEATURES = ['lieu', 'jockey_nom', 'sexe', 'type_course']
+
+# Colonnes one-hot produites par encode_features_for_model pour les faibles cardinalités
+ONE_HOT_PREFIXES = ('sexe_', 'type_course_')
+
+
+def supports_native_categorical(*estimators):
+    """
+    Indique si tous les estimateurs acceptent des catégorielles pandas: XGBoost
+    avec enable_categorical=True, ou LightGBM. Les autres (forêts aléatoires,
+    ...) n'acceptent que des colonnes numériques.
+    """
+    for estimator in estimators:
+        if estimator is None:
+            continue
+        params = estimator.get_params() if hasattr(estimator, 'get_params') else {}
+        if 'enable_categorical' in params:
+            if not params['enable_categorical']:
+                return False
+        elif not type(estimator).__module__.startswith('lightgbm'):
+            return False
+    return True
+
+
+def native_feature_columns(df, feature_cols, native=True):
+    """
+    Remplace les colonnes issues de LabelEncoder / OneHotEncoder (lieu_encoded,
+    sexe_M, ...) par les colonnes catégorielles brutes présentes dans df.
+    Sans native (modèle sans support des catégorielles, voir
+    supports_native_categorical), feature_cols est gardé tel quel: colonnes
+    encodées numériques.
+
+    Returns:
+        features numériques (ordre conservé) suivies des catégorielles
+    """
+    if not native:
+        return [col for col in feature_cols if col not in CATEGORICAL_FEATURES]
+
+    categorical = [col for col in CATEGORICAL_FEATURES if col in df.columns]
+    encoded = {f'{col}_encoded' for col in categorical}
+    one_hot = tuple(prefix for prefix in ONE_HOT_PREFIXES if prefix[:-1] in categorical)
+
+    numeric = [col for col in feature_cols
+               if col not in encoded and col not in categorical
+               and not (one_hot and col.startswith(one_hot))]
+    return numeric + categorical
+
+
+def _medians(block):
+    """Médiane de chaque colonne d'un bloc float32 (0 si la colonne est vide)."""
+    medians = np.zeros(block.shape[1], dtype=np.float32)
+    filled = ~np.isnan(block).all(axis=0)
+    if filled.any():
+        medians[filled] = np.nanmedian(block[:, filled], axis=0)
+    return medians
+
+
+def compute_fill_values(df, feature_cols):
+    """
+    Valeurs de remplacement des features numériques (médianes d'entraînement),
+    à réutiliser telles quelles en inférence via build_compact_matrix(fill_values=...).
+
+    Returns:
+        dict {colonne: médiane}
+    """
+    numeric = [col for col in feature_cols if col not in CATEGORICAL_FEATURES]
+    block = df.reindex(columns=numeric).to_numpy(dtype=np.float32, na_value=np.nan)
+    return dict(zip(numeric, _medians(block).tolist()))
+
+
+def build_compact_matrix(df, feature_cols, categories=None, fill_values=None):
+    """
+    Matrice compacte pour XGBoost: les features numériques forment un seul bloc
+    contigu float32 (valeurs manquantes remplacées par la médiane de la colonne,
+    0 si elle est vide), les catégorielles sont des pandas.Categorical (codes
+    int8/int16) à utiliser avec enable_categorical=True.
+
+    Args:
+        df: données source
+        feature_cols: liste ordonnée des features
+        categories: catégories connues par colonne (celles de l'entraînement en
+            inférence; les valeurs inconnues deviennent manquantes)
+        fill_values: valeurs de remplacement par colonne (médianes de l'entraînement,
+            voir compute_fill_values); calculées sur df si absent
+
+    Returns:
+        tuple: (DataFrame des features dans l'ordre de feature_cols, catégories par colonne)
+    """
+    categorical = [col for col in feature_cols if col in CATEGORICAL_FEATURES]
+    numeric = [col for col in feature_cols if col not in categorical]
+
+    block = np.ascontiguousarray(df.reindex(columns=numeric).to_numpy(dtype=np.float32, na_value=np.nan))
+    missing = np.isnan(block)
+    if missing.any():
+        if fill_values is None:
+            fills = _medians(block)
+        else:
+            fills = np.array([fill_values.get(col, 0.0) for col in numeric], dtype=np.float32)
+        block[missing] = np.take(fills, np.nonzero(missing)[1])
+
+    X = pd.DataFrame(block, columns=numeric, index=df.index)
+
+    categories = dict(categories or {})
+    for col in categorical:
+        source = df[col] if col in df.columns else pd.Series(np.nan, index=df.index)
+        values = source.astype(str).where(source.notna())
+        if col not in categories:
+            categories[col] = sorted(values.dropna().unique().tolist())
+        X[col] = pd.Categorical(values, categories=categories[col])
+
+    return X[list(feature_cols)], categories
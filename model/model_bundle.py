@@ -0,0 +1,113 @@
+# model/model_bundle.py
+import logging
+import os
+from datetime import datetime
+
+import joblib
+
+from model.feature_matrix import build_compact_matrix
+
+# Version du format de bundle (à incrémenter si les attributs changent)
+BUNDLE_VERSION = 1
+
+# Dossier des encodeurs de EnhancedDataPreparation (label / one-hot / scaler)
+ENCODERS_PATH = 'data_preparation/encoders'
+ENCODER_NAMES = ('label_encoders', 'one_hot_encoders', 'scaler')
+
+# Copies du dernier modèle entraîné par catégorie (et leur bundle), réécrites à
+# chaque entraînement: chargées quand aucune version n'est active
+LATEST_MODEL_FILES = {
+    'standard': 'enhanced_latest.pkl',
+    'simulation': 'simulation_top7_latest.pkl'
+}
+
+
+def bundle_path(model_path):
+    """Chemin du bundle associé à un fichier de modèle (.pkl)."""
+    return f"{os.path.splitext(model_path)[0]}_bundle.joblib"
+
+
+def collect_encoders(data_prep=None, folder_path=ENCODERS_PATH):
+    """
+    Encodeurs à embarquer dans le bundle: ceux de data_prep s'il est fourni,
+    sinon les pickles sauvegardés par EnhancedDataPreparation.save_encoders.
+
+    Returns:
+        dict {nom: encodeur}
+    """
+    if data_prep is not None:
+        return {name: getattr(data_prep, name) for name in ENCODER_NAMES if hasattr(data_prep, name)}
+
+    encoders = {}
+    for name in ENCODER_NAMES:
+        path = os.path.join(folder_path, f'{name}.pkl')
+        if os.path.exists(path):
+            encoders[name] = joblib.load(path)
+    return encoders
+
+
+class ModelBundle:
+    """
+    Modèle entraîné et tout ce qu'il faut pour l'inférence, dans un seul fichier
+    versionné: estimateur, liste ordonnée des features, types, valeurs de
+    remplacement (médianes d'entraînement), catégories connues et encodeurs.
+
+    L'inférence se résume à un reindex des colonnes (matrix) suivi d'un predict,
+    sans sélection de features ni recalcul de médianes.
+    """
+
+    def __init__(self, model, feature_cols, fill_values, categories=None, encoders=None, metadata=None):
+        self.model = model
+        self.feature_cols = list(feature_cols)
+        self.categories = dict(categories or {})
+        self.fill_values = {col: float(value) for col, value in (fill_values or {}).items()}
+        self.dtypes = {col: 'category' if col in self.categories else 'float32' for col in self.feature_cols}
+        self.encoders = dict(encoders or {})
+        self.metadata = {
+            'bundle_version': BUNDLE_VERSION,
+            'created_at': datetime.now().isoformat(),
+            'estimator': type(model).__name__,
+            **(metadata or {})
+        }
+
+    def missing_features(self, data):
+        """Features attendues absentes de data (remplacées par leur valeur de remplacement)."""
+        return [col for col in self.feature_cols if col not in data.columns]
+
+    def matrix(self, data):
+        """Matrice d'inférence: colonnes du modèle dans l'ordre, types et remplissage de l'entraînement."""
+        return build_compact_matrix(data, self.feature_cols, categories=self.categories,
+                                    fill_values=self.fill_values)[0]
+
+    def predict(self, data):
+        return self.model.predict(self.matrix(data))
+
+    def predict_proba(self, data):
+        return self.model.predict_proba(self.matrix(data))
+
+    def install_encoders(self, data_prep):
+        """Remplace les encodeurs de data_prep par ceux de l'entraînement."""
+        for name, encoder in self.encoders.items():
+            setattr(data_prep, name, encoder)
+        return bool(self.encoders)
+
+    def with_model(self, model, **metadata):
+        """Même schéma de features pour un autre estimateur (mise à jour incrémentale)."""
+        return ModelBundle(model, self.feature_cols, self.fill_values, categories=self.categories,
+                           encoders=self.encoders, metadata={**self.metadata, **metadata})
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        joblib.dump(self, path)
+        logging.getLogger(__name__).info(f"Model bundle saved to {path}")
+        return path
+
+    @staticmethod
+    def load(path):
+        bundle = joblib.load(path)
+        if not isinstance(bundle, ModelBundle):
+            raise ValueError(f"{path} ne contient pas un bundle de modèle")
+        version = bundle.metadata.get('bundle_version', 0)
+        if version > BUNDLE_VERSION:
+            raise ValueError(f"Bundle {path} en version {version}, version supportée: {BUNDLE_VERSION}")
+        return bundle
@@ -0,0 +1,235 @@
+# model/ranker_tuning.py
+import json
+import logging
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.model_selection import GroupKFold, ParameterSampler
+
+from model.ranking_metrics import compute_ranking_metrics
+from model.walk_forward import _group_sizes
+
+# Espace de recherche par défaut des rankers XGBoost (simulation / Top 7)
+DEFAULT_RANKER_PARAM_GRID = {
+    'max_depth': [5, 7, 9],
+    'learning_rate': [0.01, 0.03, 0.05, 0.1],
+    'subsample': [0.7, 0.85, 1.0],
+    'colsample_bytree': [0.6, 0.75, 0.9],
+    'min_child_weight': [1, 2, 5],
+    'gamma': [0.0, 0.5, 1.0],
+    'reg_lambda': [1.0, 1.5, 3.0]
+}
+
+# Matrices partagées par les essais, chargées une seule fois par processus de travail
+_TUNING_DATA = {}
+
+
+def _init_worker(data):
+    _TUNING_DATA.clear()
+    _TUNING_DATA.update(data)
+
+
+def halving_schedule(n_candidates, max_resource, factor=3, min_resource=None):
+    """
+    Nombre d'arbres de chaque palier: le dernier palier atteint max_resource et
+    chaque palier précédent en utilise factor fois moins.
+
+    Returns:
+        Liste croissante du nombre d'arbres par palier
+    """
+    n_rungs = max(int(math.ceil(math.log(max(n_candidates, 1), factor))), 0) + 1
+    if min_resource:
+        n_rungs = min(n_rungs, int(math.floor(math.log(max_resource / min_resource, factor))) + 1)
+    return [max(int(round(max_resource / factor ** (n_rungs - 1 - rung))), 1) for rung in range(n_rungs)]
+
+
+def _run_trial(candidate, fold, params, n_rounds, booster, estimator, n_jobs, metric):
+    """
+    Poursuit l'entraînement d'un candidat sur un fold jusqu'à n_rounds arbres
+    (exécuté dans un processus de travail). Les arbres du palier précédent
+    (booster) sont conservés: seuls les arbres supplémentaires sont construits.
+
+    Returns:
+        tuple: (candidat, fold, score, booster)
+    """
+    X = _TUNING_DATA['X']
+    position = _TUNING_DATA['position']
+    groups = _TUNING_DATA['groups']
+    train, test = _TUNING_DATA['folds'][fold]
+
+    done = 0 if booster is None else booster.num_boosted_rounds()
+    model = clone(estimator)
+    model.set_params(**params, n_estimators=n_rounds - done, n_jobs=n_jobs, early_stopping_rounds=None)
+    model.fit(X[train], position[train], group=_group_sizes(groups[train]), xgb_model=booster)
+
+    scores = model.predict(X[test])
+    score = compute_ranking_metrics(groups[test], position[test], scores)[metric]
+    return candidate, fold, float(score), model.get_booster()
+
+
+class RankerHalvingTuner:
+    """
+    Recherche d'hyperparamètres par divisions successives (successive halving)
+    pour les rankers XGBoost.
+
+    Tous les candidats sont d'abord entraînés avec peu d'arbres; à chaque palier
+    seul le meilleur 1/factor est conservé et poursuit son entraînement (le
+    nombre d'arbres est multiplié par factor) jusqu'à max_resource. Les folds
+    (GroupKFold) ne coupent jamais une course et les essais d'un palier sont
+    exécutés en parallèle sur les cœurs disponibles.
+    """
+
+    def __init__(self, param_grid=None, n_candidates=27, factor=3, max_resource=1500,
+                 min_resource=None, n_splits=3, metric='ndcg_at_7', max_workers=None,
+                 max_seconds=None, random_state=42, report_dir='model/trained_models/tuning'):
+        self.param_grid = param_grid or DEFAULT_RANKER_PARAM_GRID
+        self.n_candidates = n_candidates
+        self.factor = factor
+        self.max_resource = max_resource
+        self.min_resource = min_resource
+        self.n_splits = n_splits
+        self.metric = metric
+        self.max_workers = max_workers
+        self.max_seconds = max_seconds
+        self.random_state = random_state
+        self.report_dir = report_dir
+        self.logger = logging.getLogger(__name__)
+
+    def _prepare(self, df, feature_cols):
+        """Regroupe les lignes par course et construit les folds par course."""
+        data = df[df['position'].notna()]
+        data = data.sort_values('id_course', kind='mergesort').reset_index(drop=True)
+        groups = data['id_course'].to_numpy()
+        n_splits = min(self.n_splits, len(np.unique(groups)))
+        folds = list(GroupKFold(n_splits=n_splits).split(data, groups=groups))
+        return {
+            'X': data.reindex(columns=feature_cols).to_numpy(dtype=np.float32, na_value=np.nan),
+            'position': data['position'].to_numpy(dtype=np.float64),
+            'groups': groups,
+            'folds': folds
+        }
+
+    def _pool_size(self, n_tasks):
+        cpu_count = os.cpu_count() or 1
+        workers = max(min(n_tasks, self.max_workers or cpu_count), 1)
+        return workers, max(cpu_count // workers, 1)
+
+    def run(self, df, feature_cols, estimator):
+        """
+        Exécute la recherche.
+
+        Args:
+            df: données enrichies (id_course, position et features)
+            feature_cols: liste ordonnée des features
+            estimator: ranker XGBoost servant de gabarit (non modifié)
+
+        Returns:
+            dict avec les meilleurs paramètres et le classement de tous les essais
+        """
+        matrices = self._prepare(df, feature_cols)
+        n_folds = len(matrices['folds'])
+        candidates = list(ParameterSampler(self.param_grid, n_iter=self.n_candidates,
+                                           random_state=self.random_state))
+        schedule = halving_schedule(len(candidates), self.max_resource, self.factor, self.min_resource)
+        workers, n_jobs = self._pool_size(len(candidates) * n_folds)
+        self.logger.info(f"Successive halving: {len(candidates)} candidats, paliers {schedule}, "
+                         f"{n_folds} folds, {workers} processus, {n_jobs} threads par modèle")
+
+        start_time = time.time()
+        alive = list(range(len(candidates)))
+        boosters = {}
+        leaderboard = []
+
+        executor = None
+        if workers > 1:
+            # spawn: pas de fork d'un processus dont les pools OpenMP sont déjà actifs
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                           initializer=_init_worker, initargs=(matrices,))
+        else:
+            _init_worker(matrices)
+
+        try:
+            for rung, n_rounds in enumerate(schedule):
+                tasks = [(c, f, candidates[c], n_rounds, boosters.get((c, f)), estimator, n_jobs, self.metric)
+                         for c in alive for f in range(n_folds)]
+                if executor is None:
+                    results = [_run_trial(*task) for task in tasks]
+                else:
+                    results = [future.result() for future in [executor.submit(_run_trial, *task) for task in tasks]]
+
+                fold_scores = {c: [0.0] * n_folds for c in alive}
+                for candidate, fold, score, booster in results:
+                    fold_scores[candidate][fold] = score
+                    boosters[(candidate, fold)] = booster
+
+                rung_entries = sorted((
+                    {
+                        'candidate': c,
+                        'rung': rung,
+                        'n_estimators': n_rounds,
+                        'params': candidates[c],
+                        'score': float(np.mean(fold_scores[c])),
+                        'std': float(np.std(fold_scores[c])),
+                        'fold_scores': fold_scores[c]
+                    } for c in alive
+                ), key=lambda entry: entry['score'], reverse=True)
+                leaderboard.extend(rung_entries)
+                self.logger.info(f"Palier {rung} ({n_rounds} arbres): meilleur {self.metric} "
+                                 f"{rung_entries[0]['score']:.4f} ({len(alive)} candidats)")
+
+                n_keep = max(int(math.ceil(len(alive) / self.factor)), 1)
+                alive = [entry['candidate'] for entry in rung_entries[:n_keep]]
+                # Libérer les modèles des candidats éliminés
+                boosters = {key: value for key, value in boosters.items() if key[0] in alive}
+
+                if self.max_seconds and time.time() - start_time > self.max_seconds and rung < len(schedule) - 1:
+                    self.logger.warning(f"Budget de {self.max_seconds}s atteint après le palier {rung}")
+                    break
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        leaderboard.sort(key=lambda entry: (entry['rung'], entry['score']), reverse=True)
+        best = leaderboard[0]
+        elapsed_time = time.time() - start_time
+        self.logger.info(f"Recherche terminée en {elapsed_time:.2f} secondes, meilleurs paramètres: "
+                         f"{best['params']} ({best['n_estimators']} arbres, {self.metric}={best['score']:.4f})")
+
+        return {
+            'metric': self.metric,
+            'schedule': schedule,
+            'n_candidates': len(candidates),
+            'n_splits': n_folds,
+            'feature_cols': list(feature_cols),
+            'best_params': {**best['params'], 'n_estimators': best['n_estimators']},
+            'best_score': best['score'],
+            'elapsed_time': elapsed_time,
+            'leaderboard': leaderboard
+        }
+
+    def save_leaderboard(self, report):
+        """
+        Écrit le rapport (JSON) et le classement des essais (CSV).
+
+        Returns:
+            Chemin du rapport JSON
+        """
+        os.makedirs(self.report_dir, exist_ok=True)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        report_path = os.path.join(self.report_dir, f'ranker_halving_{timestamp}.json')
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=4, default=str)
+
+        rows = [{key: value for key, value in entry.items() if key not in ('params', 'fold_scores')}
+                | entry['params'] for entry in report['leaderboard']]
+        pd.DataFrame(rows).to_csv(report_path.replace('.json', '_leaderboard.csv'), index=False)
+
+        self.logger.info(f"Classement de la recherche enregistré dans {report_path}")
+        return report_path
@@ -0,0 +1,224 @@
+# model/ranking_metrics.py
+import numpy as np
+import pandas as pd
+
+# Nombre minimal de partants pour qu'une course soit évaluée
+MIN_RUNNERS = 5
+
+
+class RaceSegments:
+    """
+    Découpage d'un lot de lignes en courses (segments) et rangs intra-course.
+
+    Les lignes sont regroupées par course sans boucle Python: un tri lexicographique
+    (course, clé, ordre d'origine) suivi d'un décalage par le début de segment
+    donne le rang de chaque ligne dans sa course.
+
+    Attributes:
+        codes: numéro de segment de chaque ligne (ordre de première apparition)
+        sizes: nombre de lignes par segment
+        starts: indice de début de chaque segment dans l'ordre trié
+    """
+
+    def __init__(self, groups):
+        codes, uniques = pd.factorize(pd.Series(groups).reset_index(drop=True), sort=False)
+        self.codes = codes.astype(np.int64)
+        self.groups = np.asarray(uniques)
+        self.sizes = np.bincount(self.codes, minlength=len(uniques))
+        self.starts = np.cumsum(self.sizes) - self.sizes
+        self._row_order = np.arange(len(self.codes))
+        # Ordre des lignes regroupées par course (tri unique, réutilisé par sum)
+        self._by_segment = np.argsort(self.codes, kind='stable')
+
+    @property
+    def n_segments(self):
+        return len(self.sizes)
+
+    def rank(self, keys):
+        """
+        Rang (0 = premier) de chaque ligne dans sa course, par clé croissante.
+        Les égalités sont départagées par l'ordre d'origine des lignes (tri stable).
+        """
+        keys = np.asarray(keys, dtype=np.float64)
+        order = np.lexsort((self._row_order, keys, self.codes))
+        ranks = np.empty(len(order), dtype=np.int64)
+        ranks[order] = self._row_order - np.repeat(self.starts, self.sizes)
+        return ranks
+
+    def sum(self, values):
+        """Somme par course (np.add.reduceat sur les lignes regroupées par course)."""
+        values = np.asarray(values, dtype=np.float64)
+        if self.n_segments == 0:
+            return np.zeros(0)
+        return np.add.reduceat(values[self._by_segment], self.starts)
+
+    def max(self, values):
+        """Maximum par course (NaN ignorés)."""
+        result = np.full(self.n_segments, -np.inf)
+        np.fmax.at(result, self.codes, np.asarray(values, dtype=np.float64))
+        return result
+
+
+def _dcg(segments, gains, ranks, k=None):
+    weights = gains / np.log2(ranks + 2.0)
+    if k is not None:
+        weights = np.where(ranks < k, weights, 0.0)
+    return segments.sum(weights)
+
+
+def compute_ranking_metrics(groups, positions, scores, min_runners=MIN_RUNNERS):
+    """
+    Métriques de classement calculées pour toutes les courses en une passe.
+
+    Le classement prédit range les chevaux par score croissant (plus petit =
+    meilleur rang), le classement réel par position croissante; les positions
+    manquantes (non-arrivées) sont classées en dernier.
+
+    Args:
+        groups: identifiant de course de chaque ligne
+        positions: position réelle à l'arrivée
+        scores: score prédit (rang estimé)
+        min_runners: nombre minimal de partants d'une course évaluée
+
+    Returns:
+        dict de métriques (mêmes clés que DualPredictionModel.evaluate_top7_performance)
+    """
+    segments = RaceSegments(groups)
+    positions = np.asarray(positions, dtype=np.float64)
+    scores = np.asarray(scores, dtype=np.float64)
+
+    true_rank = segments.rank(np.where(np.isnan(positions), np.inf, positions))
+    pred_rank = segments.rank(scores)
+    sizes = segments.sizes
+    evaluated = sizes >= min_runners
+    total_races = int(evaluated.sum())
+
+    if total_races == 0:
+        return {
+            'ndcg_score': 0.0, 'ndcg_at_7': 0.0, 'winner_accuracy': 0.0,
+            'top3_accuracy': 0.0, 'top5_accuracy': 0.0, 'top7_accuracy': 0.0,
+            'quinte_exact_rate': 0.0, 'quinte_desordre_rate': 0.0,
+            'total_races_evaluated': 0
+        }
+
+    def overlap(k):
+        """Nombre de chevaux communs aux k premiers prédits et réels, par course."""
+        return segments.sum((pred_rank < k) & (true_rank < k))
+
+    winners = segments.sum((pred_rank == 0) & (true_rank == 0))
+    top3, top5, top7 = overlap(3), overlap(5), overlap(7)
+    quinte_exact = segments.sum((pred_rank < 5) & (pred_rank == true_rank))
+
+    # NDCG: pertinence = position maximale de la course - position + 1 (0 pour les non-arrivées)
+    max_position = segments.max(positions)[segments.codes]
+    gains = np.where(np.isnan(positions), 0.0, max_position - positions + 1)
+    ideal = _dcg(segments, gains, true_rank)
+    ideal_at_7 = _dcg(segments, gains, true_rank, k=7)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ndcg = _dcg(segments, gains, pred_rank) / ideal
+        ndcg_at_7 = _dcg(segments, gains, pred_rank, k=7) / ideal_at_7
+    valid_ndcg = evaluated & (ideal > 0)
+
+    def rate(hits):
+        return float(np.sum(hits & evaluated) / total_races)
+
+    return {
+        'ndcg_score': float(ndcg[valid_ndcg].mean()) if valid_ndcg.any() else 0.0,
+        'ndcg_at_7': float(ndcg_at_7[valid_ndcg].mean()) if valid_ndcg.any() else 0.0,
+        'winner_accuracy': rate(winners == 1),
+        'top3_accuracy': rate(top3 >= 2),
+        'top5_accuracy': rate(top5 >= 3),
+        'top7_accuracy': rate((sizes >= 7) & (top7 >= 4)),
+        'quinte_exact_rate': rate(quinte_exact == 5),
+        'quinte_desordre_rate': rate(top5 == 5),
+        'total_races_evaluated': total_races
+    }
+
+
+def top_k_accuracy(groups, y_true, y_pred, k=7):
+    """
+    Part des k premiers réels de chaque course retrouvés parmi les k premiers prédits.
+
+    Rangs par course obtenus par np.lexsort, recouvrements comptés par
+    np.add.reduceat: aucun masque par course n'est construit.
+
+    Args:
+        groups: identifiant de course de chaque ligne
+        y_true: positions réelles (plus petit = meilleur)
+        y_pred: scores prédits (plus petit = meilleur)
+        k: nombre de places considérées
+
+    Returns:
+        chevaux correctement placés / somme des min(k, partants) sur toutes les courses
+    """
+    segments = RaceSegments(groups)
+    if segments.n_segments == 0:
+        return 0
+    true_rank = segments.rank(np.asarray(y_true, dtype=np.float64))
+    pred_rank = segments.rank(np.asarray(y_pred, dtype=np.float64))
+    correct = segments.sum((true_rank < k) & (pred_rank < k)).sum()
+    total = np.minimum(segments.sizes, k).sum()
+    return float(correct / total) if total > 0 else 0
+
+
+def _groups_from_dmatrix(dmatrix):
+    """Identifiants de course reconstruits depuis les bornes de groupes d'une DMatrix."""
+    group_ptr = dmatrix.get_uint_info('group_ptr')
+    if len(group_ptr) < 2:
+        return np.zeros(dmatrix.num_row(), dtype=np.int64)
+    return np.repeat(np.arange(len(group_ptr) - 1), np.diff(group_ptr.astype(np.int64)))
+
+
+class TopKError:
+    """
+    Erreur Top-k (1 - top_k_accuracy) utilisable comme eval_metric de l'API
+    scikit-learn de XGBoost. XGBoost minimise les métriques personnalisées:
+    l'arrêt anticipé retient l'itération de plus faible erreur.
+
+    Positions réelles et scores prédits sont lus « plus petit = meilleur »
+    (cibles de position des modèles de simulation).
+
+    - XGBRanker appelle la métrique course par course (bornes de groupes de
+      l'eval_set) et moyenne les erreurs; groups est alors inutile.
+    - XGBRegressor / XGBClassifier l'appellent une fois sur tout l'eval_set:
+      groups donne l'identifiant de course de chacune de ses lignes (sans
+      groups, l'eval_set est traité comme une seule course).
+
+    Classe plutôt que fermeture: l'estimateur qui la porte reste sérialisable.
+    """
+
+    def __init__(self, k=7, groups=None):
+        self.k = k
+        self.groups = None if groups is None else np.asarray(groups)
+        self.__name__ = f'top{k}_error'
+
+    def __call__(self, y_true, y_pred):
+        race_groups = self.groups if self.groups is not None and len(self.groups) == len(y_true) \
+            else np.zeros(len(y_true))
+        return 1.0 - top_k_accuracy(race_groups, y_true, y_pred, k=self.k)
+
+
+def make_top_k_eval_metric(k=7, groups=None):
+    """
+    Métrique d'arrêt anticipé Top-k pour l'API scikit-learn (eval_metric=..., à minimiser).
+
+    Returns:
+        TopKError: callable(y_true, y_pred) -> 1 - top_k_accuracy
+    """
+    return TopKError(k=k, groups=groups)
+
+
+def make_top_k_custom_metric(k=7):
+    """
+    Erreur Top-k pour l'API native (xgb.train(custom_metric=...), à minimiser);
+    les courses sont lues dans les bornes de groupes de la DMatrix.
+
+    Returns:
+        callable(predt, dmatrix) -> (nom, 1 - top_k_accuracy)
+    """
+    name = f'top{k}_error'
+
+    def top_k_metric(predt, dmatrix):
+        return name, 1.0 - top_k_accuracy(_groups_from_dmatrix(dmatrix), dmatrix.get_label(), predt, k=k)
+
+    return top_k_metric
@@ -0,0 +1,297 @@
+# model/walk_forward.py
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score, f1_score, log_loss, precision_score, recall_score
+
+from model.ranking_metrics import compute_ranking_metrics
+
+# Matrices partagées par les folds, chargées une seule fois par processus de travail
+_FOLD_DATA = {}
+
+
+def _init_worker(data):
+    _FOLD_DATA.clear()
+    _FOLD_DATA.update(data)
+
+
+def walk_forward_splits(dates, min_train_days=60, test_days=7, step_days=None, max_folds=None):
+    """
+    Découpage chronologique à fenêtre d'entraînement croissante.
+
+    Le fold i entraîne sur toutes les courses antérieures à sa date de coupure
+    et évalue sur les test_days jours suivants; la coupure avance de step_days
+    (test_days par défaut) à partir de min_train_days jours après la première course.
+
+    Args:
+        dates: date_heure de chaque ligne
+        max_folds: ne conserver que les derniers folds
+
+    Returns:
+        Liste de dict (fold, train_end, test_end, train_idx, test_idx)
+    """
+    dates = pd.to_datetime(pd.Series(dates)).to_numpy()
+    if len(dates) == 0:
+        return []
+
+    start = pd.Timestamp(dates.min()).normalize()
+    end = pd.Timestamp(dates.max())
+    test_span = pd.Timedelta(days=test_days)
+    step = pd.Timedelta(days=step_days or test_days)
+
+    folds = []
+    cutoff = start + pd.Timedelta(days=min_train_days)
+    while cutoff <= end:
+        test_end = cutoff + test_span
+        train_idx = np.flatnonzero(dates < np.datetime64(cutoff))
+        test_idx = np.flatnonzero((dates >= np.datetime64(cutoff)) & (dates < np.datetime64(test_end)))
+        if len(train_idx) and len(test_idx):
+            folds.append({'train_end': cutoff, 'test_end': test_end,
+                          'train_idx': train_idx, 'test_idx': test_idx})
+        cutoff += step
+
+    if max_folds:
+        folds = folds[-max_folds:]
+    for number, fold in enumerate(folds):
+        fold['fold'] = number
+    return folds
+
+
+def _with_threads(estimator, n_jobs):
+    """Copie non entraînée de l'estimateur limitée à n_jobs threads, sans arrêt anticipé."""
+    estimator = clone(estimator)
+    params = estimator.get_params()
+    if 'n_jobs' in params:
+        estimator.set_params(n_jobs=n_jobs)
+    # Les folds sont ajustés sans eval_set (modèles sauvegardés avec early_stopping_rounds)
+    if params.get('early_stopping_rounds') is not None:
+        estimator.set_params(early_stopping_rounds=None)
+    return estimator
+
+
+def _group_sizes(groups):
+    """Tailles des courses contiguës (les lignes sont triées par course)."""
+    boundaries = np.flatnonzero(groups[1:] != groups[:-1]) + 1
+    return np.diff(np.concatenate([[0], boundaries, [len(groups)]]))
+
+
+def _run_fold(fold, standard_estimator, simulation_estimator, n_jobs):
+    """Entraîne et évalue les deux modèles sur un fold (exécuté dans un processus de travail)."""
+    X = _FOLD_DATA['X']
+    position = _FOLD_DATA['position']
+    groups = _FOLD_DATA['groups']
+    train, test = fold['train_idx'], fold['test_idx']
+
+    result = {
+        'fold': fold['fold'],
+        'train_end': str(fold['train_end']),
+        'test_end': str(fold['test_end']),
+        'train_size': int(len(train)),
+        'test_size': int(len(test)),
+        'test_races': int(len(np.unique(groups[test])))
+    }
+
+    if standard_estimator is not None:
+        target = (position <= 3).astype(np.int32)
+        model = _with_threads(standard_estimator, n_jobs)
+        model.fit(X[train], target[train])
+        proba = model.predict_proba(X[test])[:, 1]
+        predicted = (proba >= 0.5).astype(np.int32)
+        result['standard'] = {
+            'accuracy': float(accuracy_score(target[test], predicted)),
+            'precision': float(precision_score(target[test], predicted, zero_division=0)),
+            'recall': float(recall_score(target[test], predicted, zero_division=0)),
+            'f1_score': float(f1_score(target[test], predicted, zero_division=0)),
+            'log_loss': float(log_loss(target[test], proba, labels=[0, 1]))
+        }
+
+    if simulation_estimator is not None:
+        model = _with_threads(simulation_estimator, n_jobs)
+        if 'rank' in type(model).__name__.lower():
+            model.fit(X[train], position[train], group=_group_sizes(groups[train]))
+        else:
+            model.fit(X[train], position[train])
+        scores = model.predict(X[test])
+        result['simulation'] = compute_ranking_metrics(groups[test], position[test], scores)
+
+    return result
+
+
+def aggregate_fold_metrics(fold_results, category):
+    """Moyenne et écart-type de chaque métrique d'une catégorie sur les folds."""
+    frame = pd.DataFrame([r[category] for r in fold_results if category in r])
+    if frame.empty:
+        return {}
+    return {
+        metric: {'mean': float(frame[metric].mean()), 'std': float(frame[metric].std(ddof=0))}
+        for metric in frame.columns
+    }
+
+
+class WalkForwardValidator:
+    """
+    Validation croisée chronologique (walk-forward) des modèles standard et de simulation.
+
+    Les folds (fenêtre d'entraînement croissante, évaluation sur la semaine
+    suivante) sont exécutés en parallèle dans un pool de processus dimensionné sur
+    le nombre de cœurs; la matrice de features n'est transmise qu'une fois par
+    processus. Les métriques agrégées sont enregistrées dans model_versions.
+    """
+
+    def __init__(self, min_train_days=60, test_days=7, step_days=None, max_folds=None,
+                 max_workers=None, report_dir='model/trained_models/cv', engine=None):
+        self.min_train_days = min_train_days
+        self.test_days = test_days
+        self.step_days = step_days
+        self.max_folds = max_folds
+        self.max_workers = max_workers
+        self.report_dir = report_dir
+        self.engine = engine
+        self.logger = logging.getLogger(__name__)
+
+    def _prepare(self, df, feature_cols):
+        """Trie par date puis par course et convertit les features en matrice float32."""
+        data = df[df['position'].notna()].copy()
+        data['date_heure'] = pd.to_datetime(data['date_heure'])
+        data = data.sort_values(['date_heure', 'id_course'], kind='mergesort').reset_index(drop=True)
+        matrices = {
+            'X': data.reindex(columns=feature_cols).to_numpy(dtype=np.float32, na_value=np.nan),
+            'position': data['position'].to_numpy(dtype=np.float64),
+            'groups': data['id_course'].to_numpy()
+        }
+        return data, matrices
+
+    def _pool_size(self, n_folds):
+        cpu_count = os.cpu_count() or 1
+        workers = min(n_folds, self.max_workers or cpu_count)
+        # Les threads de chaque modèle se partagent les cœurs restants
+        return max(workers, 1), max(cpu_count // max(workers, 1), 1)
+
+    def run(self, df, feature_cols, standard_estimator=None, simulation_estimator=None):
+        """
+        Exécute tous les folds.
+
+        Args:
+            df: données enrichies (date_heure, id_course, position et features)
+            feature_cols: liste ordonnée des features
+            standard_estimator: modèle de classification top 3 (non entraîné) ou None
+            simulation_estimator: modèle de classement (non entraîné) ou None
+
+        Returns:
+            dict avec les métriques par fold et leur agrégation par catégorie
+        """
+        data, matrices = self._prepare(df, feature_cols)
+        folds = walk_forward_splits(data['date_heure'], self.min_train_days, self.test_days,
+                                    self.step_days, self.max_folds)
+        if not folds:
+            self.logger.warning("Période trop courte pour la validation walk-forward")
+            return {'folds': [], 'standard': {}, 'simulation': {}}
+
+        workers, n_jobs = self._pool_size(len(folds))
+        self.logger.info(f"Walk-forward: {len(folds)} folds, {workers} processus, {n_jobs} threads par modèle")
+
+        if workers == 1:
+            _init_worker(matrices)
+            results = [_run_fold(fold, standard_estimator, simulation_estimator, n_jobs) for fold in folds]
+        else:
+            # spawn: pas de fork d'un processus dont les pools OpenMP sont déjà actifs
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=_init_worker, initargs=(matrices,)) as executor:
+                futures = [executor.submit(_run_fold, fold, standard_estimator, simulation_estimator, n_jobs)
+                           for fold in folds]
+                results = [future.result() for future in futures]
+
+        for result in results:
+            self.logger.info(f"Fold {result['fold']} (jusqu'au {result['train_end']}): "
+                             f"{ {k: v for k, v in result.items() if k in ('standard', 'simulation')} }")
+
+        return {
+            'period': [str(data['date_heure'].min()), str(data['date_heure'].max())],
+            'feature_cols': list(feature_cols),
+            'sample_count': int(len(data)),
+            'folds': results,
+            'standard': aggregate_fold_metrics(results, 'standard'),
+            'simulation': aggregate_fold_metrics(results, 'simulation')
+        }
+
+    def save_report(self, report, standard_estimator=None, simulation_estimator=None):
+        """
+        Écrit le rapport JSON et enregistre une ligne par catégorie dans model_versions
+        (validation_method 'walk_forward', inactive: les modèles en production ne changent pas).
+
+        Returns:
+            Chemin du rapport JSON
+        """
+        os.makedirs(self.report_dir, exist_ok=True)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        report_path = os.path.join(self.report_dir, f'walk_forward_{timestamp}.json')
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=4, default=str)
+
+        estimators = {'standard': standard_estimator, 'simulation': simulation_estimator}
+        for category, estimator in estimators.items():
+            if estimator is not None and report.get(category):
+                self._save_to_db(category, estimator, report, report_path)
+
+        self.logger.info(f"Rapport walk-forward enregistré dans {report_path}")
+        return report_path
+
+    def _save_to_db(self, category, estimator, report, report_path):
+        try:
+            from sqlalchemy import text
+
+            engine = self.engine
+            if engine is None:
+                from database.setup_database import engine
+
+            summary = report[category]
+
+            def mean(metric):
+                return summary[metric]['mean'] if metric in summary else None
+
+            params = estimator.get_params()
+            hyperparameters = {key: params.get(key) for key in
+                               ('n_estimators', 'max_depth', 'learning_rate', 'subsample',
+                                'colsample_bytree', 'objective')}
+            per_fold = [
+                {'fold': r['fold'], 'train_end': r['train_end'], **r[category]}
+                for r in report['folds'] if category in r
+            ]
+            current_time = datetime.now()
+            values = {
+                'model_type': type(estimator).__name__,
+                'model_category': category,
+                'hyperparameters': json.dumps(hyperparameters, default=str),
+                'training_date': current_time,
+                'training_duration': None,
+                'accuracy': mean('accuracy') if category == 'standard' else mean('winner_accuracy'),
+                'precision_score': mean('precision'),
+                'recall_score': mean('recall'),
+                'f1_score': mean('f1_score'),
+                'log_loss': mean('log_loss'),
+                'file_path': report_path,
+                'training_data_range': f"{report['period'][0]} -> {report['period'][1]}",
+                'feature_count': len(report['feature_cols']),
+                'sample_count': report['sample_count'],
+                'validation_method': 'walk_forward',
+                'notes': json.dumps({'summary': summary, 'folds': per_fold}),
+                'is_active': 0,
+                'created_at': current_time,
+                'updated_at': current_time
+            }
+            query = text(f"""
+            INSERT INTO model_versions ({', '.join(values)})
+            VALUES ({', '.join(f':{key}' for key in values)})
+            """)
+            with engine.begin() as connection:
+                connection.execute(query, values)
+            self.logger.info(f"Métriques walk-forward du modèle {category} enregistrées dans model_versions")
+        except Exception as e:
+            self.logger.error(f"Erreur lors de l'enregistrement des métriques walk-forward: {str(e)}")
@@ -11,10 +11,13 @@ import time
 
 # Import des modules mis à jour
 from data_preparation.enhanced_data_prep import EnhancedDataPreparation
+from data_preparation.feature_store import FeatureStore, DEFAULT_STORE_PATH
 from model.dual_prediction_model import DualPredictionModel
+from model.chunk_iterator import ChunkCache
 from analysis.historical_analysis import HistoricalAnalysis
 from model.model_evaluation import ModelEvaluation
 from batch_processing.batch_processor import BatchProcessor
+from batch_processing.race_executor import RacePredictionExecutor, DEFAULT_RACE_TIMEOUT
 
 class PMUOrchestrateur:
     """
@@ -34,6 +37,12 @@ class PMUOrchestrateur:
         
         # Charger les encodeurs si disponibles
         self.data_prep.load_encoders()
+
+        # Feature store persistant pour l'entraînement
+        self.feature_store = FeatureStore(
+            self.data_prep,
+            store_path=self.config.get('feature_store_path', DEFAULT_STORE_PATH)
+        )
         
         # Initialiser le modèle dual avec support pour le Top 7
         self.model = DualPredictionModel(base_path=self.config.get('model_path', 'model/trained_models'))
@@ -91,6 +100,8 @@ class PMUOrchestrateur:
                 'standard_model_type': 'xgboost',
                 'simulation_model_type': 'xgboost_ranking',
                 'top_n_features': 30,
+                'use_feature_store': True,
+                'feature_selection_gain': False,
                 'schedule': {
                     'time': '01:00',
                     'frequency': 'monthly',
@@ -143,7 +154,50 @@ class PMUOrchestrateur:
                     latest_model = sorted(simulation_models)[-1]
                     self.model.load_simulation_model(os.path.join(model_dir, latest_model))
                     self.logger.info(f"Modèle de simulation standard chargé: {latest_model}")
+        
+        # Encodeurs de l'entraînement embarqués dans les bundles
+        self.model.install_encoders(self.data_prep)
     
+    def _get_enhanced_training_data(self, start_date, end_date):
+        """
+        Retourne les données d'entraînement avec leurs features avancées, depuis le
+        feature store (rafraîchi pour les courses nouvelles ou modifiées) ou en
+        recalculant tout si training.use_feature_store est désactivé.
+        """
+        if self.config.get('training', {}).get('use_feature_store', True):
+            enhanced_data = self.feature_store.load(start_date=start_date, end_date=end_date)
+        else:
+            training_data = self.data_prep.get_training_data(start_date=start_date, end_date=end_date)
+            if training_data.empty:
+                return training_data
+            enhanced_data = self.data_prep.create_enhanced_features(training_data, point_in_time=True)
+
+        self.logger.info(f"Données récupérées: {len(enhanced_data)} échantillons")
+        return enhanced_data
+
+    def refresh_feature_store(self, full=False):
+        """Rafraîchit le feature store sur la fenêtre d'entraînement configurée."""
+        days_back = self.config.get('training', {}).get('days_back', 180)
+        start_date = (datetime.now() - timedelta(days=days_back)).strftime('%Y-%m-%d')
+        refreshed = self.feature_store.refresh(start_date=start_date, full=full)
+        self.logger.info(f"Feature store rafraîchi: {refreshed} courses recalculées")
+        return refreshed
+
+    def rebuild_entity_aggregates(self, verify_only=False):
+        """
+        Recalcule les tables d'agrégats père / entraîneur / propriétaire depuis
+        les participations, ou vérifie seulement leur cohérence (verify_only).
+        """
+        aggregates = self.data_prep.entity_aggregates
+        if verify_only:
+            mismatches = aggregates.verify()
+            self.logger.info(f"Vérification des agrégats: {mismatches}")
+            return mismatches
+
+        counts = aggregates.rebuild()
+        self.logger.info(f"Agrégats reconstruits: {counts}")
+        return counts
+
     def train_enhanced_models(self):
         """Entraîne les modèles avec les features améliorées."""
         self.logger.info("Démarrage de l'entraînement des modèles améliorés")
@@ -159,40 +213,33 @@ class PMUOrchestrateur:
         
         self.logger.info(f"Récupération des données du {start_date.strftime('%Y-%m-%d')} au {end_date.strftime('%Y-%m-%d')}")
         
-        # Obtenir les données d'entraînement
-        training_data = self.data_prep.get_training_data(
-            start_date=start_date.strftime('%Y-%m-%d'),
-            end_date=end_date.strftime('%Y-%m-%d')
+        # Obtenir les données d'entraînement avec leurs features avancées
+        enhanced_data = self._get_enhanced_training_data(
+            start_date.strftime('%Y-%m-%d'),
+            end_date.strftime('%Y-%m-%d')
         )
         
-        if training_data.empty:
+        if enhanced_data.empty:
             self.logger.error("Aucune donnée d'entraînement trouvée")
             return None
         
-        self.logger.info(f"Données récupérées: {len(training_data)} échantillons")
-        
-        # Créer des features avancées avec l'implémentation améliorée
-        enhanced_data = self.data_prep.create_enhanced_features(training_data)
-        
         # Créer les variables cibles
         prepared_data = self.model.create_target_variables(enhanced_data)
         
-        # Entraîner le modèle standard amélioré
-        self.logger.info(f"Entraînement du modèle standard amélioré")
-        standard_metrics, standard_path = self.model.train_with_enhanced_features(
-            prepared_data, 
-            target_col='target_place',
-            test_size=test_size,
-            top_n_features=top_n_features
-        )
-        
-        # Entraîner le modèle de simulation optimisé pour le Top 7
-        self.logger.info(f"Entraînement du modèle de simulation optimisé pour le Top 7")
-        simulation_metrics, simulation_path = self.model.train_top7_simulation_model(
+        # Entraîner en parallèle le modèle standard amélioré et le modèle Top 7
+        # à partir d'une seule matrice de features
+        self.logger.info("Entraînement concurrent des modèles standard et de simulation Top 7")
+        results = self.model.train_concurrently(
             prepared_data,
             test_size=test_size,
-            top_n_features=top_n_features
+            top_n_features=top_n_features,
+            max_workers=self.config.get('training', {}).get('train_workers'),
+            use_gain=self.config.get('training', {}).get('feature_selection_gain', False)
         )
+        if results is None:
+            return None
+        standard_metrics, standard_path = results['standard_accuracy'], results['standard_path']
+        simulation_metrics, simulation_path = results['simulation_metrics'], results['simulation_path']
         
         # Mettre à jour la configuration avec les nouveaux chemins de modèles
         self.config['standard_model_path'] = standard_path
@@ -246,24 +293,7 @@ class PMUOrchestrateur:
                 return None
             
             # Sauvegarder les prédictions
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            output_dir = 'predictions'
-            os.makedirs(output_dir, exist_ok=True)
-            output_file = f"{output_dir}/prediction_top7_{course_id}_{timestamp}.json"
-            
-            # Convertir en format JSON
-            prediction_dict = {
-                'course_id': course_id,
-                'date_prediction': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'predictions': results.to_dict(orient='records'),
-                'model_type': 'simulation_top7'
-            }
-            
-            # Sauvegarder au format JSON
-            with open(output_file, 'w') as f:
-                json.dump(prediction_dict, f, indent=2)
-            
-            self.logger.info(f"Prédiction Top 7 pour la course {course_id} sauvegardée dans {output_file}")
+            self._save_top7_prediction(course_id, results)
             
             return results
             
@@ -271,6 +301,28 @@ class PMUOrchestrateur:
             self.logger.error(f"Erreur lors de la prédiction Top 7 pour la course {course_id}: {str(e)}")
             return None
     
+    def _save_top7_prediction(self, course_id, results):
+        """Sauvegarde une prédiction Top 7 au format JSON dans predictions/."""
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        output_dir = 'predictions'
+        os.makedirs(output_dir, exist_ok=True)
+        output_file = f"{output_dir}/prediction_top7_{course_id}_{timestamp}.json"
+        
+        # Convertir en format JSON
+        prediction_dict = {
+            'course_id': course_id,
+            'date_prediction': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'predictions': results.to_dict(orient='records'),
+            'model_type': 'simulation_top7'
+        }
+        
+        # Sauvegarder au format JSON
+        with open(output_file, 'w') as f:
+            json.dump(prediction_dict, f, indent=2)
+        
+        self.logger.info(f"Prédiction Top 7 pour la course {course_id} sauvegardée dans {output_file}")
+        return output_file
+    
     def simulate_custom_top7(self, course_id, selected_horses=None, simulation_params=None):
         """
         Simule une course personnalisée avec prédiction des 7 premiers chevaux.
@@ -382,37 +434,92 @@ class PMUOrchestrateur:
     def batch_predict_top7(self, days_ahead=1):
         """
         Exécute des prédictions Top 7 par lot pour toutes les courses à venir.
+        
+        Les participants de toutes les courses sont chargés ensemble, les features
+        calculées en une passe et le modèle appelé une seule fois; les scores sont
+        ensuite découpés par course. Les courses que le lot n'a pas pu prédire sont
+        reprises course par course en parallèle (voir predict_races).
         """
         self.logger.info(f"Prédiction par lot Top 7 pour les {days_ahead} prochains jours")
         
+        # Vérifier si le modèle de simulation est chargé
+        if self.model.simulation_model is None:
+            self.logger.error("Modèle de simulation non chargé. Impossible de faire des prédictions Top 7.")
+            return []
+        
         # Récupérer les courses à venir
         upcoming_races = self.get_upcoming_races(days_ahead)
         
         if not len(upcoming_races):
             return []
         
+        try:
+            # Participants de toutes les courses de la période
+            participants_data = self.data_prep.get_upcoming_data(course_ids=upcoming_races['id'].tolist())
+            
+            if participants_data.empty:
+                self.logger.info("Pas de participants trouvés pour les courses à venir")
+                return []
+            
+            # Features de toute la journée en une passe (valeurs manquantes:
+            # médianes d'entraînement du bundle, et non médianes de la journée)
+            enhanced_data = self.data_prep.create_enhanced_features(participants_data, fill_missing=False)
+            
+            # Un seul appel au modèle pour toutes les courses
+            predictions_by_course = self.model.predict_top7_batch(enhanced_data) or {}
+            
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la prédiction par lot Top 7: {str(e)}")
+            predictions_by_course = {}
+        
+        # Courses non prédites par le lot: prédiction course par course en parallèle
+        remaining = [race_id for race_id in upcoming_races['id'] if race_id not in predictions_by_course]
+        if remaining:
+            self.logger.warning(f"{len(remaining)} courses prédites course par course")
+            predictions_by_course.update(self.predict_races(remaining, 'top7')['predictions'])
+        
         # Stocker les résultats
         all_predictions = []
         
-        # Traiter chaque course
+        # Découper par course
         for idx, race in upcoming_races.iterrows():
             race_id = race['id']
-            self.logger.info(f"Traitement de la course {race_id} - {race['lieu'] if 'lieu' in race else 'Unknown'} ({idx+1}/{len(upcoming_races)})")
+            predictions = predictions_by_course.get(race_id)
             
-            # Faire la prédiction Top 7
-            predictions = self.predict_course_top7(race_id)
+            if predictions is None:
+                self.logger.warning(f"Pas de prédiction Top 7 pour la course {race_id}")
+                continue
+            
+            self._save_top7_prediction(race_id, predictions)
             
-            if predictions is not None:
-                all_predictions.append({
-                    'course_id': race_id,
-                    'lieu': race['lieu'] if 'lieu' in race else 'Unknown',
-                    'date_heure': str(race['date_heure']) if 'date_heure' in race else None,
-                    'predictions': predictions.to_dict(orient='records')
-                })
+            all_predictions.append({
+                'course_id': race_id,
+                'lieu': race['lieu'] if 'lieu' in race else 'Unknown',
+                'date_heure': str(race['date_heure']) if 'date_heure' in race else None,
+                'predictions': predictions.to_dict(orient='records')
+            })
         
         self.logger.info(f"Prédictions par lot Top 7 terminées. {len(all_predictions)} prédictions générées.")
         return all_predictions
     
+    def predict_races(self, course_ids, prediction_type='top7'):
+        """
+        Prédit des courses une par une avec le pool configuré dans la section
+        prediction: race_executor ('thread', 'process' ou 'sequential'),
+        race_workers et race_timeout (secondes).
+        
+        Returns:
+            dict avec predictions ({course: DataFrame}), failed, timed_out et duration_seconds
+        """
+        prediction_config = self.config.get('prediction', {})
+        executor = RacePredictionExecutor(
+            self.model, self.data_prep,
+            mode=prediction_config.get('race_executor', 'thread'),
+            max_workers=prediction_config.get('race_workers'),
+            race_timeout=prediction_config.get('race_timeout', DEFAULT_RACE_TIMEOUT)
+        )
+        return executor.run(course_ids, prediction_type)
+    
     def run_course_analysis(self, course_id):
         """
         Analyse détaillée d'une course spécifique avec tous les indicateurs disponibles.
@@ -615,54 +722,47 @@ class PMUOrchestrateur:
             
             self.logger.info(f"Récupération des données du {start_date.strftime('%Y-%m-%d')} au {end_date.strftime('%Y-%m-%d')}")
             
-            # Récupérer les données
-            training_data = self.data_prep.get_training_data(
-                start_date=start_date.strftime("%Y-%m-%d"),
-                end_date=end_date.strftime("%Y-%m-%d")
+            # Récupérer les données avec leurs features avancées
+            enhanced_data = self._get_enhanced_training_data(
+                start_date.strftime("%Y-%m-%d"),
+                end_date.strftime("%Y-%m-%d")
             )
             
-            if training_data.empty:
+            if enhanced_data.empty:
                 self.logger.error("Aucune donnée d'entraînement trouvée")
                 return False
             
-            self.logger.info(f"Données récupérées: {len(training_data)} échantillons")
-            
-            # Créer des features avancées
-            enhanced_data = self.data_prep.create_enhanced_features(training_data)
-            
             # Créer les variables cibles
             prepared_data = self.model.create_target_variables(enhanced_data)
             
-            # Entraîner le modèle standard
-            self.logger.info(f"Entraînement du modèle standard ({standard_model_type})")
-            
-            if optimize_for_top7:
-                # Utiliser la méthode d'entraînement améliorée avec sélection de features enrichie
-                # Assurez-vous d'appeler la méthode du modèle, pas celle de data_prep
-                standard_accuracy, standard_path = self.model.train_with_enhanced_features(
-                    prepared_data, 
-                    target_col='target_place',
-                    test_size=test_size,
-                    top_n_features=top_n_features,
-                    data_prep=self.data_prep
-)
-            else:
-                # Utiliser la méthode d'entraînement standard existante
-                standard_accuracy, standard_path = self.model.train_standard_model(prepared_data, test_size=test_size)
-            
-            # Entraîner le modèle de simulation
-            self.logger.info(f"Entraînement du modèle de simulation ({simulation_model_type})")
-            
             if optimize_for_top7:
-                # Utiliser le modèle optimisé pour le Top 7
-                simulation_metrics, simulation_path = self.model.train_top7_simulation_model(
+                # Entraîner en parallèle le modèle standard amélioré et le modèle Top 7
+                # à partir d'une seule matrice de features
+                self.logger.info("Entraînement concurrent des modèles standard et de simulation Top 7")
+                results = self.model.train_concurrently(
                     prepared_data,
                     test_size=test_size,
                     top_n_features=top_n_features,
-                    data_prep=self.data_prep  # Ajouter cette ligne
+                    data_prep=self.data_prep,
+                    max_workers=self.config.get('training', {}).get('train_workers'),
+                    use_gain=self.config.get('training', {}).get('feature_selection_gain', False)
                 )
+                if results is None:
+                    return False
+                standard_accuracy, standard_path = results['standard_accuracy'], results['standard_path']
+                simulation_path = results['simulation_path']
             else:
-                # Utiliser la méthode d'entraînement de simulation standard
+                # Types de modèles de la configuration
+                if self.model.standard_model is None or self.model.standard_model_type != standard_model_type:
+                    self.model.initialize_standard_model(model_type=standard_model_type)
+                if self.model.simulation_model is None or self.model.simulation_model_type != simulation_model_type:
+                    self.model.initialize_simulation_model(model_type=simulation_model_type)
+                
+                # Utiliser les méthodes d'entraînement standard existantes
+                self.logger.info(f"Entraînement du modèle standard ({standard_model_type})")
+                standard_accuracy, standard_path = self.model.train_standard_model(prepared_data, test_size=test_size)
+                
+                self.logger.info(f"Entraînement du modèle de simulation ({simulation_model_type})")
                 simulation_metrics, simulation_path = self.model.train_simulation_model(prepared_data, test_size=test_size)
             
             # Mettre à jour les chemins des modèles dans la configuration
@@ -691,6 +791,150 @@ class PMUOrchestrateur:
             self.logger.error(f"Erreur lors de l'entraînement: {str(e)}")
             return False
 
+    def run_streaming_training(self, races_per_chunk=None, external_memory=False):
+        """
+        Entraîne les modèles standard et de simulation en flux, mois par mois,
+        sans charger toute la période en mémoire (historiques longs). Le dernier
+        mois de la période sert à l'évaluation.
+        """
+        self.logger.info("Démarrage de l'entraînement en flux des modèles")
+
+        try:
+            days_back = self.config.get('training', {}).get('days_back', 180)
+            test_days = self.config.get('training', {}).get('test_days', 30)
+
+            end_date = datetime.now()
+            eval_start = end_date - timedelta(days=test_days)
+            start_date = end_date - timedelta(days=days_back)
+
+            # Découpage semi-ouvert: [start, eval_start[ pour l'entraînement, [eval_start, end] pour l'évaluation
+            train_range = (start_date.strftime('%Y-%m-%d'), eval_start.strftime('%Y-%m-%d'))
+            eval_chunks = list(self.data_prep.iter_training_data(
+                start_date=train_range[1], end_date=end_date.strftime('%Y-%m-%d')
+            ))
+            eval_data = pd.concat(eval_chunks, ignore_index=True) if eval_chunks else None
+
+            # Morceaux chargés une seule fois, partagés par les deux modèles et toutes les passes XGBoost
+            chunks = ChunkCache.build(
+                lambda: self.data_prep.iter_training_data(
+                    start_date=train_range[0], end_date=train_range[1],
+                    races_per_chunk=races_per_chunk, end_exclusive=True
+                ),
+                os.path.join(self.model.base_path, 'cache'),
+                prepare_chunk=self.model.create_target_variables
+            )
+            try:
+                standard_metrics, standard_path = self.model.train_from_chunks(
+                    chunks, model_category='standard', eval_data=eval_data,
+                    external_memory=external_memory
+                )
+                simulation_metrics, simulation_path = self.model.train_from_chunks(
+                    chunks, model_category='simulation', eval_data=eval_data,
+                    external_memory=external_memory
+                )
+            finally:
+                chunks.cleanup()
+
+            if standard_path is None or simulation_path is None:
+                self.logger.error("Aucune donnée d'entraînement trouvée")
+                return False
+
+            self.config['standard_model_path'] = standard_path
+            self.config['simulation_model_path'] = simulation_path
+            with open('config/config.json', 'w') as f:
+                json.dump(self.config, f, indent=2)
+
+            self.logger.info(f"Modèle standard: {standard_path} {standard_metrics}")
+            self.logger.info(f"Modèle de simulation: {simulation_path} {simulation_metrics}")
+            return True
+
+        except Exception as e:
+            self.logger.error(f"Erreur lors de l'entraînement en flux: {str(e)}")
+            return False
+
+    def run_walk_forward_cv(self):
+        """
+        Validation walk-forward des modèles sur la période d'entraînement configurée
+        (fenêtre croissante, évaluation sur la semaine suivante, folds en parallèle).
+        """
+        self.logger.info("Démarrage de la validation walk-forward")
+
+        try:
+            training_config = self.config.get('training', {})
+            days_back = training_config.get('days_back', 180)
+            end_date = datetime.now()
+            start_date = end_date - timedelta(days=days_back)
+
+            enhanced_data = self._get_enhanced_training_data(
+                start_date.strftime('%Y-%m-%d'),
+                end_date.strftime('%Y-%m-%d')
+            )
+            if enhanced_data.empty:
+                self.logger.error("Aucune donnée d'entraînement trouvée")
+                return None
+
+            report, report_path = self.model.walk_forward_validate(
+                enhanced_data,
+                min_train_days=training_config.get('cv_min_train_days', 60),
+                test_days=training_config.get('cv_test_days', 7),
+                max_folds=training_config.get('cv_max_folds'),
+                max_workers=training_config.get('cv_workers')
+            )
+
+            self.logger.info(f"Validation walk-forward terminée: {len(report['folds'])} folds ({report_path})")
+            self.logger.info(f"Modèle standard: {report['standard']}")
+            self.logger.info(f"Modèle de simulation: {report['simulation']}")
+            return report
+
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la validation walk-forward: {str(e)}")
+            return None
+
+    def run_ranker_tuning(self):
+        """
+        Recherche d'hyperparamètres du ranker Top 7 par divisions successives sur la
+        période d'entraînement configurée; le classement est enregistré avec les modèles.
+        """
+        self.logger.info("Démarrage de la recherche d'hyperparamètres du ranker")
+
+        try:
+            training_config = self.config.get('training', {})
+            days_back = training_config.get('days_back', 180)
+            end_date = datetime.now()
+            start_date = end_date - timedelta(days=days_back)
+
+            enhanced_data = self._get_enhanced_training_data(
+                start_date.strftime('%Y-%m-%d'),
+                end_date.strftime('%Y-%m-%d')
+            )
+            if enhanced_data.empty:
+                self.logger.error("Aucune donnée d'entraînement trouvée")
+                return None
+
+            report, report_path = self.model.tune_simulation_model(
+                self.model.create_target_variables(enhanced_data),
+                n_candidates=training_config.get('tuning_candidates', 27),
+                factor=training_config.get('tuning_factor', 3),
+                n_splits=training_config.get('tuning_folds', 3),
+                max_workers=training_config.get('tuning_workers'),
+                max_seconds=training_config.get('tuning_max_seconds')
+            )
+
+            self.logger.info(f"Recherche terminée ({report_path}): {report['best_params']}")
+
+            # Modèle Top 7 réentraîné avec les meilleurs paramètres
+            refit_path = report.get('refit', {}).get('model_path')
+            if refit_path:
+                self.config['simulation_top7_model_path'] = refit_path
+                with open('config/config.json', 'w') as f:
+                    json.dump(self.config, f, indent=2)
+                self.logger.info(f"Modèle Top 7 réentraîné: {refit_path}")
+            return report
+
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la recherche d'hyperparamètres: {str(e)}")
+            return None
+
 def parse_args():
     """Parse les arguments de ligne de commande."""
     parser = argparse.ArgumentParser(description='Orchestrateur du système de prédiction PMU')
@@ -699,7 +943,8 @@ def parse_args():
                         help='Chemin vers le fichier de configuration')
     
     parser.add_argument('--action', type=str, 
-                        choices=['all', 'scrape', 'predict', 'evaluate', 'train', 'schedule', 'simulate'],
+                        choices=['all', 'scrape', 'predict', 'evaluate', 'train', 'schedule', 'simulate',
+                                 'refresh_features', 'train_streaming', 'rebuild_aggregates', 'walk_forward', 'tune_ranker'],
                         default='all', help='Action à exécuter')
     
     # Arguments pour l'optimisation Top 7
@@ -708,6 +953,12 @@ def parse_args():
     
     parser.add_argument('--quinte', action='store_true',
                        help='Alias pour --top7')
+
+    parser.add_argument('--full', action='store_true',
+                       help='Reconstruire entièrement le feature store (action refresh_features)')
+
+    parser.add_argument('--verify', action='store_true',
+                       help='Comparer les agrégats à un recalcul complet sans les réécrire (action rebuild_aggregates)')
     
     # Autres arguments existants...
     
@@ -755,6 +1006,21 @@ def main():
         analysis_report = orchestrateur.run_course_analysis(course_id)
         print(analysis_report)
     
+    elif args.action == 'train_streaming':
+        orchestrateur.run_streaming_training()
+    
+    elif args.action == 'refresh_features':
+        orchestrateur.refresh_feature_store(full=args.full)
+    
+    elif args.action == 'rebuild_aggregates':
+        print(orchestrateur.rebuild_entity_aggregates(verify_only=args.verify))
+    
+    elif args.action == 'walk_forward':
+        orchestrateur.run_walk_forward_cv()
+    
+    elif args.action == 'tune_ranker':
+        orchestrateur.run_ranker_tuning()
+    
     elif args.action == 'schedule':
         # Exemple d'utilisation de la planification
         orchestrateur.schedule_tasks()
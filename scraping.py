@@ -550,8 +550,14 @@ logging.basicConfig(
 # Importez vos modèles de base de données
 from database.setup_database import CommentaireCourse, CoteHistorique, Incident, PhotoArrivee, PmuCourse, engine, Course, Reunion, Pays, Hippodrome, Base, Participant, Cheval, Jockey, Participation
 
+from data_preparation.entity_aggregates import EntityAggregates
+
 # Créez une session
 Session = sessionmaker(bind=engine)
+
+# Agrégats par père / entraîneur / propriétaire tenus à jour à l'ingestion
+entity_aggregates = EntityAggregates(engine)
+
 def save_commentaire(course_id, commentaire_data):
     if not commentaire_data or 'texte' not in commentaire_data:
         return
@@ -963,6 +969,10 @@ def save_participant(participant_data, course_id):
         if 'handicapPoids' in participant_data:
             participant_dict['handicapPoids'] = participant_data.get('handicapPoids')
         
+        # Contributions de la course aux agrégats avant écriture
+        entity_aggregates.ensure_tables()
+        before = entity_aggregates.snapshot(session, pmu_course_ids=[course_id])
+
         if existing_participant:
             # Mettre à jour les champs
             for key, value in participant_dict.items():
@@ -979,6 +989,10 @@ def save_participant(participant_data, course_id):
             participant_id = new_participant.id
             logging.info(f"Created new participant {participant_data.get('nom')} in course {course_id}")
         
+        # Agrégats mis à jour par deltas dans la même transaction
+        session.flush()
+        after = entity_aggregates.snapshot(session, pmu_course_ids=[course_id])
+        entity_aggregates.record_change(session, before, after)
         session.commit()
         
         # Option: créer aussi un enregistrement dans la table participations
@@ -1002,6 +1016,8 @@ def save_participant(participant_data, course_id):
                     id_cheval=cheval_id
                 ).first()
                 
+                before = entity_aggregates.snapshot(session, course_ids=[course_simple.id])
+                
                 if participation_simple:
                     participation_simple.position = participant_data.get('ordreArrivee')
                     participation_simple.cote_actuelle = cote_actuelle
@@ -1026,6 +1042,11 @@ def save_participant(participant_data, course_id):
                     )
                     session.add(new_participation)
                 
+                # Agrégats mis à jour par deltas dans la même transaction
+                session.flush()
+                after = entity_aggregates.snapshot(session, course_ids=[course_simple.id])
+                entity_aggregates.record_change(session, before, after)
+                
                 session.commit()
         except Exception as e:
             logging.warning(f"Could not create/update simplified participation: {str(e)}")
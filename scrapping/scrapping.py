@@ -401,6 +401,7 @@ from database.setup_database import (
     Cheval, Jockey, Participation, CoteEvolution, Incident, 
     CommentaireCourse, PhotoArrivee
 )
+from data_preparation.entity_aggregates import EntityAggregates
 
 # Configuration du logging
 logging.basicConfig(
@@ -423,6 +424,10 @@ Session = sessionmaker(bind=engine)
 # Assurez-vous que toutes les tables sont créées
 Base.metadata.create_all(engine)
 
+# Agrégats par père / entraîneur / propriétaire tenus à jour à chaque ingestion
+entity_aggregates = EntityAggregates(engine)
+entity_aggregates.ensure_tables()
+
 def get_race_dates(start_date, end_date):
     """Calcule les dates intermédiaires entre deux dates données"""
     current_date = start_date
@@ -699,9 +704,18 @@ def save_participant(participant_data, course_id):
         if 'dernierRapportReference' in participant_data:
             data_to_save['dernierRapportReference'] = json.dumps(participant_data.get('dernierRapportReference'))
         
+        # Contributions de la course aux agrégats avant écriture
+        entity_aggregates.ensure_tables()
+        before = entity_aggregates.snapshot(session, pmu_course_ids=[course_id])
+        
         # Créer et sauvegarder le participant
         new_participant = Participant(**data_to_save)
         session.add(new_participant)
+        
+        # Agrégats mis à jour par deltas dans la même transaction
+        session.flush()
+        after = entity_aggregates.snapshot(session, pmu_course_ids=[course_id])
+        entity_aggregates.record_change(session, before, after)
         session.commit()
         
         # Enregistrer les données du cheval et du jockey
@@ -786,8 +800,16 @@ def save_cheval_jockey(participant_data, course_id):
             ).first()
             
             if not existing_participation:
+                entity_aggregates.ensure_tables()
+                before = entity_aggregates.snapshot(session, course_ids=[course_id])
+                
                 participation = Participation(**participation_data)
                 session.add(participation)
+                
+                # Agrégats mis à jour par deltas dans la même transaction
+                session.flush()
+                after = entity_aggregates.snapshot(session, course_ids=[course_id])
+                entity_aggregates.record_change(session, before, after)
         
         session.commit()
         return True
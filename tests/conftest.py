@@ -1 +1,55 @@
 # conftest.py
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+from benchmarks.synthetic_data import generate_synthetic_database
+
+
+@pytest.fixture(scope='session')
+def synthetic_engine(tmp_path_factory):
+    """Petite base SQLite synthétique (lecture seule), le dernier quart des jours sans arrivée"""
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('pmu') / 'pmu_synthetic.db'}")
+    generate_synthetic_database(engine, days=12, reunions_per_day=2, races_per_reunion=4,
+                                runners_per_race=8, horse_pool=60, results_ratio=0.75)
+    return engine
+
+
+def _make_races(n_races=40, runners=8, start=0, seed=0, noise=0.0, categorical=False):
+    """
+    Courses synthétiques d'une heure d'intervalle: la forme (bruitée de noise)
+    détermine l'arrivée. categorical ajoute des catégorielles brutes (lieu, jockey,
+    sexe, type de course) et leurs colonnes encodées.
+    """
+    rng = np.random.default_rng(seed)
+    n = n_races * runners
+    race = np.repeat(np.arange(n_races), runners)
+    df = pd.DataFrame({
+        'id_course': start + race,
+        'id_cheval': np.arange(n),
+        'date_heure': pd.Timestamp('2026-01-01') + pd.to_timedelta(race, unit='h'),
+        'forme': rng.normal(size=n),
+        'cote_actuelle': rng.uniform(2, 30, size=n)
+    })
+    if categorical:
+        lieux = np.array(['Vincennes', 'Longchamp', 'Chantilly'])
+        df['lieu'] = lieux[rng.integers(0, 3, size=n)]
+        df['jockey_nom'] = [f'Jockey {i}' for i in rng.integers(0, 10, size=n)]
+        df['sexe'] = np.where(rng.random(n) < 0.5, 'M', 'F')
+        df['type_course'] = np.where(rng.random(n) < 0.5, 'Plat', 'Trot')
+        df['lieu_encoded'] = pd.Categorical(df['lieu']).codes
+        df['jockey_nom_encoded'] = pd.Categorical(df['jockey_nom']).codes
+        df['sexe_M'] = (df['sexe'] == 'M').astype(int)
+        df['type_course_Plat'] = (df['type_course'] == 'Plat').astype(int)
+
+    score = df['forme'] + rng.normal(scale=noise, size=n) if noise else df['forme']
+    df['position'] = score.groupby(df['id_course']).rank(ascending=False, method='first').astype(int)
+    df['target_place'] = (df['position'] <= 3).astype(int)
+    return df
+
+
+@pytest.fixture
+def make_races():
+    """Fabrique de courses synthétiques partagée par les tests d'entraînement"""
+    return _make_races
@@ -0,0 +1,29 @@
+# test_bulk_features.py
+import pandas as pd
+
+from data_preparation.enhanced_data_prep import EnhancedDataPreparation
+
+# Familles calculées par BulkFeatureBuilder (les statistiques par entité relèvent
+# de RollingStatsAggregator et ont leurs propres définitions)
+BUILDER_FEATURES = [
+    'past_incidents_count', 'temperature', 'force_vent', 'meteo_code',
+    'similar_weather_perf', 'similar_weather_count', 'avg_speed', 'max_speed', 'avg_reduction_km',
+    'prize_category', 'similar_course_type_perf', 'similar_course_type_count', 'comment_sentiment',
+]
+
+ENTITY_PREFIXES = ('pere_', 'entraineur_', 'proprietaire_', 'jockey_cheval_', 'distance_')
+
+
+def test_bulk_matches_legacy(synthetic_engine):
+    """Test d'équivalence: le calcul groupé produit les mêmes features que le calcul ligne par ligne"""
+    data_prep = EnhancedDataPreparation(engine=synthetic_engine)
+    df = data_prep.get_training_data()
+    df = df[df['id_course'].isin(sorted(df['id_course'].unique())[-6:])].reset_index(drop=True)
+
+    bulk = data_prep.create_enhanced_features(df.copy(), fill_missing=False)
+    legacy = data_prep.create_enhanced_features(df.copy(), method='legacy', fill_missing=False)
+
+    assert bulk[BUILDER_FEATURES].notna().any().all()
+    columns = [col for col in legacy.columns if not col.startswith(ENTITY_PREFIXES)]
+    assert set(columns) <= set(bulk.columns)
+    pd.testing.assert_frame_equal(bulk[columns], legacy[columns], check_dtype=False)
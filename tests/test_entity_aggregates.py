@@ -0,0 +1,74 @@
+# test_entity_aggregates.py
+import pytest
+from sqlalchemy import create_engine, text
+
+from benchmarks.synthetic_data import generate_synthetic_database
+from data_preparation.entity_aggregates import EntityAggregates
+
+
+@pytest.fixture
+def aggregates(tmp_path):
+    """Base synthétique modifiable, agrégats reconstruits, la moitié des jours sans arrivée"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'pmu.db'}")
+    generate_synthetic_database(engine, days=6, reunions_per_day=1, races_per_reunion=3,
+                                runners_per_race=6, horse_pool=30, results_ratio=0.5)
+    return EntityAggregates(engine)
+
+
+def _pending_course(connection):
+    return connection.execute(text("""
+        SELECT c.id, c.pmu_course_id FROM courses c
+        WHERE NOT EXISTS (SELECT 1 FROM participations r WHERE r.id_course = c.id AND r.position IS NOT NULL)
+        ORDER BY c.date_heure LIMIT 1
+    """)).fetchone()
+
+
+def _zero(mismatches):
+    return all(count == 0 for count in mismatches.values())
+
+
+def test_arrival_deltas_match_full_rebuild(aggregates):
+    """Test de l'arrivée d'une course: les deltas donnent les mêmes agrégats qu'une reconstruction"""
+    assert _zero(aggregates.verify())
+
+    with aggregates.engine.begin() as connection:
+        course_id, _ = _pending_course(connection)
+        before = aggregates.snapshot(connection, course_ids=[course_id])
+        connection.execute(text("""
+            UPDATE participations SET position = numPmu WHERE id_course = :course_id
+        """), {'course_id': course_id})
+        after = aggregates.snapshot(connection, course_ids=[course_id])
+        aggregates.record_change(connection, before, after)
+
+    # La course sans arrivée ne contribuait pas: toutes ses entités sont nouvelles
+    assert all(not contributions for contributions in before.values())
+    assert all(contributions for contributions in after.values())
+    assert _zero(aggregates.verify())
+
+
+def test_participant_deltas_match_full_rebuild(aggregates):
+    """Test de l'ajout d'un partant (participation et participant PMU) dans une course terminée"""
+    with aggregates.engine.begin() as connection:
+        course_id, pmu_course_id = connection.execute(text(
+            "SELECT c.id, c.pmu_course_id FROM courses c ORDER BY c.date_heure LIMIT 1"
+        )).fetchone()
+        id_cheval = connection.execute(text("""
+            SELECT MAX(id) FROM chevaux
+            WHERE id NOT IN (SELECT id_cheval FROM participations WHERE id_course = :course_id)
+        """), {'course_id': course_id}).scalar()
+
+        before = aggregates.snapshot(connection, pmu_course_ids=[pmu_course_id])
+        connection.execute(text("""
+            INSERT INTO participations (id_course, id_cheval, id_jockey, position, numPmu)
+            VALUES (:course_id, :id_cheval, 1, 1, 99)
+        """), {'course_id': course_id, 'id_cheval': id_cheval})
+        connection.execute(text("""
+            INSERT INTO pmu_participants (id_course, numPmu, nom, entraineur, ordreArrivee)
+            VALUES (:pmu_course_id, 99, 'NOUVEAU', 'ENTRAINEUR NOUVEAU', 1)
+        """), {'pmu_course_id': pmu_course_id})
+        after = aggregates.snapshot(connection, pmu_course_ids=[pmu_course_id])
+        aggregates.record_change(connection, before, after)
+
+    assert _zero(aggregates.verify())
+    trainer = aggregates.read('trainer', ['ENTRAINEUR NOUVEAU'])
+    assert trainer.loc['ENTRAINEUR NOUVEAU', 'nb_victoires'] == 1
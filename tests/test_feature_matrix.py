@@ -0,0 +1,53 @@
+# test_feature_matrix.py
+import numpy as np
+import pytest
+from lightgbm import LGBMClassifier
+from sklearn.ensemble import RandomForestClassifier
+from xgboost import XGBClassifier
+
+from model.dual_prediction_model import DualPredictionModel
+from model.feature_matrix import build_compact_matrix, native_feature_columns, supports_native_categorical
+
+
+@pytest.fixture
+def races(make_races):
+    """Courses synthétiques avec catégorielles brutes et leurs colonnes encodées"""
+    return make_races(categorical=True)
+
+
+def test_supports_native_categorical():
+    """Test de la détection du support des catégorielles natives"""
+    assert supports_native_categorical(XGBClassifier(enable_categorical=True))
+    assert not supports_native_categorical(XGBClassifier(enable_categorical=False))
+    assert supports_native_categorical(LGBMClassifier())
+    assert not supports_native_categorical(RandomForestClassifier())
+    assert not supports_native_categorical(XGBClassifier(enable_categorical=True), RandomForestClassifier())
+
+
+def test_native_feature_columns_keeps_encoded_columns_without_native_support(races):
+    """Test des colonnes encodées gardées pour un modèle sans catégorielles natives"""
+    feature_cols = ['forme', 'lieu_encoded', 'sexe_M', 'cote_actuelle']
+
+    native = native_feature_columns(races, feature_cols)
+    assert native == ['forme', 'cote_actuelle', 'lieu', 'jockey_nom', 'sexe', 'type_course']
+
+    encoded = native_feature_columns(races, feature_cols, native=False)
+    assert encoded == feature_cols
+    X, categories = build_compact_matrix(races, encoded)
+    assert categories == {}
+    assert all(dtype == np.float32 for dtype in X.dtypes)
+
+
+def test_random_forest_training_uses_encoded_columns(races, tmp_path):
+    """Test de l'entraînement d'une forêt aléatoire (modèle standard et de simulation)"""
+    model = DualPredictionModel(base_path=str(tmp_path))
+
+    model.initialize_standard_model(model_type='random_forest')
+    accuracy, standard_path = model.train_with_enhanced_features(races, top_n_features=10)
+    assert standard_path is not None
+    assert 0.0 <= accuracy <= 1.0
+
+    model.initialize_simulation_model(model_type='random_forest_regression')
+    metrics, simulation_path = model.train_top7_simulation_model(races, top_n_features=10)
+    assert simulation_path is not None
+    assert 'winner_accuracy' in metrics
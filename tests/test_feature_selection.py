@@ -0,0 +1,54 @@
+# test_feature_selection.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from model.dual_prediction_model import DualPredictionModel
+
+
+@pytest.fixture
+def runners():
+    """Partants synthétiques: la forme est corrélée à la position, le bruit non"""
+    rng = np.random.default_rng(0)
+    n = 400
+    df = pd.DataFrame({
+        'forme': rng.normal(size=n),
+        'bruit': rng.normal(size=n),
+        'cote_actuelle': rng.uniform(2, 30, size=n)
+    })
+    df['position'] = df['forme'].rank(ascending=False, method='first').astype(int)
+    return df
+
+
+def test_feature_scores_follow_inputs(runners, tmp_path):
+    """Test de l'invalidation des scores quand la cible ou les données changent"""
+    model = DualPredictionModel(base_path=str(tmp_path))
+
+    assert model.select_features_enhanced(runners, target_col='position', top_n=1) == ['forme']
+    scores = model.feature_scores
+    model.select_features_enhanced(runners, target_col='position', top_n=1)
+    assert model.feature_scores is scores
+
+    shuffled = runners.copy()
+    shuffled['position'] = shuffled['bruit'].rank(ascending=False, method='first').astype(int)
+    assert model.select_features_enhanced(shuffled, target_col='position', top_n=1) == ['bruit']
+    assert model.feature_scores is not scores
+
+    # Sans top_n, pas de scores: rien de périmé n'est sauvegardé avec le modèle
+    model.select_features_enhanced(runners, target_col='position')
+    assert model.feature_scores is None
+
+
+def test_use_gain_adds_probe_importances(runners, tmp_path):
+    """Test de use_gain: scores combinés (rangs de la corrélation et des importances du modèle sonde)"""
+    model = DualPredictionModel(base_path=str(tmp_path))
+
+    model.select_features_enhanced(runners, target_col='position', top_n=2)
+    without_gain = model.feature_scores
+    model.select_features_enhanced(runners, target_col='position', top_n=2, use_gain=True)
+
+    assert model.feature_scores is not without_gain
+    # Moyenne de deux rangs en pourcentage sur 3 features: multiples de 1/6
+    np.testing.assert_allclose(model.feature_scores * 6, np.round(model.feature_scores * 6))
+    assert not model.feature_scores.equals(without_gain)
+    assert model.feature_scores.index[0] == 'forme'
@@ -0,0 +1,68 @@
+# test_feature_store.py
+import pandas as pd
+import pytest
+
+from data_preparation.feature_store import FeatureStore
+
+
+class CountingDataPrep:
+    """Préparation des données simulée: enregistre les courses recalculées"""
+
+    engine = None
+
+    def __init__(self):
+        self.computed = []
+        self.forme = {}
+
+    def get_training_data(self, course_ids):
+        self.computed.append(sorted(course_ids))
+        return pd.DataFrame({
+            'id_course': course_ids,
+            'id_cheval': [1] * len(course_ids),
+            'date_heure': pd.to_datetime(['2026-01-15'] * len(course_ids)),
+            'forme': [self.forme.get(course, 0.0) for course in course_ids]
+        })
+
+    def create_enhanced_features(self, df, point_in_time=False, fill_missing=True):
+        return df
+
+    def fill_missing_numeric(self, df):
+        return df
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = FeatureStore(CountingDataPrep(), store_path=str(tmp_path / 'store'))
+    store.signatures = pd.DataFrame({'id_course': [1, 2, 3], 'month': ['2026-01'] * 3,
+                                     'signature': ['a', 'b', 'c']})
+    monkeypatch.setattr(store, 'get_course_signatures', lambda start_date=None, end_date=None: store.signatures.copy())
+    return store
+
+
+def test_only_changed_courses_are_recomputed(store):
+    """Test de l'invalidation par signature: seules les courses modifiées sont recalculées"""
+    assert store.refresh() == 3
+    assert store.refresh() == 0
+    assert store.data_prep.computed == [[1, 2, 3]]
+
+    # Nouveau résultat pour la course 2
+    store.signatures.loc[store.signatures['id_course'] == 2, 'signature'] = 'b2'
+    store.data_prep.forme[2] = 1.0
+    assert store.refresh() == 1
+    assert store.data_prep.computed[-1] == [2]
+
+    features = store.load(refresh=False).set_index('id_course')
+    assert sorted(features.index) == [1, 2, 3]
+    assert features.loc[2, 'forme'] == 1.0
+
+
+def test_feature_version_change_rebuilds_store(store):
+    """Test de la reconstruction complète après un changement de FEATURE_VERSION"""
+    store.refresh()
+
+    rebuilt = FeatureStore(store.data_prep, store_path=store.store_path, feature_version=store.feature_version + 1)
+    rebuilt.get_course_signatures = store.get_course_signatures
+
+    assert rebuilt.refresh() == 3
+    assert store.data_prep.computed == [[1, 2, 3], [1, 2, 3]]
+    assert set(rebuilt.load(refresh=False)['feature_version']) == {store.feature_version + 1}
@@ -0,0 +1,77 @@
+# test_incremental_training.py
+import joblib
+import numpy as np
+import pytest
+from xgboost import XGBClassifier, XGBRanker
+
+from model.dual_prediction_model import DualPredictionModel
+
+FEATURES = ['forme', 'cote_actuelle']
+
+# Bruit sur la forme: l'arrivée n'est pas parfaitement prévisible
+NOISE = 0.3
+
+
+@pytest.fixture
+def model(tmp_path):
+    return DualPredictionModel(base_path=str(tmp_path))
+
+
+def test_continue_training_adds_rounds_to_classifier(model, tmp_path, make_races):
+    """Test de la continuation d'un classifieur: arbres ajoutés, modèle sauvegardé rechargeable"""
+    train = make_races(40, seed=0, noise=NOISE)
+    new = make_races(20, start=1000, seed=1, noise=NOISE)
+    holdout = make_races(10, start=2000, seed=2, noise=NOISE)
+    estimator = XGBClassifier(n_estimators=20, max_depth=3)
+    estimator.fit(train[FEATURES], train['target_place'])
+
+    updated, report = model.continue_training(estimator, new, holdout, extra_rounds=10, max_regression=1.0)
+
+    assert updated is not None and report['accepted']
+    assert report['metric'] == 'log_loss'
+    assert report['base_rounds'] == 20
+    assert report['total_rounds'] == 30
+    assert report['training_size'] == len(new)
+    # Le modèle d'origine n'est pas modifié
+    assert estimator.get_booster().num_boosted_rounds() == 20
+
+    path = tmp_path / 'enhanced_xgboost_incremental.pkl'
+    joblib.dump(updated, path)
+    restored = joblib.load(path)
+    np.testing.assert_allclose(restored.predict_proba(holdout[FEATURES]), updated.predict_proba(holdout[FEATURES]))
+    assert restored.get_booster().num_boosted_rounds() == 30
+
+
+def test_continue_training_rejects_regression(model, make_races):
+    """Test du rejet d'une mise à jour qui dégrade la métrique de validation"""
+    train = make_races(40, seed=0, noise=NOISE)
+    holdout = make_races(10, start=2000, seed=2, noise=NOISE)
+    # Nouvelles courses aux cibles inversées: la mise à jour dégrade le log loss
+    new = make_races(20, start=1000, seed=1, noise=NOISE)
+    new['target_place'] = 1 - new['target_place']
+    estimator = XGBClassifier(n_estimators=20, max_depth=3)
+    estimator.fit(train[FEATURES], train['target_place'])
+
+    updated, report = model.continue_training(estimator, new, holdout, extra_rounds=30)
+
+    assert updated is None
+    assert not report['accepted']
+    assert report['after']['log_loss'] > report['before']['log_loss']
+
+
+def test_continue_training_ranker_starts_from_best_iteration(model, make_races):
+    """Test de la continuation d'un ranker à partir des arbres retenus par l'arrêt anticipé"""
+    train = make_races(40, seed=0, noise=NOISE)
+    valid = make_races(10, start=500, seed=3, noise=NOISE)
+    new = make_races(20, start=1000, seed=1, noise=NOISE)
+    holdout = make_races(10, start=2000, seed=2, noise=NOISE)
+    estimator = XGBRanker(n_estimators=200, learning_rate=0.3, objective='rank:ndcg', early_stopping_rounds=5)
+    estimator.fit(train[FEATURES], train['position'], group=[8] * 40,
+                  eval_set=[(valid[FEATURES], valid['position'])], eval_group=[[8] * 10], verbose=False)
+
+    updated, report = model.continue_training(estimator, new, holdout, extra_rounds=10, max_regression=1.0)
+
+    assert report['metric'] == 'ndcg_at_7'
+    assert report['base_rounds'] == estimator.best_iteration + 1
+    assert report['total_rounds'] == report['base_rounds'] + 10
+    assert updated.get_params()['early_stopping_rounds'] is None
@@ -0,0 +1,51 @@
+# test_model_bundle.py
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.model_selection import GroupShuffleSplit, train_test_split
+
+from model.dual_prediction_model import DualPredictionModel
+from model.model_bundle import LATEST_MODEL_FILES, ModelBundle, bundle_path
+
+
+def test_training_writes_latest_copy(tmp_path, make_races):
+    """Test de la copie latest (modèle et bundle) écrite à chaque entraînement"""
+    races = make_races()
+    model = DualPredictionModel(base_path=str(tmp_path))
+    model.initialize_standard_model(model_type='xgboost')
+    _, model_path = model.train_with_enhanced_features(races, top_n_features=10)
+
+    latest_path = os.path.join(str(tmp_path), LATEST_MODEL_FILES['standard'])
+    assert os.path.exists(latest_path)
+    assert os.path.exists(bundle_path(latest_path))
+
+    versioned, latest = DualPredictionModel(base_path=str(tmp_path)), DualPredictionModel(base_path=str(tmp_path))
+    assert versioned.load_standard_model(model_path)
+    assert latest.load_standard_model(latest_path)
+    assert latest.bundles['standard'].feature_cols == versioned.bundles['standard'].feature_cols
+    assert latest.bundles['standard'].metadata['model_path'] == model_path
+    pd.testing.assert_frame_equal(latest.predict_standard(races), versioned.predict_standard(races))
+
+
+@pytest.mark.parametrize('category', ['standard', 'simulation'])
+def test_fill_values_use_training_rows_only(tmp_path, make_races, category):
+    """Test des médianes de remplacement: calculées sur les seules lignes d'entraînement"""
+    races = make_races()
+    races.loc[races.index % 5 == 0, 'cote_actuelle'] = np.nan
+    model = DualPredictionModel(base_path=str(tmp_path))
+    if category == 'standard':
+        model.initialize_standard_model(model_type='xgboost')
+        _, model_path = model.train_with_enhanced_features(races, top_n_features=10)
+        train_idx, _ = train_test_split(np.arange(len(races)), test_size=0.2, random_state=42)
+    else:
+        model.initialize_simulation_model()
+        _, model_path = model.train_top7_simulation_model(races, top_n_features=10)
+        splitter = GroupShuffleSplit(n_splits=1, test_size=0.2, random_state=42)
+        train_idx, _ = next(splitter.split(np.zeros(len(races)), groups=races['id_course']))
+
+    fill_values = ModelBundle.load(bundle_path(model_path)).fill_values
+    expected = races['cote_actuelle'].iloc[train_idx].astype(np.float32).median()
+    assert fill_values['cote_actuelle'] == pytest.approx(expected)
+    assert fill_values['cote_actuelle'] != pytest.approx(races['cote_actuelle'].astype(np.float32).median())
@@ -0,0 +1,38 @@
+# test_race_executor.py
+import time
+
+import pandas as pd
+
+from batch_processing.race_executor import RacePredictionExecutor
+
+
+class SlowDataPrep:
+    """Préparation des données simulée: chargement d'une course en durations[course] secondes"""
+
+    def __init__(self, durations):
+        self.durations = durations
+
+    def get_upcoming_data(self, course_ids):
+        time.sleep(self.durations[course_ids[0]])
+        return pd.DataFrame({'id_course': course_ids, 'id_cheval': [1]})
+
+    def create_enhanced_features(self, df, fill_missing=True):
+        return df
+
+
+class EchoModel:
+    def predict_top7(self, data):
+        return data
+
+
+def test_timeout_counts_from_task_start():
+    """Test du délai compté au démarrage: une course bloquée ne fait pas échouer celles qui attendent"""
+    durations = {1: 1.5, **{course: 0.3 for course in range(2, 7)}}
+    executor = RacePredictionExecutor(EchoModel(), SlowDataPrep(durations), mode='thread', max_workers=2,
+                                      race_timeout=0.5)
+
+    results = executor.run(list(durations))
+
+    assert results['timed_out'] == [1]
+    assert sorted(results['predictions']) == [2, 3, 4, 5, 6]
+    assert list(results['failed']) == [1]
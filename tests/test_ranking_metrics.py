@@ -0,0 +1,138 @@
+# test_ranking_metrics.py
+import pickle
+
+import numpy as np
+import pytest
+from sklearn.metrics import ndcg_score
+from xgboost import XGBRanker, XGBRegressor
+
+from model.ranking_metrics import (compute_ranking_metrics, make_top_k_custom_metric, make_top_k_eval_metric,
+                                   top_k_accuracy)
+
+
+@pytest.fixture
+def races():
+    """Deux courses de 4 partants: positions réelles et groupes"""
+    groups = np.array([1, 1, 1, 1, 2, 2, 2, 2])
+    positions = np.array([1, 2, 3, 4, 1, 2, 3, 4], dtype=float)
+    return groups, positions
+
+
+def test_top_k_error_is_minimized(races):
+    """Test de l'erreur Top-k: nulle pour un classement parfait, maximale pour l'inverse"""
+    groups, positions = races
+    metric = make_top_k_eval_metric(k=2, groups=groups)
+
+    assert metric.__name__ == 'top2_error'
+    assert metric(positions, positions) == 0.0
+    assert metric(positions, -positions) == 1.0
+    assert metric(positions, -positions) == 1.0 - top_k_accuracy(groups, positions, -positions, k=2)
+
+
+def test_top_k_error_uses_groups_on_whole_eval_set(races):
+    """Test de l'erreur Top-k sur un eval_set complet: les courses viennent de groups"""
+    groups, positions = races
+    # Bon classement pour la course 1, inversé pour la course 2
+    y_pred = np.concatenate([positions[:4], -positions[4:]])
+
+    assert make_top_k_eval_metric(k=2, groups=groups)(positions, y_pred) == 0.5
+    # Sans groups, l'eval_set est traité comme une seule course
+    assert make_top_k_eval_metric(k=2)(positions, y_pred) == 1.0 - top_k_accuracy(
+        np.zeros(len(positions)), positions, y_pred, k=2)
+
+
+def test_top_k_error_is_picklable(races):
+    """Test de la sérialisation d'un estimateur portant la métrique"""
+    groups, _ = races
+    model = XGBRegressor(n_estimators=2, eval_metric=make_top_k_eval_metric(k=2, groups=groups))
+    restored = pickle.loads(pickle.dumps(model))
+
+    assert restored.get_params()['eval_metric'].__name__ == 'top2_error'
+
+
+def test_top_k_custom_metric_reads_dmatrix_groups(races):
+    """Test de la métrique de l'API native sur les bornes de groupes de la DMatrix"""
+    import xgboost as xgb
+
+    groups, positions = races
+    dmatrix = xgb.DMatrix(np.zeros((len(positions), 1)), label=positions)
+    dmatrix.set_group([4, 4])
+
+    name, value = make_top_k_custom_metric(k=2)(positions, dmatrix)
+    assert name == 'top2_error'
+    assert value == 0.0
+
+
+def test_ranker_early_stopping_keeps_lowest_error():
+    """Test de l'arrêt anticipé d'un XGBRanker sur l'erreur Top-k: meilleure itération = erreur minimale"""
+    rng = np.random.default_rng(0)
+    n_races, runners = 60, 8
+    X = rng.normal(size=(n_races * runners, 4))
+    positions = np.concatenate([
+        np.argsort(np.argsort(-X[i * runners:(i + 1) * runners, 0] + rng.normal(scale=0.5, size=runners))) + 1
+        for i in range(n_races)
+    ]).astype(float)
+    split = 40 * runners
+
+    model = XGBRanker(n_estimators=30, learning_rate=0.3, objective='rank:ndcg',
+                      eval_metric=make_top_k_eval_metric(k=3), early_stopping_rounds=10)
+    model.fit(X[:split], positions[:split], group=[runners] * 40,
+              eval_set=[(X[split:], positions[split:])], eval_group=[[runners] * 20], verbose=False)
+
+    history = model.evals_result()['validation_0']['top3_error']
+    assert model.best_score == pytest.approx(min(history))
+    assert model.best_iteration == int(np.argmin(history))
+
+
+def _legacy_top7_metrics(groups, positions, scores):
+    """Boucle par course de l'ancien evaluate_top7_performance (référence)"""
+    counts = dict.fromkeys(['winner', 'top3', 'top5', 'top7', 'quinte_exact', 'quinte_desordre'], 0)
+    ndcg_scores, total_races = [], 0
+    for group in dict.fromkeys(groups):
+        mask = groups == group
+        y_true, y_pred = positions[mask], scores[mask]
+        if len(y_true) <= 4:
+            continue
+        pred_idx = [i for i, _ in sorted(enumerate(y_pred), key=lambda x: x[1])]
+        true_idx = [i for i, _ in sorted(enumerate(y_true), key=lambda x: x[1])]
+        # Plus petit score = meilleur rang: scores opposés pour ndcg_score
+        ndcg_scores.append(ndcg_score([y_true.max() - y_true + 1], [-y_pred]))
+
+        counts['winner'] += pred_idx[0] == true_idx[0]
+        counts['top3'] += len(set(pred_idx[:3]) & set(true_idx[:3])) >= 2
+        common5 = len(set(pred_idx[:5]) & set(true_idx[:5]))
+        counts['top5'] += common5 >= 3
+        counts['quinte_desordre'] += common5 == 5
+        counts['quinte_exact'] += pred_idx[:5] == true_idx[:5]
+        counts['top7'] += len(y_true) >= 7 and len(set(pred_idx[:7]) & set(true_idx[:7])) >= 4
+        total_races += 1
+
+    return {
+        'ndcg_score': float(np.mean(ndcg_scores)),
+        'winner_accuracy': counts['winner'] / total_races,
+        'top3_accuracy': counts['top3'] / total_races,
+        'top5_accuracy': counts['top5'] / total_races,
+        'top7_accuracy': counts['top7'] / total_races,
+        'quinte_exact_rate': counts['quinte_exact'] / total_races,
+        'quinte_desordre_rate': counts['quinte_desordre'] / total_races,
+        'total_races_evaluated': total_races
+    }
+
+
+def test_compute_ranking_metrics_matches_legacy_loop():
+    """Test de compute_ranking_metrics contre la boucle par course de evaluate_top7_performance"""
+    rng = np.random.default_rng(0)
+    sizes = rng.integers(3, 16, size=300)
+    groups = np.repeat(rng.permutation(np.arange(1000, 1300)), sizes)
+    positions = np.concatenate([rng.permutation(size) + 1 for size in sizes]).astype(float)
+    # Scores corrélés aux positions, sans égalités
+    scores = positions + rng.normal(scale=2.0, size=len(positions))
+
+    metrics = compute_ranking_metrics(groups, positions, scores)
+    legacy = _legacy_top7_metrics(groups, positions, scores)
+
+    assert metrics['total_races_evaluated'] == legacy['total_races_evaluated'] == int(np.sum(sizes >= 5))
+    for key, value in legacy.items():
+        assert metrics[key] == pytest.approx(value), key
+    # Des quintés trouvés et des Top 5 manqués: les deux branches sont couvertes
+    assert 0.0 < metrics['quinte_desordre_rate'] < metrics['top5_accuracy'] < 1.0
@@ -0,0 +1,112 @@
+# test_rolling_stats.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_preparation.rolling_stats import RollingStatsAggregator
+
+
+def _history():
+    """Trois courses successives de l'entraîneur A (et B), la dernière sans arrivée connue"""
+    rows = [
+        # course, cheval, jockey, position, date, entraîneur
+        (1, 10, 100, 1, '2026-01-01 14:00', 'A'),
+        (1, 11, 101, 2, '2026-01-01 14:00', 'A'),
+        (1, 12, 102, 3, '2026-01-01 14:00', 'B'),
+        (2, 10, 100, 4, '2026-01-02 14:00', 'A'),
+        (2, 12, 102, 1, '2026-01-02 14:00', 'B'),
+        (3, 10, 100, None, '2026-01-03 14:00', 'A'),
+        (3, 12, 102, None, '2026-01-03 14:00', 'B'),
+    ]
+    history = pd.DataFrame(rows, columns=['id_course', 'id_cheval', 'id_jockey', 'position', 'date_heure',
+                                          'entraineur'])
+    history['distance'] = 2000
+    history['nomPere'] = 'Pere'
+    history['proprietaire'] = 'Proprio'
+    return history
+
+
+def _as_of(aggregator, course, horse, column):
+    return aggregator.as_of.loc[(course, horse), column]
+
+
+def test_rows_only_see_earlier_races():
+    """Test du point-in-time: chaque ligne ne voit que les courses strictement antérieures"""
+    aggregator = RollingStatsAggregator(engine=None).fit(_history())
+
+    # Première course: aucun antécédent, y compris pour le partant de la même course
+    assert np.isnan(_as_of(aggregator, 1, 10, 'entraineur_win_rate'))
+    assert np.isnan(_as_of(aggregator, 1, 11, 'entraineur_win_rate'))
+    # Course 2: les deux partants de A dans la course 1 (1er et 2e)
+    assert _as_of(aggregator, 2, 10, 'entraineur_win_rate') == pytest.approx(50.0)
+    assert _as_of(aggregator, 2, 10, 'entraineur_place_rate') == pytest.approx(100.0)
+    assert _as_of(aggregator, 2, 10, 'entraineur_avg_position') == pytest.approx(1.5)
+    # Course 3: courses 1 et 2, pas son propre résultat
+    assert _as_of(aggregator, 3, 10, 'entraineur_win_rate') == pytest.approx(100 / 3)
+    assert _as_of(aggregator, 3, 12, 'entraineur_win_rate') == pytest.approx(50.0)
+    assert _as_of(aggregator, 3, 10, 'jockey_cheval_count') == pytest.approx(2.0)
+    assert _as_of(aggregator, 3, 10, 'distance_avg_position') == pytest.approx(2.5)
+
+
+def test_future_races_do_not_change_past_rows():
+    """Test de l'absence de fuite: ajouter des courses ne modifie pas les valeurs des courses passées"""
+    history = _history()
+    full = RollingStatsAggregator(engine=None).fit(history)
+    past = RollingStatsAggregator(engine=None).fit(history[history['id_course'] < 3])
+
+    pd.testing.assert_frame_equal(full.as_of.loc[past.as_of.index], past.as_of)
+
+
+def test_unknown_rows_use_whole_history():
+    """Test des nouvelles courses: statistiques sur tout l'historique connu"""
+    aggregator = RollingStatsAggregator(engine=None).fit(_history())
+    upcoming = pd.DataFrame({'id_course': [4], 'id_cheval': [10], 'id_jockey': [100], 'entraineur': ['A'],
+                             'distance': [2100]})
+
+    aggregator.add_family(upcoming, 'entraineur')
+    aggregator.add_family(upcoming, 'distance')
+
+    assert upcoming.loc[0, 'entraineur_win_rate'] == pytest.approx(100 / 3)
+    assert upcoming.loc[0, 'distance_perf_count'] == pytest.approx(2.0)
+
+
+ENTITY_FEATURES = [
+    'pere_win_rate', 'pere_place_rate', 'pere_avg_position',
+    'entraineur_win_rate', 'entraineur_place_rate', 'entraineur_avg_position',
+    'proprietaire_win_rate', 'proprietaire_place_rate',
+    'jockey_cheval_win_rate', 'jockey_cheval_place_rate', 'jockey_cheval_avg_position', 'jockey_cheval_count',
+    'distance_win_rate', 'distance_place_rate', 'distance_avg_position', 'distance_perf_count',
+]
+
+
+def _next_races(engine, history):
+    """Prochaine course (hors historique) des chevaux sans course en attente d'arrivée"""
+    finished = history['position'].notna().groupby(history['id_course']).transform('any')
+    pending = set(history.loc[~finished, 'id_cheval'])
+    last = history[~history['id_cheval'].isin(pending)].sort_values('date_heure').groupby('id_cheval').tail(1)
+    upcoming = last[['id_cheval', 'id_jockey', 'nomPere', 'entraineur', 'proprietaire', 'distance']].copy()
+    upcoming['id_course'] = 10 ** 6
+    return upcoming.reset_index(drop=True)
+
+
+@pytest.mark.parametrize('with_tables', [True, False])
+def test_inference_matches_training(synthetic_engine, with_tables):
+    """Test de cohérence: la prédiction voit les mêmes statistiques que l'entraînement"""
+    from data_preparation.enhanced_data_prep import EnhancedDataPreparation
+
+    training = RollingStatsAggregator(synthetic_engine)
+    history = training.load_history()
+    training.fit(history)
+    upcoming = _next_races(synthetic_engine, history)
+    assert len(upcoming) > 0
+
+    expected = upcoming.copy()
+    for family in ['pere', 'entraineur', 'proprietaire', 'jockey_cheval', 'distance']:
+        training.add_family(expected, family)
+
+    data_prep = EnhancedDataPreparation(engine=synthetic_engine)
+    data_prep._aggregates_available = with_tables
+    actual = data_prep.create_enhanced_features(upcoming.copy(), point_in_time=False, fill_missing=False)
+
+    assert expected[ENTITY_FEATURES].notna().any().all()
+    pd.testing.assert_frame_equal(actual[ENTITY_FEATURES], expected[ENTITY_FEATURES], check_dtype=False)